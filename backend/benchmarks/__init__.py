@@ -0,0 +1,4 @@
+"""Reproducible benchmarks for the backend hot paths.
+
+Run ``python -m backend.benchmarks.run --help`` from the repository root.
+"""
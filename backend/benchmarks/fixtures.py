@@ -0,0 +1,507 @@
+"""Deterministic synthetic fixtures for the benchmark suites."""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from typing import Any, Dict, List, Optional
+
+HOOKS = [f"Hook variant {i} grabs attention" for i in range(20)]
+CORES = [f"Core loop {i} delivers three quick tips" for i in range(10)]
+CTAS = [f"Follow for more idea {i}" for i in range(8)]
+STYLES = ["lo-fi", "cinematic", "unknown", "talking-head"]
+NICHES = ["tech", "fitness", "finance", "beauty", "food"]
+
+
+def make_records(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Video records shaped like the ``videos`` rows consumed by the miner.
+
+    Transcripts are built from a fixed template pool so the number of
+    distinct patterns stays bounded (20 × 10 × 8 × 4) while the record count
+    grows.
+    """
+    rng = random.Random(seed)
+    transcripts = [
+        f"{h}. {c}. {'Once upon a time ' if i % 3 == 0 else ''}{c}. {t}."
+        for i, (h, c, t) in enumerate(
+            (h, c, t) for h in HOOKS for c in CORES for t in CTAS
+        )
+    ]
+    records = []
+    for _ in range(count):
+        records.append(
+            {
+                "transcript": rng.choice(transcripts),
+                "visual_style": rng.choice(STYLES),
+                "likes": rng.randint(0, 50_000),
+                "comments": rng.randint(0, 2_000),
+            }
+        )
+    return records
+
+
+def make_lexicon(categories: int = 40, phrases: int = 8, seed: int = 13) -> Dict[str, Dict[str, List[str]]]:
+    """Arc/hook/CTA lexicons of ``categories`` × ``phrases`` one- to three-word phrases."""
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(2_000)]
+    return {
+        kind: {
+            f"{kind}{c}": [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(phrases)]
+            for c in range(categories)
+        }
+        for kind in ("arc", "hook", "cta")
+    }
+
+
+def make_transcripts(count: int, words: int = 120, seed: int = 17) -> List[str]:
+    """Transcripts of ``words`` tokens over the :func:`make_lexicon` vocabulary."""
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(20_000)]
+    transcripts = []
+    for _ in range(count):
+        tokens = rng.choices(vocabulary, k=words)
+        transcripts.append(". ".join(" ".join(tokens[i : i + 12]) for i in range(0, words, 12)) + ".")
+    return transcripts
+
+
+def make_video_rows(count: int, audio_cardinality: int = 5_000, seed: int = 11) -> List[Dict[str, Any]]:
+    """Rows for trending-audio aggregation with a Zipf-like audio distribution."""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(audio_cardinality)]
+    audio_ids = rng.choices(range(audio_cardinality), weights=weights, k=count)
+    rows = []
+    for idx in audio_ids:
+        aid = f"audio-{idx}"
+        rows.append(
+            {
+                "audio_id": aid,
+                "audio_url": f"https://audio.example/{aid}",
+                "audio_hash": f"hash-{idx}",
+                "niche": rng.choice(NICHES),
+                "likes": rng.randint(0, 50_000),
+                "comments": rng.randint(0, 2_000),
+            }
+        )
+    return rows
+
+
+def make_ingest_response(videos: int = 500, patterns: int = 50, seed: int = 19) -> Any:
+    """``IngestResponse`` of a large synthetic ingest: ~1 min transcripts and OCR text per video."""
+    from ..models import GenerateResponse, IngestResponse, Pattern, TrendingAudio, VideoRecord
+
+    transcripts = make_transcripts(videos, words=150, seed=seed)
+    rng = random.Random(seed)
+    records = [
+        VideoRecord(
+            id=i + 1,
+            url=f"https://www.tiktok.com/@creator{i}/video/{7_300_000_000 + i}",
+            niche=rng.choice(NICHES),
+            provider="apify",
+            transcript=transcripts[i],
+            pacing=round(rng.uniform(0.8, 4.0), 2),
+            visual_style=rng.choice(STYLES),
+            onscreen_text=" ".join(rng.choice(HOOKS) for _ in range(4)),
+            audio_id=f"audio-{rng.randrange(200)}",
+            audio_url="https://audio.example/track",
+            audio_hash=f"{rng.getrandbits(128):032x}",
+            likes=rng.randint(0, 50_000),
+            comments=rng.randint(0, 2_000),
+            trending_audio=rng.random() < 0.3,
+            time_to_hook=round(rng.uniform(0.5, 4.0), 2),
+            speech_rate=round(rng.uniform(1.5, 3.5), 2),
+            pause_density=round(rng.uniform(0.0, 0.6), 2),
+        )
+        for i in range(videos)
+    ]
+    mined = [
+        Pattern(
+            id=i + 1,
+            niche=rng.choice(NICHES),
+            hook=rng.choice(HOOKS),
+            core_value_loop=rng.choice(CORES),
+            narrative_arc="informational",
+            visual_formula=rng.choice(STYLES),
+            cta=rng.choice(CTAS),
+            prevalence=rng.random(),
+            engagement_score=rng.uniform(0, 50_000),
+        )
+        for i in range(patterns)
+    ]
+    audios = [
+        TrendingAudio(audio_id=f"audio-{i}", audio_hash=f"hash-{i}", count=100 - i, avg_engagement=1000.0,
+                      loudness_envelope=[-20.0] * 60, drops=[12.5])
+        for i in range(10)
+    ]
+    generated = GenerateResponse(
+        script=" ".join(transcripts[:3]),
+        storyboard=[f"https://cdn.example/frame{i}.webp" for i in range(6)],
+        notes=["Cut on the beat at 120 BPM"],
+        audio=audios[0],
+        pattern_ids=[p.id for p in mined[:5]],
+        patterns=mined[:5],
+    )
+    return IngestResponse(
+        message="Ingestion complete",
+        run_id="bench",
+        video_ids=[r.id for r in records],
+        videos=records,
+        patterns=mined,
+        pattern_ids=[p.id for p in mined],
+        trending_audios=audios,
+        generated=generated,
+    )
+
+
+class FakeSupabase:
+    """Minimal Supabase stand-in returning fixed rows for any query."""
+
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]]):
+        self._tables = tables
+
+    def table(self, name: str) -> "_FakeQuery":
+        return _FakeQuery(self._tables.get(name, []))
+
+
+class _FakeQuery:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self._rows = rows
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: self
+
+    def execute(self) -> Any:
+        return types.SimpleNamespace(data=self._rows)
+
+
+def make_test_video(path: str, seconds: float = 6.0, fps: int = 24, shot_len: float = 1.5) -> str:
+    """Write a synthetic clip with hard cuts every ``shot_len`` and captions."""
+    import cv2
+    import numpy as np
+
+    width, height = 320, 568
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    rng = np.random.default_rng(3)
+    frames_per_shot = max(1, int(shot_len * fps))
+    colour = rng.integers(0, 255, size=3)
+    for frame_idx in range(int(seconds * fps)):
+        if frame_idx % frames_per_shot == 0:
+            colour = rng.integers(0, 255, size=3)
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = colour
+        cv2.putText(
+            frame, "3 TIPS YOU NEED", (20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+            (255, 255, 255), 2,
+        )
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class _OpenAIHandler(BaseHTTPRequestHandler):
+    variations = json.dumps(
+        {
+            p: {"hook": f"{p} hook", "cta": f"{p} cta"}
+            for p in ("tiktok", "instagram", "youtube")
+        }
+    )
+
+    def log_message(self, *args: Any) -> None:  # pragma: no cover - silence
+        pass
+
+    @staticmethod
+    def frame() -> str:
+        import base64
+        import io
+
+        from PIL import Image
+
+        buf = io.BytesIO()
+        Image.new("RGB", (288, 512), (40, 90, 160)).save(buf, format="PNG")
+        return base64.b64encode(buf.getvalue()).decode()
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/images/generations"):
+            payload: Dict[str, Any] = {"created": 0, "data": [{"b64_json": self.frame()}]}
+        else:
+            prompt = body.get("messages", [{}])[-1].get("content", "")
+            content = self.variations if "platform-specific" in prompt else "Stub script."
+            if body.get("stream"):
+                self._stream(body, content)
+                return
+            payload = {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+            }
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, body: Dict[str, Any], content: str) -> None:
+        """Server-sent chat completion chunks, a few characters each."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        events = []
+        for i in range(0, len(content), 8):
+            chunk = {
+                "id": "stub",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": content[i : i + 8]}, "finish_reason": None}],
+            }
+            events.append(f"data: {json.dumps(chunk)}\n\n")
+        # one write: per-event writes would hit Nagle/delayed-ACK stalls
+        self.wfile.write(("".join(events) + "data: [DONE]\n\n").encode())
+        self.close_connection = True
+
+
+class StubOpenAIServer:
+    """Local OpenAI-compatible server answering chat and image requests."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), _OpenAIHandler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "StubOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self._saved = {k: os.environ.get(k) for k in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+        os.environ["OPENAI_BASE_URL"] = self.base_url
+        os.environ["OPENAI_API_KEY"] = "stub-key"
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        for key, value in self._saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+class _FaultHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args: Any) -> None:  # pragma: no cover - silence
+        pass
+
+    def _respond(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        action = self.server.next_action()  # type: ignore[attr-defined]
+        if action == "slow":
+            time.sleep(self.server.delay)  # type: ignore[attr-defined]
+        status = self.server.status if action == "fail" else 200  # type: ignore[attr-defined]
+        data = json.dumps({"ok": status == 200, "action": action}).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):  # pragma: no cover - hedge cancelled
+            pass
+
+    do_GET = do_POST = _respond
+
+
+class FaultInjectingServer:
+    """Local HTTP stand-in that fails or stalls requests on demand.
+
+    ``schedule`` lists the actions (``"ok"``, ``"fail"`` or ``"slow"``) for the
+    first requests in arrival order; afterwards each request fails with
+    probability ``error_rate`` or stalls for ``delay`` seconds with probability
+    ``slow_rate``.
+    """
+
+    def __init__(
+        self,
+        schedule: Optional[List[str]] = None,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        delay: float = 0.2,
+        status: int = 503,
+        seed: int = 5,
+    ):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _FaultHandler)
+        self._server.daemon_threads = True
+        self._server.delay = delay  # type: ignore[attr-defined]
+        self._server.status = status  # type: ignore[attr-defined]
+        self._server.next_action = self._next_action  # type: ignore[attr-defined]
+        self._schedule = list(schedule or [])
+        self._error_rate = error_rate
+        self._slow_rate = slow_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def _next_action(self) -> str:
+        with self._lock:
+            self.requests += 1
+            if self._schedule:
+                return self._schedule.pop(0)
+            roll = self._rng.random()
+        if roll < self._error_rate:
+            return "fail"
+        if roll < self._error_rate + self._slow_rate:
+            return "slow"
+        return "ok"
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self) -> "FaultInjectingServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _RedisHandler(StreamRequestHandler):
+    def _command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self) -> None:
+        server = self.server
+        while True:
+            args = self._command()
+            if args is None:
+                return
+            with server.lock:  # type: ignore[attr-defined]
+                server.commands += 1  # type: ignore[attr-defined]
+                reply = server.execute([args[0].upper().decode()] + args[1:])  # type: ignore[attr-defined]
+            self.wfile.write(reply)
+
+
+class FakeRedisServer:
+    """In-process TCP server speaking enough RESP2 for the cache backend.
+
+    Supports ``PING``, ``GET``, ``MGET``, ``SET`` (with ``PX``/``EX`` and
+    ``NX``/``XX``), ``DEL``, ``INCR``, ``PEXPIRE``, ``SELECT``, ``AUTH`` and
+    ``FLUSHDB``; every database
+    number shares one keyspace.
+    """
+
+    def __init__(self) -> None:
+        self._server = ThreadingTCPServer(("127.0.0.1", 0), _RedisHandler)
+        self._server.daemon_threads = True
+        self._server.lock = threading.Lock()  # type: ignore[attr-defined]
+        self._server.commands = 0  # type: ignore[attr-defined]
+        self._server.execute = self._execute  # type: ignore[attr-defined]
+        self.data: Dict[bytes, tuple] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def commands(self) -> int:
+        return self._server.commands  # type: ignore[attr-defined]
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            entry = None
+        return entry[0] if entry else None
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _execute(self, args: List[Any]) -> bytes:
+        name, rest = args[0], args[1:]
+        if name == "PING":
+            return b"+PONG\r\n"
+        if name in ("SELECT", "AUTH"):
+            return b"+OK\r\n"
+        if name == "FLUSHDB":
+            self.data.clear()
+            return b"+OK\r\n"
+        if name == "GET":
+            return self._bulk(self._get(rest[0]))
+        if name == "MGET":
+            return b"*%d\r\n" % len(rest) + b"".join(self._bulk(self._get(k)) for k in rest)
+        if name == "SET":
+            expires = None
+            options = [o.upper() for o in rest[2:]]
+            for unit, flag in ((1000, b"PX"), (1, b"EX")):
+                if flag in options:
+                    expires = time.monotonic() + int(rest[2 + options.index(flag) + 1]) / unit
+            exists = self._get(rest[0]) is not None
+            if (b"NX" in options and exists) or (b"XX" in options and not exists):
+                return self._bulk(None)
+            self.data[rest[0]] = (rest[1], expires)
+            return b"+OK\r\n"
+        if name == "PEXPIRE":
+            value = self._get(rest[0])
+            if value is None:
+                return b":0\r\n"
+            self.data[rest[0]] = (value, time.monotonic() + int(rest[1]) / 1000)
+            return b":1\r\n"
+        if name == "DEL":
+            removed = sum(self.data.pop(k, None) is not None for k in rest)
+            return b":%d\r\n" % removed
+        if name == "INCR":
+            try:
+                value = int(self._get(rest[0]) or 0) + 1
+            except ValueError:
+                return b"-ERR value is not an integer or out of range\r\n"
+            # INCR keeps the key's expiry, as Redis does
+            self.data[rest[0]] = (str(value).encode(), self.data.get(rest[0], (None, None))[1])
+            return b":%d\r\n" % value
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+    def __enter__(self) -> "FakeRedisServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
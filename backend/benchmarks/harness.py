@@ -0,0 +1,135 @@
+"""Measurement helpers shared by the benchmark suites."""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Return the ``q`` (0-100) percentile of ``samples`` by linear interpolation."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    pos = (len(ordered) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def summarize(latencies: List[float], items: int, wall: float, peak_bytes: int) -> Dict[str, float]:
+    """Reduce raw per-call latencies into the reported benchmark figures."""
+    return {
+        "calls": len(latencies),
+        "throughput_per_s": items / wall if wall else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_mb": peak_bytes / (1024 * 1024),
+    }
+
+
+def _peak_memory(call: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure(
+    func: Callable[[], Any], *, repeat: int = 5, items_per_call: int = 1, warmup: int = 1
+) -> Dict[str, float]:
+    """Benchmark a synchronous callable.
+
+    Latency is sampled on untraced runs; peak memory comes from one additional
+    run under ``tracemalloc`` so tracing overhead does not skew timings.
+    """
+    for _ in range(warmup):
+        func()
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    peak = _peak_memory(func)
+    return summarize(latencies, items_per_call * repeat, wall, peak)
+
+
+def measure_async(
+    factory: Callable[[], Any],
+    *,
+    requests: int = 50,
+    concurrency: int = 10,
+    setup: Optional[Callable[[], Any]] = None,
+) -> Dict[str, float]:
+    """Benchmark an async callable driven with bounded concurrency."""
+
+    async def run() -> Dict[str, float]:
+        if setup is not None:
+            await setup()
+        sem = asyncio.Semaphore(concurrency)
+        latencies: List[float] = []
+
+        async def one() -> None:
+            async with sem:
+                t0 = time.perf_counter()
+                await factory()
+                latencies.append(time.perf_counter() - t0)
+
+        await one()  # warm up connections and lazy clients
+        latencies.clear()
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(one() for _ in range(requests)))
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return summarize(latencies, requests, wall, peak)
+
+    return asyncio.run(run())
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    """Return human-readable regressions of ``results`` against ``baseline``."""
+    regressions: List[str] = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if current["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_per_s']:.1f}/s "
+                f"< baseline {base['throughput_per_s']:.1f}/s"
+            )
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.2f}ms > baseline {base['p95_ms']:.2f}ms"
+            )
+        if current["peak_mb"] > base["peak_mb"] * (1 + tolerance) + 1:
+            regressions.append(
+                f"{name}: peak memory {current['peak_mb']:.1f}MB > baseline {base['peak_mb']:.1f}MB"
+            )
+        if "recall_at_10" in base and current.get("recall_at_10", 0.0) < base["recall_at_10"]:
+            regressions.append(
+                f"{name}: recall@10 {current.get('recall_at_10', 0.0):.2f} "
+                f"< baseline {base['recall_at_10']:.2f}"
+            )
+    return regressions
@@ -0,0 +1,534 @@
+"""Command line entry point for the backend benchmark suites.
+
+Examples::
+
+    python -m backend.benchmarks.run                      # run and compare
+    python -m backend.benchmarks.run --suite miner --quick
+    python -m backend.benchmarks.run --save-baseline      # refresh baseline
+
+Results are compared against ``baselines/baseline.json``; the command exits
+non-zero when throughput, p95 latency or peak memory regress beyond the
+tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from typing import Callable, Dict
+
+from . import fixtures
+from .harness import compare, measure, measure_async
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "baseline.json")
+
+Results = Dict[str, Dict[str, float]]
+
+
+def bench_miner(quick: bool) -> Results:
+    """``mine_patterns_from_records`` at 1k/100k/1M records."""
+    from ..services.pattern_miner import mine_patterns_from_records
+
+    sizes = [1_000, 100_000] if quick else [1_000, 100_000, 1_000_000]
+    results: Results = {}
+    for size in sizes:
+        records = fixtures.make_records(size)
+        repeat = 20 if size <= 1_000 else (5 if size <= 100_000 else 1)
+        results[f"miner/{size}"] = measure(
+            lambda: mine_patterns_from_records(records, "tech"),
+            repeat=repeat,
+            items_per_call=size,
+            warmup=0 if size >= 1_000_000 else 1,
+        )
+    return results
+
+
+def bench_pattern_index(quick: bool) -> Results:
+    """Prompt-aware ``NicheIndex.search`` over a full niche of patterns."""
+    from ..services.pattern_index import NicheIndex
+    from ..services.pattern_miner import mine_patterns_from_records
+
+    patterns = mine_patterns_from_records(fixtures.make_records(20_000), "tech")[:2000]
+    index = NicheIndex(patterns)
+    prompts = [f"three quick tips idea {i} to grab attention" for i in range(100)]
+    return {
+        "pattern_index/search": measure(
+            lambda: [index.search(p, 5) for p in prompts], repeat=20, items_per_call=len(prompts)
+        )
+    }
+
+
+def bench_lexicon(quick: bool) -> Results:
+    """Arc/hook/CTA labelling of a transcript corpus against 3 × 40 × 8 phrases.
+
+    ``naive`` scans each transcript once per phrase, as the miner used to for
+    its three story keywords; ``automaton`` is the compiled lexicon.
+    """
+    from ..services.lexicon import Lexicon
+
+    categories = fixtures.make_lexicon()
+    lexicon = Lexicon(categories)
+    corpus = fixtures.make_transcripts(2_000 if quick else 20_000)
+
+    def naive() -> None:
+        for text in corpus:
+            lowered = f" {' '.join(text.lower().replace('.', ' ').split())} "
+            for labels in categories.values():
+                for phrases in labels.values():
+                    any(f" {p} " in lowered for p in phrases)
+
+    def automaton() -> None:
+        for text in corpus:
+            lexicon.classify(text)
+
+    def labels() -> None:
+        for text in corpus:
+            lexicon.arc(text)
+            lexicon.hook_type(text)
+            lexicon.cta_type(text)
+
+    repeat = 3 if quick else 5
+    return {
+        "lexicon/naive": measure(naive, repeat=repeat, items_per_call=len(corpus)),
+        "lexicon/automaton-labels": measure(labels, repeat=repeat, items_per_call=len(corpus)),
+        "lexicon/automaton-positions": measure(automaton, repeat=repeat, items_per_call=len(corpus)),
+    }
+
+
+def bench_trending(quick: bool) -> Results:
+    """Uncached ``get_trending_audio`` aggregation over large ``videos`` row sets."""
+    from ..services import ingestion
+
+    sizes = [10_000, 100_000] if quick else [10_000, 100_000, 500_000]
+    results: Results = {}
+    original = ingestion.get_supabase_client
+    try:
+        for size in sizes:
+            fake = fixtures.FakeSupabase({"videos": fixtures.make_video_rows(size)})
+            ingestion.get_supabase_client = lambda: fake
+            results[f"trending/{size}"] = measure(
+                lambda: asyncio.run(ingestion._rank_trending_audio(None, 10, None)),
+                repeat=10 if size <= 100_000 else 3,
+                items_per_call=size,
+            )
+    finally:
+        ingestion.get_supabase_client = original
+
+    from ..services.trending import TrendingTracker
+
+    tracker = TrendingTracker(bucket_seconds=3600, buckets=168)
+    rows = fixtures.make_video_rows(sizes[-1])
+    now = tracker.clock()
+    for i, r in enumerate(rows):
+        tracker.record(
+            r["niche"], r["audio_id"], r["likes"] + r["comments"],
+            timestamp=now - (i % 168) * 3600, url=r["audio_url"], audio_hash=r["audio_hash"],
+        )
+    for window in ("1h", "24h", "7d"):
+        results[f"trending/tracker-{window}"] = measure(
+            lambda: tracker.top(niche="tech", limit=10, window=window), repeat=20
+        )
+    return results
+
+
+def bench_sketch(quick: bool) -> Results:
+    """Audio sketch update cost and top-K accuracy against exact aggregation."""
+    from collections import Counter
+
+    from ..services.sketch import AudioSketch
+
+    size = 100_000 if quick else 500_000
+    rows = fixtures.make_video_rows(size, audio_cardinality=50_000)
+    exact = Counter(r["audio_id"] for r in rows)
+
+    def build() -> AudioSketch:
+        sketch = AudioSketch(path="")
+        for r in rows:
+            sketch.record(r["niche"], r["audio_id"], r["likes"] + r["comments"])
+        return sketch
+
+    results: Results = {f"sketch/update-{size}": measure(build, repeat=1, items_per_call=size)}
+    sketch = build()
+    results["sketch/top-10"] = measure(lambda: sketch.top(limit=10), repeat=50)
+
+    k = 10
+    truth = {aid for aid, _ in exact.most_common(k)}
+    found = sketch.top(limit=k)
+    results["sketch/top-10"].update(
+        {
+            "recall_at_10": len(truth & {a.audio_id for a in found}) / k,
+            "max_error_ratio": max(a.count - exact[a.audio_id] for a in found) / size,
+            "error_bound_ratio": sketch.epsilon,
+            "sketch_mb": sketch.nbytes / (1024 * 1024),
+        }
+    )
+    return results
+
+
+def bench_snapshot(quick: bool) -> Results:
+    """Columnar videos snapshot: append, trending and mining versus dict rows."""
+    from ..services import ingestion
+    from ..services.pattern_miner import mine_patterns_from_records, mine_patterns_from_snapshot
+    from ..services.snapshot import VideoSnapshot
+
+    size = 200_000 if quick else 1_000_000
+    rows = fixtures.make_video_rows(size)
+    records = fixtures.make_records(size)
+    for i, (row, rec) in enumerate(zip(rows, records), start=1):
+        row.update(rec, id=i)
+
+    results: Results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        counter = iter(range(10**6))
+
+        def build() -> VideoSnapshot:
+            snapshot = VideoSnapshot(os.path.join(tmp, f"build-{next(counter)}"))
+            for start in range(0, size, 50_000):
+                snapshot.append(rows[start : start + 50_000])
+            return snapshot
+
+        results[f"snapshot/append-{size}"] = measure(build, repeat=1, items_per_call=size, warmup=0)
+        snapshot = VideoSnapshot(os.path.join(tmp, "build-0"))
+        disk = sum(
+            os.path.getsize(os.path.join(snapshot.path, f)) for f in os.listdir(snapshot.path)
+        )
+        results[f"snapshot/append-{size}"]["bytes_per_row"] = disk / size
+
+        results[f"snapshot/trending-{size}"] = measure(
+            lambda: snapshot.top_audio(limit=10), repeat=10, items_per_call=size
+        )
+        original = ingestion.get_supabase_client
+        fake = fixtures.FakeSupabase({"videos": rows})
+        ingestion.get_supabase_client = lambda: fake
+        try:
+            results[f"snapshot/trending-dict-{size}"] = measure(
+                lambda: asyncio.run(ingestion._rank_trending_audio(None, 10, None)),
+                repeat=3,
+                items_per_call=size,
+            )
+        finally:
+            ingestion.get_supabase_client = original
+
+        tech = snapshot.select(niches=["tech"])
+        tech_rows = [rows[i] for i in tech.tolist()]
+        results["snapshot/mine-top5pct"] = measure(
+            lambda: mine_patterns_from_snapshot(snapshot, tech, "tech", top_percentile=0.05),
+            repeat=3,
+            items_per_call=len(tech),
+        )
+        results["snapshot/mine-top5pct-dict"] = measure(
+            lambda: mine_patterns_from_records(tech_rows, "tech", top_percentile=0.05),
+            repeat=3,
+            items_per_call=len(tech),
+        )
+    return results
+
+
+def bench_analyzers(quick: bool) -> Results:
+    """Each ingestion analyzer on a generated test video."""
+    from ..services import ingestion
+
+    results: Results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = fixtures.make_test_video(os.path.join(tmp, "clip.mp4"))
+        analyzers: Dict[str, Callable[[str], object]] = {
+            "pacing": ingestion._analyse_pacing,
+            "visual_style": ingestion._classify_visual_style,
+            "ocr": ingestion._extract_onscreen_text,
+        }
+        for name, func in analyzers.items():
+            results[f"analyzers/{name}"] = measure(
+                lambda: func(path), repeat=3 if quick else 10
+            )
+    return results
+
+
+def bench_audio(quick: bool) -> Results:
+    """Audio feature extraction on a 30 s, 22.05 kHz signal (items are seconds of audio)."""
+    import numpy as np
+
+    from ..services.audio_features import analyse_signal
+
+    sr, seconds = 22050, 30
+    rng = np.random.default_rng(3)
+    t = np.arange(sr * seconds) / sr
+    y = (0.1 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 2 * t) > 0) + rng.normal(0, 0.01, len(t)))
+    y = y.astype(np.float32)
+    return {
+        "audio/features-30s": measure(
+            lambda: analyse_signal(y, sr), repeat=5 if quick else 20, items_per_call=seconds
+        )
+    }
+
+
+def bench_generate(quick: bool) -> Results:
+    """End-to-end ``POST /api/generate`` against a stubbed OpenAI server.
+
+    A second run swaps in the deterministic stub LLM backend so the
+    micro-batching scheduler is exercised without any network hop.
+    """
+    import httpx
+
+    from ..services.llm import get_llm, get_openai_client
+
+    results: Results = {}
+    payload = {"prompt": "3 productivity tips", "niche": "tech"}
+    requests = 20 if quick else 200
+    saved_backend = os.environ.get("LLM_BACKEND")
+    media = tempfile.TemporaryDirectory()
+    os.environ.setdefault("STORYBOARD_DIR", media.name)
+    with media, fixtures.StubOpenAIServer():
+        from ..main import app
+
+        transport = httpx.ASGITransport(app=app)
+
+        async def request() -> None:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                resp = await client.post("/api/generate/", json=payload)
+                resp.raise_for_status()
+
+        try:
+            for backend in ("openai", "stub"):
+                os.environ["LLM_BACKEND"] = backend
+                get_llm.cache_clear()
+                get_openai_client.cache_clear()
+                name = "generate/e2e" if backend == "openai" else f"generate/e2e-{backend}-llm"
+                results[name] = measure_async(request, requests=requests, concurrency=10)
+        finally:
+            if saved_backend is None:
+                os.environ.pop("LLM_BACKEND", None)
+            else:
+                os.environ["LLM_BACKEND"] = saved_backend
+            get_llm.cache_clear()
+            get_openai_client.cache_clear()
+    return results
+
+
+def bench_resilience(quick: bool) -> Results:
+    """Tail latency against a stand-in that stalls 5% of requests.
+
+    The hedged run starts a second attempt after 150ms (about twice the
+    median), trading a few extra requests for a shorter tail.
+    """
+    import httpx
+
+    from ..services.resilience import Dependency, Policy
+
+    results: Results = {}
+    requests = 100 if quick else 400
+    for name, hedge_ms in (("resilience/plain", 0.0), ("resilience/hedged", 150.0)):
+        dep = Dependency(f"bench_{name}", Policy(timeout=5, retries=0, hedge_ms=hedge_ms))
+        clients = []
+
+        async def setup() -> None:
+            clients.append(httpx.AsyncClient(base_url=server.url))
+
+        async def call() -> None:
+            resp = await dep.call(lambda: clients[0].get("/"))
+            resp.raise_for_status()
+
+        with fixtures.FaultInjectingServer(slow_rate=0.05, delay=0.25) as server:
+            results[name] = measure_async(call, requests=requests, concurrency=10, setup=setup)
+    return results
+
+
+def bench_serialization(quick: bool) -> Results:
+    """Encoding a large ingest response (items are videos) and compressing it.
+
+    ``fastapi-default`` is the path a returned model takes through a route
+    with ``response_model`` (dump, re-validate, jsonable conversion, stdlib
+    JSON); ``orjson`` is :class:`ORJSONResponse` as returned by the ingest
+    endpoint. Body sizes are reported in bytes.
+    """
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from ..models import IngestResponse
+    from ..services import serialization
+    from ..services.serialization import ORJSONResponse
+
+    videos = 100 if quick else 500
+    response = fixtures.make_ingest_response(videos)
+    summary = IngestResponse(
+        message=response.message,
+        run_id=response.run_id,
+        video_ids=response.video_ids,
+        pattern_ids=response.pattern_ids,
+    )
+    field = create_response_field(name="ingest", type_=IngestResponse)
+
+    def fastapi_default() -> bytes:
+        content = asyncio.run(serialize_response(field=field, response_content=response, is_coroutine=True))
+        return JSONResponse(content).body
+
+    body = ORJSONResponse(response).body
+    results: Results = {
+        "serialize/fastapi-default": measure(fastapi_default, repeat=5, items_per_call=videos),
+        "serialize/orjson": measure(lambda: ORJSONResponse(response).body, repeat=20, items_per_call=videos),
+        "serialize/summary": measure(lambda: ORJSONResponse(summary).body, repeat=20, items_per_call=videos),
+    }
+    results["serialize/fastapi-default"]["bytes"] = float(len(fastapi_default()))
+    results["serialize/orjson"]["bytes"] = float(len(body))
+    results["serialize/summary"]["bytes"] = float(len(ORJSONResponse(summary).body))
+
+    encoders = {"gzip": lambda: serialization._compressor("gzip", 6)}
+    if serialization.brotli is not None:
+        encoders["br"] = lambda: serialization._compressor("br", 4)
+    for name, make in encoders.items():
+
+        def compress(make=make) -> bytes:
+            stream = make()
+            return stream[0](body) + stream[2]()
+
+        results[f"compress/{name}"] = measure(compress, repeat=10, items_per_call=videos)
+        results[f"compress/{name}"]["bytes"] = float(len(compress()))
+    return results
+
+
+def bench_cache(quick: bool) -> Results:
+    """Cache hit latency per backend for a trending-sized JSON value."""
+    from ..services.cache import Cache, MemoryBackend, RedisBackend, SQLiteBackend
+
+    results: Results = {}
+    requests = 500 if quick else 2000
+    value = [
+        {"audio_id": f"a{i}", "audio_hash": "h" * 32, "count": i, "avg_engagement": 1.5, "url": None}
+        for i in range(10)
+    ]
+    with tempfile.TemporaryDirectory() as tmp, fixtures.FakeRedisServer() as server:
+        backends = {
+            "memory": MemoryBackend,
+            "sqlite": lambda: SQLiteBackend(os.path.join(tmp, "cache.sqlite3")),
+            "redis": lambda: RedisBackend(server.url),
+        }
+        for name, make in backends.items():
+            caches = []
+
+            async def setup() -> None:
+                caches.append(Cache(make()))
+                await caches[0].set("trending", "k", value)
+
+            async def hit() -> None:
+                await caches[0].get("trending", "k")
+
+            results[f"cache/{name}-hit"] = measure_async(hit, requests=requests, concurrency=10, setup=setup)
+    return results
+
+
+_COLD_START = {
+    # interpreter start plus importing the application
+    "import": "import backend.main",
+    # import, lifespan warmup and the first request served
+    "ready": (
+        "from fastapi.testclient import TestClient\n"
+        "import backend.main\n"
+        "with TestClient(backend.main.app) as client:\n"
+        "    client.get('/')\n"
+    ),
+}
+
+
+def bench_cold_start(quick: bool) -> Results:
+    """Fresh-process startup time per role, measured with subprocesses."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    results: Results = {}
+    for role in ("api", "worker"):
+        env = {**os.environ, "VIRALSYNTH_ROLE": role}
+        for stage, code in _COLD_START.items():
+            results[f"cold_start/{stage}-{role}"] = measure(
+                lambda: subprocess.run(
+                    [sys.executable, "-c", code], cwd=root, env=env, check=True,
+                    stdout=subprocess.DEVNULL,
+                ),
+                repeat=3 if quick else 7,
+            )
+    return results
+
+
+SUITES: Dict[str, Callable[[bool], Results]] = {
+    "miner": bench_miner,
+    "pattern_index": bench_pattern_index,
+    "lexicon": bench_lexicon,
+    "trending": bench_trending,
+    "sketch": bench_sketch,
+    "snapshot": bench_snapshot,
+    "analyzers": bench_analyzers,
+    "audio": bench_audio,
+    "generate": bench_generate,
+    "resilience": bench_resilience,
+    "cache": bench_cache,
+    "serialization": bench_serialization,
+    "cold_start": bench_cold_start,
+}
+
+
+def _print(results: Results) -> None:
+    header = f"{'benchmark':<32}{'items/s':>14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<32}{r['throughput_per_s']:>14.1f}{r['p50_ms']:>10.2f}"
+            f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['peak_mb']:>10.1f}"
+        )
+    for name, r in results.items():
+        if "bytes" in r:
+            print(f"{name}: {r['bytes'] / 1024:.1f} KiB body")
+        if "bytes_per_row" in r:
+            print(f"{name}: {r['bytes_per_row']:.1f} bytes per row on disk")
+        if "recall_at_10" in r:
+            print(
+                f"{name}: recall@10 {r['recall_at_10']:.2f}, max overcount "
+                f"{r['max_error_ratio']:.5f} of total (bound {r['error_bound_ratio']:.5f}), "
+                f"{r['sketch_mb']:.1f}MB of counters"
+            )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="suite(s) to run")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for CI smoke runs")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--output", help="write raw results JSON here")
+    args = parser.parse_args(argv)
+
+    results: Results = {}
+    for name in args.suite or list(SUITES):
+        results.update(SUITES[name](args.quick))
+    _print(results)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+
+    baseline: Dict = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+
+    if args.save_baseline:
+        baseline.setdefault("results", {}).update(results)
+        baseline["machine"] = {"python": platform.python_version(), "platform": platform.platform()}
+        with open(args.baseline, "w") as fh:
+            json.dump(baseline, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline.get("results", {}), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
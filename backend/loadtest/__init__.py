@@ -0,0 +1,4 @@
+"""Load tests of the API against local stand-ins for every external service.
+
+Run ``python -m backend.loadtest.run --help`` from the repository root.
+"""
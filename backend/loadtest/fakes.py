@@ -0,0 +1,685 @@
+"""Local stand-ins for OpenAI, Groq, Apify and Supabase (PostgREST).
+
+Every fake is a threaded HTTP server whose responses are delayed by a
+:class:`Latency` distribution and fail with probability ``error_rate``
+(status ``error_status``), so load tests see realistic dependency behaviour
+instead of the application's placeholder branches:
+
+* :class:`FakeOpenAI` – chat completions (plain and streamed) and image
+  generations;
+* :class:`FakeGroq` – Whisper ``verbose_json`` transcriptions with word
+  timestamps;
+* :class:`FakeApify` – ``run-sync-get-dataset-items`` returning videos whose
+  media (a WAV track, an MP4 clip when OpenCV is installed) it also serves;
+* :class:`FakePostgREST` – an in-memory PostgREST subset (``select``, ``eq``,
+  ``in``, ``gte``, ``gt``/``lt``, ``or``/``and`` groups, ``order``,
+  ``limit``, inserts, upserts with ``on_conflict``, deletes and the
+  ``merge_patterns`` function) that the ``supabase`` client talks to as it
+  would to Supabase.
+
+:class:`FakeStack` runs all of them in a separate process, so serving fake
+traffic does not compete with the load generator for the GIL, and returns
+the environment that points the application at them. ``python -m
+backend.loadtest.fakes`` serves the stack on its own.
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import struct
+import threading
+import time
+import wave
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from ..benchmarks.fixtures import CORES, CTAS, HOOKS, NICHES, STYLES
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+class Latency:
+    """Response delay distribution parsed from a spec string.
+
+    ``fixed:S``, ``uniform:LOW,HIGH``, ``exp:MEAN`` or ``lognormal:MEDIAN,SIGMA``
+    (seconds); ``0`` or an empty spec means no delay.
+    """
+
+    def __init__(self, spec: str = "0") -> None:
+        self.spec = spec or "0"
+        kind, _, args = self.spec.partition(":")
+        values = [float(v) for v in args.split(",") if v.strip()]
+        if kind in ("0", "none"):
+            self._sample: Callable[[random.Random], float] = lambda rng: 0.0
+        elif kind == "fixed" and len(values) == 1:
+            self._sample = lambda rng: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            self._sample = lambda rng: rng.uniform(values[0], values[1])
+        elif kind == "exp" and len(values) == 1:
+            self._sample = lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+        elif kind == "lognormal" and len(values) == 2:
+            self._sample = lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+        else:
+            raise ValueError(f"Unknown latency spec: {spec!r}")
+
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, self._sample(rng))
+
+    def __repr__(self) -> str:
+        return f"Latency({self.spec!r})"
+
+
+def _json(status: int, payload: Any) -> Response:
+    return status, {"Content-Type": "application/json"}, json.dumps(payload).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args: Any) -> None:  # pragma: no cover - silence
+        pass
+
+    def _dispatch(self) -> None:
+        fake: FakeService = self.server.fake  # type: ignore[attr-defined]
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, data = fake.respond(
+            self.command, parts.path, parse_qsl(parts.query, keep_blank_values=True), self.headers, body
+        )
+        try:
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):  # pragma: no cover - client gave up
+            pass
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_HEAD = _dispatch
+
+
+class FakeService:
+    """Threaded HTTP stand-in with injected latency and errors."""
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: str = "0",
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = 13,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.latency = Latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, method: str, path: str, query: List[Tuple[str, str]], headers: Any, body: bytes) -> Response:
+        if path == "/health":
+            return _json(200, {"ok": True})
+        with self._lock:
+            self.requests += 1
+            delay = self.latency.sample(self._rng)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return _json(self.error_status, {"error": {"message": f"injected {self.name} failure"}})
+        return self.handle(method, path, query, headers, body)
+
+    def handle(self, method: str, path: str, query: List[Tuple[str, str]], headers: Any, body: bytes) -> Response:
+        raise NotImplementedError
+
+    def start(self) -> "FakeService":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeService":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def _png(width: int = 288, height: int = 512, rgb: Tuple[int, int, int] = (40, 90, 160)) -> bytes:
+    """Solid-colour PNG without an imaging dependency."""
+    row = b"\x00" + bytes(rgb) * width
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeOpenAI(FakeService):
+    """Chat completions (optionally streamed) and image generations."""
+
+    name = "openai"
+    variations = json.dumps(
+        {p: {"hook": f"{p} hook", "cta": f"{p} cta"} for p in ("tiktok", "instagram", "youtube")}
+    )
+
+    def __init__(self, *args: Any, script_words: int = 120, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.script = " ".join(HOOKS[i % len(HOOKS)].split()[i % 4] for i in range(script_words))
+        self.frame = base64.b64encode(_png()).decode()
+
+    def handle(self, method, path, query, headers, body) -> Response:
+        request = json.loads(body or b"{}")
+        if path.endswith("/images/generations"):
+            return _json(200, {"created": 0, "data": [{"b64_json": self.frame}]})
+        if not path.endswith("/chat/completions"):
+            return _json(404, {"error": {"message": f"unknown path {path}"}})
+        prompt = (request.get("messages") or [{}])[-1].get("content", "")
+        content = self.variations if "platform-specific" in prompt else self.script
+        model = request.get("model", "fake")
+        if request.get("stream"):
+            events = [
+                {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": model,
+                 "choices": [{"index": 0, "delta": {"content": content[i : i + 16]}, "finish_reason": None}]}
+                for i in range(0, len(content), 16)
+            ]
+            data = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+            return 200, {"Content-Type": "text/event-stream"}, data.encode()
+        return _json(200, {
+            "id": "fake", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+        })
+
+
+class FakeGroq(FakeService):
+    """Whisper transcriptions in ``verbose_json`` form with word timestamps."""
+
+    name = "groq"
+
+    def handle(self, method, path, query, headers, body) -> Response:
+        with self._lock:
+            words = [self._rng.choice(HOOKS).split()[j % 4].lower() for j in range(self._rng.randint(40, 160))]
+        timed_words, t = [], 0.0
+        for word in words:
+            timed_words.append({"word": word, "start": round(t, 2), "end": round(t + 0.3, 2)})
+            t += 0.3 + (0.4 if len(timed_words) % 12 == 0 else 0.05)
+        text = " ".join(words)
+        return _json(200, {
+            "text": text,
+            "duration": round(t, 2),
+            "segments": [{"id": 0, "start": 0.0, "end": round(t, 2), "text": text}],
+            "words": timed_words,
+        })
+
+
+def _wav(seconds: float = 3.0, sr: int = 22050, bpm: float = 120.0) -> bytes:
+    """Click track at ``bpm`` with a louder second half (a "drop")."""
+    beat = int(sr * 60 / bpm)
+    frames = bytearray()
+    for i in range(int(seconds * sr)):
+        level = 0.6 if i > seconds * sr / 2 else 0.2
+        value = level * math.sin(2 * math.pi * 880 * i / sr) if i % beat < sr // 50 else 0.0
+        frames += struct.pack("<h", int(value * 32767))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sr)
+        wav.writeframes(bytes(frames))
+    return buf.getvalue()
+
+
+class FakeApify(FakeService):
+    """Synchronous actor runs returning trending videos, plus their media."""
+
+    name = "apify"
+
+    def __init__(self, *args: Any, items: int = 10, audios: int = 50, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.items = items
+        self.audios = audios
+        self._media: Dict[str, bytes] = {"audio.wav": _wav()}
+        self._counter = 0
+
+    def _video(self) -> bytes:
+        if "video.mp4" not in self._media:
+            try:
+                import tempfile
+
+                from ..benchmarks.fixtures import make_test_video
+
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = make_test_video(os.path.join(tmp, "clip.mp4"))
+                    with open(path, "rb") as fh:
+                        self._media["video.mp4"] = fh.read()
+            except Exception:  # OpenCV missing: analysers fall back to defaults
+                self._media["video.mp4"] = b""
+        return self._media["video.mp4"]
+
+    def handle(self, method, path, query, headers, body) -> Response:
+        if path.startswith("/media/"):
+            data = self._video() if path.endswith(".mp4") else self._media["audio.wav"]
+            if not data:
+                return _json(404, {"error": "no media"})
+            kind = "video/mp4" if path.endswith(".mp4") else "audio/wav"
+            ranged = re.match(r"bytes=(\d*)-(\d*)$", headers.get("Range") or "")
+            if not ranged or not any(ranged.groups()):
+                return 200, {"Content-Type": kind, "Accept-Ranges": "bytes"}, data
+            # FFmpeg and OpenCV seek through HTTP media with range requests
+            first, last = ranged.groups()
+            if not first:
+                first, last = str(max(0, len(data) - int(last))), ""
+            start, end = int(first), min(int(last or len(data) - 1), len(data) - 1)
+            if start > end:
+                return 416, {"Content-Range": f"bytes */{len(data)}"}, b""
+            return 206, {
+                "Content-Type": kind,
+                "Accept-Ranges": "bytes",
+                "Content-Range": f"bytes {start}-{end}/{len(data)}",
+            }, data[start : end + 1]
+        if not path.endswith("/run-sync-get-dataset-items"):
+            return _json(404, {"error": {"message": f"unknown path {path}"}})
+        request = json.loads(body or b"{}")
+        niche = request.get("niche", "general")
+        with self._lock:
+            start = self._counter
+            self._counter += self.items
+            # Zipf-like audio reuse so some tracks trend
+            audio_ids = [int(self.audios ** self._rng.random()) - 1 for _ in range(self.items)]
+            engagement = [(self._rng.randint(0, 50_000), self._rng.randint(0, 2_000)) for _ in range(self.items)]
+        return _json(200, [
+            {
+                "url": f"{self.url}/media/{niche}-{start + i}.mp4",
+                "audio_id": f"audio-{a}",
+                "audio_url": f"{self.url}/media/audio-{a}.wav",
+                "likes": likes,
+                "comments": comments,
+            }
+            for i, (a, (likes, comments)) in enumerate(zip(audio_ids, engagement))
+        ])
+
+
+_FILTER = re.compile(r"^(eq|neq|gt|gte|lt|lte|in|is)\.(.*)$", re.S)
+
+
+def _split_top(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+
+def _unwrap(text: str) -> str:
+    return text[1:-1] if text.startswith("(") and text.endswith(")") else text
+
+
+def _literal(raw: str) -> Any:
+    if len(raw) >= 2 and raw[0] == raw[-1] == '"':
+        return raw[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return raw
+
+
+def _coerce(stored: Any, raw: Any) -> Tuple[Any, Any]:
+    """Make a stored value and a filter literal comparable."""
+    if isinstance(stored, bool):
+        return stored, str(raw).lower() == "true"
+    if isinstance(stored, (int, float)):
+        try:
+            return float(stored), float(raw)
+        except (TypeError, ValueError):
+            return str(stored), str(raw)
+    return ("" if stored is None else str(stored)), str(raw)
+
+
+def _match(row: Dict[str, Any], column: str, op: str, raw: str) -> bool:
+    value = row.get(column)
+    if op == "is":
+        return value is None if raw == "null" else str(value).lower() == raw
+    if op == "in":
+        options = [_literal(v) for v in _split_top(_unwrap(raw))]
+        return any(_coerce(value, o)[0] == _coerce(value, o)[1] for o in options)
+    if value is None:
+        return False
+    left, right = _coerce(value, _literal(raw))
+    return {
+        "eq": left == right, "neq": left != right, "gt": left > right,
+        "gte": left >= right, "lt": left < right, "lte": left <= right,
+    }[op]
+
+
+def _logical(row: Dict[str, Any], expression: str, any_of: bool) -> bool:
+    results = []
+    for term in _split_top(expression):
+        term = term.strip()
+        if term.startswith(("and(", "or(")):
+            name, _, inner = term.partition("(")
+            results.append(_logical(row, inner[:-1], name == "or"))
+            continue
+        column, _, rest = term.partition(".")
+        found = _FILTER.match(rest)
+        results.append(bool(found) and _match(row, column, found.group(1), found.group(2)))
+    return any(results) if any_of else all(results)
+
+
+class FakePostgREST(FakeService):
+    """In-memory tables behind the PostgREST subset the repositories use."""
+
+    name = "supabase"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._ids: Dict[str, int] = {}
+        self._data_lock = threading.Lock()
+
+    def _filter(self, rows: List[Dict[str, Any]], query: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        for key, value in query:
+            if key in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            if key in ("or", "and"):
+                rows = [r for r in rows if _logical(r, _unwrap(value), key == "or")]
+                continue
+            found = _FILTER.match(value)
+            if found:
+                rows = [r for r in rows if _match(r, key, found.group(1), found.group(2))]
+        return rows
+
+    @staticmethod
+    def _order(rows: List[Dict[str, Any]], spec: str) -> List[Dict[str, Any]]:
+        for term in reversed(spec.split(",")):
+            column, *modifiers = term.split(".")
+            desc = "desc" in modifiers
+
+            def key(row: Dict[str, Any], column: str = column) -> Tuple[int, Any]:
+                value = row.get(column)
+                # nulls sort last ascending and first descending, as in Postgres
+                return (1, 0) if value is None else (0, value)
+
+            rows = sorted(rows, key=key, reverse=desc)
+        return rows
+
+    @staticmethod
+    def _project(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+        columns = [c.strip() for c in (select or "*").split(",") if c.strip()]
+        if not columns or "*" in columns:
+            return [dict(r) for r in rows]
+        return [{c: r.get(c) for c in columns} for r in rows]
+
+    def insert(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Insert ``rows`` (merging on ``on_conflict`` columns) and return them stored."""
+        keys = [c.strip() for c in on_conflict.split(",")] if on_conflict else []
+        stored = []
+        with self._data_lock:
+            existing = self.tables.setdefault(table, [])
+            for row in rows:
+                match = None
+                if keys:
+                    match = next(
+                        (r for r in existing if all(r.get(k) == row.get(k) for k in keys)), None
+                    )
+                if match is not None:
+                    match.update(row)
+                    stored.append(dict(match))
+                    continue
+                new = dict(row)
+                if new.get("id") is None:
+                    self._ids[table] = self._ids.get(table, 0) + 1
+                    new["id"] = self._ids[table]
+                else:
+                    self._ids[table] = max(self._ids.get(table, 0), int(new["id"]))
+                new.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                existing.append(new)
+                stored.append(dict(new))
+        return stored
+
+    def handle(self, method, path, query, headers, body) -> Response:
+        if not path.startswith("/rest/v1/"):
+            return _json(404, {"message": f"unknown path {path}"})
+        table = path[len("/rest/v1/"):].strip("/")
+        params = dict(query)
+        if table.startswith("rpc/"):
+            return self.rpc(table[len("rpc/"):], json.loads(body or b"{}"))
+        if method in ("GET", "HEAD"):
+            with self._data_lock:
+                rows = self._filter(list(self.tables.get(table, [])), query)
+            if "order" in params:
+                rows = self._order(rows, params["order"])
+            offset = int(params.get("offset", 0))
+            if "limit" in params:
+                rows = rows[offset : offset + int(params["limit"])]
+            return _json(200, self._project(rows, params.get("select")))
+        if method == "POST":
+            payload = json.loads(body or b"[]")
+            rows = payload if isinstance(payload, list) else [payload]
+            merge = "merge-duplicates" in (headers.get("Prefer") or "")
+            stored = self.insert(table, rows, params.get("on_conflict") if merge else None)
+            return _json(201, self._project(stored, params.get("select")))
+        if method == "PATCH":
+            changes = json.loads(body or b"{}")
+            with self._data_lock:
+                rows = self._filter(self.tables.get(table, []), query)
+                for row in rows:
+                    row.update(changes)
+                return _json(200, [dict(r) for r in rows])
+        if method == "DELETE":
+            with self._data_lock:
+                doomed = self._filter(self.tables.get(table, []), query)
+                ids = {id(r) for r in doomed}
+                self.tables[table] = [r for r in self.tables.get(table, []) if id(r) not in ids]
+            return _json(200, [dict(r) for r in doomed])
+        return _json(405, {"message": f"{method} not supported"})
+
+    def rpc(self, function: str, params: Dict[str, Any]) -> Response:
+        """Database functions the application calls (``merge_patterns``)."""
+        if function != "merge_patterns":
+            return _json(404, {"message": f"function {function} not found"})
+        from ..models import Pattern
+        from ..services.pattern_miner import merge_pattern_stats
+
+        stored = []
+        with self._data_lock:
+            rows = self.tables.setdefault("patterns", [])
+            for row in params.get("batch", []):
+                match = next((r for r in rows if r.get("content_key") == row.get("content_key")), None)
+                if match is None:
+                    self._ids["patterns"] = self._ids.get("patterns", 0) + 1
+                    match = {**row, "id": self._ids["patterns"]}
+                    rows.append(match)
+                else:
+                    merged = merge_pattern_stats(Pattern(**match), Pattern(**row))
+                    match.update(merged.model_dump(exclude={"id"}))
+                stored.append(dict(match))
+        return _json(200, stored)
+
+    def seed(self, videos: int = 2000, patterns: int = 40, seed: int = 21) -> None:
+        """Fill ``videos`` and ``patterns`` with synthetic rows across the niches."""
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc)
+        self.insert("videos", [
+            {
+                "niche": rng.choice(NICHES),
+                "url": f"https://www.tiktok.com/@seed/video/{i}",
+                "provider": "apify",
+                "transcript": " ".join(rng.choice(HOOKS) for _ in range(3)),
+                "pacing": round(rng.uniform(0.8, 4.0), 2),
+                "visual_style": rng.choice(STYLES),
+                "onscreen_text": rng.choice(HOOKS),
+                "audio_id": f"audio-{int(200 ** rng.random()) - 1}",
+                "audio_url": "https://audio.example/track",
+                "audio_hash": f"hash-{i % 200}",
+                "likes": rng.randint(0, 50_000),
+                "comments": rng.randint(0, 2_000),
+                "trending_audio": rng.random() < 0.3,
+                "created_at": (now - timedelta(hours=rng.uniform(0, 24 * 7))).isoformat(),
+            }
+            for i in range(videos)
+        ])
+        self.insert("patterns", [
+            {
+                "niche": NICHES[i % len(NICHES)],
+                "hook": rng.choice(HOOKS),
+                "core_value_loop": rng.choice(CORES),
+                "narrative_arc": "informational",
+                "visual_formula": rng.choice(STYLES),
+                "cta": rng.choice(CTAS),
+                "prevalence": round(rng.random(), 3),
+                "engagement_score": round(rng.uniform(0, 50_000), 1),
+                "content_key": f"seed-{i}",
+            }
+            for i in range(patterns)
+        ])
+
+
+SERVICES: Dict[str, type] = {
+    "openai": FakeOpenAI,
+    "groq": FakeGroq,
+    "apify": FakeApify,
+    "supabase": FakePostgREST,
+}
+
+
+def environment(urls: Dict[str, str]) -> Dict[str, str]:
+    """Environment pointing the application at fakes served at ``urls``."""
+    return {
+        "OPENAI_BASE_URL": f"{urls['openai']}/v1",
+        "OPENAI_API_KEY": "fake-key",
+        "LLM_BACKEND": "openai",
+        "GROQ_BASE_URL": f"{urls['groq']}/openai/v1",
+        "GROQ_API_KEY": "fake-key",
+        "APIFY_BASE_URL": urls["apify"],
+        "APIFY_API_TOKEN": "fake-token",
+        "APIFY_ACTOR_ID": "fake~trending",
+        "INGESTION_PROVIDER": "apify",
+        "SUPABASE_URL": urls["supabase"],
+        "SUPABASE_SERVICE_KEY": "fake-key",
+    }
+
+
+def _serve(config: Dict[str, Dict[str, Any]], seed_rows: bool, ready: Any, stop: Any) -> None:
+    fakes = {name: SERVICES[name](**options).start() for name, options in config.items()}
+    if seed_rows and "supabase" in fakes:
+        fakes["supabase"].seed()
+    ready.put({name: fake.url for name, fake in fakes.items()})
+    stop.wait()
+    ready.put({name: {"requests": f.requests, "errors": f.errors} for name, f in fakes.items()})
+    for fake in fakes.values():
+        fake.stop()
+
+
+class FakeStack:
+    """All fakes served from one child process.
+
+    ``config`` maps a service name to :class:`FakeService` keyword arguments
+    (``latency``, ``error_rate``, ``error_status``, ...); services left out
+    run with their defaults.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Dict[str, Any]]] = None, seed: bool = True) -> None:
+        self.config = {name: dict((config or {}).get(name, {})) for name in SERVICES}
+        self.seed = seed
+        self.urls: Dict[str, str] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+        ctx = multiprocessing.get_context("spawn")
+        self._ready = ctx.Queue()
+        self._stop = ctx.Event()
+        self._process = ctx.Process(
+            target=_serve, args=(self.config, self.seed, self._ready, self._stop), daemon=True
+        )
+
+    @property
+    def env(self) -> Dict[str, str]:
+        return environment(self.urls)
+
+    def __enter__(self) -> "FakeStack":
+        self._process.start()
+        self.urls = self._ready.get(timeout=60)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        try:
+            self.stats = self._ready.get(timeout=10)
+        except Exception:
+            self.stats = {}
+        self._process.join(timeout=10)
+        if self._process.is_alive():  # pragma: no cover - stuck server thread
+            self._process.terminate()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the fake dependencies until interrupted.")
+    parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=SPEC")
+    parser.add_argument("--error-rate", action="append", default=[], metavar="SERVICE=RATE")
+    args = parser.parse_args(argv)
+    config: Dict[str, Dict[str, Any]] = {}
+    for item in args.latency:
+        name, _, spec = item.partition("=")
+        config.setdefault(name, {})["latency"] = spec
+    for item in args.error_rate:
+        name, _, rate = item.partition("=")
+        config.setdefault(name, {})["error_rate"] = float(rate)
+    with FakeStack(config) as stack:
+        for key, value in stack.env.items():
+            print(f"{key}={value}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,255 @@
+"""Command line entry point for load tests against local fake dependencies.
+
+Examples::
+
+    python -m backend.loadtest.run --scenario read
+    python -m backend.loadtest.run --scenario mixed --workers 1,2,4 --concurrency 8,32,128
+    python -m backend.loadtest.run --scenario generate --latency openai=lognormal:0.4,0.5 \\
+        --error-rate openai=0.02 --output loadtest.json
+
+All external services are replaced by the fakes in :mod:`backend.loadtest.fakes`.
+For each worker count the API is started under uvicorn and driven by a closed
+loop of ``concurrency`` clients per step; each step reports throughput, tail
+latency, error rate and a per-endpoint breakdown, and the saturation point is
+the first step where adding clients stops paying off.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from ..benchmarks.harness import percentile, summarize
+from .fakes import SERVICES, FakeStack
+from .scenarios import SCENARIOS, Scenario
+
+Step = Dict[str, Any]
+
+
+def saturation_point(
+    steps: Sequence[Step], slo_p99_ms: float, max_error_rate: float = 0.01, min_gain: float = 0.1
+) -> Optional[Step]:
+    """First step (by concurrency) past which the server is saturated.
+
+    That is the first step that misses the p99 SLO or error budget, or whose
+    throughput improves less than ``min_gain`` over the previous step.
+    """
+    previous = None
+    for step in sorted(steps, key=lambda s: s["concurrency"]):
+        if step["p99_ms"] > slo_p99_ms or step["error_rate"] > max_error_rate:
+            return step
+        if previous is not None and step["throughput_per_s"] < previous["throughput_per_s"] * (1 + min_gain):
+            return step
+        previous = step
+    return None
+
+
+async def drive(
+    base_url: str, scenario: Scenario, concurrency: int, duration: float, timeout: float = 60.0
+) -> Step:
+    """Run ``concurrency`` closed-loop clients for ``duration`` seconds."""
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                call = scenario.next()
+                start = time.perf_counter()
+                try:
+                    resp = await client.request(call.method, call.path, params=call.params, json=call.json)
+                    failed = resp.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies[call.name].append(time.perf_counter() - start)
+                if failed:
+                    errors[call.name] += 1
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - wall_start
+
+    every = [lat for values in latencies.values() for lat in values]
+    step: Step = {"concurrency": concurrency, **summarize(every, len(every), wall, 0)}
+    step.pop("peak_mb")
+    step["error_rate"] = sum(errors.values()) / len(every) if every else 0.0
+    step["endpoints"] = {
+        name: {
+            "calls": len(values),
+            "errors": errors[name],
+            "p50_ms": percentile(values, 50) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+        for name, values in sorted(latencies.items())
+    }
+    return step
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"API did not become ready at {url}")
+
+
+def _app_env(fake_env: Dict[str, str], data_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(fake_env)
+    # keep state of the run out of the working tree
+    env.update({
+        "STORYBOARD_DIR": os.path.join(data_dir, "storyboards"),
+        "INGEST_JOURNAL_PATH": os.path.join(data_dir, "ingest_journal.sqlite3"),
+        "INGEST_SCHEDULE_PATH": os.path.join(data_dir, "ingest_schedule.json"),
+        "CACHE_SQLITE_PATH": os.path.join(data_dir, "cache.sqlite3"),
+        "PROFILE_DIR": os.path.join(data_dir, "profiles"),
+        "SLOW_REQUEST_LOG": os.path.join(data_dir, "slow_requests.jsonl"),
+        "INGEST_SCHEDULE_NICHES": "",
+    })
+    env.pop("DATABASE_URL", None)
+    return env
+
+
+def run_workers(
+    workers: int, stack: FakeStack, scenario: str, concurrency: Sequence[int], duration: float, warmup: float
+) -> List[Step]:
+    """Serve the API with ``workers`` uvicorn workers and step through ``concurrency``."""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="viralsynth-loadtest-") as data_dir:
+        log_path = os.path.join(data_dir, "uvicorn.log")
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+                 "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+                env=_app_env(stack.env, data_dir),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        try:
+            try:
+                _wait_ready(f"{base_url}/", process)
+            except RuntimeError:
+                with open(log_path) as fh:
+                    sys.stderr.write(fh.read()[-4000:])
+                raise
+            if warmup:
+                asyncio.run(drive(base_url, Scenario(scenario), min(concurrency), warmup))
+            steps = []
+            for level in concurrency:
+                step = asyncio.run(drive(base_url, Scenario(scenario), level, duration))
+                step["workers"] = workers
+                steps.append(step)
+                _print_step(step)
+            return steps
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:  # pragma: no cover - hung worker
+                process.kill()
+
+
+def _print_step(step: Step) -> None:
+    print(
+        f"workers={step['workers']:<3} clients={step['concurrency']:<5} "
+        f"{step['throughput_per_s']:9.1f} req/s  p50 {step['p50_ms']:8.1f} ms  "
+        f"p99 {step['p99_ms']:8.1f} ms  errors {step['error_rate']:6.1%}"
+    )
+    for name, figures in step["endpoints"].items():
+        print(
+            f"    {name:<10} {figures['calls']:>7} calls  p50 {figures['p50_ms']:8.1f} ms  "
+            f"p99 {figures['p99_ms']:8.1f} ms  errors {figures['errors']}"
+        )
+
+
+def _ints(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def _service_options(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    config: Dict[str, Dict[str, Any]] = {}
+    for option, key, cast in (
+        (args.latency, "latency", str),
+        (args.error_rate, "error_rate", float),
+        (args.error_status, "error_status", int),
+    ):
+        for item in option:
+            name, _, value = item.partition("=")
+            if name not in SERVICES:
+                raise SystemExit(f"Unknown service {name!r}; choose from {sorted(SERVICES)}")
+            config.setdefault(name, {})[key] = cast(value)
+    return config
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--workers", type=_ints, default=[1, 2, 4], help="comma-separated uvicorn worker counts")
+    parser.add_argument(
+        "--concurrency", type=_ints, default=[4, 8, 16, 32, 64], help="comma-separated client counts"
+    )
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per concurrency step")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before the first step")
+    parser.add_argument(
+        "--latency", action="append", default=[], metavar="SERVICE=SPEC",
+        help="fake latency, e.g. openai=lognormal:0.4,0.5 (fixed:S, uniform:A,B, exp:MEAN)",
+    )
+    parser.add_argument("--error-rate", action="append", default=[], metavar="SERVICE=RATE")
+    parser.add_argument("--error-status", action="append", default=[], metavar="SERVICE=STATUS")
+    parser.add_argument("--slo-p99-ms", type=float, default=2000.0, help="p99 latency objective")
+    parser.add_argument("--output", help="write per-step results JSON here")
+    args = parser.parse_args(argv)
+
+    if importlib.util.find_spec("uvicorn") is None:
+        print("uvicorn is required: pip install -r backend/requirements.txt", file=sys.stderr)
+        return 2
+
+    results: Dict[str, Any] = {"scenario": args.scenario, "slo_p99_ms": args.slo_p99_ms, "workers": {}}
+    with FakeStack(_service_options(args)) as stack:
+        for workers in args.workers:
+            steps = run_workers(workers, stack, args.scenario, args.concurrency, args.duration, args.warmup)
+            saturated = saturation_point(steps, args.slo_p99_ms)
+            results["workers"][str(workers)] = {
+                "steps": steps,
+                "saturation_concurrency": saturated["concurrency"] if saturated else None,
+                "peak_throughput_per_s": max(s["throughput_per_s"] for s in steps),
+            }
+            where = f"{saturated['concurrency']} clients" if saturated else "not reached"
+            print(f"workers={workers}: saturation {where}\n")
+    results["fakes"] = stack.stats
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Weighted request mixes driven against the API during a load test."""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..benchmarks.fixtures import NICHES
+
+TOPICS = (
+    "3 productivity tips",
+    "the cheapest meal prep",
+    "why your code review is slow",
+    "a 10 minute home workout",
+    "budgeting for the first job",
+)
+
+
+@dataclass(frozen=True)
+class Call:
+    """One HTTP request; ``name`` groups the per-endpoint breakdown."""
+
+    name: str
+    method: str
+    path: str
+    params: Optional[Dict[str, Any]] = None
+    json: Optional[Dict[str, Any]] = None
+
+
+def generate(rng: random.Random) -> Call:
+    return Call(
+        "generate",
+        "POST",
+        "/api/generate/",
+        json={"prompt": rng.choice(TOPICS), "niche": rng.choice(NICHES), "platform": "tiktok"},
+    )
+
+
+def ingest(rng: random.Random) -> Call:
+    return Call(
+        "ingest",
+        "POST",
+        "/api/ingest/",
+        json={"niches": [rng.choice(NICHES)], "top_percentile": 0.5, "summary": True},
+    )
+
+
+def patterns(rng: random.Random) -> Call:
+    return Call("patterns", "GET", "/api/patterns/", params={"niche": rng.choice(NICHES)})
+
+
+def trending(rng: random.Random) -> Call:
+    return Call("trending", "GET", "/api/audio/trending", params={"niche": rng.choice(NICHES)})
+
+
+SCENARIOS: Dict[str, List[Tuple[Any, float]]] = {
+    "generate": [(generate, 1.0)],
+    "ingest": [(ingest, 1.0)],
+    "read": [(patterns, 0.5), (trending, 0.5)],
+    # mostly reads, some generation, occasional ingestion
+    "mixed": [(patterns, 0.35), (trending, 0.35), (generate, 0.25), (ingest, 0.05)],
+}
+
+
+class Scenario:
+    """Draws calls from the weighted mix of scenario ``name``."""
+
+    def __init__(self, name: str, seed: int = 7) -> None:
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}; choose from {sorted(SCENARIOS)}")
+        self.name = name
+        self._builders = [b for b, _ in SCENARIOS[name]]
+        self._weights = [w for _, w in SCENARIOS[name]]
+        self._rng = random.Random(seed)
+
+    def next(self) -> Call:
+        builder = self._rng.choices(self._builders, self._weights)[0]
+        return builder(self._rng)
@@ -1,11 +1,59 @@
 """Entry point for the ViralSynth FastAPI application."""
 
-from fastapi import FastAPI
+import importlib
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+
+from .services.audio_features import shutdown_audio_analysis
+from .services.cache import get_cache
+from .services.database import close_pool
+from .services.ingest_journal import get_ingest_journal
+from .services.scheduler import get_ingest_scheduler
+from .services.serialization import CompressionMiddleware, ORJSONResponse
+from .services.metrics import HTTP_LATENCY, record_error
+from .services.profiling import ProfilingMiddleware, profiling_enabled
+from .services.sketch import get_audio_sketch
+from .services.warmup import get_role, warm_up
+
+ROLE = get_role()
+
+# Routers mounted per process role; ingestion (and with it the scraping and
+# video analysis stacks) is only served by workers.
+ROLE_ROUTERS = {
+    "api": ["strategy", "generate", "audio", "patterns", "metrics"],
+    "worker": ["ingest", "strategy", "metrics"],
+    "all": ["ingest", "strategy", "generate", "audio", "patterns", "metrics"],
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up(ROLE)
+    get_cache().start()
+    if "ingest" in ROLE_ROUTERS[ROLE]:
+        get_ingest_scheduler().start()
+    yield
+    await get_ingest_scheduler().stop()
+    await shutdown_audio_analysis()
+    try:
+        get_audio_sketch().snapshot()
+    except Exception:
+        record_error("shutdown.sketch_snapshot")
+    await get_cache().close()
+    await get_ingest_journal().close()
+    await close_pool()
 
-from .routers import ingest, strategy, generate, audio, patterns
 
-app = FastAPI(title="ViralSynth API")
+app = FastAPI(title="ViralSynth API", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Large ingest and generation bodies are compressed (brotli or gzip) above a
+# size threshold; streamed NDJSON is compressed and flushed per line.
+app.add_middleware(CompressionMiddleware)
 
 # CORS settings for local development; adjust origins in production
 app.add_middleware(
@@ -14,14 +62,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Process-Time", "ETag", "X-Next-Cursor", "X-Profile-Id"],
 )
 
+# On-demand profiles and the slow-request log; not mounted unless configured
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Record request latency and report it via timing headers."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    HTTP_LATENCY.observe(
+        request.method,
+        getattr(route, "path", "unmatched"),
+        str(response.status_code),
+        value=elapsed,
+    )
+    response.headers["X-Process-Time"] = f"{elapsed:.6f}"
+    response.headers["Server-Timing"] = f"app;dur={elapsed * 1000:.2f}"
+    return response
+
 # Include API routers
-app.include_router(ingest.router)
-app.include_router(strategy.router)
-app.include_router(generate.router)
-app.include_router(audio.router)
-app.include_router(patterns.router)
+for name in ROLE_ROUTERS[ROLE]:
+    app.include_router(importlib.import_module(f".routers.{name}", __package__).router)
+
+if {"generate", "ingest"} & set(ROLE_ROUTERS[ROLE]):
+    # Locally stored storyboard frames and thumbnails, served by every role
+    # that generates packages (ingestion generates a sample one)
+    app.mount(
+        "/media/storyboards",
+        StaticFiles(directory=os.environ.get("STORYBOARD_DIR", "media/storyboards"), check_dir=False),
+        name="storyboards",
+    )
 
 @app.get("/")
 async def read_root():
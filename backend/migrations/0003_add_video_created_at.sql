@@ -0,0 +1,13 @@
+-- Migration: timestamp videos so trending windows can be rebuilt after restarts
+--
+-- The column is added without a default so existing videos keep a NULL
+-- timestamp (their ingestion time is unknown) and stay out of every trending
+-- window; stamping them with the migration time would make all history trend
+-- at once. Only new inserts default to now().
+ALTER TABLE IF EXISTS videos
+    ADD COLUMN IF NOT EXISTS created_at timestamptz;
+
+ALTER TABLE IF EXISTS videos
+    ALTER COLUMN created_at SET DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS videos_created_at_idx ON videos (created_at);
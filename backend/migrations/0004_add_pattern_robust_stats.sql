@@ -0,0 +1,7 @@
+-- Migration: robust engagement statistics for mined patterns
+ALTER TABLE IF EXISTS patterns
+    ADD COLUMN IF NOT EXISTS engagement_median double precision,
+    ADD COLUMN IF NOT EXISTS engagement_trimmed_mean double precision,
+    ADD COLUMN IF NOT EXISTS engagement_ci_low double precision,
+    ADD COLUMN IF NOT EXISTS engagement_ci_high double precision,
+    ADD COLUMN IF NOT EXISTS engagement_percentile double precision;
@@ -0,0 +1,9 @@
+-- Migration: deduplicate patterns by content key
+ALTER TABLE IF EXISTS patterns
+    ADD COLUMN IF NOT EXISTS content_key text,
+    ADD COLUMN IF NOT EXISTS video_count integer,
+    ADD COLUMN IF NOT EXISTS last_video_id bigint;
+
+-- NULL keys do not conflict, so legacy rows can stay until
+-- `python -m backend.services.pattern_miner compact` collapses them.
+CREATE UNIQUE INDEX IF NOT EXISTS patterns_content_key_idx ON patterns (content_key);
@@ -0,0 +1,4 @@
+-- Migration: hook and CTA categories from the keyword lexicons
+ALTER TABLE IF EXISTS patterns
+    ADD COLUMN IF NOT EXISTS hook_type text,
+    ADD COLUMN IF NOT EXISTS cta_type text;
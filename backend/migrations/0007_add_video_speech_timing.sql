@@ -0,0 +1,6 @@
+-- Migration: word timestamps and speech pacing features per video
+ALTER TABLE IF EXISTS videos
+    ADD COLUMN IF NOT EXISTS word_timings text,
+    ADD COLUMN IF NOT EXISTS time_to_hook double precision,
+    ADD COLUMN IF NOT EXISTS speech_rate double precision,
+    ADD COLUMN IF NOT EXISTS pause_density double precision;
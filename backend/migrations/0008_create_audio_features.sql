@@ -0,0 +1,9 @@
+-- Migration: signal features per distinct trending audio
+CREATE TABLE IF NOT EXISTS audio_features (
+    audio_hash text PRIMARY KEY,
+    tempo double precision,
+    onset_density double precision,
+    loudness_envelope double precision[],
+    drops double precision[],
+    analysed_at timestamptz NOT NULL DEFAULT now()
+);
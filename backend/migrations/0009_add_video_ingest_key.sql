@@ -0,0 +1,7 @@
+-- Migration: idempotency key per ingested video
+ALTER TABLE IF EXISTS videos
+    ADD COLUMN IF NOT EXISTS ingest_key text;
+
+-- Journaled ingestion upserts on the key, so a resumed run never stores an
+-- item twice. Rows ingested before the journal keep a NULL key.
+CREATE UNIQUE INDEX IF NOT EXISTS videos_ingest_key_idx ON videos (ingest_key);
@@ -0,0 +1,104 @@
+-- Migration: merge mined pattern statistics inside the database
+--
+-- store_patterns(merge=True) calls merge_patterns over RPC instead of
+-- reading rows, pooling them in Python and writing absolute values back,
+-- which lost counts when two ingestions of a niche merged at once. Unseen
+-- keys are inserted; an existing row is locked while its statistics are
+-- pooled, so concurrent merges of one pattern apply one after the other.
+-- The arithmetic mirrors pattern_miner.merge_pattern_stats.
+
+CREATE OR REPLACE FUNCTION pattern_weighted(
+    a double precision, b double precision, n1 double precision, n2 double precision
+) RETURNS double precision
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN a IS NULL THEN b WHEN b IS NULL THEN a ELSE (a * n1 + b * n2) / (n1 + n2) END
+$$;
+
+-- sum of squared deviations recovered from a 95% confidence interval
+CREATE OR REPLACE FUNCTION pattern_variance(
+    ci_low double precision, ci_high double precision, n double precision
+) RETURNS double precision
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN ci_low IS NULL OR ci_high IS NULL THEN 0
+                ELSE ((ci_high - ci_low) / (2 * 1.96)) ^ 2 * n END
+$$;
+
+CREATE OR REPLACE FUNCTION merge_patterns(batch jsonb)
+RETURNS SETOF patterns
+LANGUAGE plpgsql AS $$
+DECLARE
+    u patterns;
+    b patterns;
+    m patterns;
+    n1 double precision;
+    n2 double precision;
+    n double precision;
+    half_width double precision;
+BEGIN
+    FOR u IN SELECT * FROM jsonb_populate_recordset(NULL::patterns, batch) LOOP
+        INSERT INTO patterns (
+            niche, hook, core_value_loop, narrative_arc, visual_formula, cta, prevalence,
+            engagement_score, engagement_median, engagement_trimmed_mean, engagement_ci_low,
+            engagement_ci_high, engagement_percentile, content_key, video_count, last_video_id,
+            hook_type, cta_type
+        ) VALUES (
+            u.niche, u.hook, u.core_value_loop, u.narrative_arc, u.visual_formula, u.cta, u.prevalence,
+            u.engagement_score, u.engagement_median, u.engagement_trimmed_mean, u.engagement_ci_low,
+            u.engagement_ci_high, u.engagement_percentile, u.content_key, u.video_count, u.last_video_id,
+            u.hook_type, u.cta_type
+        )
+        ON CONFLICT (content_key) DO NOTHING
+        RETURNING * INTO m;
+        IF FOUND THEN
+            RETURN NEXT m;
+            CONTINUE;
+        END IF;
+
+        SELECT * INTO b FROM patterns WHERE content_key = u.content_key FOR UPDATE;
+        n1 := COALESCE(NULLIF(b.video_count, 0), 1);
+        n2 := COALESCE(NULLIF(u.video_count, 0), 1);
+        n := n1 + n2;
+        m := b;
+        m.engagement_score := pattern_weighted(b.engagement_score, u.engagement_score, n1, n2);
+        m.engagement_ci_low := pattern_weighted(b.engagement_ci_low, u.engagement_ci_low, n1, n2);
+        m.engagement_ci_high := pattern_weighted(b.engagement_ci_high, u.engagement_ci_high, n1, n2);
+        IF b.engagement_score IS NOT NULL AND u.engagement_score IS NOT NULL THEN
+            half_width := 1.96 * sqrt(
+                (
+                    (n1 - 1) * pattern_variance(b.engagement_ci_low, b.engagement_ci_high, n1)
+                    + (n2 - 1) * pattern_variance(u.engagement_ci_low, u.engagement_ci_high, n2)
+                    + n1 * n2 / n * (b.engagement_score - u.engagement_score) ^ 2
+                ) / (n - 1) / n
+            );
+            m.engagement_ci_low := m.engagement_score - half_width;
+            m.engagement_ci_high := m.engagement_score + half_width;
+        END IF;
+        IF COALESCE(b.prevalence, 0) <> 0 AND COALESCE(u.prevalence, 0) <> 0 THEN
+            m.prevalence := n / (n1 / b.prevalence + n2 / u.prevalence);
+        ELSE
+            m.prevalence := pattern_weighted(b.prevalence, u.prevalence, n1, n2);
+        END IF;
+
+        UPDATE patterns SET
+            prevalence = m.prevalence,
+            engagement_score = m.engagement_score,
+            engagement_median = pattern_weighted(b.engagement_median, u.engagement_median, n1, n2),
+            engagement_trimmed_mean = pattern_weighted(
+                b.engagement_trimmed_mean, u.engagement_trimmed_mean, n1, n2
+            ),
+            engagement_ci_low = m.engagement_ci_low,
+            engagement_ci_high = m.engagement_ci_high,
+            engagement_percentile = pattern_weighted(
+                b.engagement_percentile, u.engagement_percentile, n1, n2
+            ),
+            video_count = NULLIF(COALESCE(b.video_count, 0) + COALESCE(u.video_count, 0), 0),
+            last_video_id = GREATEST(b.last_video_id, u.last_video_id),
+            -- labels follow the latest lexicon
+            hook_type = COALESCE(NULLIF(u.hook_type, ''), b.hook_type),
+            cta_type = COALESCE(NULLIF(u.cta_type, ''), b.cta_type)
+        WHERE id = b.id
+        RETURNING * INTO m;
+        RETURN NEXT m;
+    END LOOP;
+END;
+$$;
@@ -15,6 +15,23 @@ class TrendingAudio(BaseModel):
     )
     url: Optional[str] = Field(None, description="Source link for the audio")
     niche: Optional[str] = Field(None, description="Niche where the audio trends")
+    score: Optional[float] = Field(
+        None, description="Usage count with exponential time decay applied",
+    )
+    velocity: Optional[float] = Field(
+        None, description="Uses per hour over the most recent part of the window",
+    )
+    acceleration: Optional[float] = Field(
+        None, description="Change in hourly usage rate versus the preceding period",
+    )
+    tempo: Optional[float] = Field(None, description="Estimated tempo in beats per minute")
+    onset_density: Optional[float] = Field(None, description="Detected onsets per second")
+    loudness_envelope: Optional[List[float]] = Field(
+        None, description="Loudness in dBFS at AUDIO_ENVELOPE_HZ values per second"
+    )
+    drops: Optional[List[float]] = Field(
+        None, description="Seconds at which loudness jumps (beat drops)"
+    )
 
 
 class Pattern(BaseModel):
@@ -35,6 +52,36 @@ class Pattern(BaseModel):
     engagement_score: Optional[float] = Field(
         None, description="Average engagement score of videos with this pattern"
     )
+    engagement_median: Optional[float] = Field(
+        None, description="Median engagement of videos with this pattern"
+    )
+    engagement_trimmed_mean: Optional[float] = Field(
+        None, description="Mean engagement after trimming the top and bottom tails"
+    )
+    engagement_ci_low: Optional[float] = Field(
+        None, description="Lower bound of the 95% confidence interval for mean engagement"
+    )
+    engagement_ci_high: Optional[float] = Field(
+        None, description="Upper bound of the 95% confidence interval for mean engagement"
+    )
+    engagement_percentile: Optional[float] = Field(
+        None, description="Average engagement percentile (0-1) of its videos within the niche"
+    )
+    content_key: Optional[str] = Field(
+        None, description="Stable hash of the niche and normalized components; unique per pattern"
+    )
+    video_count: Optional[int] = Field(
+        None, description="Number of videos the statistics were computed from"
+    )
+    last_video_id: Optional[int] = Field(
+        None, description="Highest video ID folded into the statistics by incremental mining"
+    )
+    hook_type: Optional[str] = Field(
+        None, description="Hook category matched by the niche lexicon, e.g. question or secret"
+    )
+    cta_type: Optional[str] = Field(
+        None, description="CTA category matched by the niche lexicon, e.g. follow or comment"
+    )
 
 
 class GenerateRequest(BaseModel):
@@ -48,6 +95,17 @@ class GenerateRequest(BaseModel):
     )
 
 
+class BulkGenerateRequest(BaseModel):
+    """Request model for generating many content packages in one call."""
+
+    requests: List[GenerateRequest] = Field(
+        ..., min_length=1, max_length=1000, description="Prompts to generate packages for.",
+    )
+    concurrency: Optional[int] = Field(
+        None, ge=1, le=64, description="Maximum packages generated concurrently.",
+    )
+
+
 class PlatformVariation(BaseModel):
     """Hook and CTA pair tailored to a platform."""
 
@@ -60,6 +118,9 @@ class GenerateResponse(BaseModel):
 
     script: str
     storyboard: List[str]
+    storyboard_thumbnails: List[str] = Field(
+        default_factory=list, description="Thumbnail URLs aligned with ``storyboard`` frames"
+    )
     notes: List[str]
     variations: Dict[str, PlatformVariation] = Field(
         default_factory=dict,
@@ -114,6 +175,15 @@ class VideoRecord(BaseModel):
     trending_audio: bool = Field(
         False, description="Flag indicating if the audio track is trending",
     )
+    time_to_hook: Optional[float] = Field(
+        None, description="Seconds until the hook (first sentence) has been spoken",
+    )
+    speech_rate: Optional[float] = Field(
+        None, description="Spoken words per second",
+    )
+    pause_density: Optional[float] = Field(
+        None, description="Pauses between words per second of speech",
+    )
 
 
 class IngestRequest(BaseModel):
@@ -121,18 +191,62 @@ class IngestRequest(BaseModel):
 
     niches: List[str] = Field(..., description="List of content niches to ingest, e.g., ['tech', 'fitness'].")
     top_percentile: float = Field(
-        0.05, description="Top percentile threshold (0-1) for selecting high performing content.",
+        0.05,
+        gt=0,
+        le=1,
+        description="Top percentile threshold (0-1) for selecting high performing content.",
     )
     provider: Optional[str] = Field(
         None,
         description="Optional scraping provider: apify, playwright, or puppeteer.",
     )
+    run_id: Optional[str] = Field(
+        None,
+        description="Ingestion run to resume; repeating a request with the same run_id skips work already done.",
+    )
+    summary: bool = Field(
+        False,
+        description="Return only run, video, pattern and package IDs instead of the full records.",
+    )
+
+
+class IngestRun(BaseModel):
+    """Checkpointed progress of one niche within an ingestion run."""
+
+    run_id: str
+    niche: str
+    provider: Optional[str] = None
+    percentile: Optional[int] = None
+    status: str = Field(..., description="running or completed")
+    items: int = Field(0, description="Scraped items journaled for the niche")
+    analysed: int = Field(0, description="Items analysed but not yet stored")
+    stored: int = Field(0, description="Items persisted to videos")
+    created_at: float
+    updated_at: float
+
+
+class IngestSchedule(BaseModel):
+    """Adaptive re-ingestion state of one scheduled niche."""
+
+    niche: str
+    interval: float = Field(..., description="Seconds between runs, adapted to the niche's activity")
+    next_run: float = Field(..., description="Unix time of the next run")
+    last_run: Optional[float] = None
+    churn: Optional[float] = Field(None, description="Share of new URLs in the last run")
+    velocity: Optional[float] = Field(None, description="Uses per hour of the niche's top trending audio")
+    activity: float = 0.0
+    runs: int = 0
+    failures: int = 0
+    running: bool = False
 
 
 class IngestResponse(BaseModel):
     """Response confirming that an ingest request was processed."""
 
     message: str
+    run_id: Optional[str] = Field(
+        None, description="Ingestion run identifier; pass it back to resume an interrupted run.",
+    )
     video_ids: List[int] = Field(
         default_factory=list, description="Supabase IDs of stored video records.",
     )
@@ -149,6 +263,9 @@ class IngestResponse(BaseModel):
     trending_audios: List[TrendingAudio] = Field(
         default_factory=list, description="Ranked trending audio tracks across dataset",
     )
+    package_id: Optional[int] = Field(
+        None, description="Supabase ID of the generated sample package.",
+    )
     generated: Optional[GenerateResponse] = Field(
         None,
         description="Generated sample content based on identified patterns.",
@@ -162,6 +279,12 @@ class StrategyRequest(BaseModel):
     video_ids: Optional[List[int]] = Field(
         None, description="Specific Supabase video IDs to analyze.",
     )
+    top_percentile: Optional[float] = Field(
+        None,
+        gt=0,
+        le=1,
+        description="Only mine videos whose engagement is in this top fraction of the niche.",
+    )
 
 
 class StrategyResponse(BaseModel):
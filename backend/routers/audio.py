@@ -1,15 +1,41 @@
 """Endpoints exposing trending audio rankings."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request, Response
 from typing import List, Optional
 
 from ..models import TrendingAudio
-from ..services.ingestion import get_trending_audio
+from ..services.ingestion import page_trending_audio
+from ..services.paging import decode_cursor, encode_cursor, page_response, parse_fields
 
 router = APIRouter(prefix="/api/audio", tags=["audio"])
 
 
 @router.get("/trending", response_model=List[TrendingAudio])
-async def trending_audio(niche: Optional[str] = None, limit: int = 10) -> List[TrendingAudio]:
-    """Return top trending audio clips optionally filtered by niche."""
-    return await get_trending_audio(niche=niche, limit=limit)
+async def trending_audio(
+    request: Request,
+    niche: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    window: Optional[str] = Query(
+        None,
+        pattern=r"^(\d+[mhd]|all)$",
+        description="Ranking window such as 1h, 24h or 7d, or all for all-time usage",
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated audio fields to return"),
+) -> Response:
+    """Return top trending audio clips optionally filtered by niche and window.
+
+    Pages are ordered by score; the ``X-Next-Cursor`` header holds the cursor
+    of the next one. Unchanged pages answer ``If-None-Match`` with ``304``.
+    """
+    selected = parse_fields(fields, TrendingAudio.model_fields)
+    after = decode_cursor(cursor, float, str, int)
+    audios, next_key = await page_trending_audio(
+        niche=niche, limit=limit, window=window, after=after, fields=selected
+    )
+    include = set(selected) if selected else None
+    return page_response(
+        request,
+        [a.model_dump(include=include) for a in audios],
+        encode_cursor(*next_key) if next_key else None,
+    )
@@ -1,9 +1,11 @@
 """Endpoint for generating multi-modal content packages."""
 
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
-from ..models import GenerateRequest, GenerateResponse
-from ..services.generation import generate_package
+from ..models import BulkGenerateRequest, GenerateRequest, GenerateResponse
+from ..services.generation import generate_package, generate_packages
+from ..services.serialization import ORJSONResponse, dumps
 
 router = APIRouter(
     prefix="/api/generate",
@@ -12,6 +14,22 @@ router = APIRouter(
 
 
 @router.post("/", response_model=GenerateResponse)
-async def generate_content(request: GenerateRequest) -> GenerateResponse:
+async def generate_content(request: GenerateRequest) -> ORJSONResponse:
     """Generate a multi-modal content package using stored patterns."""
-    return await generate_package(request)
+    # encoded straight from the model instead of re-validating it
+    return ORJSONResponse(await generate_package(request))
+
+
+@router.post("/batch")
+async def generate_batch(request: BulkGenerateRequest) -> StreamingResponse:
+    """Generate many packages, streaming NDJSON lines as each one completes.
+
+    Each line is ``{"index": n, "package": {...}}`` (or ``{"index": n, "error": ...}``);
+    the final line is ``{"done": true, "package_ids": [...]}`` in request order.
+    """
+
+    async def lines():
+        async for item in generate_packages(request.requests, request.concurrency):
+            yield dumps(item) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
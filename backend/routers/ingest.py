@@ -1,15 +1,22 @@
 """Endpoints for ingesting trending content into ViralSynth."""
 
+import uuid
+
 from fastapi import APIRouter
-from typing import List
+from typing import List, Optional
 
 from ..models import (
     IngestRequest,
     IngestResponse,
+    IngestRun,
+    IngestSchedule,
     StrategyRequest,
     GenerateRequest,
 )
 from ..services.ingestion import ingest_niche, get_trending_audio
+from ..services.ingest_journal import get_ingest_journal
+from ..services.scheduler import get_ingest_scheduler
+from ..services.serialization import ORJSONResponse
 from ..services.strategy import derive_patterns
 from ..services.generation import generate_package
 
@@ -20,7 +27,7 @@ router = APIRouter(
 
 
 @router.post("/", response_model=IngestResponse)
-async def ingest_trending_content(request: IngestRequest) -> IngestResponse:
+async def ingest_trending_content(request: IngestRequest) -> ORJSONResponse:
     """
     Placeholder endpoint for ingesting top-performing content from various niches.
 
@@ -29,19 +36,26 @@ async def ingest_trending_content(request: IngestRequest) -> IngestResponse:
     persist the results to a database for further analysis.
     """
     # Call the ingestion service for each niche. The provider can be specified in
-    # the request or via the INGESTION_PROVIDER environment variable.
+    # the request or via the INGESTION_PROVIDER environment variable. Progress
+    # is journaled under the run id, so repeating a failed request resumes it.
+    run_id = request.run_id or uuid.uuid4().hex
     video_records = []
     for niche in request.niches:
         percentile = int(request.top_percentile * 100)
-        records = await ingest_niche(niche, percentile, provider=request.provider)
+        records = await ingest_niche(niche, percentile, provider=request.provider, run_id=run_id)
         video_records.extend(records)
     video_ids = [v.id for v in video_records if v.id]
 
-    trending_audios = await get_trending_audio()
+    trending_audios = [] if request.summary else await get_trending_audio()
 
-    # After ingestion, analyze patterns across the stored videos.
+    # After ingestion, fold patterns of the new videos into the stored ones.
     strategy_resp = await derive_patterns(
-        StrategyRequest(niches=request.niches, video_ids=video_ids)
+        StrategyRequest(
+            niches=request.niches,
+            video_ids=video_ids,
+            top_percentile=request.top_percentile,
+        ),
+        merge=True,
     )
 
     # Generate a sample content package using the first niche as context.
@@ -58,12 +72,48 @@ async def ingest_trending_content(request: IngestRequest) -> IngestResponse:
         )
     )
 
-    return IngestResponse(
-        message="Ingestion complete",
-        video_ids=video_ids,
-        videos=video_records,
-        patterns=strategy_resp.patterns,
-        pattern_ids=strategy_resp.pattern_ids,
-        trending_audios=trending_audios,
-        generated=generate_resp,
+    if request.summary:
+        return ORJSONResponse(
+            IngestResponse(
+                message="Ingestion complete",
+                run_id=run_id,
+                video_ids=video_ids,
+                pattern_ids=strategy_resp.pattern_ids,
+                package_id=generate_resp.package_id,
+            )
+        )
+    # full responses reach megabytes; encode the model directly
+    return ORJSONResponse(
+        IngestResponse(
+            message="Ingestion complete",
+            run_id=run_id,
+            video_ids=video_ids,
+            videos=video_records,
+            patterns=strategy_resp.patterns,
+            pattern_ids=strategy_resp.pattern_ids,
+            trending_audios=trending_audios,
+            package_id=generate_resp.package_id,
+            generated=generate_resp,
+        )
     )
+
+
+@router.get("/runs", response_model=List[IngestRun])
+async def list_ingest_runs(run_id: Optional[str] = None, unfinished: bool = False) -> List[IngestRun]:
+    """Per-niche progress of journaled ingestion runs, newest first.
+
+    ``unfinished=true`` lists runs that can be resumed by posting the same
+    ``run_id`` to ``/api/ingest`` again.
+    """
+    runs = await get_ingest_journal().runs(run_id=run_id, unfinished=unfinished)
+    return [IngestRun(**run) for run in runs]
+
+
+@router.get("/schedule", response_model=List[IngestSchedule])
+async def ingest_schedule() -> List[IngestSchedule]:
+    """Adaptive re-ingestion state of the niches in ``INGEST_SCHEDULE_NICHES``."""
+    scheduler = get_ingest_scheduler()
+    return [
+        IngestSchedule(**vars(state), running=state.niche in scheduler.running)
+        for state in scheduler.states.values()
+    ]
@@ -0,0 +1,46 @@
+"""Prometheus scrape endpoint and request profiles for backend instrumentation."""
+
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from ..services.metrics import render_latest
+from ..services.profiling import PROFILE_NAME, authorised, profile_dir, recent_slow_requests
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """Expose latency histograms, error counts and cache hit counters."""
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
+
+
+def _require_token(token: Optional[str]) -> None:
+    # profiling is invisible unless PROFILE_TOKEN is configured and presented
+    if not authorised(token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/api/profiles/slow")
+async def slow_requests(
+    x_profile_token: Optional[str] = Header(default=None),
+) -> List[Dict[str, Any]]:
+    """Span trees of the most recent requests over ``SLOW_REQUEST_SECONDS``."""
+    _require_token(x_profile_token)
+    return recent_slow_requests()
+
+
+@router.get("/api/profiles/{name}")
+async def download_profile(
+    name: str,
+    x_profile_token: Optional[str] = Header(default=None),
+) -> FileResponse:
+    """Download a stored profile named by a response's ``X-Profile-Id``."""
+    _require_token(x_profile_token)
+    path = os.path.join(profile_dir(), name)
+    if not PROFILE_NAME.match(name) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
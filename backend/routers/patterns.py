@@ -1,15 +1,33 @@
 """Endpoints to fetch stored content patterns."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request, Response
 from typing import List, Optional
 
 from ..models import Pattern
+from ..services.paging import decode_cursor, encode_cursor, page_response, parse_fields
 from ..services.strategy import fetch_patterns
 
 router = APIRouter(prefix="/api/patterns", tags=["patterns"])
 
 
 @router.get("/", response_model=List[Pattern])
-async def list_patterns(niche: Optional[str] = None, limit: int = 10) -> List[Pattern]:
-    """List stored patterns ordered by prevalence."""
-    return await fetch_patterns(niche=niche, limit=limit)
+async def list_patterns(
+    request: Request,
+    niche: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated pattern fields to return"),
+) -> Response:
+    """List stored patterns ordered by prevalence, one page at a time.
+
+    Full pages carry the next page's cursor in the ``X-Next-Cursor`` header.
+    Unchanged pages answer ``If-None-Match`` with ``304``.
+    """
+    selected = parse_fields(fields, Pattern.model_fields)
+    after = decode_cursor(cursor, float, int)
+    patterns = await fetch_patterns(niche=niche, limit=limit, after=after, fields=selected)
+    next_cursor = None
+    if len(patterns) == limit:
+        next_cursor = encode_cursor(patterns[-1].prevalence, patterns[-1].id)
+    include = set(selected) if selected else None
+    return page_response(request, [p.model_dump(include=include) for p in patterns], next_cursor)
@@ -0,0 +1,329 @@
+"""Signal features of trending audio: tempo, onset density, loudness and drops.
+
+Each distinct audio (by ``audio_hash``) is downloaded and decoded once, in the
+background of the ingestion that found it, then analysed in a process pool so
+the FFT work never blocks the event loop or competes with it for the GIL. At
+most ``AUDIO_DOWNLOAD_CONCURRENCY`` audios are downloaded and analysed at
+once per process, and downloads are streamed to disk. Features are computed
+with array operations over short-time frames:
+
+* ``tempo`` – BPM from the autocorrelation of the spectral-flux onset
+  envelope, weighted towards 120 BPM to settle octave ambiguity;
+* ``onset_density`` – onsets per second (peaks of the onset envelope);
+* ``loudness_envelope`` – frame loudness in dBFS averaged to
+  ``AUDIO_ENVELOPE_HZ`` values per second;
+* ``drops`` – seconds at which loudness, smoothed over one second, rises by
+  ``AUDIO_DROP_DB`` over the quietest point of the preceding two seconds.
+
+Results are stored in the ``audio_features`` table and in the shared cache
+(namespace ``audio_features``), and attached to :class:`TrendingAudio` when
+trending audio is served. Audio is decoded with librosa; uncompressed WAV
+files are read directly when it is not installed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import wave
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..models import TrendingAudio
+from .cache import get_cache
+from .metrics import record_error, timed
+from .resilience import get_dependency
+
+N_FFT = 2048
+HOP = 512
+FEATURE_FIELDS = ("tempo", "onset_density", "loudness_envelope", "drops")
+_NAMESPACE = "audio_features"
+
+
+def _decode(path: str, sr: int) -> Tuple[np.ndarray, int]:
+    try:
+        import librosa
+    except ImportError:
+        if not path.lower().endswith(".wav"):
+            raise
+        with wave.open(path) as wav:
+            width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+        if width == 1:
+            samples -= 128
+        samples /= float(2 ** (8 * width - 1))
+        return samples.reshape(-1, channels).mean(axis=1), rate
+    y, rate = librosa.load(path, sr=sr, mono=True)
+    return y.astype(np.float32), rate
+
+
+def analyse_signal(
+    y: np.ndarray,
+    sr: int,
+    envelope_hz: float = 2.0,
+    drop_db: float = 6.0,
+) -> Dict[str, Any]:
+    """Features of a mono signal ``y`` sampled at ``sr`` Hz."""
+    if len(y) < N_FFT:
+        y = np.pad(y, (0, N_FFT - len(y)))
+    frames = np.lib.stride_tricks.sliding_window_view(y, N_FFT)[::HOP]
+    fps = sr / HOP
+    duration = len(y) / sr
+
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    loudness = 20 * np.log10(rms + 1e-10)
+
+    spectrum = np.log1p(np.abs(np.fft.rfft(frames * np.hanning(N_FFT), axis=1)))
+    flux = np.maximum(np.diff(spectrum, axis=0), 0).sum(axis=1)
+    onset = np.concatenate(([0.0], flux))
+
+    # onsets: local maxima clearly above the envelope's typical level
+    threshold = onset.mean() + 0.5 * onset.std()
+    peaks = (onset[1:-1] > onset[:-2]) & (onset[1:-1] >= onset[2:]) & (onset[1:-1] > threshold)
+    onset_density = float(np.count_nonzero(peaks)) / duration if duration else 0.0
+
+    tempo: Optional[float] = None
+    centred = onset - onset.mean()
+    if centred.any():
+        size = 1 << int(np.ceil(np.log2(2 * len(centred))))
+        power = np.abs(np.fft.rfft(centred, size)) ** 2
+        autocorr = np.fft.irfft(power, size)[: len(centred)]
+        lags = np.arange(max(1, int(fps * 60 / 200)), min(len(autocorr) - 1, int(fps * 60 / 60)) + 1)
+        if len(lags):
+            bpm = 60 * fps / lags
+            prior = np.exp(-0.5 * (np.log2(bpm / 120.0)) ** 2)
+            lag = int(lags[np.argmax(autocorr[lags] * prior)])
+            # parabolic interpolation around the best lag
+            a, b, c = autocorr[lag - 1], autocorr[lag], autocorr[lag + 1]
+            shift = 0.5 * (a - c) / (a - 2 * b + c) if (a - 2 * b + c) else 0.0
+            tempo = float(60 * fps / (lag + shift))
+
+    block = max(1, int(round(fps / envelope_hz)))
+    usable = len(loudness) // block * block
+    envelope = loudness[:usable].reshape(-1, block).mean(axis=1) if usable else loudness
+
+    # drops: starts of runs where loudness smoothed over a second (longer
+    # than a beat) exceeds the quietest point of the preceding two seconds
+    smooth_width = max(1, int(round(fps)))
+    smooth = np.convolve(loudness, np.ones(smooth_width) / smooth_width, mode="valid")
+    lookback = max(1, int(round(2 * fps)))
+    drops: List[float] = []
+    if len(smooth) > lookback:
+        previous_min = np.lib.stride_tricks.sliding_window_view(smooth[:-1], lookback).min(axis=1)
+        rising = smooth[lookback:] - previous_min >= drop_db
+        starts = np.flatnonzero(rising & ~np.concatenate(([False], rising[:-1]))) + lookback
+        # a frame's smoothed value covers smooth_width frames of N_FFT samples each
+        offset = (smooth_width * HOP + N_FFT) / 2 / sr
+        drops = [round(float(k / fps + offset), 2) for k in starts]
+
+    return {
+        "tempo": round(tempo, 2) if tempo else None,
+        "onset_density": round(onset_density, 3),
+        "loudness_envelope": [round(float(v), 1) for v in envelope],
+        "drops": drops,
+    }
+
+
+def analyse_file(path: str) -> Dict[str, Any]:
+    """Decode and analyse one audio file (runs in the analysis pool)."""
+    y, sr = _decode(path, int(os.environ.get("AUDIO_SAMPLE_RATE", 22050)))
+    return analyse_signal(
+        y,
+        sr,
+        envelope_hz=float(os.environ.get("AUDIO_ENVELOPE_HZ", 2.0)),
+        drop_db=float(os.environ.get("AUDIO_DROP_DB", 6.0)),
+    )
+
+
+def beat_aligned(pacing: Optional[float], tempo: Optional[float]) -> Optional[float]:
+    """Snap a shot length to the nearest whole number of beats at ``tempo``."""
+    if not pacing or not tempo:
+        return pacing
+    beat = 60.0 / tempo
+    return round(max(1, round(pacing / beat)) * beat, 3)
+
+
+@lru_cache()
+def _pool() -> ProcessPoolExecutor:
+    # spawned rather than forked: the parent runs an event loop and helper threads
+    return ProcessPoolExecutor(
+        max_workers=int(os.environ.get("AUDIO_ANALYSIS_WORKERS", 2)),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _download_slots() -> asyncio.Semaphore:
+    # one bound per event loop, shared by every ingest running on it
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        limit = int(os.environ.get("AUDIO_DOWNLOAD_CONCURRENCY", 4))
+        slots = _slots[loop] = asyncio.Semaphore(limit)
+    return slots
+
+
+async def _download(url: str, path: str) -> None:
+    import httpx
+
+    async def fetch() -> None:
+        async with httpx.AsyncClient(timeout=None, follow_redirects=True) as client:
+            async with client.stream("GET", url) as resp:
+                resp.raise_for_status()
+                with open(path, "wb") as fh:
+                    async for chunk in resp.aiter_bytes():
+                        fh.write(chunk)
+
+    await get_dependency("audio_download").call(fetch)
+
+
+Fetch = Callable[[str, str], Awaitable[None]]
+
+
+async def _analyse_url(url: str, fetch: Fetch = _download) -> Dict[str, Any]:
+    async with _download_slots():
+        suffix = os.path.splitext(url.split("?", 1)[0])[1] or ".mp3"
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            with timed("audio.download"):
+                await fetch(url, path)
+            with timed("audio.analyse"):
+                return await asyncio.get_running_loop().run_in_executor(_pool(), analyse_file, path)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+async def lookup_audio_features(hashes: Iterable[str], repo=None) -> Dict[str, Dict[str, Any]]:
+    """Stored features per audio hash; hashes never analysed are omitted.
+
+    Reads the shared cache first and the ``audio_features`` table for the
+    rest; table misses are cached briefly so they are not queried per request.
+    """
+    hashes = [h for h in dict.fromkeys(hashes) if h]
+    if not hashes:
+        return {}
+    cache = get_cache()
+    cached = await cache.get_many(_NAMESPACE, hashes)
+    found = {h: v for h, v in cached.items() if v is not None}
+    missing = [h for h in hashes if h not in found]
+    if missing:
+        if repo is None:
+            from .database import AudioFeatureRepository
+            from .supabase import get_supabase_client
+
+            repo = AudioFeatureRepository(get_supabase_client())
+        try:
+            rows = await repo.select(
+                "audio_hash," + ",".join(FEATURE_FIELDS), in_={"audio_hash": missing}
+            )
+        except Exception:
+            record_error("audio_features.lookup")
+            rows = []
+        for row in rows:
+            found[row["audio_hash"]] = {f: row.get(f) for f in FEATURE_FIELDS}
+        miss_ttl = float(os.environ.get("AUDIO_FEATURES_MISS_TTL", 300))
+        for h in missing:
+            await cache.set(_NAMESPACE, h, found.get(h, {}), ttl=None if h in found else miss_ttl)
+    return {h: v for h, v in found.items() if v}
+
+
+async def analyse_audio(
+    urls: Dict[str, str], repo=None, fetch: Optional[Fetch] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Analyse each ``audio_hash -> url`` not analysed before and store the results.
+
+    ``fetch(url, path)`` writes the audio at ``url`` to ``path``; it defaults
+    to an HTTP download.
+    """
+    if repo is None:
+        from .database import AudioFeatureRepository
+        from .supabase import get_supabase_client
+
+        repo = AudioFeatureRepository(get_supabase_client())
+    known = await lookup_audio_features(urls, repo=repo)
+    todo = {h: url for h, url in urls.items() if h and url and h not in known}
+    results = await asyncio.gather(
+        *(_analyse_url(url, fetch or _download) for url in todo.values()), return_exceptions=True
+    )
+    analysed: Dict[str, Dict[str, Any]] = {}
+    for audio_hash, result in zip(todo, results):
+        if isinstance(result, BaseException):
+            record_error("audio_features.analyse")
+            continue
+        analysed[audio_hash] = result
+    if analysed:
+        try:
+            await repo.upsert(
+                [{"audio_hash": h, **features} for h, features in analysed.items()],
+                on_conflict="audio_hash",
+            )
+        except Exception:
+            record_error("audio_features.store")
+        cache = get_cache()
+        for audio_hash, features in analysed.items():
+            await cache.set(_NAMESPACE, audio_hash, features)
+    return {**known, **analysed}
+
+
+_background: Set[asyncio.Task] = set()
+
+
+def analyse_audio_later(urls: Dict[str, str]) -> asyncio.Task:
+    """Run :func:`analyse_audio` as a task on the running loop.
+
+    Ingestion returns without waiting on downloads; features are served once
+    they are stored.
+    """
+
+    async def run() -> None:
+        try:
+            await analyse_audio(urls)
+        except Exception:
+            record_error("audio_features.analyse")
+
+    task = asyncio.get_running_loop().create_task(run())
+    # the loop only keeps weak references to tasks
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+async def shutdown_audio_analysis() -> None:
+    """Cancel background analyses and stop the decoding pool.
+
+    Cancelled audios are analysed again when they are next ingested.
+    """
+    tasks = list(_background)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if _pool.cache_info().currsize:
+        _pool().shutdown(wait=False, cancel_futures=True)
+        _pool.cache_clear()
+
+
+async def attach_audio_features(audios: List[TrendingAudio]) -> List[TrendingAudio]:
+    """Fill the feature fields of ``audios`` from stored analyses."""
+    try:
+        features = await lookup_audio_features(a.audio_hash for a in audios)
+    except Exception:
+        record_error("audio_features.attach")
+        return audios
+    for audio in audios:
+        for field, value in features.get(audio.audio_hash, {}).items():
+            setattr(audio, field, value)
+    return audios
@@ -0,0 +1,563 @@
+"""Shared cache with pluggable backends and cross-process invalidation.
+
+``CACHE_BACKEND`` selects where cached values live:
+
+* ``memory`` (default) – an in-process LRU, as before;
+* ``sqlite`` – a WAL-mode SQLite file at ``CACHE_SQLITE_PATH`` shared by every
+  worker on one host (``uvicorn --workers N``);
+* ``redis`` – any server speaking the Redis protocol at ``CACHE_REDIS_URL``,
+  shared across hosts and instances.
+
+Values are JSON documents grouped into namespaces (``trending``,
+``patterns:<niche>``, ``generate:<niche>``). Every namespace has a version
+counter stored in the backend and keys embed the current version, so
+:meth:`Cache.invalidate` is a single atomic increment that orphans all of the
+namespace's entries in every process at once. Processes re-read versions at
+most every ``CACHE_VERSION_TTL`` seconds, and a background poller fires
+:meth:`Cache.on_invalidate` listeners (used to drop in-memory state such as
+the pattern index) when another process bumps a version.
+
+Cache failures never fail a request: they are recorded as errors and treated
+as misses.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from .metrics import record_cache, record_error
+from .resilience import get_dependency
+
+
+class CacheBackend(ABC):
+    """Byte-oriented key/value store with expiry and atomic counters."""
+
+    name = "base"
+
+    @abstractmethod
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """Return the value of each key, or ``None`` when absent or expired."""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_many([key]))[0]
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store ``value`` under ``key`` for ``ttl`` seconds (forever when ``None``)."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove ``key`` if present."""
+
+    @abstractmethod
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Atomically increment the integer at ``key`` and return the new value.
+
+        With ``ttl`` the counter starts over once ``ttl`` seconds have passed
+        since it was created.
+        """
+
+    @abstractmethod
+    async def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease ``key`` for ``owner`` for ``ttl`` seconds.
+
+        Fails while another owner holds an unexpired lease.
+        """
+
+    async def close(self) -> None:
+        """Release connections held by the backend."""
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU bounded by ``max_entries``; counters are never evicted."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        self.max_entries = max_entries or int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+        self._data: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._counter_expiry: Dict[str, float] = {}
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        now = time.monotonic()
+        values: List[Optional[bytes]] = []
+        for key in keys:
+            if key in self._counter_expiry and self._counter_expiry[key] <= now:
+                self._counters.pop(key, None)
+                del self._counter_expiry[key]
+            if key in self._counters:
+                values.append(str(self._counters[key]).encode())
+                continue
+            entry = self._data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= now:
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+            values.append(entry[0] if entry else None)
+        return values
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+        self._counters.pop(key, None)
+        self._counter_expiry.pop(key, None)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        now = time.monotonic()
+        if key in self._counter_expiry and self._counter_expiry[key] <= now:
+            self._counters.pop(key, None)
+            del self._counter_expiry[key]
+        if ttl and key not in self._counters:
+            self._counter_expiry[key] = now + ttl
+        value = self._counters[key] = self._counters.get(key, 0) + 1
+        return value
+
+    async def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        holder = (await self.get_many([key]))[0]
+        if holder is not None and holder != owner.encode():
+            return False
+        await self.set(key, owner.encode(), ttl)
+        return True
+
+
+class SQLiteBackend(CacheBackend):
+    """Host-local store shared by worker processes through one SQLite file.
+
+    Statements run on a dedicated thread so lock waits never block the event
+    loop; expired rows are purged every ``purge_every`` writes.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None, purge_every: int = 1000) -> None:
+        self.path = path or os.environ.get("CACHE_SQLITE_PATH", "data/cache.sqlite3")
+        self.purge_every = purge_every
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(self._connect()))
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        def query(conn: sqlite3.Connection) -> List[Optional[bytes]]:
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({placeholders}) "
+                "AND (expires IS NULL OR expires > ?)",
+                (*keys, time.time()),
+            ).fetchall()
+            found = {k: v if isinstance(v, bytes) else str(v).encode() for k, v in rows}
+            return [found.get(k) for k in keys]
+
+        return await self._run(query)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._writes += 1
+        purge = self._writes % self.purge_every == 0
+
+        def write(conn: sqlite3.Connection) -> None:
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl else None),
+            )
+            if purge:
+                conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+
+        await self._run(write)
+
+    async def delete(self, key: str) -> None:
+        await self._run(lambda conn: conn.execute("DELETE FROM cache WHERE key = ?", (key,)))
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        def increment(conn: sqlite3.Connection) -> int:
+            now = time.time()
+            row = conn.execute(
+                "INSERT INTO cache (key, value, expires) VALUES (?, 1, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "value = CASE WHEN expires <= ? THEN 1 ELSE CAST(value AS INTEGER) + 1 END, "
+                "expires = CASE WHEN expires <= ? THEN excluded.expires ELSE expires END "
+                "RETURNING value",
+                (key, now + ttl if ttl else None, now, now),
+            ).fetchone()
+            return int(row[0])
+
+        return await self._run(increment)
+
+    async def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        def take(conn: sqlite3.Connection) -> bool:
+            now = time.time()
+            # the upsert only applies when the lease is ours or has expired
+            row = conn.execute(
+                "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+                "WHERE value = excluded.value OR expires <= ? RETURNING key",
+                (key, owner.encode(), now + ttl, now),
+            ).fetchone()
+            return row is not None
+
+        return await self._run(take)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(lambda conn: conn.close())
+            self._conn = None
+
+
+class RedisError(RuntimeError):
+    """Error reply from a Redis-protocol server."""
+
+
+class RedisBackend(CacheBackend):
+    """Minimal RESP2 client for Redis and protocol-compatible servers.
+
+    One connection per event loop; commands are serialized on it and run
+    under the ``redis`` resilience policy.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: Optional[str] = None) -> None:
+        parts = urlsplit(url or os.environ.get("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0"))
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 6379
+        self.db = int(parts.path.strip("/") or 0)
+        self.password = parts.password
+        self._streams: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def _encode(args: Sequence[Any]) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    async def _read(self, reader: asyncio.StreamReader) -> Any:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RedisError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            return None if size < 0 else (await reader.readexactly(size + 2))[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [await self._read(reader) for _ in range(size)]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    async def _send(self, args: Sequence[Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._streams, self._loop, self._lock = None, loop, asyncio.Lock()
+        async with self._lock:
+            try:
+                if self._streams is None:
+                    self._streams = await asyncio.open_connection(self.host, self.port)
+                    if self.password:
+                        await self._roundtrip(("AUTH", self.password))
+                    if self.db:
+                        await self._roundtrip(("SELECT", self.db))
+                return await self._roundtrip(args)
+            except (OSError, asyncio.IncompleteReadError, asyncio.CancelledError):
+                # drop a connection that may hold a half-read reply
+                if self._streams is not None:
+                    self._streams[1].close()
+                self._streams = None
+                raise
+
+    async def _roundtrip(self, args: Sequence[Any]) -> Any:
+        reader, writer = self._streams
+        writer.write(self._encode(args))
+        await writer.drain()
+        return await self._read(reader)
+
+    async def command(self, *args: Any) -> Any:
+        return await get_dependency("redis").call(lambda: self._send(args))
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return await self.command("MGET", *keys)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if ttl:
+            await self.command("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            await self.command("SET", key, value)
+
+    async def delete(self, key: str) -> None:
+        await self.command("DEL", key)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        value = await self.command("INCR", key)
+        if ttl and value == 1:
+            await self.command("PEXPIRE", key, int(ttl * 1000))
+        return value
+
+    async def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        millis = int(ttl * 1000)
+        if await self.command("SET", key, owner, "NX", "PX", millis) is not None:
+            return True
+        if await self.command("GET", key) != owner.encode():
+            return False
+        # compare-then-extend: if the lease lapsed in between, PEXPIRE only
+        # prolongs the new holder's lease and the next renewal notices
+        return bool(await self.command("PEXPIRE", key, millis)) and (
+            await self.command("GET", key) == owner.encode()
+        )
+
+    async def close(self) -> None:
+        if self._streams is not None:
+            self._streams[1].close()
+            self._streams = None
+
+
+def create_cache_backend(name: Optional[str] = None) -> CacheBackend:
+    """Instantiate the backend named by ``name`` or ``CACHE_BACKEND``."""
+    name = (name or os.environ.get("CACHE_BACKEND", "memory")).lower()
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "redis":
+        return RedisBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND {name!r}")
+
+
+Listener = Callable[[str], None]
+
+
+class Cache:
+    """Namespaced JSON cache over a :class:`CacheBackend`."""
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        prefix: Optional[str] = None,
+        version_ttl: Optional[float] = None,
+        poll_seconds: Optional[float] = None,
+    ) -> None:
+        self.backend = backend or create_cache_backend()
+        self.prefix = prefix if prefix is not None else os.environ.get("CACHE_PREFIX", "viralsynth")
+        self.version_ttl = (
+            version_ttl if version_ttl is not None else float(os.environ.get("CACHE_VERSION_TTL", 1.0))
+        )
+        self.poll_seconds = poll_seconds or float(os.environ.get("CACHE_POLL_SECONDS", 1.0))
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._listeners: Dict[str, List[Tuple[Listener, bool]]] = {}
+        self._watched: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{self.prefix}:version:{namespace}"
+
+    def _key(self, namespace: str, version: int, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{version}:{key}"
+
+    async def _read(self, namespace: str, key: str) -> Tuple[Optional[bytes], int]:
+        now = time.monotonic()
+        known = self._versions.get(namespace)
+        if known is not None and now - known[1] < self.version_ttl:
+            return await self.backend.get(self._key(namespace, known[0], key)), known[0]
+        # refresh the version and optimistically read the last known one in one round trip
+        guess = known[0] if known else 0
+        raw, data = await self.backend.get_many(
+            [self._version_key(namespace), self._key(namespace, guess, key)]
+        )
+        version = int(raw or 0)
+        self._versions[namespace] = (version, now)
+        if version != guess:
+            data = await self.backend.get(self._key(namespace, version, key))
+        return data, version
+
+    async def _version(self, namespace: str) -> int:
+        known = self._versions.get(namespace)
+        if known is not None and time.monotonic() - known[1] < self.version_ttl:
+            return known[0]
+        version = int((await self.backend.get(self._version_key(namespace))) or 0)
+        self._versions[namespace] = (version, time.monotonic())
+        return version
+
+    async def get(self, namespace: str, key: str) -> Any:
+        """Cached JSON value for ``key`` in ``namespace``, or ``None``."""
+        try:
+            data, _ = await self._read(namespace, key)
+        except Exception:
+            record_error("cache.get")
+            data = None
+        record_cache(namespace.split(":")[0], data is not None)
+        return json.loads(data) if data is not None else None
+
+    async def get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, Any]:
+        """Cached JSON value (or ``None``) for each of ``keys`` in one backend round trip."""
+        values: List[Optional[bytes]] = [None] * len(keys)
+        try:
+            version = await self._version(namespace)
+            values = await self.backend.get_many([self._key(namespace, version, k) for k in keys])
+        except Exception:
+            record_error("cache.get")
+        for data in values:
+            record_cache(namespace.split(":")[0], data is not None)
+        return {k: json.loads(v) if v is not None else None for k, v in zip(keys, values)}
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serializable ``value`` under the namespace's current version."""
+        try:
+            version = await self._version(namespace)
+            await self.backend.set(self._key(namespace, version, key), json.dumps(value).encode(), ttl)
+        except Exception:
+            record_error("cache.set")
+
+    async def get_or_set(
+        self,
+        namespace: str,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Return the cached value or compute it once per process and store it.
+
+        Empty results are returned but not stored, so fallbacks are retried.
+        If the computing caller is cancelled, a waiting caller takes over.
+        """
+        value = await self.get(namespace, key)
+        if value is not None:
+            return value
+        flight = f"{namespace}\x00{key}"
+        pending = self._inflight.get(flight)
+        while pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this caller was cancelled, not the computation
+            pending = self._inflight.get(flight)
+        pending = self._inflight[flight] = asyncio.get_running_loop().create_future()
+        try:
+            value = await factory()
+            pending.set_result(value)
+        except Exception as exc:
+            pending.set_exception(exc)
+            pending.exception()  # mark retrieved when nobody else is waiting
+            raise
+        except BaseException:
+            pending.cancel()
+            raise
+        finally:
+            del self._inflight[flight]
+        if value:
+            await self.set(namespace, key, value, ttl)
+        return value
+
+    async def invalidate(self, *namespaces: str) -> None:
+        """Bump the version of each namespace, orphaning its entries everywhere."""
+        for namespace in namespaces:
+            try:
+                version = await self.backend.incr(self._version_key(namespace))
+                self._versions[namespace] = (version, time.monotonic())
+                if namespace in self._watched:
+                    self._watched[namespace] = version
+            except Exception:
+                record_error("cache.invalidate")
+                self._versions.pop(namespace, None)
+            self._notify(namespace, remote=False)
+
+    def on_invalidate(self, namespace: str, listener: Listener, remote_only: bool = False) -> None:
+        """Call ``listener(namespace)`` whenever ``namespace`` is invalidated.
+
+        ``remote_only`` listeners ignore invalidations issued by this process.
+        """
+        entries = self._listeners.setdefault(namespace, [])
+        if all(existing is not listener for existing, _ in entries):
+            entries.append((listener, remote_only))
+
+    def _notify(self, namespace: str, remote: bool) -> None:
+        for listener, remote_only in self._listeners.get(namespace, []):
+            if remote or not remote_only:
+                try:
+                    listener(namespace)
+                except Exception:
+                    record_error("cache.listener")
+
+    async def poll(self) -> List[str]:
+        """Check watched namespaces for versions bumped by other processes."""
+        namespaces = list(self._listeners)
+        if not namespaces:
+            return []
+        raw = await self.backend.get_many([self._version_key(ns) for ns in namespaces])
+        now = time.monotonic()
+        changed: List[str] = []
+        for namespace, value in zip(namespaces, raw):
+            version = int(value or 0)
+            self._versions[namespace] = (version, now)
+            # tracked apart from _versions, which reads refresh without notifying
+            seen = self._watched.get(namespace)
+            self._watched[namespace] = version
+            if seen is not None and seen != version:
+                changed.append(namespace)
+                self._notify(namespace, remote=True)
+        return changed
+
+    async def _poll_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.poll()
+            except Exception:
+                record_error("cache.poll")
+
+    def start(self) -> None:
+        """Start the background invalidation poller on the running loop."""
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll_forever())
+
+    async def close(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        await self.backend.close()
+
+
+@lru_cache()
+def get_cache() -> Cache:
+    """Return the process-wide cache."""
+    return Cache()
@@ -4,39 +4,48 @@ import os
 from typing import List, Optional, Tuple
 
 from ..models import Pattern, TrendingAudio
+from .database import PatternRepository
+from .metrics import instrument
+from .pattern_index import get_pattern_index
 from .supabase import get_supabase_client
 from .ingestion import get_trending_audio
 
 
-async def choose_assets(
-    niche: Optional[str] = None, pattern_ids: Optional[List[int]] = None
-) -> Tuple[Optional[TrendingAudio], List[Pattern]]:
-    """Select a trending audio clip and high-performing patterns.
+async def choose_patterns(
+    niche: Optional[str] = None,
+    pattern_ids: Optional[List[int]] = None,
+    prompt: Optional[str] = None,
+) -> List[Pattern]:
+    """Select high-performing patterns for generation.
 
-    If ``pattern_ids`` are provided, those specific patterns are retrieved. Otherwise,
-    the top patterns for the niche are returned ordered by engagement score.
+    Explicit ``pattern_ids`` are fetched as-is. With a ``niche`` and a
+    ``prompt`` the in-memory pattern index ranks the niche's patterns by
+    relevance to the prompt weighted by engagement; with only a niche the top
+    patterns by engagement score are queried.
     """
-
-    supabase = get_supabase_client()
     patterns: List[Pattern] = []
     limit = int(os.environ.get("PATTERN_CHOOSE_LIMIT", 5))
-    if supabase:
-        try:
-            query = supabase.table("patterns").select(
-                "id,hook,core_value_loop,narrative_arc,visual_formula,cta,prevalence,engagement_score"
-            )
+    try:
+        if not pattern_ids and niche and prompt:
+            patterns = await get_pattern_index().search(niche, prompt, limit)
+        else:
+            repo = PatternRepository(get_supabase_client())
+            columns = "id,hook,core_value_loop,narrative_arc,visual_formula,cta,prevalence,engagement_score"
             if pattern_ids:
-                query = query.in_("id", pattern_ids)
+                rows = await repo.select(columns, in_={"id": pattern_ids})
             elif niche:
-                query = (
-                    query.eq("niche", niche)
-                    .order("engagement_score", desc=True)
-                    .limit(limit)
+                rows = await repo.select(
+                    columns,
+                    eq={"niche": niche},
+                    order="engagement_score",
+                    desc=True,
+                    limit=limit,
                 )
-            resp = query.execute()
-            patterns = [Pattern(**r) for r in resp.data or []]
-        except Exception:
-            patterns = []
+            else:
+                rows = await repo.select(columns)
+            patterns = [Pattern(**r) for r in rows]
+    except Exception:
+        patterns = []
 
     if not patterns:
         # Fallback pattern when database is unavailable
@@ -49,12 +58,29 @@ async def choose_assets(
                 cta="Follow for more hacks",
             )
         ]
+    return patterns
 
-    audio_obj: Optional[TrendingAudio] = None
+
+async def choose_audio(niche: Optional[str] = None) -> Optional[TrendingAudio]:
+    """Return the top trending audio clip for ``niche``, if any."""
     try:
         audio_list = await get_trending_audio(niche=niche, limit=1)
-        audio_obj = audio_list[0] if audio_list else None
+        return audio_list[0] if audio_list else None
     except Exception:
-        audio_obj = None
+        return None
+
+
+@instrument("chooser.assets")
+async def choose_assets(
+    niche: Optional[str] = None,
+    pattern_ids: Optional[List[int]] = None,
+    prompt: Optional[str] = None,
+) -> Tuple[Optional[TrendingAudio], List[Pattern]]:
+    """Select a trending audio clip and high-performing patterns.
 
+    If ``pattern_ids`` are provided, those specific patterns are retrieved. Otherwise,
+    the top patterns for the niche are returned, ranked against ``prompt`` when given.
+    """
+    patterns = await choose_patterns(niche=niche, pattern_ids=pattern_ids, prompt=prompt)
+    audio_obj = await choose_audio(niche)
     return audio_obj, patterns
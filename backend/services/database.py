@@ -0,0 +1,389 @@
+"""Async data-access layer with one repository per Supabase table.
+
+When ``DATABASE_URL`` points at Postgres, queries run over a pooled asyncpg
+connection. asyncpg keeps a per-connection prepared statement cache, so the
+handful of query shapes used by the services are parsed and planned once per
+connection. Without a DSN the repositories fall back to the Supabase REST
+client, whose blocking ``execute`` calls are offloaded to a thread pool so
+concurrent requests on one worker do not serialize on database I/O. Both
+paths run under the ``postgres``/``supabase`` resilience policies; inserts
+are never retried.
+
+Selects can page by keyset: ``order`` lists one or more columns sorted in the
+same direction and ``after`` the values of the previous page's last row, so
+each page starts at an index seek instead of skipping rows with ``OFFSET``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .metrics import timed
+from .resilience import get_dependency
+from .supabase import execute_async
+
+_IDENTIFIER = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+_pool: Any = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+
+def _columns(columns: str) -> List[str]:
+    """Split a Supabase-style ``"a, b, c"`` select string into column names."""
+    cols = [c.strip() for c in columns.split(",") if c.strip()]
+    for col in cols:
+        _check_identifier(col)
+    return cols
+
+
+def _check_identifier(name: str) -> str:
+    if name != "*" and not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return name
+
+
+def build_select(
+    table: str,
+    columns: str,
+    eq: Optional[Dict[str, Any]] = None,
+    in_: Optional[Dict[str, Iterable[Any]]] = None,
+    order: Optional[str] = None,
+    desc: bool = False,
+    limit: Optional[int] = None,
+    gte: Optional[Dict[str, Any]] = None,
+    after: Optional[Sequence[Any]] = None,
+) -> Tuple[str, List[Any]]:
+    """Build a parameterized ``SELECT`` statement mirroring the REST filters.
+
+    ``order`` may name several comma-separated columns; ``after`` then holds
+    one value per column and keeps only rows sorting strictly after them.
+    """
+    args: List[Any] = []
+    clauses: List[str] = []
+    for col, value in (eq or {}).items():
+        args.append(value)
+        clauses.append(f"{_check_identifier(col)} = ${len(args)}")
+    for col, values in (in_ or {}).items():
+        args.append(list(values))
+        clauses.append(f"{_check_identifier(col)} = ANY(${len(args)})")
+    for col, value in (gte or {}).items():
+        args.append(value)
+        clauses.append(f"{_check_identifier(col)} >= ${len(args)}")
+    order_cols = _columns(order) if order else []
+    if after is not None:
+        if len(after) != len(order_cols):
+            raise ValueError("after needs one value per order column")
+        placeholders = []
+        for value in after:
+            args.append(value)
+            placeholders.append(f"${len(args)}")
+        clauses.append(
+            f"({', '.join(order_cols)}) {'<' if desc else '>'} ({', '.join(placeholders)})"
+        )
+
+    sql = f"SELECT {', '.join(_columns(columns))} FROM {_check_identifier(table)}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if order_cols:
+        direction = "DESC" if desc else "ASC"
+        sql += " ORDER BY " + ", ".join(f"{col} {direction}" for col in order_cols)
+    if limit is not None:
+        args.append(int(limit))
+        sql += f" LIMIT ${len(args)}"
+    return sql, args
+
+
+def build_insert(table: str, rows: Sequence[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """Build a multi-row ``INSERT ... RETURNING *`` statement."""
+    cols = list(rows[0].keys())
+    for col in cols:
+        _check_identifier(col)
+    args: List[Any] = []
+    values: List[str] = []
+    for row in rows:
+        placeholders = []
+        for col in cols:
+            args.append(row.get(col))
+            placeholders.append(f"${len(args)}")
+        values.append(f"({', '.join(placeholders)})")
+    sql = (
+        f"INSERT INTO {_check_identifier(table)} ({', '.join(cols)}) "
+        f"VALUES {', '.join(values)} RETURNING *"
+    )
+    return sql, args
+
+
+def build_upsert(
+    table: str, rows: Sequence[Dict[str, Any]], on_conflict: str
+) -> Tuple[str, List[Any]]:
+    """Build a multi-row ``INSERT ... ON CONFLICT DO UPDATE`` statement.
+
+    Conflicting rows take every inserted column except the conflict target.
+    """
+    sql, args = build_insert(table, rows)
+    target = _check_identifier(on_conflict)
+    updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in rows[0] if col != target)
+    sql = sql[: -len(" RETURNING *")]
+    updates = updates or f"{target} = EXCLUDED.{target}"
+    return f"{sql} ON CONFLICT ({target}) DO UPDATE SET {updates} RETURNING *", args
+
+
+def build_delete(table: str, in_: Dict[str, Iterable[Any]]) -> Tuple[str, List[Any]]:
+    """Build a ``DELETE`` statement filtered by column membership."""
+    if not in_:
+        raise ValueError("Refusing to build an unfiltered DELETE")
+    args: List[Any] = []
+    clauses: List[str] = []
+    for col, values in in_.items():
+        args.append(list(values))
+        clauses.append(f"{_check_identifier(col)} = ANY(${len(args)})")
+    return f"DELETE FROM {_check_identifier(table)} WHERE {' AND '.join(clauses)}", args
+
+
+def build_call(function: str, params: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Build ``SELECT * FROM function(name => $1, ...)`` with named arguments."""
+    names = [_check_identifier(name) for name in params]
+    arguments = ", ".join(f"{name} => ${i}" for i, name in enumerate(names, 1))
+    return f"SELECT * FROM {_check_identifier(function)}({arguments})", list(params.values())
+
+
+def _rest_value(value: Any) -> str:
+    # PostgREST reserves , ( ) and " inside logical filters; quote such values
+    text = str(value)
+    if any(c in text for c in ',()"\\'):
+        text = '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+def build_rest_keyset(order: str, after: Sequence[Any], desc: bool = False) -> str:
+    """PostgREST ``or`` filter keeping rows that sort strictly after ``after``.
+
+    Expands the row comparison ``(a, b) > (x, y)`` into
+    ``a > x OR (a = x AND b > y)``.
+    """
+    cols = _columns(order)
+    if len(after) != len(cols):
+        raise ValueError("after needs one value per order column")
+    op = "lt" if desc else "gt"
+    branches = []
+    for i, col in enumerate(cols):
+        terms = [f"{c}.eq.{_rest_value(v)}" for c, v in zip(cols[:i], after[:i])]
+        terms.append(f"{col}.{op}.{_rest_value(after[i])}")
+        branches.append(terms[0] if len(terms) == 1 else f"and({','.join(terms)})")
+    return ",".join(branches)
+
+
+async def _init_connection(conn: Any) -> None:
+    """Encode and decode json/jsonb columns as Python objects."""
+    for typename in ("json", "jsonb"):
+        await conn.set_type_codec(
+            typename, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+
+
+async def get_pool() -> Any:
+    """Return the shared asyncpg pool, or ``None`` when no DSN is configured."""
+    global _pool, _pool_lock
+    dsn = os.environ.get("DATABASE_URL")
+    if not dsn:
+        return None
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                import asyncpg
+
+                _pool = await asyncpg.create_pool(
+                    dsn,
+                    min_size=int(os.environ.get("DATABASE_POOL_MIN_SIZE", 1)),
+                    max_size=int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10)),
+                    statement_cache_size=int(
+                        os.environ.get("DATABASE_STATEMENT_CACHE_SIZE", 100)
+                    ),
+                    init=_init_connection,
+                )
+    return _pool
+
+
+async def close_pool() -> None:
+    """Close the shared asyncpg pool if one was opened."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def _fetch(pool: Any, sql: str, args: List[Any]) -> List[Any]:
+    async with pool.acquire() as conn:
+        return await conn.fetch(sql, *args)
+
+
+class Repository:
+    """Table gateway that prefers asyncpg and falls back to Supabase REST."""
+
+    table: str = ""
+
+    def __init__(self, supabase: Any = None) -> None:
+        self._supabase = supabase
+
+    @property
+    def configured(self) -> bool:
+        """Whether either a Postgres DSN or a Supabase client is available."""
+        return self._supabase is not None or bool(os.environ.get("DATABASE_URL"))
+
+    async def select(
+        self,
+        columns: str,
+        *,
+        eq: Optional[Dict[str, Any]] = None,
+        in_: Optional[Dict[str, Iterable[Any]]] = None,
+        order: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        gte: Optional[Dict[str, Any]] = None,
+        after: Optional[Sequence[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return rows matching equality, membership and lower-bound filters.
+
+        With ``after``, only rows sorting after that keyset position in
+        ``order`` are returned (see :func:`build_select`).
+        """
+        pool = await get_pool()
+        if pool is not None:
+            sql, args = build_select(self.table, columns, eq, in_, order, desc, limit, gte, after)
+            with timed(f"postgres.{self.table}.select"):
+                rows = await get_dependency("postgres").call(lambda: _fetch(pool, sql, args))
+            return [dict(r) for r in rows]
+
+        if self._supabase is None:
+            return []
+        query = self._supabase.table(self.table).select(columns)
+        for col, value in (eq or {}).items():
+            query = query.eq(col, value)
+        for col, values in (in_ or {}).items():
+            query = query.in_(col, list(values))
+        for col, value in (gte or {}).items():
+            query = query.gte(col, value.isoformat() if hasattr(value, "isoformat") else value)
+        if after is not None:
+            query = query.or_(build_rest_keyset(order or "", after, desc))
+        for col in _columns(order) if order else []:
+            query = query.order(col, desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        with timed(f"supabase.{self.table}.select"):
+            resp = await get_dependency("supabase").call(lambda: execute_async(query))
+        return resp.data or []
+
+    async def insert(self, rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert ``rows`` in a single statement and return the stored rows."""
+        if not rows:
+            return []
+        pool = await get_pool()
+        if pool is not None:
+            sql, args = build_insert(self.table, rows)
+            with timed(f"postgres.{self.table}.insert"):
+                stored = await get_dependency("postgres").call(
+                    lambda: _fetch(pool, sql, args), idempotent=False
+                )
+            return [dict(r) for r in stored]
+
+        if self._supabase is None:
+            return []
+        with timed(f"supabase.{self.table}.insert"):
+            query = self._supabase.table(self.table).insert(list(rows))
+            resp = await get_dependency("supabase").call(
+                lambda: execute_async(query), idempotent=False
+            )
+        return resp.data or []
+
+    async def upsert(
+        self, rows: Sequence[Dict[str, Any]], on_conflict: str
+    ) -> List[Dict[str, Any]]:
+        """Insert ``rows``, overwriting rows that collide on ``on_conflict``.
+
+        Rows carry absolute values, so the statement is safe to retry.
+        """
+        if not rows:
+            return []
+        pool = await get_pool()
+        if pool is not None:
+            sql, args = build_upsert(self.table, rows, on_conflict)
+            with timed(f"postgres.{self.table}.upsert"):
+                stored = await get_dependency("postgres").call(lambda: _fetch(pool, sql, args))
+            return [dict(r) for r in stored]
+
+        if self._supabase is None:
+            return []
+        with timed(f"supabase.{self.table}.upsert"):
+            query = self._supabase.table(self.table).upsert(list(rows), on_conflict=on_conflict)
+            resp = await get_dependency("supabase").call(lambda: execute_async(query))
+        return resp.data or []
+
+    async def rpc(self, function: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Call the database function ``function`` with named ``params`` and return its rows.
+
+        Functions may write, so calls are never retried or hedged.
+        """
+        pool = await get_pool()
+        if pool is not None:
+            sql, args = build_call(function, params)
+            with timed(f"postgres.{function}"):
+                rows = await get_dependency("postgres").call(
+                    lambda: _fetch(pool, sql, args), idempotent=False
+                )
+            return [dict(r) for r in rows]
+
+        if self._supabase is None:
+            return []
+        with timed(f"supabase.{function}"):
+            query = self._supabase.rpc(function, params)
+            resp = await get_dependency("supabase").call(
+                lambda: execute_async(query), idempotent=False
+            )
+        return resp.data or []
+
+    async def delete(self, *, in_: Dict[str, Iterable[Any]]) -> None:
+        """Delete rows whose columns match the given value lists."""
+        pool = await get_pool()
+        if pool is not None:
+            sql, args = build_delete(self.table, in_)
+            with timed(f"postgres.{self.table}.delete"):
+                await get_dependency("postgres").call(lambda: _fetch(pool, sql, args))
+            return
+
+        if self._supabase is None:
+            return
+        query = self._supabase.table(self.table).delete()
+        for col, values in in_.items():
+            query = query.in_(col, list(values))
+        with timed(f"supabase.{self.table}.delete"):
+            await get_dependency("supabase").call(lambda: execute_async(query))
+
+
+class VideoRepository(Repository):
+    """Analyzed videos collected during ingestion."""
+
+    table = "videos"
+
+
+class PatternRepository(Repository):
+    """Mined content patterns and their engagement statistics."""
+
+    table = "patterns"
+
+
+class PackageRepository(Repository):
+    """Generated content packages."""
+
+    table = "packages"
+
+
+class AudioFeatureRepository(Repository):
+    """Signal features per distinct audio, keyed by ``audio_hash``."""
+
+    table = "audio_features"
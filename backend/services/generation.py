@@ -1,86 +1,138 @@
 """Service functions for generating content packages and storing them in Supabase."""
 
-import os
+import asyncio
+import dataclasses
 import json
-from typing import Dict, List, Optional
-from openai import AsyncOpenAI
+import os
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from ..models import (
     GenerateRequest,
     GenerateResponse,
     Pattern,
     PlatformVariation,
+    TrendingAudio,
 )
+from .audio_features import beat_aligned
+from .cache import get_cache
+from .database import PackageRepository, VideoRepository
+from .llm import get_llm
+from .metrics import timed
+from .prompts import PromptBuilder
+from .storyboard import PLACEHOLDER, get_storyboarder
 from .supabase import get_supabase_client
-from .chooser import choose_assets
+from .chooser import choose_assets, choose_patterns
 
 
-async def generate_package(request: GenerateRequest) -> GenerateResponse:
-    """Generate a script, storyboard and notes from stored patterns."""
-    supabase = get_supabase_client()
-
-    audio_obj, patterns = await choose_assets(
-        niche=request.niche, pattern_ids=request.pattern_ids
-    )
-    pattern_ids_used: List[int] = [p.id for p in patterns if p.id]
+@dataclass
+class GenerationAssets:
+    """Patterns, audio and style hints shared by packages for one niche."""
 
+    audio: Optional[TrendingAudio]
+    patterns: List[Pattern]
     pacing_hint: Optional[float] = None
     style_hint: Optional[str] = None
-    if supabase and audio_obj:
+
+
+async def resolve_assets(
+    niche: Optional[str] = None,
+    pattern_ids: Optional[List[int]] = None,
+    prompt: Optional[str] = None,
+) -> GenerationAssets:
+    """Choose patterns and audio and look up pacing/style hints for the audio.
+
+    The pacing hint is snapped to a whole number of beats of the audio's
+    stored tempo.
+
+    Choices are shared through the ``generate:<niche>`` cache namespace for
+    ``GENERATION_ASSET_CACHE_TTL`` seconds; fallback patterns (without ids) are
+    not cached.
+    """
+    cache = get_cache()
+    namespace = f"generate:{niche or '*'}"
+    key = json.dumps([sorted(pattern_ids) if pattern_ids else None, prompt])
+    cached = await cache.get(namespace, key)
+    if cached is not None:
+        audio = cached["audio"]
+        return GenerationAssets(
+            audio=TrendingAudio(**audio) if audio else None,
+            patterns=[Pattern(**p) for p in cached["patterns"]],
+            pacing_hint=cached["pacing_hint"],
+            style_hint=cached["style_hint"],
+        )
+
+    audio_obj, patterns = await choose_assets(
+        niche=niche, pattern_ids=pattern_ids, prompt=prompt
+    )
+    assets = GenerationAssets(audio=audio_obj, patterns=patterns)
+    if audio_obj:
         try:
-            video_resp = (
-                supabase.table("videos")
-                .select("pacing, visual_style")
-                .eq("audio_id", audio_obj.audio_id)
-                .limit(1)
-                .execute()
+            hints = await VideoRepository(get_supabase_client()).select(
+                "pacing, visual_style", eq={"audio_id": audio_obj.audio_id}, limit=1
             )
-            if video_resp.data:
-                pacing_hint = video_resp.data[0].get("pacing")
-                style_hint = video_resp.data[0].get("visual_style")
+            if hints:
+                assets.pacing_hint = beat_aligned(hints[0].get("pacing"), audio_obj.tempo)
+                assets.style_hint = hints[0].get("visual_style")
         except Exception:
             pass
+    if all(p.id is not None for p in patterns):
+        await cache.set(
+            namespace,
+            key,
+            {
+                "audio": audio_obj.model_dump() if audio_obj else None,
+                "patterns": [p.model_dump() for p in patterns],
+                "pacing_hint": assets.pacing_hint,
+                "style_hint": assets.style_hint,
+            },
+            ttl=float(os.environ.get("GENERATION_ASSET_CACHE_TTL", 60)),
+        )
+    return assets
+
+
+async def build_package(
+    request: GenerateRequest, assets: GenerationAssets
+) -> Tuple[GenerateResponse, Dict[str, Any]]:
+    """Run the LLM and image calls for one prompt without persisting it.
+
+    Returns the response together with the row to store in ``packages``.
+    """
+    audio_obj, patterns = assets.audio, assets.patterns
+    pacing_hint, style_hint = assets.pacing_hint, assets.style_hint
+    pattern_ids_used: List[int] = [p.id for p in patterns if p.id]
 
-    pattern_lines = [
-        f"Hook: {p.hook}; Value: {p.core_value_loop}; Narrative: {p.narrative_arc}; Visual: {p.visual_formula}; CTA: {p.cta}"
-        for p in patterns
-    ]
-    patterns_text = "\n".join(pattern_lines)
     style_context = (
         f"Trending audio: {audio_obj.audio_id}. " if audio_obj else ""
     ) + (
         f"Pacing target: {pacing_hint} sec per shot. " if pacing_hint else ""
     ) + (f"Visual style: {style_hint}." if style_hint else "")
+    # both calls share the pattern prefix so providers can reuse it
+    prompts = PromptBuilder().build(patterns, style_context, request.prompt)
 
-    client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    llm = get_llm()
     try:
-        completion = await client.chat.completions.create(
-            model=os.environ.get("GENERATION_MODEL", "gpt-4o-mini"),
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Using these patterns:\n{patterns_text}\n{style_context}\nGenerate a viral video script for: {request.prompt}",
-                }
-            ],
-        )
-        script = completion.choices[0].message.content.strip()
+        with timed("llm.script"):
+            script = (await llm.complete(prompts.script())).strip()
     except Exception:
         script = f"This is a placeholder script for the prompt: {request.prompt}"
 
     try:
-        image_resp = await client.images.generate(
-            model="dall-e-3", prompt=f"Storyboard frames for: {request.prompt}"
-        )
-        storyboard = [img.url for img in image_resp.data]
+        with timed("storyboard.build"):
+            frames = await get_storyboarder().build(
+                script, request.prompt, pacing_hint=pacing_hint, style_hint=style_hint
+            )
+        storyboard = [f.url if f else PLACEHOLDER.format(i + 1) for i, f in enumerate(frames)]
+        thumbnails = [f.thumbnail_url if f else PLACEHOLDER.format(i + 1) for i, f in enumerate(frames)]
     except Exception:
-        storyboard = [
-            "https://via.placeholder.com/512x512.png?text=Storyboard+Frame+1",
-            "https://via.placeholder.com/512x512.png?text=Storyboard+Frame+2",
-        ]
+        storyboard = [PLACEHOLDER.format(1), PLACEHOLDER.format(2)]
+        thumbnails = []
 
     notes = [f"Pattern used: {p}" for p in patterns[:3]] if patterns else []
     if audio_obj:
         notes.append(f"Use trending audio {audio_obj.audio_id}")
+        if audio_obj.tempo:
+            notes.append(f"Cut on the beat at {audio_obj.tempo:.0f} BPM")
     if pacing_hint:
         notes.append(f"Aim for average shot length of {pacing_hint:.2f}s")
     if style_hint:
@@ -93,17 +145,12 @@ async def generate_package(request: GenerateRequest) -> GenerateResponse:
         ]
     variations: Dict[str, PlatformVariation] = {}
     try:
-        var_prompt = (
-            "Provide platform-specific hooks and CTAs for TikTok, Instagram and YouTube."
-            f"\nScript: {script}\nReturn JSON object mapping platform to hook and cta."
-        )
-        var_completion = await client.chat.completions.create(
-            model=os.environ.get("GENERATION_MODEL", "gpt-4o-mini"),
-            messages=[{"role": "user", "content": var_prompt}],
-        )
-        var_data = json.loads(var_completion.choices[0].message.content)
-        for platform, data in var_data.items():
-            variations[platform] = PlatformVariation(**data)
+        with timed("llm.variations"):
+            var_text = await llm.complete(prompts.variations(script))
+        with timed("generation.parse_variations"):
+            var_data = json.loads(var_text)
+            for platform, data in var_data.items():
+                variations[platform] = PlatformVariation(**data)
     except Exception:
         variations[request.platform] = PlatformVariation(
             hook=f"Hook optimized for {request.platform}",
@@ -122,22 +169,97 @@ async def generate_package(request: GenerateRequest) -> GenerateResponse:
         "audio_id": audio_obj.audio_id if audio_obj else None,
         "audio_url": audio_obj.url if audio_obj else None,
     }
-    package_id = None
-    if supabase:
-        try:
-            resp = supabase.table("packages").insert(package_record).execute()
-            if resp.data:
-                package_id = resp.data[0].get("id")
-        except Exception:
-            pass
 
-    return GenerateResponse(
+    response = GenerateResponse(
         script=script,
         storyboard=storyboard,
+        storyboard_thumbnails=thumbnails,
         notes=notes,
         variations=variations,
         audio=audio_obj,
-        package_id=package_id,
         pattern_ids=pattern_ids_used,
         patterns=patterns,
     )
+    return response, package_record
+
+
+async def generate_package(request: GenerateRequest) -> GenerateResponse:
+    """Generate a script, storyboard and notes from stored patterns."""
+    assets = await resolve_assets(
+        niche=request.niche, pattern_ids=request.pattern_ids, prompt=request.prompt
+    )
+    response, package_record = await build_package(request, assets)
+    try:
+        stored = await PackageRepository(get_supabase_client()).insert([package_record])
+        if stored:
+            response.package_id = stored[0].get("id")
+    except Exception:
+        pass
+    return response
+
+
+async def generate_packages(
+    requests: List[GenerateRequest], concurrency: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Generate many packages, yielding each result as soon as it completes.
+
+    Assets are resolved once per distinct ``(niche, pattern_ids)`` pair; when a
+    request relies on automatic selection its patterns are then re-ranked for
+    its own prompt through the in-memory pattern index. LLM and image calls
+    run with at most ``concurrency`` packages in flight, and all package rows
+    are persisted with a single bulk insert once every package has been
+    produced. Items are yielded as ``{"index", "package"}`` (or
+    ``{"index", "error"}``) followed by a final ``{"done", "package_ids"}``
+    summary whose IDs line up with the request order.
+    """
+    limit = concurrency or int(os.environ.get("BULK_GENERATE_CONCURRENCY", 8))
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    asset_tasks: Dict[Tuple[Optional[str], Optional[Tuple[int, ...]]], asyncio.Future] = {}
+    for req in requests:
+        key = (req.niche, tuple(req.pattern_ids) if req.pattern_ids else None)
+        if key not in asset_tasks:
+            asset_tasks[key] = asyncio.ensure_future(
+                resolve_assets(niche=req.niche, pattern_ids=req.pattern_ids)
+            )
+
+    async def run_one(index: int, req: GenerateRequest):
+        key = (req.niche, tuple(req.pattern_ids) if req.pattern_ids else None)
+        try:
+            assets = await asset_tasks[key]
+            if req.niche and not req.pattern_ids:
+                assets = dataclasses.replace(
+                    assets, patterns=await choose_patterns(niche=req.niche, prompt=req.prompt)
+                )
+            async with semaphore:
+                return index, await build_package(req, assets), None
+        except Exception as exc:
+            return index, None, exc
+
+    tasks = [asyncio.ensure_future(run_one(i, r)) for i, r in enumerate(requests)]
+    records: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result, error = await next_done
+            if error is not None:
+                yield {"index": index, "error": str(error)}
+                continue
+            response, records[index] = result
+            yield {"index": index, "package": response.model_dump()}
+    finally:
+        for task in [*tasks, *asset_tasks.values()]:
+            task.cancel()
+
+    package_ids: List[Optional[int]] = [None] * len(requests)
+    positions = [i for i, r in enumerate(records) if r is not None]
+    if positions:
+        try:
+            with timed("generation.bulk_insert"):
+                stored = await PackageRepository(get_supabase_client()).insert(
+                    [records[i] for i in positions]
+                )
+            for i, row in zip(positions, stored):
+                package_ids[i] = row.get("id")
+        except Exception:
+            pass
+    yield {"done": True, "package_ids": package_ids}
@@ -0,0 +1,279 @@
+"""Durable per-item checkpoints for ingestion runs.
+
+An ingestion run is identified by a ``run_id`` and covers one or more
+niches. When a niche is first ingested under a run, the scraped items are
+written to the journal before any analysis starts, so a resumed run works
+through exactly the same items without scraping again. Each item then moves
+through three states:
+
+* ``pending`` – scraped, not analysed yet;
+* ``analysed`` – transcription and video analysis are done and the finished
+  ``videos`` row is kept in the journal;
+* ``stored`` – the row has been written to ``videos``.
+
+Resuming a run skips stored items, re-sends the rows of analysed ones and
+only analyses pending ones, so a crash costs just the unfinished work. Rows
+carry an ``ingest_key`` derived from the run, niche and the scraped video's
+identity (its provider id, else its normalised URL) and are upserted on it,
+so an item persisted just before a crash (but not yet marked stored) is
+overwritten rather than duplicated. A run resumed without its journal
+entries re-scrapes in whatever order the provider returns, and each video
+still lands on its own row.
+
+The journal is a WAL-mode SQLite file at ``INGEST_JOURNAL_PATH`` (default
+``data/ingest_journal.sqlite3``) shared by every worker on the host;
+statements run on a dedicated thread. Runs without progress for
+``INGEST_JOURNAL_RETENTION_DAYS`` are pruned.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+PENDING, ANALYSED, STORED = "pending", "analysed", "stored"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_runs (
+    run_id TEXT NOT NULL,
+    niche TEXT NOT NULL,
+    provider TEXT,
+    percentile INTEGER,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, niche)
+);
+CREATE TABLE IF NOT EXISTS ingest_items (
+    run_id TEXT NOT NULL,
+    niche TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    status TEXT NOT NULL,
+    row TEXT,
+    video_id INTEGER,
+    PRIMARY KEY (run_id, niche, position)
+);
+"""
+
+
+# share and tracking parameters that do not change which video a URL names
+_TRACKING_PARAMS = {"is_from_webapp", "sender_device", "igshid", "igsh", "si", "feature", "share_id"}
+
+
+def _normalise_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS and not k.startswith("utm_")
+    )
+    host = parts.netloc.lower()
+    host = host[4:] if host.startswith("www.") else host
+    return urlunsplit((parts.scheme.lower(), host, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+def item_identity(item: Dict[str, Any]) -> str:
+    """Which video a scraped item is: its provider id, else its normalised URL."""
+    for field in ("video_id", "id"):
+        if item.get(field) not in (None, ""):
+            return f"{field}:{item[field]}"
+    if item.get("url"):
+        return f"url:{_normalise_url(str(item['url']))}"
+    return "item:" + json.dumps(item, sort_keys=True, default=str)
+
+
+def ingest_key(run_id: str, niche: str, item: Dict[str, Any]) -> str:
+    """Idempotency key of the ``videos`` row for one scraped item of a run."""
+    identity = item_identity(item)
+    return hashlib.sha256(f"{run_id}\x00{niche}\x00{identity}".encode()).hexdigest()[:32]
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # the connection is in autocommit mode; group statements explicitly
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class JournalItem(NamedTuple):
+    """One scraped item and its progress within a run."""
+
+    position: int
+    item: Dict[str, Any]
+    status: str
+    row: Optional[Dict[str, Any]]
+    video_id: Optional[int]
+
+
+class IngestJournal:
+    """Checkpoint store for ingestion runs backed by one SQLite file."""
+
+    def __init__(self, path: Optional[str] = None, retention_days: Optional[float] = None) -> None:
+        self.path = path or os.environ.get("INGEST_JOURNAL_PATH", "data/ingest_journal.sqlite3")
+        self.retention_days = (
+            retention_days
+            if retention_days is not None
+            else float(os.environ.get("INGEST_JOURNAL_RETENTION_DAYS", 7))
+        )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-journal")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # checkpoints must survive a crash of the host, not only of the process
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(_SCHEMA)
+            self._prune(conn)
+            self._conn = conn
+        return self._conn
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        cutoff = time.time() - self.retention_days * 86400
+        with _transaction(conn):
+            conn.execute(
+                "DELETE FROM ingest_items WHERE (run_id, niche) IN "
+                "(SELECT run_id, niche FROM ingest_runs WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            conn.execute("DELETE FROM ingest_runs WHERE updated_at < ?", (cutoff,))
+
+    async def _run(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(self._connect()))
+
+    async def start(
+        self,
+        run_id: str,
+        niche: str,
+        items: Sequence[Dict[str, Any]],
+        provider: Optional[str] = None,
+        percentile: Optional[int] = None,
+    ) -> None:
+        """Record the scraped ``items`` of ``niche`` as pending under ``run_id``."""
+
+        def write(conn: sqlite3.Connection) -> None:
+            now = time.time()
+            with _transaction(conn):
+                conn.execute(
+                    "INSERT OR IGNORE INTO ingest_runs VALUES (?, ?, ?, ?, 'running', ?, ?)",
+                    (run_id, niche, provider, percentile, now, now),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO ingest_items (run_id, niche, position, item, status) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(run_id, niche, i, json.dumps(item), PENDING) for i, item in enumerate(items)],
+                )
+
+        await self._run(write)
+
+    async def items(self, run_id: str, niche: str) -> Optional[List[JournalItem]]:
+        """Items of ``niche`` in ``run_id`` in scrape order, or ``None`` if it never started."""
+
+        def query(conn: sqlite3.Connection) -> Optional[List[JournalItem]]:
+            started = conn.execute(
+                "SELECT 1 FROM ingest_runs WHERE run_id = ? AND niche = ?", (run_id, niche)
+            ).fetchone()
+            if started is None:
+                return None
+            rows = conn.execute(
+                "SELECT position, item, status, row, video_id FROM ingest_items "
+                "WHERE run_id = ? AND niche = ? ORDER BY position",
+                (run_id, niche),
+            ).fetchall()
+            return [
+                JournalItem(pos, json.loads(item), status, json.loads(row) if row else None, vid)
+                for pos, item, status, row, vid in rows
+            ]
+
+        return await self._run(query)
+
+    async def analysed(self, run_id: str, niche: str, position: int, row: Dict[str, Any]) -> None:
+        """Checkpoint the finished ``videos`` row of one item."""
+        await self._update(run_id, niche, position, ANALYSED, json.dumps(row), None)
+
+    async def stored(
+        self, run_id: str, niche: str, position: int, video_id: Optional[int]
+    ) -> None:
+        """Mark one item as persisted to ``videos``."""
+        await self._update(run_id, niche, position, STORED, None, video_id)
+
+    async def _update(
+        self, run_id: str, niche: str, position: int, status: str, row: Optional[str], video_id: Optional[int]
+    ) -> None:
+        def write(conn: sqlite3.Connection) -> None:
+            with _transaction(conn):
+                conn.execute(
+                    "UPDATE ingest_items SET status = ?, row = COALESCE(?, row), video_id = ? "
+                    "WHERE run_id = ? AND niche = ? AND position = ?",
+                    (status, row, video_id, run_id, niche, position),
+                )
+                conn.execute(
+                    "UPDATE ingest_runs SET updated_at = ? WHERE run_id = ? AND niche = ?",
+                    (time.time(), run_id, niche),
+                )
+
+        await self._run(write)
+
+    async def finish(self, run_id: str, niche: str) -> None:
+        """Mark ``niche`` complete within ``run_id`` (every item stored)."""
+        await self._run(
+            lambda conn: conn.execute(
+                "UPDATE ingest_runs SET status = 'completed', updated_at = ? WHERE run_id = ? AND niche = ?",
+                (time.time(), run_id, niche),
+            )
+        )
+
+    async def runs(self, run_id: Optional[str] = None, unfinished: bool = False) -> List[Dict[str, Any]]:
+        """Progress per run and niche, newest first."""
+
+        def query(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+            clauses, args = [], []
+            if run_id is not None:
+                clauses.append("r.run_id = ?")
+                args.append(run_id)
+            if unfinished:
+                clauses.append("r.status != 'completed'")
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            rows = conn.execute(
+                "SELECT r.run_id, r.niche, r.provider, r.percentile, r.status, r.created_at, r.updated_at, "
+                "COUNT(i.position), "
+                f"COALESCE(SUM(i.status = '{STORED}'), 0), COALESCE(SUM(i.status = '{ANALYSED}'), 0) "
+                "FROM ingest_runs r LEFT JOIN ingest_items i ON i.run_id = r.run_id AND i.niche = r.niche "
+                f"{where} GROUP BY r.run_id, r.niche ORDER BY r.created_at DESC",
+                args,
+            ).fetchall()
+            keys = (
+                "run_id", "niche", "provider", "percentile", "status",
+                "created_at", "updated_at", "items", "stored", "analysed",
+            )
+            return [dict(zip(keys, row)) for row in rows]
+
+        return await self._run(query)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(lambda conn: conn.close())
+            self._conn = None
+
+
+@lru_cache()
+def get_ingest_journal() -> IngestJournal:
+    """Return the process-wide ingestion journal."""
+    return IngestJournal()
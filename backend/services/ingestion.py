@@ -1,43 +1,84 @@
-"""Ingestion service for fetching videos and enriching them with analysis."""
+"""Ingestion service for fetching videos and enriching them with analysis.
+
+The scraping (Playwright, Pyppeteer) and analysis (OpenCV, scenedetect,
+pytesseract) stacks are imported inside the functions that use them so API
+processes that only rank audio never pay for loading them; workers preload
+them via :func:`preload_analysis_stack`.
+"""
 
 from __future__ import annotations
 
+import json
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Tuple
 import hashlib
 
-import cv2
-import numpy as np
+import importlib
+
 import httpx
-import pytesseract
-from scenedetect import VideoManager, SceneManager
-from scenedetect.detectors import ContentDetector
-from playwright.async_api import async_playwright
-from pyppeteer import launch
 
 from ..models import VideoRecord, TrendingAudio
+from .audio_features import FEATURE_FIELDS, analyse_audio_later, attach_audio_features
+from .cache import get_cache
+from .database import VideoRepository
+from .ingest_journal import PENDING, STORED, JournalItem, get_ingest_journal, ingest_key
+from .metrics import instrument, record_error, timed
+from .resilience import get_dependency, spend_budget
 from .supabase import get_supabase_client
+from .sketch import get_audio_sketch
+from .snapshot import get_video_snapshot
+from .speech import WordTimings, hook_word_count, speech_features
+from .stats import get_engagement_stats
 from .transcription import transcribe_video
+from .trending import ALL_TIME, get_trending_tracker
 
 APIFY_ACTOR_ID = os.environ.get("APIFY_ACTOR_ID", "your_apify_actor_id")
 APIFY_TOKEN = os.environ.get("APIFY_API_TOKEN")
-pytesseract.pytesseract.tesseract_cmd = os.environ.get("PYTESSERACT_PATH", "tesseract")
+APIFY_BASE_URL = os.environ.get("APIFY_BASE_URL", "https://api.apify.com").rstrip("/")
+ANALYSIS_MODULES = ("cv2", "pytesseract", "scenedetect", "playwright.async_api", "pyppeteer")
+
+
+def preload_analysis_stack() -> List[str]:
+    """Import the scraping and analysis dependencies ahead of the first ingest.
+
+    Returns the modules that could not be imported.
+    """
+    missing: List[str] = []
+    for name in ANALYSIS_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            record_error(f"import.{name}")
+            missing.append(name)
+    return missing
 
 
 async def _ingest_niche_apify(niche: str, percentile: int) -> List[Dict[str, Any]]:
-    """Fetch trending videos for a niche using the Apify actor API (placeholder)."""
+    """Fetch trending videos for a niche by running the Apify actor synchronously.
+
+    Without ``APIFY_API_TOKEN`` nothing is scraped.
+    """
 
-    url = f"https://api.apify.com/v2/actors/{APIFY_ACTOR_ID}/runs"
+    if not APIFY_TOKEN:
+        return []
+    url = f"{APIFY_BASE_URL}/v2/acts/{APIFY_ACTOR_ID}/run-sync-get-dataset-items"
     payload = {"niche": niche, "percentile": percentile}
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {APIFY_TOKEN}"}
-    async with httpx.AsyncClient() as client:
-        try:
-            # resp = await client.post(url, json=payload, headers=headers)
-            # data = resp.json()
-            # return data.get("items", [])
-            return []
-        except Exception as exc:  # pragma: no cover - network failure
-            return [{"error": str(exc)}]
+
+    async def run() -> httpx.Response:
+        async with httpx.AsyncClient(timeout=None) as client:
+            resp = await client.post(url, json=payload, headers=headers)
+            resp.raise_for_status()
+            return resp
+
+    try:
+        resp = await get_dependency("apify").call(run)
+        data = resp.json()
+        return data if isinstance(data, list) else data.get("items", [])
+    except Exception:
+        # an empty scrape stores nothing and leaves no journal entries behind
+        record_error("scrape.apify")
+        return []
 
 
 async def _ingest_niche_playwright(niche: str, percentile: int) -> List[Dict[str, Any]]:
@@ -45,14 +86,17 @@ async def _ingest_niche_playwright(niche: str, percentile: int) -> List[Dict[str
 
     items: List[Dict[str, Any]] = []
     try:
+        from playwright.async_api import async_playwright
+
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
             page = await browser.new_page()
             await page.goto(f"https://www.tiktok.com/tag/{niche}")
             # TODO: Extract video metadata here
             await browser.close()
-    except Exception as exc:  # pragma: no cover - network failure
-        return [{"error": str(exc)}]
+    except Exception:
+        record_error("scrape.browser")
+        return []
     return items
 
 
@@ -61,20 +105,27 @@ async def _ingest_niche_puppeteer(niche: str, percentile: int) -> List[Dict[str,
 
     items: List[Dict[str, Any]] = []
     try:
+        from pyppeteer import launch
+
         browser = await launch(headless=True)
         page = await browser.newPage()
         await page.goto(f"https://www.tiktok.com/tag/{niche}")
         # TODO: Extract video metadata here
         await browser.close()
-    except Exception as exc:  # pragma: no cover - network failure
-        return [{"error": str(exc)}]
+    except Exception:
+        record_error("scrape.browser")
+        return []
     return items
 
 
+@instrument("analysis.pacing")
 def _analyse_pacing(video_path: str) -> float:
     """Estimate average shot length using scenedetect and OpenCV."""
 
     try:
+        from scenedetect import VideoManager, SceneManager
+        from scenedetect.detectors import ContentDetector
+
         vm = VideoManager([video_path])
         sm = SceneManager()
         sm.add_detector(ContentDetector())
@@ -86,15 +137,19 @@ def _analyse_pacing(video_path: str) -> float:
             (end.get_frames() - start.get_frames()) / vm.get_framerate()
             for start, end in scenes
         ]
-        return float(np.mean(durations)) if durations else 0.0
+        return float(sum(durations) / len(durations)) if durations else 0.0
     except Exception:  # pragma: no cover - best effort
+        record_error("analysis.pacing")
         return 0.0
 
 
+@instrument("analysis.visual_style")
 def _classify_visual_style(video_path: str) -> str:
     """Very rough visual style classification based on contrast."""
 
     try:
+        import cv2
+
         cap = cv2.VideoCapture(video_path)
         ret, frame = cap.read()
         cap.release()
@@ -103,13 +158,19 @@ def _classify_visual_style(video_path: str) -> str:
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         return "cinematic" if gray.std() > 50 else "lo-fi"
     except Exception:  # pragma: no cover
+        record_error("analysis.visual_style")
         return "unknown"
 
 
+@instrument("analysis.ocr")
 def _extract_onscreen_text(video_path: str) -> str:
     """Extract on-screen text via pytesseract from the first frame."""
 
     try:
+        import cv2
+        import pytesseract
+
+        pytesseract.pytesseract.tesseract_cmd = os.environ.get("PYTESSERACT_PATH", "tesseract")
         cap = cv2.VideoCapture(video_path)
         ret, frame = cap.read()
         cap.release()
@@ -117,108 +178,276 @@ def _extract_onscreen_text(video_path: str) -> str:
             return ""
         return pytesseract.image_to_string(frame)
     except Exception:  # pragma: no cover
+        record_error("analysis.ocr")
         return ""
 
 
+async def _scrape(niche: str, percentile: int, provider_name: str) -> List[Dict[str, Any]]:
+    await spend_budget(provider_name)
+    with timed(f"scrape.{provider_name}"):
+        if provider_name == "playwright":
+            return await _ingest_niche_playwright(niche, percentile)
+        if provider_name == "puppeteer":
+            return await _ingest_niche_puppeteer(niche, percentile)
+        return await _ingest_niche_apify(niche, percentile)
+
+
+async def _analyse_item(niche: str, provider_name: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Transcribe and analyse one scraped item into its ``videos`` row."""
+    tracker = get_trending_tracker()
+    url = item.get("url", "")
+    audio_id = item.get("audio_id", "audio")
+    audio_url = item.get("audio_url", f"https://audio.example/{audio_id}")
+    likes = int(item.get("likes", 0) or 0)
+    comments = int(item.get("comments", 0) or 0)
+    audio_hash = hashlib.md5(audio_id.encode()).hexdigest()
+
+    try:
+        transcript_data = await transcribe_video(url)
+        transcript = transcript_data.get("text", "")
+        timings = WordTimings.from_response(transcript_data)
+    except Exception:
+        transcript = ""
+        timings = WordTimings.decode(None)
+    speech = speech_features(timings, hook_word_count(transcript))
+
+    pacing = _analyse_pacing(url)
+    visual_style = _classify_visual_style(url)
+    onscreen_text = _extract_onscreen_text(url)
+
+    get_engagement_stats().update(niche, [likes + comments])
+    # the tracker counts this video once it is stored
+    trending_audio = tracker.window_count(
+        niche, audio_id, os.environ.get("TRENDING_FLAG_WINDOW", "24h")
+    ) > 0
+
+    return {
+        "niche": niche,
+        "provider": provider_name,
+        "url": url,
+        "audio_id": audio_id,
+        "audio_url": audio_url,
+        "audio_hash": audio_hash,
+        "likes": likes,
+        "comments": comments,
+        "transcript": transcript,
+        "pacing": pacing,
+        "visual_style": visual_style,
+        "onscreen_text": onscreen_text,
+        "trending_audio": trending_audio,
+        "word_timings": timings.encode() if len(timings) else None,
+        **speech,
+    }
+
+
+def _video_record(row: Dict[str, Any], vid: Optional[int]) -> VideoRecord:
+    fields = VideoRecord.model_fields
+    return VideoRecord(id=vid, **{k: v for k, v in row.items() if k in fields and k != "id"})
+
+
+async def _checkpoint(step: str, call: Awaitable[Any]) -> bool:
+    """Await a journal write; a failing journal must not fail the ingest."""
+    try:
+        await call
+        return True
+    except Exception:
+        record_error(f"ingest_journal.{step}")
+        return False
+
+
 async def ingest_niche(
-    niche: str, percentile: int, provider: Optional[str] = None
+    niche: str, percentile: int, provider: Optional[str] = None, run_id: Optional[str] = None
 ) -> List[VideoRecord]:
-    """Ingest a niche using the requested provider and enrich video records."""
+    """Ingest a niche using the requested provider and enrich video records.
+
+    With ``run_id`` the scraped items and each item's progress are
+    checkpointed in the ingestion journal and rows are upserted on their
+    ``ingest_key``. Calling again with the same ``run_id`` resumes the run:
+    stored items are returned from the journal, analysed ones are only
+    persisted and just the remaining items are analysed.
+    """
 
     provider_name = (provider or os.environ.get("INGESTION_PROVIDER", "apify")).lower()
-    if provider_name == "playwright":
-        items = await _ingest_niche_playwright(niche, percentile)
-    elif provider_name == "puppeteer":
-        items = await _ingest_niche_puppeteer(niche, percentile)
-    else:
-        items = await _ingest_niche_apify(niche, percentile)
-
-    supabase = get_supabase_client()
-    records: List[VideoRecord] = []
-    audio_counts: Dict[str, int] = {}
+    repo = VideoRepository(get_supabase_client())
+    journal = get_ingest_journal() if run_id and repo.configured else None
 
-    if supabase and items:
-        for item in items:
-            url = item.get("url", "")
-            audio_id = item.get("audio_id", "audio")
-            audio_url = item.get("audio_url", f"https://audio.example/{audio_id}")
-            likes = int(item.get("likes", 0) or 0)
-            comments = int(item.get("comments", 0) or 0)
-            audio_hash = hashlib.md5(audio_id.encode()).hexdigest()
+    entries: Optional[List[JournalItem]] = None
+    if journal is not None:
+        try:
+            entries = await journal.items(run_id, niche)
+        except Exception:
+            record_error("ingest_journal.items")
+            journal = None
+    if entries is None:
+        items = await _scrape(niche, percentile, provider_name)
+        entries = [JournalItem(i, item, PENDING, None, None) for i, item in enumerate(items)]
+        if journal is not None and items:
+            if not await _checkpoint("start", journal.start(run_id, niche, items, provider_name, percentile)):
+                journal = None
 
+    records: List[VideoRecord] = []
+    complete = True
+
+    if repo.configured and entries:
+        for entry in entries:
+            if entry.status == STORED:
+                records.append(_video_record(entry.row, entry.video_id))
+                continue
+            row = entry.row
+            if row is None:
+                row = await _analyse_item(niche, provider_name, entry.item)
+                if run_id:
+                    row["ingest_key"] = ingest_key(run_id, niche, entry.item)
+                if journal is not None:
+                    await _checkpoint("analysed", journal.analysed(run_id, niche, entry.position, row))
             try:
-                transcript_data = await transcribe_video(url)
-                transcript = transcript_data.get("text", "")
-            except Exception:
-                transcript = ""
-
-            pacing = _analyse_pacing(url)
-            visual_style = _classify_visual_style(url)
-            onscreen_text = _extract_onscreen_text(url)
-
-            audio_counts[audio_id] = audio_counts.get(audio_id, 0) + 1
-            trending_audio = audio_counts[audio_id] > 1
-
-            row = {
-                "niche": niche,
-                "provider": provider_name,
-                "url": url,
-                "audio_id": audio_id,
-                "audio_url": audio_url,
-                "audio_hash": audio_hash,
-                "likes": likes,
-                "comments": comments,
-                "transcript": transcript,
-                "pacing": pacing,
-                "visual_style": visual_style,
-                "onscreen_text": onscreen_text,
-                "trending_audio": trending_audio,
-            }
-            try:
-                resp = supabase.table("videos").insert(row).execute()
-                vid = resp.data[0]["id"] if resp.data else None
+                if "ingest_key" in row:
+                    # retried and resumed writes land on the same row
+                    stored = await repo.upsert([row], on_conflict="ingest_key")
+                else:
+                    stored = await repo.insert([row])
+                vid = stored[0]["id"] if stored else None
+                if vid is not None:
+                    get_trending_tracker().record(
+                        niche,
+                        row.get("audio_id") or "",
+                        engagement=(row.get("likes") or 0) + (row.get("comments") or 0),
+                        url=row.get("audio_url"),
+                        audio_hash=row.get("audio_hash"),
+                        video_id=vid,
+                    )
+                if journal is not None:
+                    await _checkpoint("stored", journal.stored(run_id, niche, entry.position, vid))
             except Exception:
                 vid = None
+                complete = False
 
-            records.append(
-                VideoRecord(
-                    id=vid,
-                    url=url,
-                    niche=niche,
-                    provider=provider_name,
-                    transcript=transcript,
-                    pacing=pacing,
-                    visual_style=visual_style,
-                    onscreen_text=onscreen_text,
-                    audio_id=audio_id,
-                    audio_url=audio_url,
-                    audio_hash=audio_hash,
-                    likes=likes,
-                    comments=comments,
-                    trending_audio=trending_audio,
-                )
-            )
+            records.append(_video_record(row, vid))
+
+        if journal is not None and complete:
+            await _checkpoint("finish", journal.finish(run_id, niche))
 
+    if records:
+        if int(os.environ.get("AUDIO_ANALYSIS_WORKERS", 2)) > 0:
+            # each distinct audio is analysed once, across all its videos, after
+            # the ingest has returned
+            analyse_audio_later({r.audio_hash: r.audio_url for r in records})
+        await get_cache().invalidate("trending", f"generate:{niche}", "generate:*")
     return records
 
 
 async def get_trending_audio(
-    niche: Optional[str] = None, limit: int = 10
+    niche: Optional[str] = None, limit: int = 10, window: Optional[str] = None
 ) -> List[TrendingAudio]:
-    """Aggregate audio usage across all videos and return top results."""
+    """Return top audio by time-decayed usage within ``window``.
+
+    Served from the in-memory trending tracker once it has been seeded. Without
+    it, or for ``window="all"``, all-time usage is aggregated exactly over the
+    columnar videos snapshot when enabled, estimated from the fixed-memory
+    audio sketch once it has caught up with the ``videos`` table, and
+    aggregated from the ``videos`` table otherwise. Rankings are shared through
+    the ``trending`` cache namespace for ``TRENDING_CACHE_TTL`` seconds and
+    invalidated whenever a niche is ingested. Stored audio features (tempo,
+    onsets, loudness, drops) are attached to each entry.
+    """
+    audios, _ = await page_trending_audio(niche, limit, window)
+    return audios
+
+
+def _rank_score(audio: Dict[str, Any]) -> float:
+    # fallback rankings without a decayed score are ordered by usage count
+    score = audio.get("score")
+    return float(score if score is not None else audio.get("count") or 0)
+
+
+async def page_trending_audio(
+    niche: Optional[str] = None,
+    limit: int = 10,
+    window: Optional[str] = None,
+    after: Optional[Sequence[Any]] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Tuple[List[TrendingAudio], Optional[List[Any]]]:
+    """One page of the trending audio ranking and the keyset of the next page.
+
+    Entries are ordered by score, then ``audio_id``. ``after`` is the
+    ``(score, audio_id, position)`` returned for the previous page; the
+    position only sizes how deep the ranking is computed, so pages stay
+    correct when the ranking shifts in between. ``limit`` is capped at
+    ``TRENDING_AUDIO_LIMIT`` and rankings are computed at most
+    ``TRENDING_AUDIO_MAX_DEPTH`` entries deep. Audio features are only looked up when
+    ``fields`` includes one of them.
+    """
+
+    limit = max(1, min(limit, int(os.environ.get("TRENDING_AUDIO_LIMIT", 100))))
+    max_depth = int(os.environ.get("TRENDING_AUDIO_MAX_DEPTH", 1000))
+    depth = min(max_depth, max(0, int(after[2])) + 1 + 2 * limit) if after else limit
+
+    async def compute() -> List[Dict[str, Any]]:
+        ranked = await _rank_trending_audio(niche, depth, window)
+        return [a.model_dump() for a in ranked]
+
+    cached = await get_cache().get_or_set(
+        "trending",
+        json.dumps([niche, depth, window]),
+        compute,
+        ttl=float(os.environ.get("TRENDING_CACHE_TTL", 30)),
+    )
+    ranked = sorted(cached, key=lambda a: (-_rank_score(a), a["audio_id"]))
+    if after:
+        position = (-float(after[0]), str(after[1]))
+        ranked = [a for a in ranked if (-_rank_score(a), a["audio_id"]) > position]
+    page = [TrendingAudio(**a) for a in ranked[:limit]]
+    if not fields or any(f in FEATURE_FIELDS for f in fields):
+        page = await attach_audio_features(page)
+    next_key = None
+    # more entries exist past this page, or the ranking was cut off at depth
+    if len(ranked) > limit or (len(page) == limit and len(cached) >= depth):
+        last = ranked[limit - 1]
+        next_key = [_rank_score(last), last["audio_id"], len(cached) - len(ranked) + limit - 1]
+    return page, next_key
+
+
+async def _rank_trending_audio(
+    niche: Optional[str], limit: int, window: Optional[str]
+) -> List[TrendingAudio]:
+    window = window or os.environ.get("TRENDING_WINDOW", "7d")
+    if window != ALL_TIME:
+        tracker = get_trending_tracker()
+        try:
+            if tracker.ready or await tracker.sync():
+                with timed("trending.top"):
+                    return tracker.top(niche=niche, limit=limit, window=window)
+        except Exception:
+            record_error("trending.top")
+
+    # the all-time ranking, also served when the windowed tracker is unavailable
+    try:
+        snapshot = await get_video_snapshot()
+        if snapshot is not None and snapshot.rows:
+            with timed("trending.snapshot_top"):
+                ranked = snapshot.top_audio(niche=niche, limit=limit)
+            if ranked:
+                return ranked
+    except Exception:
+        record_error("trending.snapshot")
+
+    try:
+        # the sketch is only consulted once it has counted every ``videos`` row
+        sketch = get_audio_sketch()
+        if await sketch.sync():
+            with timed("trending.sketch_top"):
+                ranked = sketch.top(niche=niche, limit=limit)
+            # a niche the sketch has not seen falls through to the database
+            if ranked:
+                return ranked
+    except Exception:
+        record_error("trending.sketch")
 
-    limit = int(os.environ.get("TRENDING_AUDIO_LIMIT", limit))
-    supabase = get_supabase_client()
-    if not supabase:
-        return []
     try:
-        query = supabase.table("videos").select(
-            "audio_id,audio_url,audio_hash,niche,likes,comments"
+        rows = await VideoRepository(get_supabase_client()).select(
+            "audio_id,audio_url,audio_hash,niche,likes,comments",
+            eq={"niche": niche} if niche else None,
         )
-        if niche:
-            query = query.eq("niche", niche)
-        resp = query.execute()
-        rows = resp.data or []
     except Exception:
         return []
 
@@ -0,0 +1,251 @@
+"""Keyword lexicons for narrative-arc, hook-type and CTA classification.
+
+A lexicon maps categories to phrases for three kinds of label: ``arc``
+(matched over the whole transcript), ``hook`` (the opening sentence) and
+``cta`` (the closing sentence). Each kind is compiled into an Aho-Corasick
+automaton over word tokens, so a text is labelled in a single pass whose cost
+does not depend on how many phrases the lexicon holds. Phrases match whole
+words, case-insensitively; the category with the most matches wins, ties
+going to the category listed first.
+
+Built-in lexicons can be extended with a JSON file at
+``PATTERN_LEXICON_PATH``::
+
+    {"hook": {"question": ["why", "how do"]},
+     "niches": {"fitness": {"arc": {"transformation": ["before and after"]}}}}
+
+Categories in the file replace built-in ones of the same name and niche
+sections apply on top. Automata are rebuilt only when the file changes.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import string
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+KINDS = ("arc", "hook", "cta")
+DEFAULT_ARC = "informational"
+
+DEFAULT_LEXICON: Dict[str, Dict[str, List[str]]] = {
+    "arc": {
+        "story": ["story", "stories", "storytime", "journey", "once"],
+    },
+    "hook": {
+        "question": ["why", "how", "what", "did you know", "have you ever", "ever wonder"],
+        "contrarian": ["stop", "nobody", "myth", "wrong", "unpopular opinion", "you're doing it wrong"],
+        "secret": ["secret", "hack", "trick", "nobody tells you"],
+        "list": ["tips", "ways", "things", "reasons", "steps", "mistakes"],
+        "challenge": ["challenge", "try this", "i tried"],
+        "pov": ["pov", "imagine"],
+    },
+    "cta": {
+        "follow": ["follow", "subscribe"],
+        "comment": ["comment", "let me know", "tell me"],
+        "share": ["share", "send this", "tag"],
+        "save": ["save this", "save it", "bookmark"],
+        "link": ["link in bio", "check out", "shop"],
+    },
+}
+
+# Tokens are runs of characters other than whitespace and ASCII punctuation
+# (apostrophes stay inside words). Hot paths split bytes translated through
+# _FOLD; find() uses the equivalent regex to keep character offsets.
+_PUNCTUATION = string.punctuation.replace("'", "")
+_FOLD = bytearray(range(256))
+for _c in _PUNCTUATION.encode():
+    _FOLD[_c] = ord(" ")
+_FOLD = bytes(_FOLD)
+_TOKEN = re.compile(rf"[^\s{re.escape(_PUNCTUATION)}]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens of ``text``."""
+    return text.lower().encode().translate(_FOLD).decode().split()
+
+
+class Match(NamedTuple):
+    """One lexicon phrase found in a text; ``start``/``end`` are character offsets."""
+
+    kind: str
+    category: str
+    phrase: str
+    start: int
+    end: int
+
+
+class Classification(NamedTuple):
+    """Labels of one transcript and the matches they were derived from."""
+
+    arc: str
+    hook_type: Optional[str]
+    cta_type: Optional[str]
+    matches: List[Match]
+
+
+class Automaton:
+    """Aho-Corasick automaton over word tokens.
+
+    ``phrases`` maps each phrase to its category. Matching walks the tokens
+    once, following failure links, and reports every (possibly overlapping)
+    phrase occurrence.
+    """
+
+    def __init__(self, phrases: Dict[str, str]) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # (category, phrase, phrase length in tokens) ending at each state
+        self.output: List[List[Tuple[str, str, int]]] = [[]]
+        for phrase, category in phrases.items():
+            words = tokenize(phrase)
+            if not words:
+                continue
+            state = 0
+            for word in words:
+                nxt = self.goto[state].get(word)
+                if nxt is None:
+                    nxt = self.goto[state][word] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append((category, phrase, len(words)))
+        self.first_words = frozenset(self.goto[0])
+
+        queue = list(self.goto[0].values())
+        for state in queue:  # breadth-first, so fail targets are complete
+            for word, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(word, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def scan(self, tokens: Sequence[str]) -> Iterable[Tuple[int, str, str, int]]:
+        """Yield ``(end token index, category, phrase, length)`` per occurrence."""
+        if self.first_words.isdisjoint(tokens):
+            return
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for category, phrase, length in output[state]:
+                yield i, category, phrase, length
+
+    def counts(self, tokens: Sequence[str]) -> Dict[str, int]:
+        """Occurrences per category (the hot path of :meth:`scan`, without positions)."""
+        counts: Dict[str, int] = {}
+        if self.first_words.isdisjoint(tokens):
+            return counts
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for category, _, _ in output[state]:
+                counts[category] = counts.get(category, 0) + 1
+        return counts
+
+
+class Lexicon:
+    """Compiled arc, hook and CTA automata for one niche and lexicon version."""
+
+    def __init__(self, categories: Dict[str, Dict[str, List[str]]], version: str = "builtin") -> None:
+        self.version = version
+        self.order: Dict[str, Dict[str, int]] = {}
+        self.automata: Dict[str, Automaton] = {}
+        for kind in KINDS:
+            labels = categories.get(kind, {})
+            self.order[kind] = {category: i for i, category in enumerate(labels)}
+            self.automata[kind] = Automaton(
+                {phrase: category for category, phrases in labels.items() for phrase in phrases}
+            )
+
+    def _best(self, kind: str, counts: Dict[str, int]) -> Optional[str]:
+        if not counts:
+            return None
+        order = self.order[kind]
+        return min(counts, key=lambda category: (-counts[category], order[category]))
+
+    def arc(self, transcript: str) -> str:
+        """Narrative arc of a whole transcript (``informational`` when nothing matches)."""
+        return self._best("arc", self.automata["arc"].counts(tokenize(transcript or ""))) or DEFAULT_ARC
+
+    def hook_type(self, hook: str) -> Optional[str]:
+        """Category of an opening sentence, or ``None``."""
+        return self._best("hook", self.automata["hook"].counts(tokenize(hook or "")))
+
+    def cta_type(self, cta: str) -> Optional[str]:
+        """Category of a closing call to action, or ``None``."""
+        return self._best("cta", self.automata["cta"].counts(tokenize(cta or "")))
+
+    def find(self, kind: str, text: str, offset: int = 0) -> List[Match]:
+        """Every ``kind`` phrase in ``text`` with character offsets (shifted by ``offset``)."""
+        lowered = text.lower()
+        spans = [m.span() for m in _TOKEN.finditer(lowered)]
+        tokens = [lowered[start:end] for start, end in spans]
+        return [
+            Match(kind, category, phrase, spans[i - length + 1][0] + offset, spans[i][1] + offset)
+            for i, category, phrase, length in self.automata[kind].scan(tokens)
+        ]
+
+    def classify(self, transcript: str) -> Classification:
+        """Arc, hook and CTA labels of ``transcript`` with every match's position.
+
+        Sentences are split on full stops as in pattern mining: the hook is
+        the first sentence and the CTA the last one when there are several.
+        """
+        transcript = transcript or ""
+        sentences = [m for m in re.finditer(r"[^.]+", transcript) if m.group().strip()]
+        matches = self.find("arc", transcript)
+        if sentences:
+            matches += self.find("hook", sentences[0].group(), sentences[0].start())
+        if len(sentences) > 1:
+            matches += self.find("cta", sentences[-1].group(), sentences[-1].start())
+        counts: Dict[str, Dict[str, int]] = {kind: {} for kind in KINDS}
+        for match in matches:
+            counts[match.kind][match.category] = counts[match.kind].get(match.category, 0) + 1
+        return Classification(
+            arc=self._best("arc", counts["arc"]) or DEFAULT_ARC,
+            hook_type=self._best("hook", counts["hook"]),
+            cta_type=self._best("cta", counts["cta"]),
+            matches=matches,
+        )
+
+
+@lru_cache(maxsize=8)
+def _load(path: str, mtime_ns: int) -> Dict:
+    with open(path) as fh:
+        return json.load(fh)
+
+
+@lru_cache(maxsize=256)
+def _compile(path: Optional[str], mtime_ns: int, niche: Optional[str]) -> Lexicon:
+    categories = {kind: dict(labels) for kind, labels in DEFAULT_LEXICON.items()}
+    if path:
+        config = _load(path, mtime_ns)
+        layers = [config, config.get("niches", {}).get(niche or "", {})]
+        for layer in layers:
+            for kind in KINDS:
+                categories[kind].update(layer.get(kind, {}))
+    return Lexicon(categories, version=f"{mtime_ns}" if path else "builtin")
+
+
+def get_lexicon(niche: Optional[str] = None) -> Lexicon:
+    """Return the compiled lexicon for ``niche``, rebuilt when the file changes."""
+    path = os.environ.get("PATTERN_LEXICON_PATH")
+    mtime_ns = 0
+    if path:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            path = None
+    return _compile(path, mtime_ns, niche)
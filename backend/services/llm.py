@@ -0,0 +1,257 @@
+"""Pluggable text generation backends with micro-batched inference.
+
+``LLM_BACKEND`` selects the implementation:
+
+* ``openai`` (default) – chat completions through a shared ``AsyncOpenAI`` client.
+* ``local`` – a llama.cpp-style server exposing the OpenAI-compatible
+  ``/v1/completions`` endpoint, which accepts a list of prompts per request.
+* ``stub`` – deterministic offline responses for tests and benchmarks.
+
+Backends that accept batches are wrapped in a :class:`MicroBatcher`, which
+collects prompts submitted concurrently (script and variation requests from
+many packages) for up to ``LLM_BATCH_WAIT_MS`` and sends them as one
+inference call.
+
+The OpenAI backend streams completions so time to first token is recorded
+(``viralsynth_llm_time_to_first_token_seconds``) alongside total latency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Set, Tuple
+
+import httpx
+
+if TYPE_CHECKING:  # imported lazily; the SDK is slow to load
+    from openai import AsyncOpenAI
+
+from .metrics import REGISTRY, timed
+from .resilience import get_dependency
+
+BATCH_SIZE = REGISTRY.histogram(
+    "viralsynth_llm_batch_size",
+    "Number of prompts sent per batched inference call.",
+    ("backend",),
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "viralsynth_llm_time_to_first_token_seconds",
+    "Time from sending a prompt to receiving the first streamed token.",
+    ("backend",),
+)
+
+
+@lru_cache()
+def get_openai_client() -> AsyncOpenAI:
+    """Return a process-wide OpenAI client so connections are pooled.
+
+    The SDK's own retries are disabled; :mod:`.resilience` owns timeouts and
+    retries for every OpenAI call.
+    """
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)
+
+
+class LLMBackend(ABC):
+    """Interface implemented by every text generation backend."""
+
+    name = "base"
+    max_batch_size = 1
+
+    async def complete(self, prompt: str) -> str:
+        """Return the completion for a single prompt."""
+        return (await self.complete_batch([prompt]))[0]
+
+    @abstractmethod
+    async def complete_batch(self, prompts: List[str]) -> List[str]:
+        """Return completions for ``prompts`` in order."""
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI chat completions; batches fan out as concurrent requests."""
+
+    name = "openai"
+
+    def __init__(self, model: Optional[str] = None) -> None:
+        self.model = model or os.environ.get("GENERATION_MODEL", "gpt-4o-mini")
+
+    async def _stream(self, prompt: str) -> Tuple[str, Optional[float]]:
+        start = time.perf_counter()
+        parts: List[str] = []
+        first: Optional[float] = None
+        # server-sent events are parsed directly: building the SDK's chunk
+        # models costs more event-loop CPU than the whole unstreamed call
+        async with get_openai_client().chat.completions.with_streaming_response.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+        ) as resp:
+            async for line in resp.iter_lines():
+                if not line.startswith("data:") or line == "data: [DONE]":
+                    continue
+                event = json.loads(line[5:])
+                if event.get("error"):
+                    raise RuntimeError(f"OpenAI stream error: {event['error']}")
+                for choice in event.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        if first is None:
+                            first = time.perf_counter() - start
+                        parts.append(delta)
+        return "".join(parts), first
+
+    async def complete(self, prompt: str) -> str:
+        with timed("openai.chat"):
+            text, first = await get_dependency("openai").call(lambda: self._stream(prompt))
+        if first is not None:
+            TIME_TO_FIRST_TOKEN.observe(self.name, value=first)
+        return text.strip()
+
+    async def complete_batch(self, prompts: List[str]) -> List[str]:
+        return list(await asyncio.gather(*(self.complete(p) for p in prompts)))
+
+
+class LocalServerBackend(LLMBackend):
+    """CPU model served by llama.cpp (or any OpenAI-compatible completions server)."""
+
+    name = "local"
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> None:
+        self.base_url = (base_url or os.environ.get("LOCAL_LLM_URL", "http://127.0.0.1:8080")).rstrip("/")
+        self.model = model or os.environ.get("LOCAL_LLM_MODEL", "local")
+        self.max_tokens = max_tokens or int(os.environ.get("LOCAL_LLM_MAX_TOKENS", 512))
+        self.max_batch_size = int(os.environ.get("LLM_BATCH_SIZE", 8))
+        self._dependency = get_dependency("local_llm")
+        self._client = httpx.AsyncClient(base_url=self.base_url, timeout=None)
+
+    async def _post(self, prompts: List[str]) -> httpx.Response:
+        resp = await self._client.post(
+            "/v1/completions",
+            json={"model": self.model, "prompt": prompts, "max_tokens": self.max_tokens},
+        )
+        resp.raise_for_status()
+        return resp
+
+    async def complete_batch(self, prompts: List[str]) -> List[str]:
+        with timed("local_llm.completions"):
+            resp = await self._dependency.call(lambda: self._post(prompts))
+        choices = sorted(resp.json().get("choices", []), key=lambda c: c.get("index", 0))
+        if len(choices) != len(prompts):
+            raise RuntimeError(
+                f"Local LLM returned {len(choices)} completions for {len(prompts)} prompts"
+            )
+        return [c.get("text", "").strip() for c in choices]
+
+
+class StubBackend(LLMBackend):
+    """Deterministic offline backend; identical prompts yield identical output."""
+
+    name = "stub"
+
+    def __init__(self) -> None:
+        self.max_batch_size = int(os.environ.get("LLM_BATCH_SIZE", 8))
+        self.calls: List[List[str]] = []
+
+    async def complete_batch(self, prompts: List[str]) -> List[str]:
+        self.calls.append(list(prompts))
+        return [self._respond(p) for p in prompts]
+
+    @staticmethod
+    def _respond(prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+        if "Return JSON" in prompt:
+            return json.dumps(
+                {
+                    platform: {"hook": f"{platform} hook {digest}", "cta": f"{platform} cta {digest}"}
+                    for platform in ("tiktok", "instagram", "youtube")
+                }
+            )
+        return f"Stub script {digest}: open with the hook, deliver three beats, close with the CTA."
+
+
+class MicroBatcher:
+    """Merge concurrently submitted prompts into batched backend calls."""
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+    ) -> None:
+        self.backend = backend
+        self.max_batch_size = max_batch_size or backend.max_batch_size
+        wait = max_wait_ms if max_wait_ms is not None else float(os.environ.get("LLM_BATCH_WAIT_MS", 10))
+        self.max_wait = wait / 1000.0
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Future] = set()
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    async def complete(self, prompt: str) -> str:
+        """Queue ``prompt`` for the next batch and wait for its completion."""
+        if self.max_batch_size <= 1:
+            return await self.backend.complete(prompt)
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((prompt, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            task = asyncio.ensure_future(self._run(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        BATCH_SIZE.observe(self.backend.name, value=len(batch))
+        try:
+            results = await self.backend.complete_batch([prompt for prompt, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """Instantiate the backend named by ``name`` or ``LLM_BACKEND``."""
+    name = (name or os.environ.get("LLM_BACKEND", "openai")).lower()
+    if name == "local":
+        return LocalServerBackend()
+    if name == "stub":
+        return StubBackend()
+    return OpenAIBackend()
+
+
+@lru_cache()
+def get_llm() -> MicroBatcher:
+    """Return the process-wide generation backend behind a micro-batcher."""
+    return MicroBatcher(create_backend())
@@ -0,0 +1,308 @@
+"""Lightweight in-process instrumentation exposed in Prometheus text format.
+
+Services wrap hot paths with :func:`timed` (a context manager) or
+:func:`instrument` (a decorator for sync and async callables). Both record a
+latency histogram per operation and count exceptions, including ones that the
+caller later swallows into a placeholder result. :func:`record_cache` tracks
+cache hits and misses so hit rates can be derived in Prometheus.
+
+Within a :func:`trace` block every :func:`timed` operation also becomes a
+:class:`Span`, nested under the operation that was running when it started,
+so one request yields a tree of its database queries, LLM calls and
+analysis steps. Outside a trace this costs a single context variable lookup.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can be set to arbitrary levels per label set."""
+
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed distribution of observed values per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # bucket counts followed by sum and count
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        names = self.labelnames + ("le",)
+        for key, series in items:
+            for bound, total in zip(self.buckets, series):
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(total)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together on ``/metrics``."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+OPERATION_LATENCY = REGISTRY.histogram(
+    "viralsynth_operation_duration_seconds",
+    "Latency of instrumented service operations.",
+    ("operation",),
+)
+OPERATION_ERRORS = REGISTRY.counter(
+    "viralsynth_operation_errors_total",
+    "Exceptions raised inside instrumented service operations.",
+    ("operation",),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "viralsynth_cache_requests_total",
+    "Cache lookups partitioned by result (hit or miss).",
+    ("cache", "result"),
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "viralsynth_http_request_duration_seconds",
+    "End-to-end HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+
+
+class Span:
+    """One timed operation of a traced request and the operations it ran."""
+
+    __slots__ = ("name", "start", "duration", "error", "children")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error = False
+        self.children: List["Span"] = []
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        """JSON-ready tree with offsets and durations in milliseconds."""
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "error": self.error,
+            "children": [c.to_dict(origin) for c in self.children],
+        }
+
+
+_SPAN: ContextVar[Optional[Span]] = ContextVar("viralsynth_span", default=None)
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Span]:
+    """Collect the :func:`timed` operations run within the block as a span tree."""
+    span = Span(name)
+    token = _SPAN.set(span)
+    try:
+        yield span
+    except Exception:
+        span.error = True
+        raise
+    finally:
+        span.duration = time.perf_counter() - span.start
+        _SPAN.reset(token)
+
+
+def record_error(operation: str) -> None:
+    """Count an error for ``operation`` (use in ``except`` branches)."""
+    OPERATION_ERRORS.inc(operation)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup outcome."""
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+@contextmanager
+def timed(operation: str) -> Iterator[None]:
+    """Time the enclosed block and count any exception it raises."""
+    parent = _SPAN.get()
+    span = token = None
+    if parent is not None:
+        span = Span(operation)
+        parent.children.append(span)
+        token = _SPAN.set(span)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        OPERATION_ERRORS.inc(operation)
+        if span is not None:
+            span.error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        OPERATION_LATENCY.observe(operation, value=elapsed)
+        if span is not None:
+            span.duration = elapsed
+            _SPAN.reset(token)
+
+
+def instrument(operation: str) -> Callable[[Callable], Callable]:
+    """Decorate a sync or async callable with :func:`timed`."""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(operation):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(operation):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def render_latest() -> str:
+    """Render every registered metric in Prometheus text exposition format."""
+    return REGISTRY.render()
@@ -0,0 +1,79 @@
+"""Keyset cursors, field projection and conditional responses for list APIs.
+
+List endpoints order their results by a score and a unique id. Each page
+hands out the ``(score, id)`` of its last item as an opaque cursor (URL-safe
+base64 of JSON) and the next page starts strictly after it, so pages stay
+stable while rows are added and no request pays for skipped rows.
+
+``fields=`` limits the attributes returned; endpoints push the projection
+down into their queries. Responses carry a strong ``ETag`` over the
+serialized page and answer a matching ``If-None-Match`` with ``304 Not
+Modified`` and no body.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, Request, Response
+
+from .serialization import dumps
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque cursor for the keyset position ``values``."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], *types: type) -> Optional[List[Any]]:
+    """Keyset position of ``cursor``, one value of each of ``types``.
+
+    Raises ``400`` for a malformed cursor. ``float`` positions accept integers.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != len(types) or not all(
+        isinstance(v, (int, float) if t is float else t) and not isinstance(v, bool)
+        for v, t in zip(values, types)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Requested field names in ``allowed`` order; raises ``400`` for unknown ones."""
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    allowed = list(allowed)
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [f for f in allowed if f in requested] or None
+
+
+def page_response(
+    request: Request, items: List[Dict[str, Any]], next_cursor: Optional[str] = None
+) -> Response:
+    """JSON response for one page with ``ETag`` and ``If-None-Match`` handling."""
+    body = dumps(items)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    candidates = {
+        tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")
+    }
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,191 @@
+"""In-process, prompt-aware pattern retrieval.
+
+Each niche's top patterns (by engagement) are held in memory as L2-normalized
+TF-IDF vectors in a NumPy matrix. Tokens are mapped to columns with a stable
+feature hash, so the matrix has a fixed width regardless of vocabulary size.
+A query is a single matrix-vector product: patterns are ranked by
+``(floor + cosine similarity) × (floor + normalized engagement)``, which falls
+back to pure engagement ordering when the prompt shares no terms with any
+pattern.
+
+Niches are loaded lazily (or up front via :meth:`PatternIndex.warm`) and
+reloaded after :meth:`PatternIndex.invalidate` or once ``PATTERN_INDEX_TTL``
+seconds have passed. :func:`invalidate_patterns` also reaches the indexes of
+other worker processes through the shared cache's ``patterns:<niche>``
+namespace.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..models import Pattern
+from .cache import get_cache
+from .database import PatternRepository
+from .metrics import record_cache, timed
+from .supabase import get_supabase_client
+
+PATTERN_COLUMNS = (
+    "id,niche,hook,core_value_loop,narrative_arc,visual_formula,cta,prevalence,engagement_score"
+)
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for both patterns and prompts."""
+    return _TOKEN.findall(text.lower())
+
+
+def _pattern_text(pattern: Pattern) -> str:
+    return " ".join(
+        [pattern.hook, pattern.core_value_loop, pattern.narrative_arc, pattern.visual_formula, pattern.cta]
+    )
+
+
+class NicheIndex:
+    """TF-IDF matrix and engagement weights for one niche's patterns."""
+
+    def __init__(self, patterns: List[Pattern], dim: int = 1024, floor: float = 0.1):
+        self.patterns = patterns
+        self.dim = dim
+        self.floor = floor
+        self.loaded_at = time.monotonic()
+
+        counts = np.zeros((len(patterns), dim), dtype=np.float32)
+        for row, pattern in enumerate(patterns):
+            columns = self._columns(tokenize(_pattern_text(pattern)))
+            np.add.at(counts[row], columns, 1.0)
+        doc_freq = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1.0 + len(patterns)) / (1.0 + doc_freq)) + 1.0).astype(np.float32)
+        self.matrix = self._normalize(counts * self.idf)
+
+        engagement = np.log1p(
+            np.array([max(p.engagement_score or 0.0, 0.0) for p in patterns], dtype=np.float32)
+        )
+        peak = engagement.max() if len(engagement) else 0.0
+        self.engagement = engagement / peak if peak > 0 else np.ones_like(engagement)
+
+    def _columns(self, tokens: List[str]) -> np.ndarray:
+        return np.fromiter(
+            (zlib.crc32(t.encode()) % self.dim for t in tokens), dtype=np.int64, count=len(tokens)
+        )
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+    def search(self, prompt: str, limit: int) -> List[Pattern]:
+        """Return up to ``limit`` patterns ranked by relevance × engagement."""
+        if not self.patterns or limit <= 0:
+            return []
+        query = np.zeros(self.dim, dtype=np.float32)
+        np.add.at(query, self._columns(tokenize(prompt or "")), 1.0)
+        query = self._normalize(query * self.idf)
+        scores = (self.floor + self.matrix @ query) * (self.floor + self.engagement)
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.patterns[i] for i in top]
+
+
+class PatternIndex:
+    """Per-niche :class:`NicheIndex` registry with lazy loading and invalidation."""
+
+    def __init__(
+        self,
+        max_patterns: Optional[int] = None,
+        ttl: Optional[float] = None,
+        dim: Optional[int] = None,
+    ) -> None:
+        self.max_patterns = max_patterns or int(os.environ.get("PATTERN_INDEX_MAX_PATTERNS", 2000))
+        self.ttl = ttl if ttl is not None else float(os.environ.get("PATTERN_INDEX_TTL", 300))
+        self.dim = dim or int(os.environ.get("PATTERN_INDEX_DIM", 1024))
+        self._niches: Dict[str, NicheIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _fresh(self, niche: str) -> Optional[NicheIndex]:
+        index = self._niches.get(niche)
+        if index is None or time.monotonic() - index.loaded_at > self.ttl:
+            return None
+        return index
+
+    async def _load(self, niche: str) -> NicheIndex:
+        with timed("pattern_index.load"):
+            rows = await PatternRepository(get_supabase_client()).select(
+                PATTERN_COLUMNS,
+                eq={"niche": niche},
+                order="engagement_score",
+                desc=True,
+                limit=self.max_patterns,
+            )
+            index = NicheIndex([Pattern(**r) for r in rows], dim=self.dim)
+        self._store(niche, index)
+        return index
+
+    def _store(self, niche: str, index: NicheIndex) -> None:
+        self._niches[niche] = index
+        get_cache().on_invalidate(f"patterns:{niche}", self._on_invalidate, remote_only=True)
+
+    def _on_invalidate(self, namespace: str) -> None:
+        self.invalidate(namespace.split(":", 1)[1])
+
+    async def get(self, niche: str) -> NicheIndex:
+        """Return the niche index, loading it once even under concurrent callers."""
+        index = self._fresh(niche)
+        record_cache("pattern_index", index is not None)
+        if index is not None:
+            return index
+        lock = self._locks.setdefault(niche, asyncio.Lock())
+        async with lock:
+            return self._fresh(niche) or await self._load(niche)
+
+    async def search(self, niche: str, prompt: str, limit: int) -> List[Pattern]:
+        """Return the patterns for ``niche`` most relevant to ``prompt``."""
+        index = await self.get(niche)
+        with timed("pattern_index.search"):
+            return index.search(prompt, limit)
+
+    async def warm(self, limit: Optional[int] = None) -> None:
+        """Preload every niche present among the top patterns."""
+        rows = await PatternRepository(get_supabase_client()).select(
+            PATTERN_COLUMNS,
+            order="engagement_score",
+            desc=True,
+            limit=limit or int(os.environ.get("PATTERN_INDEX_WARM_LIMIT", 20000)),
+        )
+        grouped: Dict[str, List[Pattern]] = {}
+        for row in rows:
+            if row.get("niche") and len(grouped.setdefault(row["niche"], [])) < self.max_patterns:
+                grouped[row["niche"]].append(Pattern(**row))
+        for niche, patterns in grouped.items():
+            self._store(niche, NicheIndex(patterns, dim=self.dim))
+
+    def invalidate(self, niche: Optional[str] = None) -> None:
+        """Drop one niche (or all) so the next query reloads from the database."""
+        if niche is None:
+            self._niches.clear()
+        else:
+            self._niches.pop(niche, None)
+
+
+@lru_cache()
+def get_pattern_index() -> PatternIndex:
+    """Return the process-wide pattern index."""
+    return PatternIndex()
+
+
+async def invalidate_patterns(niche: str) -> None:
+    """Drop the niche's patterns here and, through the shared cache, in every process."""
+    get_pattern_index().invalidate(niche)
+    await get_cache().invalidate(f"patterns:{niche}", "patterns:*", f"generate:{niche}", "generate:*")
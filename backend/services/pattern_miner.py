@@ -2,13 +2,45 @@
 
 This service extracts hooks, core value loops, narrative arcs,
 visual formulas and CTAs from transcripts and shot graphs and computes
-prevalence/engagement statistics per niche.
+prevalence/engagement statistics per niche. Narrative arcs and hook/CTA
+categories come from the niche's compiled keyword lexicon (see
+:mod:`backend.services.lexicon`).
+
+Each pattern carries a ``content_key`` (a hash of its niche and normalized
+components) that is unique in the ``patterns`` table. Writes are bulk upserts
+on that key which fold the new statistics into the stored row, so the table
+grows with the number of distinct patterns rather than with every mining run.
+Legacy duplicates are collapsed with::
+
+    python -m backend.services.pattern_miner compact [--niche tech]
 """
 
-from collections import defaultdict
-from typing import Dict, List, Tuple
+import argparse
+import asyncio
+import hashlib
+import math
+import os
+import sys
+from array import array
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
 
 from ..models import Pattern
+from .lexicon import Lexicon, get_lexicon
+from .metrics import record_error
+from .snapshot import VideoSnapshot
+from .stats import EngagementStats, TDigest, grouped_summary
+
+
+PATTERN_COLUMNS = (
+    "id,niche,hook,core_value_loop,narrative_arc,visual_formula,cta,prevalence,"
+    "engagement_score,engagement_median,engagement_trimmed_mean,engagement_ci_low,"
+    "engagement_ci_high,engagement_percentile,content_key,video_count,last_video_id,"
+    "hook_type,cta_type"
+)
+CI_Z = 1.96
 
 
 def _split_sentences(text: str) -> List[str]:
@@ -18,102 +50,447 @@ def _split_sentences(text: str) -> List[str]:
     return [s.strip() for s in text.replace("\n", " ").split(".") if s.strip()]
 
 
-def _extract_components(record: Dict) -> Tuple[str, str, str, str, str]:
-    """Extract pattern components from a single video record."""
-    transcript = record.get("transcript", "")
-    visual_style = record.get("visual_style", "") or "unspecified"
+def _parts(transcript: str, visual_style: str) -> Tuple[str, str, str, str]:
+    """Hook, core, visual formula and CTA of a transcript (everything but the arc)."""
     sentences = _split_sentences(transcript)
 
     hook = sentences[0] if sentences else ""
     cta = sentences[-1] if len(sentences) > 1 else ""
     core = " ".join(sentences[1:-1]) if len(sentences) > 2 else ""
 
-    narrative_arc = "informational"
-    if any(word in transcript.lower() for word in ["story", "journey", "once"]):
-        narrative_arc = "story"
+    return hook, core, visual_style or "unspecified", cta
+
+
+def _arc(parts: Tuple[str, str, str, str], lexicon: Lexicon) -> str:
+    # hook, core and CTA hold every word of the transcript and lexicon
+    # matching ignores punctuation, so this equals the arc of the transcript
+    return lexicon.arc(" ".join((parts[0], parts[1], parts[3])))
 
-    visual_formula = visual_style
 
-    return hook, core, narrative_arc, visual_formula, cta
+def _components(
+    transcript: str, visual_style: str, lexicon: Optional[Lexicon] = None
+) -> Tuple[str, str, str, str, str]:
+    """Extract pattern components from a transcript and visual style."""
+    parts = _parts(transcript, visual_style)
+    hook, core, visual_formula, cta = parts
+    return hook, core, _arc(parts, lexicon or get_lexicon()), visual_formula, cta
 
 
-def mine_patterns_from_records(records: List[Dict], niche: str) -> List[Pattern]:
-    """Group video records into unique patterns and compute statistics."""
-    total = len(records)
-    groups: Dict[Tuple[str, str, str, str, str], Dict[str, float]] = defaultdict(
-        lambda: {"count": 0, "engagement": 0.0}
+def _extract_components(record: Dict) -> Tuple[str, str, str, str, str]:
+    """Extract pattern components from a single video record."""
+    return _components(record.get("transcript", ""), record.get("visual_style", ""))
+
+
+@lru_cache(maxsize=65536)
+def _normalize(text: Optional[str]) -> str:
+    # components repeat across many patterns (hooks, CTAs), hence the cache
+    return " ".join((text or "").split()).strip(" .!?,;:").lower()
+
+
+def _key(niche: Optional[str], components: Iterable[str]) -> str:
+    material = "\x1f".join([_normalize(niche), *map(_normalize, components)])
+    return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+
+def content_key(pattern: Pattern) -> str:
+    """Stable identity of ``pattern``: hash of its niche and normalized components."""
+    return _key(
+        pattern.niche,
+        (
+            pattern.hook,
+            pattern.core_value_loop,
+            pattern.narrative_arc,
+            pattern.visual_formula,
+            pattern.cta,
+        ),
     )
 
-    for rec in records:
-        hook, core, arc, visual, cta = _extract_components(rec)
-        key = (hook, core, arc, visual, cta)
-        engagement = float((rec.get("likes") or 0) + (rec.get("comments") or 0))
-        groups[key]["count"] += 1
-        groups[key]["engagement"] += engagement
+
+def mine_patterns_from_records(
+    records: List[Dict],
+    niche: str,
+    top_percentile: Optional[float] = None,
+    stats: Optional[EngagementStats] = None,
+) -> List[Pattern]:
+    """Group video records into unique patterns and compute statistics.
+
+    Each video's engagement is mapped to a percentile within the niche's
+    distribution (``stats`` when it holds enough samples, otherwise the
+    records themselves). With ``top_percentile`` (e.g. ``0.05``) only videos
+    in that top fraction are mined. Patterns carry the mean engagement as
+    ``engagement_score`` alongside robust median, trimmed-mean and
+    confidence-interval figures.
+    """
+    engagement = np.fromiter(
+        (float((r.get("likes") or 0) + (r.get("comments") or 0)) for r in records),
+        dtype=np.float64,
+        count=len(records),
+    )
+    return mine_patterns(
+        engagement,
+        lambda idx: (
+            (records[i].get("transcript", ""), records[i].get("visual_style", ""))
+            for i in idx.tolist()
+        ),
+        niche,
+        top_percentile,
+        stats,
+    )
+
+
+def mine_patterns_from_snapshot(
+    snapshot: VideoSnapshot,
+    rows: np.ndarray,
+    niche: str,
+    top_percentile: Optional[float] = None,
+    stats: Optional[EngagementStats] = None,
+) -> List[Pattern]:
+    """Mine patterns from ``rows`` of the columnar videos snapshot.
+
+    Engagement is read straight from the mapped columns and transcripts are
+    decoded only for videos that pass the percentile filter.
+    """
+    return mine_patterns(
+        snapshot.engagement(rows),
+        lambda idx: snapshot.texts(rows[idx]),
+        niche,
+        top_percentile,
+        stats,
+    )
+
+
+def mine_patterns(
+    engagement: np.ndarray,
+    texts: Callable[[np.ndarray], Iterable[Tuple[str, str]]],
+    niche: str,
+    top_percentile: Optional[float] = None,
+    stats: Optional[EngagementStats] = None,
+) -> List[Pattern]:
+    """Shared mining core.
+
+    ``engagement`` holds one value per video and ``texts(idx)`` yields the
+    ``(transcript, visual_style)`` pairs for the selected video positions.
+    """
+    if not len(engagement):
+        return []
+    digest = (stats.digest(niche) if stats else None) or TDigest.of(engagement)
+    percentile = digest.cdf(engagement)
+    idx = np.arange(len(engagement))
+    if top_percentile is not None and 0 < top_percentile < 1:
+        idx = np.flatnonzero(percentile >= 1 - top_percentile)
+        if not len(idx):
+            return []
+        engagement, percentile = engagement[idx], percentile[idx]
+
+    # the arc is a function of the other parts, so it is labelled per group
+    keys: Dict[Tuple[str, str, str, str], int] = {}
+    # typed buffer keeps per-video memory at 8 bytes
+    group_ids = array("q")
+    for transcript, visual_style in texts(idx):
+        group_ids.append(keys.setdefault(_parts(transcript, visual_style), len(keys)))
+    groups = np.frombuffer(group_ids, dtype=np.int64)
+
+    present, groups = np.unique(groups, return_inverse=True)
+    summary = grouped_summary(
+        groups, engagement, trim=float(os.environ.get("ENGAGEMENT_TRIM", 0.1))
+    )
+    counts = summary["count"]
+    prevalence = (counts / len(groups)).tolist()
+    mean_percentile = (np.bincount(groups, weights=percentile) / counts).tolist()
+    columns = {name: summary[name].tolist() for name in ("mean", "median", "trimmed_mean", "ci_low", "ci_high")}
+    counts_list = counts.tolist()
+    key_list = list(keys)
+    lexicon = get_lexicon(niche)
+    # hooks and CTAs repeat across patterns; label each distinct sentence once
+    hook_types: Dict[str, Optional[str]] = {}
+    cta_types: Dict[str, Optional[str]] = {}
 
     patterns: List[Pattern] = []
-    for key, stats in groups.items():
-        count = stats["count"]
-        engagement_avg = stats["engagement"] / count if count else 0.0
-        prevalence = count / total if total else 0.0
+    for i, key_id in enumerate(present.tolist()):
+        key = key_list[key_id]
+        if key[0] not in hook_types:
+            hook_types[key[0]] = lexicon.hook_type(key[0])
+        if key[3] not in cta_types:
+            cta_types[key[3]] = lexicon.cta_type(key[3])
         patterns.append(
             Pattern(
                 hook=key[0],
                 core_value_loop=key[1],
-                narrative_arc=key[2],
-                visual_formula=key[3],
-                cta=key[4],
-                prevalence=prevalence,
-                engagement_score=engagement_avg,
+                narrative_arc=_arc(key, lexicon),
+                visual_formula=key[2],
+                cta=key[3],
+                prevalence=prevalence[i],
+                engagement_score=columns["mean"][i],
+                engagement_median=columns["median"][i],
+                engagement_trimmed_mean=columns["trimmed_mean"][i],
+                engagement_ci_low=columns["ci_low"][i],
+                engagement_ci_high=columns["ci_high"][i],
+                engagement_percentile=mean_percentile[i],
                 niche=niche,
+                video_count=counts_list[i],
+                hook_type=hook_types[key[0]],
+                cta_type=cta_types[key[3]],
             )
         )
 
     return patterns
 
 
-async def mine_and_store_patterns(niche: str) -> List[Pattern]:
-    """Fetch video records for a niche, mine patterns and persist them."""
+def pattern_row(pattern: Pattern) -> Dict:
+    """Column values stored in the ``patterns`` table for ``pattern``."""
+    return pattern.model_dump(exclude={"id"})
+
+
+def merge_pattern_stats(base: Pattern, update: Pattern) -> Pattern:
+    """Combine the statistics of one pattern observed over two disjoint video sets.
+
+    Counts add up and the mean and its confidence interval are pooled exactly
+    (variances are recovered from the stored intervals). Median, trimmed mean
+    and percentile are count-weighted averages, and prevalence is recomputed
+    over the implied totals of analysed videos. Rows without a ``video_count``
+    are weighted as a single observation.
+    """
+    n1, n2 = base.video_count or 1, update.video_count or 1
+    n = n1 + n2
+
+    def weighted(a: Optional[float], b: Optional[float]) -> Optional[float]:
+        if a is None or b is None:
+            return b if a is None else a
+        return (a * n1 + b * n2) / n
+
+    def variance(p: Pattern, count: int) -> float:
+        if p.engagement_ci_low is None or p.engagement_ci_high is None:
+            return 0.0
+        return ((p.engagement_ci_high - p.engagement_ci_low) / (2 * CI_Z)) ** 2 * count
+
+    mean = weighted(base.engagement_score, update.engagement_score)
+    ci_low = weighted(base.engagement_ci_low, update.engagement_ci_low)
+    ci_high = weighted(base.engagement_ci_high, update.engagement_ci_high)
+    if base.engagement_score is not None and update.engagement_score is not None:
+        squares = (
+            (n1 - 1) * variance(base, n1)
+            + (n2 - 1) * variance(update, n2)
+            + n1 * n2 / n * (base.engagement_score - update.engagement_score) ** 2
+        )
+        half_width = CI_Z * math.sqrt(squares / (n - 1) / n)
+        ci_low, ci_high = mean - half_width, mean + half_width
+
+    if base.prevalence and update.prevalence:
+        prevalence = n / (n1 / base.prevalence + n2 / update.prevalence)
+    else:
+        prevalence = weighted(base.prevalence, update.prevalence)
+
+    watermarks = [w for w in (base.last_video_id, update.last_video_id) if w is not None]
+    return base.model_copy(
+        update={
+            "prevalence": prevalence,
+            "engagement_score": mean,
+            "engagement_median": weighted(base.engagement_median, update.engagement_median),
+            "engagement_trimmed_mean": weighted(
+                base.engagement_trimmed_mean, update.engagement_trimmed_mean
+            ),
+            "engagement_ci_low": ci_low,
+            "engagement_ci_high": ci_high,
+            "engagement_percentile": weighted(
+                base.engagement_percentile, update.engagement_percentile
+            ),
+            "content_key": base.content_key or update.content_key,
+            "video_count": (base.video_count or 0) + (update.video_count or 0) or None,
+            "last_video_id": max(watermarks) if watermarks else None,
+            # labels follow the latest lexicon
+            "hook_type": update.hook_type or base.hook_type,
+            "cta_type": update.cta_type or base.cta_type,
+        }
+    )
+
+
+async def store_patterns(
+    patterns: List[Pattern],
+    merge: bool = True,
+    last_video_id: Optional[int] = None,
+    repo: Any = None,
+) -> Dict[str, Optional[int]]:
+    """Upsert ``patterns`` by content key and return the stored ID per key.
+
+    ``content_key`` is filled in on each of ``patterns``. With ``merge`` the
+    patterns must come from videos not counted before (``last_video_id``
+    records the newest of them) and their statistics are folded into existing
+    rows by the ``merge_patterns`` database function
+    (``0010_create_merge_patterns.sql``), which locks each row while pooling, so
+    concurrent ingestions of a niche never lose counts. Otherwise existing rows
+    are left untouched and only unseen patterns are inserted.
+    """
+    if repo is None:
+        from .database import PatternRepository
+        from .supabase import get_supabase_client
+
+        repo = PatternRepository(get_supabase_client())
+
+    batch: Dict[str, Pattern] = {}
+    for pattern in patterns:
+        key = pattern.content_key = pattern.content_key or content_key(pattern)
+        pattern = pattern.model_copy(
+            update={"id": None, "content_key": key, "last_video_id": last_video_id if merge else None}
+        )
+        batch[key] = merge_pattern_stats(batch[key], pattern) if key in batch else pattern
+
+    if merge:
+        rows = [pattern_row(p) for p in batch.values()]
+        stored = await repo.rpc("merge_patterns", {"batch": rows}) if rows else []
+        return {row["content_key"]: row.get("id") for row in stored}
+
+    existing = {
+        row["content_key"]: Pattern(**row)
+        for row in await repo.select(PATTERN_COLUMNS, in_={"content_key": list(batch)})
+    }
+    ids: Dict[str, Optional[int]] = {}
+    rows: List[Dict] = []
+    for key, pattern in batch.items():
+        stored = existing.get(key)
+        if stored is None:
+            rows.append(pattern_row(pattern))
+        else:
+            ids[key] = stored.id
+    for row in await repo.upsert(rows, on_conflict="content_key"):
+        ids[row["content_key"]] = row.get("id")
+    return ids
+
+
+async def compact_patterns(
+    niche: Optional[str] = None, page_size: Optional[int] = None, repo: Any = None
+) -> int:
+    """Collapse duplicate ``patterns`` rows into one row per content key.
+
+    Rows are paged in by ID, grouped by their recomputed key and merged into
+    the row already holding the key (or the oldest one). Survivors are
+    written before the duplicates are deleted, so an interrupted run never
+    loses statistics. Returns the number of rows removed.
+    """
+    if repo is None:
+        from .database import PatternRepository
+        from .supabase import get_supabase_client
+
+        repo = PatternRepository(get_supabase_client())
+    page_size = page_size or int(os.environ.get("PATTERN_COMPACT_PAGE_SIZE", 5000))
+
+    groups: Dict[str, List[Pattern]] = {}
+    last_id = 0
+    while True:
+        rows = await repo.select(
+            PATTERN_COLUMNS,
+            eq={"niche": niche} if niche else None,
+            gte={"id": last_id + 1},
+            order="id",
+            limit=page_size,
+        )
+        for row in rows:
+            pattern = Pattern(**row)
+            groups.setdefault(content_key(pattern), []).append(pattern)
+        if len(rows) < page_size:
+            break
+        last_id = rows[-1]["id"]
+
+    survivors: List[Dict] = []
+    duplicates: List[int] = []
+    for key, group in groups.items():
+        if len(group) == 1 and group[0].content_key == key:
+            continue
+        group.sort(key=lambda p: (p.content_key != key, p.id))
+        # legacy rows have no count; weigh each as one observation throughout
+        counted = [p.model_copy(update={"video_count": p.video_count or 1}) for p in group]
+        merged = counted[0].model_copy(update={"content_key": key})
+        for other in counted[1:]:
+            merged = merge_pattern_stats(merged, other)
+        if all(p.video_count is None for p in group):
+            merged.video_count = None
+        survivors.append({"id": merged.id, **pattern_row(merged)})
+        duplicates.extend(p.id for p in group[1:])
+
+    chunk = 500
+    for start in range(0, len(survivors), chunk):
+        await repo.upsert(survivors[start : start + chunk], on_conflict="id")
+    for start in range(0, len(duplicates), chunk):
+        await repo.delete(in_={"id": duplicates[start : start + chunk]})
+    return len(duplicates)
+
+
+async def mine_and_store_patterns(
+    niche: str, top_percentile: Optional[float] = None
+) -> List[Pattern]:
+    """Mine the niche's videos not yet counted and merge them into stored patterns.
+
+    The watermark is the highest ``last_video_id`` among the niche's stored
+    patterns, so each video contributes to the statistics once.
+    """
+    from .database import PatternRepository, VideoRepository
+    from .pattern_index import invalidate_patterns
+    from .snapshot import get_video_snapshot
+    from .stats import get_engagement_stats
     from .supabase import get_supabase_client
 
     supabase = get_supabase_client()
-    records: List[Dict] = []
-    if supabase:
+    repo = PatternRepository(supabase)
+    stats = get_engagement_stats()
+    try:
+        latest = await repo.select(
+            "last_video_id",
+            eq={"niche": niche},
+            gte={"last_video_id": 0},
+            order="last_video_id",
+            desc=True,
+            limit=1,
+        )
+        watermark = latest[0]["last_video_id"] if latest else 0
+    except Exception:
+        watermark = 0
+    try:
+        snapshot = await get_video_snapshot()
+    except Exception:
+        snapshot = None
+
+    if snapshot is not None and snapshot.rows:
+        rows = snapshot.select(niches=[niche])
+        video_ids = snapshot.columns["id"][rows]
+        rows = rows[video_ids > watermark]
+        last_video_id = int(video_ids.max()) if len(rows) else None
+        patterns = mine_patterns_from_snapshot(snapshot, rows, niche, top_percentile, stats)
+    else:
         try:
-            resp = (
-                supabase.table("videos")
-                .select(
-                    "transcript,visual_style,onscreen_text,likes,comments"
-                )
-                .eq("niche", niche)
-                .execute()
+            records = await VideoRepository(supabase).select(
+                "id,transcript,visual_style,onscreen_text,likes,comments",
+                eq={"niche": niche},
+                gte={"id": watermark + 1},
             )
-            records = resp.data or []
         except Exception:
             records = []
+        last_video_id = max((r.get("id") or 0 for r in records), default=None)
+        patterns = mine_patterns_from_records(
+            records, niche, top_percentile=top_percentile, stats=stats
+        )
 
-    patterns = mine_patterns_from_records(records, niche)
-
-    if supabase and patterns:
-        rows = [
-            {
-                "niche": p.niche,
-                "hook": p.hook,
-                "core_value_loop": p.core_value_loop,
-                "narrative_arc": p.narrative_arc,
-                "visual_formula": p.visual_formula,
-                "cta": p.cta,
-                "prevalence": p.prevalence,
-                "engagement_score": p.engagement_score,
-            }
-            for p in patterns
-        ]
+    if patterns:
         try:
-            resp = supabase.table("patterns").insert(rows).execute()
-            if resp.data:
-                for pat, row in zip(patterns, resp.data):
-                    pat.id = row.get("id")
+            ids = await store_patterns(patterns, last_video_id=last_video_id, repo=repo)
+            for pat in patterns:
+                pat.id = ids.get(pat.content_key)
         except Exception:
-            pass
+            record_error("patterns.store")
+        await invalidate_patterns(niche)
 
     return patterns
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintenance jobs for the patterns table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact = commands.add_parser("compact", help="collapse duplicate patterns by content key")
+    compact.add_argument("--niche", help="only compact this niche")
+    args = parser.parse_args(argv)
+
+    removed = asyncio.run(compact_patterns(niche=args.niche))
+    print(f"Removed {removed} duplicate pattern rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
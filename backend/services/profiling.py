@@ -0,0 +1,241 @@
+"""Opt-in request profiling and span trees of slow requests.
+
+Two diagnostics, both off unless configured:
+
+* **On-demand profiles.** With ``PROFILE_TOKEN`` set, a request carrying
+  ``X-Profile-Token: <token>`` (or ``?profile_token=<token>``) runs under a
+  profiler chosen by ``X-Profile`` / ``?profile=``: ``sample`` (default)
+  samples the event-loop thread's stack every ``PROFILE_INTERVAL`` seconds
+  and writes folded stacks (``.folded``, the input of ``flamegraph.pl`` and
+  speedscope); ``cprofile`` writes a ``pstats`` dump (``.prof``, for
+  snakeviz or ``python -m pstats``). Profiles are written to ``PROFILE_DIR``
+  (the newest ``PROFILE_KEEP`` are kept) and named in the ``X-Profile-Id``
+  response header. Both profilers observe the whole event-loop thread, so
+  concurrent requests show up too, and only one request is profiled at a
+  time (others are answered with ``X-Profile-Id: busy``).
+* **Slow-request log.** With ``SLOW_REQUEST_SECONDS`` set, each request
+  collects the span tree of its :func:`~.metrics.timed` operations (Supabase
+  and Postgres queries, LLM calls, analysis steps); requests slower than the
+  threshold append it as a JSON line to ``SLOW_REQUEST_LOG`` and the newest
+  ``SLOW_REQUEST_KEEP`` are kept in memory for ``/api/profiles/slow``.
+
+When neither is configured :class:`ProfilingMiddleware` is not installed, so
+requests pay nothing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import cProfile
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import REGISTRY, record_error, trace
+
+SLOW_REQUESTS = REGISTRY.counter(
+    "viralsynth_slow_requests_total",
+    "Requests slower than SLOW_REQUEST_SECONDS by route.",
+    ("method", "route"),
+)
+
+PROFILE_NAME = re.compile(r"^[\w-]+\.(folded|prof)$")
+_ACTIVE = threading.Lock()
+_SLOW: Deque[Dict[str, Any]] = collections.deque(
+    maxlen=int(os.environ.get("SLOW_REQUEST_KEEP", 50))
+)
+
+
+def profile_token() -> str:
+    return os.environ.get("PROFILE_TOKEN", "")
+
+
+def slow_threshold() -> float:
+    return float(os.environ.get("SLOW_REQUEST_SECONDS", 0) or 0)
+
+
+def profiling_enabled() -> bool:
+    """Whether either diagnostic is configured."""
+    return bool(profile_token()) or slow_threshold() > 0
+
+
+def authorised(token: Optional[str]) -> bool:
+    """Whether ``token`` unlocks profiling (never when no token is configured)."""
+    expected = profile_token()
+    return bool(expected) and token is not None and hmac.compare_digest(token, expected)
+
+
+def profile_dir() -> str:
+    return os.environ.get("PROFILE_DIR", "data/profiles")
+
+
+def recent_slow_requests() -> List[Dict[str, Any]]:
+    """Slow-request records kept in memory, newest first."""
+    return list(reversed(_SLOW))
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: collections.Counter = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        """Stacks in the folded format: ``outer;inner count`` per line."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _prune_profiles(directory: str, keep: int) -> None:
+    names = sorted(
+        (n for n in os.listdir(directory) if PROFILE_NAME.match(n)),
+        key=lambda n: os.path.getmtime(os.path.join(directory, n)),
+    )
+    for name in names[: max(0, len(names) - keep)]:
+        os.remove(os.path.join(directory, name))
+
+
+def _write_profile(name: str, profiler: Any) -> None:
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    if isinstance(profiler, cProfile.Profile):
+        profiler.dump_stats(path)
+    else:
+        with open(path, "w") as fh:
+            fh.write(profiler.folded())
+    _prune_profiles(directory, int(os.environ.get("PROFILE_KEEP", 20)))
+
+
+def _log_slow(record: Dict[str, Any]) -> None:
+    path = os.environ.get("SLOW_REQUEST_LOG", "data/slow_requests.jsonl")
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as fh:
+        fh.write(json.dumps(record) + "\n")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware for on-demand profiles and the slow-request log."""
+
+    def __init__(self, app: ASGIApp, slow_seconds: Optional[float] = None) -> None:
+        self.app = app
+        self.slow_seconds = slow_threshold() if slow_seconds is None else slow_seconds
+
+    def _requested_mode(self, scope: Scope) -> Optional[str]:
+        """Profiler an authorised request asks for, if any."""
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        token = headers.get("x-profile-token") or (query.get("profile_token") or [None])[0]
+        mode = headers.get("x-profile") or (query.get("profile") or ["sample"])[0]
+        return mode if mode in ("sample", "cprofile") and authorised(token) else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = self._requested_mode(scope)
+        profiler: Any = None
+        profile_id: Optional[str] = None
+        if mode is not None:
+            if _ACTIVE.acquire(blocking=False):
+                profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+                profile_id += ".prof" if mode == "cprofile" else ".folded"
+                if mode == "cprofile":
+                    profiler = cProfile.Profile()
+                else:
+                    profiler = StackSampler(
+                        threading.get_ident(), float(os.environ.get("PROFILE_INTERVAL", 0.005))
+                    )
+            else:
+                profile_id = "busy"
+
+        status = 500
+
+        async def send_tagged(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id is not None:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        root = None
+        start = time.perf_counter()
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.enable()
+            elif profiler is not None:
+                profiler.start()
+            if self.slow_seconds > 0:
+                with trace(f"{scope.get('method', '')} {scope.get('path', '')}") as root:
+                    await self.app(scope, receive, send_tagged)
+            else:
+                await self.app(scope, receive, send_tagged)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                if isinstance(profiler, cProfile.Profile):
+                    profiler.disable()
+                else:
+                    profiler.stop()
+                _ACTIVE.release()
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, _write_profile, profile_id, profiler)
+                except Exception:
+                    record_error("profiling.write")
+        if root is not None and elapsed >= self.slow_seconds:
+            await self._record_slow(scope, status, elapsed, root)
+
+    async def _record_slow(self, scope: Scope, status: int, elapsed: float, root: Any) -> None:
+        route = getattr(scope.get("route"), "path", "unmatched")
+        SLOW_REQUESTS.inc(scope.get("method", ""), route)
+        record = {
+            "time": time.time(),
+            "method": scope.get("method"),
+            "route": route,
+            "path": scope.get("path"),
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 3),
+            "spans": root.to_dict(),
+        }
+        _SLOW.append(record)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, _log_slow, record)
+        except Exception:
+            record_error("profiling.slow_log")
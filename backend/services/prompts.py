@@ -0,0 +1,151 @@
+"""Generation prompts assembled under a per-call token budget.
+
+Both LLM calls of a package (the script, then its platform variations)
+start with the same prefix: the chosen patterns and the audio, pacing and
+style context. Keeping the leading text identical lets llama.cpp's prompt
+cache reuse the prefix computed for the first call. OpenAI only caches
+prefixes of at least 1024 tokens, which the prefix (at most half the budget,
+see below) can only reach with ``PROMPT_TOKEN_BUDGET`` of 2048 or more and
+enough distinct pattern text; the default budget of 1024 favours small
+prompts over those cache hits.
+
+The prefix is compressed to fit ``PROMPT_TOKEN_BUDGET``:
+
+* patterns are listed by engagement score (then prevalence), strongest
+  first, and the lowest-ranked are dropped once the budget is spent;
+* a field value already stated by a stronger pattern is not repeated, so
+  patterns mined from similar videos collapse to what sets them apart;
+* each field is cut to ``PROMPT_FIELD_TOKENS`` tokens, which bounds long
+  transcript-derived value loops.
+
+The prefix, style context included, takes at most half of the budget, so
+the variations call keeps room for the script (truncated to what remains). Tokens are counted locally
+with a regex approximation of BPE tokenizers (words of up to eight letters,
+groups of up to three digits and single punctuation marks count as one
+token); no tokenizer model is loaded.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from itertools import islice
+from typing import List, Optional, Sequence, Set, Tuple
+
+from ..models import Pattern
+from .metrics import REGISTRY
+
+PROMPT_TOKENS = REGISTRY.histogram(
+    "viralsynth_llm_prompt_tokens",
+    "Estimated prompt tokens per generation LLM call.",
+    ("call",),
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+
+_PIECE = re.compile(r" ?[^\W\d_]{1,8}| ?\d{1,3}| ?(?:[^\w\s]|_)|\s+")
+
+PATTERN_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("Hook", "hook"),
+    ("Value", "core_value_loop"),
+    ("Narrative", "narrative_arc"),
+    ("Visual", "visual_formula"),
+    ("CTA", "cta"),
+)
+PREFIX = "You write short-form viral video content.\nUsing these patterns, strongest first:\n"
+SCRIPT_TASK = "Generate a viral video script for: {topic}"
+VARIATIONS_TASK = (
+    "Provide platform-specific hooks and CTAs for TikTok, Instagram and YouTube."
+    "\nScript: {script}\nReturn JSON object mapping platform to hook and cta."
+)
+
+
+def count_tokens(text: str) -> int:
+    """Approximate number of BPE tokens in ``text``."""
+    return sum(1 for _ in _PIECE.finditer(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """``text`` cut to at most ``max_tokens`` tokens (marked with an ellipsis)."""
+    if max_tokens <= 0:
+        return ""
+    pieces = list(islice(_PIECE.finditer(text), max_tokens + 1))
+    if len(pieces) <= max_tokens:
+        return text
+    # the ellipsis takes the last token
+    keep = max_tokens - 1
+    return (text[: pieces[keep - 1].end()].rstrip() if keep else "") + "…"
+
+
+def _normalise(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+def pattern_lines(patterns: Sequence[Pattern], budget: int, field_tokens: int) -> List[str]:
+    """One line per pattern, strongest first, deduplicated and within ``budget`` tokens."""
+    ranked = sorted(
+        patterns, key=lambda p: (p.engagement_score or 0.0, p.prevalence or 0.0), reverse=True
+    )
+    seen: Set[Tuple[str, str]] = set()
+    lines: List[str] = []
+    used = 0
+    for pattern in ranked:
+        parts = []
+        for label, attr in PATTERN_FIELDS:
+            value = getattr(pattern, attr) or ""
+            key = (attr, _normalise(value))
+            if not key[1] or key in seen:
+                continue
+            seen.add(key)
+            parts.append(f"{label}: {truncate_tokens(value.strip(), field_tokens)}")
+        if not parts:
+            continue
+        line = "- " + "; ".join(parts)
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    return lines
+
+
+@dataclass
+class GenerationPrompts:
+    """Script and variation prompts of one package sharing ``prefix``."""
+
+    prefix: str
+    topic: str
+    budget: int
+
+    def script(self) -> str:
+        prompt = self.prefix + SCRIPT_TASK.format(topic=self.topic)
+        PROMPT_TOKENS.observe("script", value=count_tokens(prompt))
+        return prompt
+
+    def variations(self, script: str) -> str:
+        room = self.budget - count_tokens(self.prefix) - count_tokens(VARIATIONS_TASK.format(script=""))
+        if room <= 0:
+            raise ValueError(f"PROMPT_TOKEN_BUDGET of {self.budget} leaves no room for the script")
+        prompt = self.prefix + VARIATIONS_TASK.format(script=truncate_tokens(script, room))
+        PROMPT_TOKENS.observe("variations", value=count_tokens(prompt))
+        return prompt
+
+
+class PromptBuilder:
+    """Builds the prompts of a package within a per-call token budget."""
+
+    def __init__(self, budget: Optional[int] = None, field_tokens: Optional[int] = None) -> None:
+        self.budget = budget or int(os.environ.get("PROMPT_TOKEN_BUDGET", 1024))
+        self.field_tokens = field_tokens or int(os.environ.get("PROMPT_FIELD_TOKENS", 40))
+
+    def build(self, patterns: Sequence[Pattern], context: str, topic: str) -> GenerationPrompts:
+        """Prompts for ``topic`` given the chosen ``patterns`` and style ``context``."""
+        topic = truncate_tokens(topic, self.budget // 4)
+        # the context is cut so the prefix never takes more than half the budget
+        context = truncate_tokens(context.strip(), self.budget // 2 - count_tokens(PREFIX) - 1)
+        context = f"{context}\n" if context else ""
+        fixed = count_tokens(PREFIX + context + SCRIPT_TASK.format(topic=topic))
+        room = min(self.budget - fixed, self.budget // 2 - count_tokens(PREFIX + context))
+        lines = pattern_lines(patterns, room, self.field_tokens)
+        prefix = PREFIX + "".join(f"{line}\n" for line in lines) + context
+        return GenerationPrompts(prefix=prefix, topic=topic, budget=self.budget)
@@ -0,0 +1,336 @@
+"""Timeouts, retries, circuit breakers and hedging for outbound calls.
+
+Every external dependency (OpenAI chat and images, Groq transcription, Apify,
+Supabase/Postgres, the local LLM server, image and audio downloads, the Redis
+cache) is called through a
+:class:`Dependency`. The dependency applies a per-attempt timeout, retries
+transient failures (timeouts, connection errors, 429 and 5xx responses) with
+full-jitter exponential backoff, and trips a circuit breaker after
+``failure_threshold`` consecutive transient failures. An open breaker rejects
+calls immediately with :class:`CircuitOpenError` for ``reset_seconds`` before
+one probe call is let through (half-open). Idempotent calls can additionally
+be hedged: if the first attempt has not finished after ``hedge_ms`` a second
+one is started and whichever succeeds first wins.
+
+Policies come from built-in defaults per dependency and can be overridden
+with ``RESILIENCE_<DEPENDENCY>_<SETTING>`` environment variables, e.g.
+``RESILIENCE_OPENAI_TIMEOUT=20`` or ``RESILIENCE_SUPABASE_HEDGE_MS=150``.
+Breaker state is exported as the ``viralsynth_circuit_breaker_state`` gauge
+(0 closed, 1 half-open, 2 open).
+
+Providers with quotas (scraping actors, transcription) can also be given a
+request budget with ``RATE_BUDGET_<NAME>_PER_MINUTE`` that manual and
+scheduled ingestion share. With a shared cache backend (``CACHE_BACKEND`` of
+``sqlite`` or ``redis``) the budget is counted there per minute
+(:class:`SharedRateBudget`), so it holds across worker processes and
+instances; with the in-process cache every caller in the process waits on the
+same :class:`RateLimiter`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass, fields, replace
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+from .metrics import REGISTRY, record_error
+
+T = TypeVar("T")
+
+BREAKER_STATE = REGISTRY.gauge(
+    "viralsynth_circuit_breaker_state",
+    "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open).",
+    ("dependency",),
+)
+DEPENDENCY_CALLS = REGISTRY.counter(
+    "viralsynth_dependency_calls_total",
+    "Outbound calls by final outcome (success, error, timeout or rejected).",
+    ("dependency", "outcome"),
+)
+DEPENDENCY_RETRIES = REGISTRY.counter(
+    "viralsynth_dependency_retries_total",
+    "Retried attempts of outbound calls.",
+    ("dependency",),
+)
+DEPENDENCY_HEDGES = REGISTRY.counter(
+    "viralsynth_dependency_hedges_total",
+    "Hedged second attempts started for slow outbound calls.",
+    ("dependency",),
+)
+
+_TRANSIENT_ERRORS = {
+    "APIConnectionError",  # openai, including APITimeoutError
+    "ConnectionDoesNotExistError",  # asyncpg
+    "TooManyConnectionsError",
+    "CannotConnectNowError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the dependency while its breaker is open."""
+
+
+@dataclass(frozen=True)
+class Policy:
+    """Resilience settings for one dependency."""
+
+    timeout: float = 30.0
+    retries: int = 2
+    backoff_base: float = 0.2
+    backoff_max: float = 5.0
+    failure_threshold: int = 5
+    reset_seconds: float = 30.0
+    hedge_ms: float = 0.0
+
+
+DEFAULT_POLICIES: Dict[str, Policy] = {
+    "openai": Policy(timeout=30.0),
+    "openai_images": Policy(timeout=90.0, retries=1),
+    "groq": Policy(timeout=60.0),
+    "apify": Policy(timeout=30.0),
+    "supabase": Policy(timeout=10.0),
+    "postgres": Policy(timeout=10.0, retries=1),
+    "local_llm": Policy(timeout=float(os.environ.get("LOCAL_LLM_TIMEOUT", 120)), retries=1),
+    "image_download": Policy(timeout=30.0),
+    "audio_download": Policy(timeout=30.0),
+    "redis": Policy(timeout=0.5, retries=1, backoff_base=0.05, reset_seconds=5.0),
+}
+
+
+def load_policy(name: str) -> Policy:
+    """Default policy for ``name`` with ``RESILIENCE_<NAME>_*`` overrides applied."""
+    policy = DEFAULT_POLICIES.get(name, Policy())
+    overrides: Dict[str, Any] = {}
+    for field in fields(Policy):
+        raw = os.environ.get(f"RESILIENCE_{name.upper()}_{field.name.upper()}")
+        if raw is not None:
+            overrides[field.name] = int(raw) if field.type in (int, "int") else float(raw)
+    return replace(policy, **overrides)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether ``exc`` signals a failure worth retrying and counting against the breaker."""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(exc).__mro__)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Async token bucket allowing ``rate`` acquisitions per ``period`` seconds."""
+
+    def __init__(self, rate: float, period: float = 60.0, burst: Optional[int] = None) -> None:
+        self.rate = rate / period
+        self.capacity = float(burst or max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SharedRateBudget:
+    """``per_minute`` acquisitions per clock minute, counted in a shared cache backend.
+
+    Callers over the minute's allowance wait for the next minute. When the
+    backend fails, the process falls back to its own :class:`RateLimiter`.
+    """
+
+    def __init__(self, name: str, per_minute: float, backend: Any, prefix: str) -> None:
+        self.per_minute = per_minute
+        self.backend = backend
+        self.key = f"{prefix}:budget:{name}"
+        self.local = RateLimiter(per_minute)
+
+    async def acquire(self) -> None:
+        while True:
+            window = int(time.time() // 60)
+            try:
+                used = await self.backend.incr(f"{self.key}:{window}", ttl=120)
+            except Exception:
+                record_error("resilience.shared_budget")
+                await self.local.acquire()
+                return
+            if used <= self.per_minute:
+                return
+            await asyncio.sleep(max(0.0, (window + 1) * 60 - time.time()) + random.uniform(0, 0.5))
+
+
+@lru_cache(maxsize=None)
+def get_rate_budget(name: str) -> Optional[Any]:
+    """Budget of ``RATE_BUDGET_<NAME>_PER_MINUTE`` requests, or ``None`` when unlimited."""
+    per_minute = float(os.environ.get(f"RATE_BUDGET_{name.upper()}_PER_MINUTE", 0) or 0)
+    if per_minute <= 0:
+        return None
+    from .cache import get_cache
+
+    cache = get_cache()
+    if cache.backend.name == "memory":
+        return RateLimiter(per_minute)
+    return SharedRateBudget(name, per_minute, cache.backend, cache.prefix)
+
+
+async def spend_budget(name: str) -> None:
+    """Wait for one request of ``name``'s budget, if it has one."""
+    budget = get_rate_budget(name)
+    if budget is not None:
+        await budget.acquire()
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe."""
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._set(self.CLOSED)
+
+    def _set(self, state: int) -> None:
+        self.state = state
+        BREAKER_STATE.set(self.name, value=state)
+
+    def allow(self) -> bool:
+        """Whether a call may proceed; moves an expired open breaker to half-open."""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._set(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set(self.CLOSED)
+
+    def abandon(self) -> None:
+        """A call ended without a verdict (it was cancelled); let the next one probe."""
+        self._probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set(self.OPEN)
+
+
+class Dependency:
+    """Outbound dependency guarded by a :class:`Policy` and a breaker."""
+
+    def __init__(self, name: str, policy: Optional[Policy] = None) -> None:
+        self.name = name
+        self.policy = policy or load_policy(name)
+        self.breaker = CircuitBreaker(name, self.policy.failure_threshold, self.policy.reset_seconds)
+
+    async def call(self, factory: Callable[[], Awaitable[T]], *, idempotent: bool = True) -> T:
+        """Run ``factory()`` under the policy and return its result.
+
+        ``factory`` must create a fresh awaitable per attempt. Non-idempotent
+        calls (inserts) get the timeout and breaker but are never retried or
+        hedged, since a timed-out attempt may still have been applied.
+        """
+        retries = self.policy.retries if idempotent else 0
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                DEPENDENCY_CALLS.inc(self.name, "rejected")
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            try:
+                result = await self._attempt(factory, hedge=idempotent)
+            except Exception as exc:
+                if not is_transient(exc):
+                    # the dependency answered; the request itself was bad
+                    self.breaker.success()
+                    DEPENDENCY_CALLS.inc(self.name, "error")
+                    raise
+                self.breaker.failure()
+                if attempt >= retries or self.breaker.state == CircuitBreaker.OPEN:
+                    timeout = isinstance(exc, asyncio.TimeoutError)
+                    DEPENDENCY_CALLS.inc(self.name, "timeout" if timeout else "error")
+                    raise
+                await asyncio.sleep(self._backoff(attempt, exc))
+                attempt += 1
+                DEPENDENCY_RETRIES.inc(self.name)
+                continue
+            except BaseException:
+                # cancelled (client gone, outer timeout, losing hedge): no verdict
+                self.breaker.abandon()
+                raise
+            self.breaker.success()
+            DEPENDENCY_CALLS.inc(self.name, "success")
+            return result
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        ceiling = min(self.policy.backoff_max, self.policy.backoff_base * 2 ** attempt)
+        delay = random.uniform(0, ceiling)
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.policy.backoff_max))
+        return delay
+
+    async def _attempt(self, factory: Callable[[], Awaitable[T]], hedge: bool) -> T:
+        timeout = self.policy.timeout
+        if not hedge or self.policy.hedge_ms <= 0:
+            return await asyncio.wait_for(factory(), timeout)
+        first = asyncio.ensure_future(asyncio.wait_for(factory(), timeout))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.policy.hedge_ms / 1000)
+            if done:
+                return first.result()
+            DEPENDENCY_HEDGES.inc(self.name)
+            tasks.append(asyncio.ensure_future(asyncio.wait_for(factory(), timeout)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return first.result()  # both failed: surface the original error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+@lru_cache(maxsize=None)
+def get_dependency(name: str) -> Dependency:
+    """Return the process-wide guard for dependency ``name``."""
+    return Dependency(name)
@@ -0,0 +1,325 @@
+"""Adaptive re-ingestion of the niches a worker keeps fresh.
+
+``INGEST_SCHEDULE_NICHES`` lists niches that worker processes re-ingest on
+their own. Each niche has its own interval, adapted after every run from how
+much the niche is moving:
+
+* ``churn`` – the share of scraped URLs that were not in the previous run;
+* ``velocity`` – summed uses per hour of the niche's top trending audio over
+  the last 24 hours, as reported by :func:`get_trending_audio`.
+
+The niche's activity is the larger of its churn and its velocity as a
+fraction of ``INGEST_VELOCITY_REF``. The interval is scaled by
+``INGEST_TARGET_CHURN / activity`` (at most halved or doubled per run) and
+kept within ``INGEST_MIN_INTERVAL`` and ``INGEST_MAX_INTERVAL``, so each run
+finds roughly the target share of new content: moving niches are revisited
+sooner and static ones back off.
+
+At most ``INGEST_CONCURRENCY`` runs execute at once and due niches start in
+order of activity. Scraping and transcription spend the shared provider
+budgets (``RATE_BUDGET_<NAME>_PER_MINUTE``) exactly like requests to
+``/api/ingest``. Runs are journaled, so a failed run is retried after the
+minimum interval and resumes where it stopped. Schedule state is written to
+``INGEST_SCHEDULE_PATH`` so learned intervals survive restarts.
+
+Only one process schedules at a time: every process serving ingestion
+competes for a lease in the shared cache backend (renewed each tick, expiring
+after ``INGEST_SCHEDULER_LEASE`` seconds), and only the holder starts runs. A
+new holder reloads the saved state before scheduling, and a process that
+loses the lease cancels its in-flight runs (they resume from the journal
+wherever the niche runs next) so a niche is never ingested twice at once.
+With the in-process
+cache backend each process holds its own lease, so multi-worker or
+multi-instance deployments that set ``INGEST_SCHEDULE_NICHES`` need
+``CACHE_BACKEND=sqlite`` (one host) or ``redis``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .metrics import REGISTRY, record_error, timed
+
+INGEST_INTERVAL = REGISTRY.gauge(
+    "viralsynth_ingest_interval_seconds",
+    "Current re-ingestion interval per scheduled niche.",
+    ("niche",),
+)
+INGEST_ACTIVITY = REGISTRY.gauge(
+    "viralsynth_ingest_activity",
+    "Activity (max of URL churn and relative audio velocity) per scheduled niche.",
+    ("niche",),
+)
+
+IngestFn = Callable[[str, int, str], Awaitable[List[str]]]
+VelocityFn = Callable[[str], Awaitable[float]]
+
+
+@dataclass
+class NicheSchedule:
+    """Adaptive schedule state of one niche."""
+
+    niche: str
+    interval: float
+    next_run: float
+    last_run: Optional[float] = None
+    churn: Optional[float] = None
+    velocity: Optional[float] = None
+    activity: float = 0.0
+    runs: int = 0
+    failures: int = 0
+    run_id: Optional[str] = None
+    urls: List[str] = field(default_factory=list)
+
+
+def _url_key(url: str) -> str:
+    return hashlib.md5(url.encode()).hexdigest()[:16]
+
+
+async def _ingest_and_mine(niche: str, percentile: int, run_id: str) -> List[str]:
+    """Ingest ``niche`` and fold the new videos into its patterns, as ``/api/ingest`` does."""
+    from ..models import StrategyRequest
+    from .ingestion import ingest_niche
+    from .strategy import derive_patterns
+
+    records = await ingest_niche(niche, percentile, run_id=run_id)
+    video_ids = [r.id for r in records if r.id]
+    if video_ids:
+        await derive_patterns(
+            StrategyRequest(niches=[niche], video_ids=video_ids, top_percentile=percentile / 100),
+            merge=True,
+        )
+    return [r.url for r in records if r.url]
+
+
+async def _audio_velocity(niche: str) -> float:
+    from .ingestion import get_trending_audio
+
+    audios = await get_trending_audio(niche, limit=10, window="24h")
+    return float(sum(a.velocity or 0.0 for a in audios))
+
+
+class IngestScheduler:
+    """Re-ingests niches at intervals adapted to their churn."""
+
+    def __init__(
+        self,
+        niches: Optional[List[str]] = None,
+        ingest: Optional[IngestFn] = None,
+        velocity: Optional[VelocityFn] = None,
+        path: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if niches is None:
+            niches = [n.strip() for n in os.environ.get("INGEST_SCHEDULE_NICHES", "").split(",")]
+        self.niches = [n for n in dict.fromkeys(niches) if n]
+        self.ingest = ingest or _ingest_and_mine
+        self.velocity = velocity or _audio_velocity
+        self.path = path if path is not None else os.environ.get(
+            "INGEST_SCHEDULE_PATH", "data/ingest_schedule.json"
+        )
+        self.concurrency = concurrency or int(os.environ.get("INGEST_CONCURRENCY", 2))
+        self.clock = clock
+        self.min_interval = float(os.environ.get("INGEST_MIN_INTERVAL", 900))
+        self.max_interval = float(os.environ.get("INGEST_MAX_INTERVAL", 86400))
+        self.initial_interval = float(os.environ.get("INGEST_INTERVAL", 3600))
+        self.target_churn = float(os.environ.get("INGEST_TARGET_CHURN", 0.3))
+        self.velocity_ref = float(os.environ.get("INGEST_VELOCITY_REF", 20))
+        self.percentile = int(os.environ.get("INGEST_SCHEDULE_PERCENTILE", 5))
+        self.tick_seconds = float(os.environ.get("INGEST_SCHEDULER_TICK", 30))
+        self.lease_seconds = float(
+            os.environ.get("INGEST_SCHEDULER_LEASE", max(90.0, 3 * self.tick_seconds))
+        )
+        self.owner = uuid.uuid4().hex
+        self.leader = False
+        self.states: Dict[str, NicheSchedule] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._load()
+
+    def _load(self) -> None:
+        saved: Dict[str, Dict] = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path) as fh:
+                    saved = {s["niche"]: s for s in json.load(fh)}
+            except Exception:
+                record_error("scheduler.load")
+        now = self.clock()
+        for niche in self.niches:
+            state = self.states.get(niche)
+            if niche in saved and state is not None:
+                # updated in place: the state object is shared with run_niche
+                for key, value in saved[niche].items():
+                    setattr(state, key, value)
+            elif niche in saved:
+                state = NicheSchedule(**saved[niche])
+            elif state is None:
+                state = NicheSchedule(niche, interval=self.initial_interval, next_run=now)
+            state.interval = min(self.max_interval, max(self.min_interval, state.interval))
+            self.states[niche] = state
+            INGEST_INTERVAL.set(niche, value=state.interval)
+
+    def save(self) -> None:
+        """Atomically write the schedule state to ``path``."""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump([asdict(s) for s in self.states.values()], fh)
+        os.replace(tmp, self.path)
+
+    def observe(self, niche: str, urls: List[str], velocity: float) -> NicheSchedule:
+        """Fold one completed run into ``niche``'s interval and schedule the next."""
+        state = self.states[niche]
+        keys = [_url_key(u) for u in dict.fromkeys(urls)]
+        previous = set(state.urls)
+        # the first run has nothing to compare against
+        state.churn = (sum(k not in previous for k in keys) / len(keys) if keys else 0.0) if previous else None
+        state.velocity = velocity
+        moving = min(1.0, velocity / self.velocity_ref) if self.velocity_ref > 0 else 0.0
+        state.activity = max(state.churn or 0.0, moving)
+        if state.churn is not None or moving:
+            factor = self.target_churn / max(state.activity, 1e-6)
+            state.interval *= min(2.0, max(0.5, factor))
+            state.interval = min(self.max_interval, max(self.min_interval, state.interval))
+        state.urls = keys or state.urls
+        state.runs += 1
+        state.last_run = self.clock()
+        state.next_run = state.last_run + state.interval
+        INGEST_INTERVAL.set(niche, value=state.interval)
+        INGEST_ACTIVITY.set(niche, value=state.activity)
+        return state
+
+    async def run_niche(self, niche: str) -> None:
+        """Ingest ``niche`` once and reschedule it."""
+        state = self.states[niche]
+        # a failed or cancelled run keeps its id so the retry resumes from the
+        # journal, in this process or the next lease holder
+        if state.run_id is None:
+            state.run_id = f"schedule-{uuid.uuid4().hex}"
+            try:
+                self.save()
+            except Exception:
+                record_error("scheduler.save")
+        try:
+            with timed("scheduler.ingest"):
+                urls = await self.ingest(niche, self.percentile, state.run_id)
+        except Exception:
+            record_error("scheduler.ingest")
+            state.failures += 1
+            state.next_run = self.clock() + self.min_interval
+        else:
+            state.run_id = None
+            try:
+                velocity = await self.velocity(niche)
+            except Exception:
+                record_error("scheduler.velocity")
+                velocity = 0.0
+            self.observe(niche, urls, velocity)
+        try:
+            self.save()
+        except Exception:
+            record_error("scheduler.save")
+
+    @property
+    def running(self) -> List[str]:
+        """Niches with a run in progress."""
+        return list(self._running)
+
+    def tick(self) -> List[str]:
+        """Start due niches, most active first, up to the concurrency bound."""
+        now = self.clock()
+        due = sorted(
+            (s for s in self.states.values() if s.next_run <= now and s.niche not in self._running),
+            key=lambda s: (-s.activity, s.next_run),
+        )
+        started: List[str] = []
+        for state in due[: max(0, self.concurrency - len(self._running))]:
+            task = asyncio.get_running_loop().create_task(self.run_niche(state.niche))
+            self._running[state.niche] = task
+            task.add_done_callback(lambda _, niche=state.niche: self._running.pop(niche, None))
+            started.append(state.niche)
+        return started
+
+    def _lease_key(self) -> str:
+        from .cache import get_cache
+
+        return f"{get_cache().prefix}:lease:ingest-scheduler"
+
+    async def elect(self) -> bool:
+        """Take or renew the scheduler lease; True while this process holds it."""
+        from .cache import get_cache
+
+        try:
+            leader = await get_cache().backend.acquire(self._lease_key(), self.owner, self.lease_seconds)
+        except Exception:
+            record_error("scheduler.lease")
+            leader = False
+        if leader and not self.leader:
+            # pick up intervals and pending run ids saved by the previous holder
+            self._load()
+        elif self.leader and not leader:
+            # the new holder may start these niches; never run them twice
+            await self._cancel_runs()
+        self.leader = leader
+        return leader
+
+    async def _cancel_runs(self) -> None:
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                if await self.elect():
+                    self.tick()
+            except Exception:
+                record_error("scheduler.tick")
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self) -> None:
+        """Start scheduling on the running loop when niches are configured."""
+        if self.niches and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Cancel the scheduler and in-flight runs (they resume on the next start)."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self._cancel_runs()
+        self._task = None
+        if self.leader:
+            self.leader = False
+            try:
+                self.save()
+            except Exception:
+                record_error("scheduler.save")
+            try:
+                from .cache import get_cache
+
+                # hand over immediately instead of after the lease expires
+                backend, key = get_cache().backend, self._lease_key()
+                if await backend.get(key) == self.owner.encode():
+                    await backend.delete(key)
+            except Exception:
+                record_error("scheduler.lease")
+
+
+@lru_cache()
+def get_ingest_scheduler() -> IngestScheduler:
+    """Return the process-wide ingestion scheduler."""
+    return IngestScheduler()
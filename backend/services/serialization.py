@@ -0,0 +1,201 @@
+"""Fast JSON encoding and compressed responses for large payloads.
+
+FastAPI's default path re-validates a returned model, converts it to plain
+Python with ``jsonable_encoder`` and encodes that with the standard library,
+which dominates CPU for megabyte-sized ingest responses. Endpoints with big
+bodies instead return :class:`ORJSONResponse` directly: models are encoded
+in one pass by pydantic-core's serializer and everything else by orjson
+(the standard library is used when orjson is not installed). The class is
+also the application's default response class.
+
+:class:`CompressionMiddleware` compresses responses of at least
+``COMPRESSION_MIN_SIZE`` bytes with the best encoding the client accepts
+among ``RESPONSE_COMPRESSION`` (``br`` needs the optional ``brotli``
+package). Streamed bodies are compressed chunk by chunk and flushed after
+each one, so NDJSON lines still reach the client as they are produced.
+A strong ``ETag`` is made weak on compressed responses, since it was computed
+over the uncompressed body, and ``Accept-Encoding`` is merged into ``Vary``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # optional: the standard library is used without it
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:  # optional: only gzip is offered without it
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if hasattr(obj, "tolist"):  # NumPy scalars and arrays
+        return obj.tolist()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON for models, containers of models and plain data."""
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded by :func:`dumps`; accepts models as content."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name.strip().lower()] = q
+    return weights
+
+
+def _weak(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """Mark a strong ``ETag`` weak; it validates the uncompressed representation."""
+    return [
+        (k, b"W/" + v if k.lower() == b"etag" and not v.startswith(b"W/") else v) for k, v in headers
+    ]
+
+
+def _vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """Merge ``Accept-Encoding`` into any existing ``Vary`` header."""
+    fields = [
+        f.strip() for k, v in headers if k.lower() == b"vary" for f in v.split(b",") if f.strip()
+    ]
+    if not any(f == b"*" or f.lower() == b"accept-encoding" for f in fields):
+        fields.append(b"Accept-Encoding")
+    return [(k, v) for k, v in headers if k.lower() != b"vary"] + [(b"vary", b", ".join(fields))]
+
+
+def _compressor(encoding: str, level: int) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes], Callable[[], bytes]]:
+    """``(compress, flush, finish)`` for a streaming ``encoding`` compressor."""
+    if encoding == "br":
+        comp = brotli.Compressor(quality=level)
+        return comp.process, comp.flush, comp.finish
+    comp = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return comp.compress, lambda: comp.flush(zlib.Z_SYNC_FLUSH), comp.flush
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: Optional[int] = None,
+        encodings: Optional[List[str]] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = (
+            minimum_size if minimum_size is not None else int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+        )
+        if encodings is None:
+            encodings = os.environ.get("RESPONSE_COMPRESSION", "br,gzip").split(",")
+        self.encodings = [
+            e.strip().lower() for e in encodings
+            if e.strip().lower() == "gzip" or (e.strip().lower() == "br" and brotli is not None)
+        ]
+        self.levels = {
+            "gzip": int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6)),
+            "br": int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4)),
+        }
+
+    @staticmethod
+    def _header(scope: Scope, name: bytes) -> bytes:
+        for key, value in scope.get("headers", []):
+            if key == name:
+                return value
+        return b""
+
+    def _negotiate(self, scope: Scope) -> Optional[str]:
+        accepted = _accepted(self._header(scope, b"accept-encoding").decode("latin-1"))
+        for encoding in self.encodings:
+            if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = self._negotiate(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        stream: Optional[Tuple[Callable, Callable, Callable]] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if stream is None:
+                headers = {k.lower(): v for k, v in start.get("headers", [])}
+                if b"content-encoding" in headers or start["status"] in (204, 304) or (
+                    not more and len(body) < self.minimum_size
+                ):
+                    passthrough = True
+                    etag = headers.get(b"etag", b"")
+                    if start["status"] == 304 and not etag.startswith(b"W/") and (
+                        b"W/" + etag in self._header(scope, b"if-none-match")
+                    ):
+                        # revalidated a compressed copy: echo the validator it was sent with
+                        start = {**start, "headers": _weak(start.get("headers", []))}
+                    await send(start)
+                    await send(message)
+                    return
+                stream = _compressor(encoding, self.levels[encoding])
+                kept = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+                # strong validators must differ per content-coding (RFC 9110 8.8.3)
+                kept = _vary(_weak(kept)) + [(b"content-encoding", encoding.encode())]
+                if not more:
+                    compressed = stream[0](body) + stream[2]()
+                    kept.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start, "headers": kept})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": kept})
+            compress, flush, finish = stream
+            chunk = compress(body) + (flush() if more else finish())
+            await send({"type": "http.response.body", "body": chunk, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
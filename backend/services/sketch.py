@@ -0,0 +1,375 @@
+"""Fixed-memory audio usage counters for high-cardinality catalogs.
+
+Exact per-``audio_id`` dictionaries grow with every distinct track, and most
+tracks are used exactly once. :class:`AudioSketch` instead keeps, per niche
+(plus one overall sketch):
+
+* a Count-Min Sketch of usage counts and summed engagement, sized from
+  ``TRENDING_SKETCH_EPSILON`` and ``TRENDING_SKETCH_DELTA`` so that estimates
+  overshoot the true count by at most ``epsilon × total`` with probability
+  ``1 - delta``;
+* a heavy-hitters table holding the ``TRENDING_SKETCH_TOP_K`` audio IDs with
+  the highest estimated counts together with their URL and hash.
+
+Memory is therefore bounded by ``niches × (width × depth + top_k)`` however
+many distinct audio IDs are seen. The sketch counts ``videos`` rows paged in
+by ascending ``id`` above a watermark, so it covers the same rows as an exact
+aggregate over the table up to that ``id``; it catches up when the
+``trending`` cache namespace is invalidated or every
+``TRENDING_RESYNC_SECONDS``. After a sync that counted new rows it is
+snapshotted, with its watermark, to ``TRENDING_SKETCH_PATH`` (when set) so a
+restart only pages in newer rows. Processes sharing the path keep whichever
+snapshot reaches the higher watermark. Rows committed with a lower ``id``
+after a higher one was counted are never picked up.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import time
+import zlib
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..models import TrendingAudio
+from .metrics import record_error, timed
+
+OVERALL = "*"
+SKETCH_COLUMNS = "id,niche,audio_id,audio_url,audio_hash,likes,comments"
+
+
+class CountMinSketch:
+    """Count-Min Sketch tracking a count and an engagement sum per key.
+
+    Counters live in flat ``array`` buffers (row-major ``depth × width``):
+    single-key updates touch only ``depth`` cells, where NumPy indexing
+    overhead would dominate, while :attr:`matrices` exposes zero-copy NumPy
+    views for snapshots.
+    """
+
+    def __init__(self, width: int, depth: int) -> None:
+        self.width = width
+        self.depth = depth
+        self.counts = array("q", bytes(8 * width * depth))
+        self.engagement = array("d", bytes(8 * width * depth))
+        self._offsets = [row * width for row in range(depth)]
+        self.total = 0
+
+    @classmethod
+    def from_error(cls, epsilon: float, delta: float) -> "CountMinSketch":
+        """Size the sketch for additive error ``epsilon × total`` w.p. ``1 - delta``."""
+        return cls(width=math.ceil(math.e / epsilon), depth=math.ceil(math.log(1 / delta)))
+
+    @property
+    def matrices(self) -> Tuple[np.ndarray, np.ndarray]:
+        shape = (self.depth, self.width)
+        return (
+            np.frombuffer(self.counts, dtype=np.int64).reshape(shape),
+            np.frombuffer(self.engagement, dtype=np.float64).reshape(shape),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return (len(self.counts) + len(self.engagement)) * 8
+
+    def _cells(self, key: str) -> List[int]:
+        data = key.encode()
+        h1 = zlib.crc32(data)
+        h2 = zlib.crc32(data, h1) | 1
+        width = self.width
+        return [offset + (h1 + row * h2) % width for row, offset in enumerate(self._offsets)]
+
+    def add(self, key: str, count: int = 1, engagement: float = 0.0) -> int:
+        """Add ``count`` uses of ``key`` and return its new estimated count."""
+        counts, sums = self.counts, self.engagement
+        estimate = None
+        for cell in self._cells(key):
+            value = counts[cell] + count
+            counts[cell] = value
+            sums[cell] += engagement
+            if estimate is None or value < estimate:
+                estimate = value
+        self.total += count
+        return estimate
+
+    def estimate(self, key: str) -> Tuple[int, float]:
+        """Return the (count, engagement) upper-bound estimates for ``key``."""
+        cells = self._cells(key)
+        return min(self.counts[c] for c in cells), min(self.engagement[c] for c in cells)
+
+
+class HeavyHitters:
+    """Count-Min Sketch plus the ``k`` keys with the highest estimated counts."""
+
+    def __init__(self, sketch: CountMinSketch, k: int) -> None:
+        self.sketch = sketch
+        self.k = k
+        self.top: Dict[str, int] = {}
+        self.meta: Dict[str, Tuple[Optional[str], str, Optional[str]]] = {}
+        self._min: Optional[Tuple[str, int]] = None
+
+    def _min_entry(self) -> Tuple[str, int]:
+        if self._min is None:
+            key = min(self.top, key=self.top.__getitem__)
+            self._min = (key, self.top[key])
+        return self._min
+
+    def add(
+        self,
+        key: str,
+        engagement: float = 0.0,
+        meta: Tuple[Optional[str], str, Optional[str]] = (None, "", None),
+    ) -> None:
+        estimate = self.sketch.add(key, 1, engagement)
+        if key in self.top:
+            self.top[key] = estimate
+            if self._min is not None and self._min[0] == key:
+                self._min = None
+            return
+        if len(self.top) >= self.k:
+            min_key, min_count = self._min_entry()
+            if estimate <= min_count:
+                return
+            del self.top[min_key]
+            self.meta.pop(min_key, None)
+            self._min = None
+        self.top[key] = estimate
+        self.meta[key] = meta
+        if self._min is not None and estimate < self._min[1]:
+            self._min = (key, estimate)
+
+    def most_common(self, limit: int) -> List[Tuple[str, int]]:
+        return sorted(self.top.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+
+class AudioSketch:
+    """Per-niche heavy-hitter sketches of audio usage with disk snapshots."""
+
+    def __init__(
+        self,
+        epsilon: Optional[float] = None,
+        delta: Optional[float] = None,
+        top_k: Optional[int] = None,
+        path: Optional[str] = None,
+        resync_seconds: Optional[float] = None,
+    ) -> None:
+        self.epsilon = epsilon or float(os.environ.get("TRENDING_SKETCH_EPSILON", 0.001))
+        self.delta = delta or float(os.environ.get("TRENDING_SKETCH_DELTA", 0.01))
+        self.top_k = top_k or int(os.environ.get("TRENDING_SKETCH_TOP_K", 200))
+        self.path = path if path is not None else os.environ.get("TRENDING_SKETCH_PATH")
+        self.resync_seconds = (
+            resync_seconds
+            if resync_seconds is not None
+            else float(os.environ.get("TRENDING_RESYNC_SECONDS", 900))
+        )
+        self.niches: Dict[str, HeavyHitters] = {}
+        self.watermark = 0
+        self.synced_at: Optional[float] = None
+        self._sync_lock: Optional[asyncio.Lock] = None
+
+    def _niche(self, niche: str) -> HeavyHitters:
+        hitters = self.niches.get(niche)
+        if hitters is None:
+            sketch = CountMinSketch.from_error(self.epsilon, self.delta)
+            hitters = self.niches[niche] = HeavyHitters(sketch, self.top_k)
+        return hitters
+
+    @property
+    def total(self) -> int:
+        overall = self.niches.get(OVERALL)
+        return overall.sketch.total if overall else 0
+
+    @property
+    def ready(self) -> bool:
+        """Whether the sketch caught up with ``videos`` recently enough."""
+        return self.synced_at is not None and time.monotonic() - self.synced_at < self.resync_seconds
+
+    def expire(self, *_: object) -> None:
+        """Page in newer ``videos`` rows before the next query (e.g. after an ingest)."""
+        self.synced_at = None
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the sketch matrices."""
+        return sum(h.sketch.nbytes for h in self.niches.values())
+
+    def error_bound(self, niche: Optional[str] = None) -> float:
+        """Maximum expected count overestimate for ``niche`` (w.p. ``1 - delta``)."""
+        hitters = self.niches.get(niche or OVERALL)
+        return self.epsilon * hitters.sketch.total if hitters else 0.0
+
+    def record(
+        self,
+        niche: Optional[str],
+        audio_id: str,
+        engagement: float = 0.0,
+        url: Optional[str] = None,
+        audio_hash: Optional[str] = None,
+    ) -> None:
+        """Count one use of ``audio_id`` in ``niche`` and overall."""
+        if not audio_id:
+            return
+        meta = (url, audio_hash or "", niche)
+        if niche:
+            self._niche(niche).add(audio_id, engagement, meta)
+        self._niche(OVERALL).add(audio_id, engagement, meta)
+
+    def top(self, niche: Optional[str] = None, limit: int = 10) -> List[TrendingAudio]:
+        """Return the ``limit`` most used audio tracks by estimated count."""
+        hitters = self.niches.get(niche or OVERALL)
+        if hitters is None:
+            return []
+        results: List[TrendingAudio] = []
+        for aid, _ in hitters.most_common(limit):
+            count, engagement = hitters.sketch.estimate(aid)
+            url, audio_hash, first_niche = hitters.meta.get(aid, (None, "", None))
+            results.append(
+                TrendingAudio(
+                    audio_id=aid,
+                    audio_hash=audio_hash,
+                    count=count,
+                    avg_engagement=engagement / count if count else 0.0,
+                    url=url,
+                    niche=niche or first_niche,
+                )
+            )
+        return results
+
+    # -- persistence -------------------------------------------------------
+
+    async def sync(self, repo=None, page_size: Optional[int] = None) -> bool:
+        """Count ``videos`` rows above the watermark; ``False`` without a database."""
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            if self.ready:
+                return True
+            if repo is None:
+                from .database import VideoRepository
+                from .supabase import get_supabase_client
+
+                repo = VideoRepository(get_supabase_client())
+                if not repo.configured:
+                    return False
+            page_size = page_size or int(os.environ.get("TRENDING_SKETCH_PAGE_SIZE", 10000))
+            added = 0
+            with timed("trending.sketch_sync"):
+                while True:
+                    rows = await repo.select(
+                        SKETCH_COLUMNS, gte={"id": self.watermark + 1}, order="id", limit=page_size
+                    )
+                    for r in rows:
+                        self.record(
+                            r.get("niche"),
+                            r.get("audio_id") or "",
+                            engagement=(r.get("likes") or 0) + (r.get("comments") or 0),
+                            url=r.get("audio_url"),
+                            audio_hash=r.get("audio_hash"),
+                        )
+                        self.watermark = max(self.watermark, int(r["id"]))
+                    added += len(rows)
+                    if len(rows) < page_size:
+                        break
+            if added:
+                try:
+                    with timed("trending.sketch_snapshot"):
+                        await asyncio.to_thread(self.snapshot)
+                except Exception:
+                    record_error("trending.sketch_snapshot")
+            self.synced_at = time.monotonic()
+            return True
+
+    def snapshot(self, path: Optional[str] = None) -> bool:
+        """Atomically write all sketches to ``path`` (``.npz``).
+
+        Nothing is written when ``path`` already holds a snapshot at least as
+        far along ``videos``, e.g. one written by another worker.
+        """
+        path = path or self.path
+        if not path or not self.niches or _stored_watermark(path) >= self.watermark:
+            return False
+        arrays: Dict[str, np.ndarray] = {}
+        state = {
+            "epsilon": self.epsilon,
+            "delta": self.delta,
+            "watermark": self.watermark,
+            "niches": [],
+        }
+        for i, (niche, hitters) in enumerate(self.niches.items()):
+            arrays[f"counts_{i}"], arrays[f"engagement_{i}"] = hitters.sketch.matrices
+            state["niches"].append(
+                {
+                    "niche": niche,
+                    "total": hitters.sketch.total,
+                    "top": [[aid, count, *hitters.meta.get(aid, (None, "", None))]
+                            for aid, count in hitters.top.items()],
+                }
+            )
+        arrays["state"] = np.frombuffer(json.dumps(state).encode(), dtype=np.uint8)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp, path)
+        return True
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """Restore sketches written by :meth:`snapshot` with matching error bounds."""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            state = json.loads(data["state"].tobytes().decode())
+            # snapshots without a watermark cannot be continued from ``videos``
+            if (state["epsilon"], state["delta"]) != (self.epsilon, self.delta) or not state.get(
+                "watermark"
+            ):
+                return False
+            niches: Dict[str, HeavyHitters] = {}
+            for i, entry in enumerate(state["niches"]):
+                sketch = CountMinSketch.from_error(self.epsilon, self.delta)
+                counts, engagement = sketch.matrices
+                counts[:] = data[f"counts_{i}"]
+                engagement[:] = data[f"engagement_{i}"]
+                sketch.total = entry["total"]
+                hitters = HeavyHitters(sketch, self.top_k)
+                ranked = sorted(entry["top"], key=lambda e: e[1], reverse=True)
+                for aid, count, url, audio_hash, first_niche in ranked[: self.top_k]:
+                    hitters.top[aid] = count
+                    hitters.meta[aid] = (url, audio_hash, first_niche)
+                niches[entry["niche"]] = hitters
+        self.niches = niches
+        self.watermark = int(state["watermark"])
+        return True
+
+
+def _stored_watermark(path: str) -> int:
+    try:
+        with np.load(path) as data:
+            return int(json.loads(data["state"].tobytes().decode()).get("watermark") or 0)
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+@lru_cache()
+def get_audio_sketch() -> AudioSketch:
+    """Return the process-wide audio sketch, restored from its snapshot if present.
+
+    Every ``trending`` invalidation, including this process's own ingests,
+    makes it page in the rows added since.
+    """
+    from .cache import get_cache
+
+    sketch = AudioSketch()
+    try:
+        sketch.load()
+    except Exception:
+        pass
+    get_cache().on_invalidate("trending", sketch.expire)
+    return sketch
@@ -0,0 +1,353 @@
+"""Columnar, memory-mapped snapshot of the ``videos`` table for analytics.
+
+Rows fetched as Python dicts cost hundreds of bytes each; the analytics paths
+(trending audio, pattern mining) only need a handful of columns. The snapshot
+stores each column as a flat little-endian binary file under
+``VIDEO_SNAPSHOT_DIR`` and maps it read-only with :class:`numpy.memmap`:
+
+* numeric columns (``id``, ``likes``, ``comments``, ``created_at``) as fixed
+  width arrays;
+* ``niche``, ``visual_style`` and ``audio`` (``audio_id`` with its URL, hash
+  and first niche) as ``int32`` codes into small dictionaries kept in ``meta.json``;
+* transcripts as one UTF-8 blob plus ``int64`` end offsets.
+
+A multi-million-row table costs roughly 50 bytes per row plus transcript text,
+and queries run over the mapped arrays without copying. The snapshot is
+refreshed incrementally: rows with an ``id`` above the stored watermark are
+paged in and appended, and ``meta.json`` is rewritten last so a crash mid-way
+leaves the previous snapshot intact. Column files only ever grow: bytes past
+the committed length left by a failed append are overwritten in place, never
+truncated, so files other processes have mapped are not shrunk under them.
+Appends hold an exclusive lock on ``.lock`` in the directory (taken in a
+worker thread, off the event loop) and re-read ``meta.json`` first, so
+several processes sharing ``VIDEO_SNAPSHOT_DIR`` extend the same files rather
+than overwriting each other's rows.
+
+The watermark is the highest ``id`` appended, so a row committed with a lower
+``id`` after a higher one was paged in is never added to the snapshot.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..models import TrendingAudio
+from .metrics import timed
+
+try:  # pragma: no cover - not available on Windows
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+SNAPSHOT_COLUMNS = "id,niche,audio_id,audio_url,audio_hash,likes,comments,visual_style,transcript,created_at"
+
+_DTYPES: Dict[str, str] = {
+    "id": "<i8",
+    "niche": "<i4",
+    "audio": "<i4",
+    "visual_style": "<i4",
+    "likes": "<i8",
+    "comments": "<i8",
+    "created_at": "<f8",
+    "transcript_end": "<i8",
+}
+
+
+def _epoch(value: Any) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if value:
+        try:
+            return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return float("nan")
+
+
+class VideoSnapshot:
+    """Append-only columnar copy of ``videos`` backed by memory-mapped files."""
+
+    def __init__(self, path: str, refresh_seconds: Optional[float] = None) -> None:
+        self.path = path
+        self.refresh_seconds = (
+            refresh_seconds
+            if refresh_seconds is not None
+            else float(os.environ.get("VIDEO_SNAPSHOT_REFRESH_SECONDS", 300))
+        )
+        self.rows = 0
+        self.watermark = 0
+        self.niches: List[str] = []
+        self.styles: List[str] = []
+        self.audio: List[Tuple[str, Optional[str], str, str]] = []
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.empty(0, dtype=dtype) for name, dtype in _DTYPES.items()
+        }
+        self.refreshed_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._codes: Dict[str, Dict[Any, int]] = {"niche": {}, "visual_style": {}, "audio": {}}
+        self._blob = np.empty(0, dtype=np.uint8)
+        self.load()
+
+    # -- files -------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _map(self, name: str, dtype: str, length: int) -> np.ndarray:
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode="r", shape=(length,))
+
+    def load(self) -> None:
+        """Map the column files described by ``meta.json``."""
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+        rows = meta["rows"]
+        niches, styles = meta["niches"], meta["styles"]
+        audio = [tuple(a) for a in meta["audio"]]
+        codes = {
+            "niche": {n: i for i, n in enumerate(niches)},
+            "visual_style": {s: i for i, s in enumerate(styles)},
+            "audio": {a[0]: i for i, a in enumerate(audio)},
+        }
+        columns = {name: self._map(name, dtype, rows) for name, dtype in _DTYPES.items()}
+        blob = self._map("transcript", "u1", meta["transcript_bytes"])
+        # swapped in together; appends run in a worker thread next to queries
+        self.rows, self.watermark, self.niches, self.styles, self.audio = (
+            rows, meta["watermark"], niches, styles, audio
+        )
+        self._codes, self.columns, self._blob = codes, columns, blob
+
+    def _code(self, kind: str, value: Any, values: List) -> int:
+        codes = self._codes[kind]
+        key = value[0] if kind == "audio" else value
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(values)
+            values.append(value)
+        return code
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "a") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def append(self, rows: List[Dict[str, Any]]) -> int:
+        """Append ``videos`` rows (ascending ``id``) and persist the snapshot.
+
+        Rows another process already appended are skipped.
+        """
+        with self._exclusive():
+            # another worker may have appended since this one last loaded
+            self.load()
+            return self._append(rows)
+
+    def _append(self, rows: List[Dict[str, Any]]) -> int:
+        rows = sorted(
+            (r for r in rows if (r.get("id") or 0) > self.watermark), key=lambda r: r["id"]
+        )
+        if not rows:
+            return 0
+        texts = [(r.get("transcript") or "").encode() for r in rows]
+        blob_size = len(self._blob)
+        new = {
+            "id": [r["id"] for r in rows],
+            "niche": [self._code("niche", r.get("niche") or "", self.niches) for r in rows],
+            "audio": [
+                self._code(
+                    "audio",
+                    (
+                        r.get("audio_id") or "",
+                        r.get("audio_url"),
+                        r.get("audio_hash") or "",
+                        r.get("niche") or "",
+                    ),
+                    self.audio,
+                )
+                for r in rows
+            ],
+            "visual_style": [
+                self._code("visual_style", r.get("visual_style") or "", self.styles) for r in rows
+            ],
+            "likes": [int(r.get("likes") or 0) for r in rows],
+            "comments": [int(r.get("comments") or 0) for r in rows],
+            "created_at": [_epoch(r.get("created_at")) for r in rows],
+            "transcript_end": blob_size + np.cumsum([len(t) for t in texts]),
+        }
+        for name, dtype in _DTYPES.items():
+            self._append_file(name, np.asarray(new[name], dtype=dtype), self.rows * np.dtype(dtype).itemsize)
+        self._append_file("transcript", np.frombuffer(b"".join(texts), dtype=np.uint8), blob_size)
+
+        meta = {
+            "rows": self.rows + len(rows),
+            "watermark": int(new["id"][-1]),
+            "transcript_bytes": int(new["transcript_end"][-1]),
+            "niches": self.niches,
+            "styles": self.styles,
+            "audio": self.audio,
+        }
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self.load()
+        return len(rows)
+
+    def _append_file(self, name: str, values: np.ndarray, committed_bytes: int) -> None:
+        # overwrite bytes from any append that never reached meta.json
+        path = self._file(name)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as fh:
+            fh.seek(committed_bytes)
+            fh.write(values.tobytes())
+
+    async def refresh(self, repo=None, page_size: Optional[int] = None) -> int:
+        """Page in rows newer than the watermark; returns how many were added."""
+        if repo is None:
+            from .database import VideoRepository
+            from .supabase import get_supabase_client
+
+            repo = VideoRepository(get_supabase_client())
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        page_size = page_size or int(os.environ.get("VIDEO_SNAPSHOT_PAGE_SIZE", 10000))
+        added = 0
+        async with self._lock:
+            with timed("snapshot.refresh"):
+                # skip pages another process has already appended
+                await asyncio.to_thread(self.load)
+                while True:
+                    rows = await repo.select(
+                        SNAPSHOT_COLUMNS,
+                        gte={"id": self.watermark + 1},
+                        order="id",
+                        limit=page_size,
+                    )
+                    # the file lock may be held by another process
+                    added += await asyncio.to_thread(self.append, rows)
+                    if len(rows) < page_size:
+                        break
+            self.refreshed_at = time.monotonic()
+        return added
+
+    @property
+    def stale(self) -> bool:
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > self.refresh_seconds
+
+    # -- queries -----------------------------------------------------------
+
+    def select(
+        self,
+        niches: Optional[Iterable[str]] = None,
+        ids: Optional[Iterable[int]] = None,
+        limit: Optional[int] = None,
+    ) -> np.ndarray:
+        """Row positions matching ``ids`` or ``niches``; the newest ``limit`` rows."""
+        if ids is not None:
+            # ids are appended in ascending order, so lookups are binary searches
+            wanted = np.unique(np.asarray(list(ids), dtype=np.int64))
+            pos = np.searchsorted(self.columns["id"], wanted)
+            found = pos < self.rows
+            pos, wanted = pos[found], wanted[found]
+            rows = pos[self.columns["id"][pos] == wanted]
+        elif niches is not None:
+            codes = [self._codes["niche"][n] for n in niches if n in self._codes["niche"]]
+            rows = np.flatnonzero(np.isin(self.columns["niche"], codes))
+        else:
+            rows = np.arange(self.rows)
+        if limit is not None:
+            rows = rows[-limit:] if limit > 0 else rows[:0]
+        return rows
+
+    def engagement(self, rows: np.ndarray) -> np.ndarray:
+        return (self.columns["likes"][rows] + self.columns["comments"][rows]).astype(np.float64)
+
+    def transcripts(self, rows: Iterable[int]) -> Iterator[str]:
+        ends = self.columns["transcript_end"]
+        blob = self._blob
+        for row in rows:
+            start = int(ends[row - 1]) if row else 0
+            yield bytes(blob[start : int(ends[row])]).decode()
+
+    def texts(self, rows: np.ndarray) -> Iterator[Tuple[str, str]]:
+        """``(transcript, visual_style)`` pairs for the miner."""
+        styles = self.styles
+        return zip(self.transcripts(rows), (styles[c] for c in self.columns["visual_style"][rows].tolist()))
+
+    def top_audio(self, niche: Optional[str] = None, limit: int = 10) -> List[TrendingAudio]:
+        """All-time audio usage ranking aggregated over the mapped columns."""
+        audio = self.columns["audio"]
+        likes, comments = self.columns["likes"], self.columns["comments"]
+        if niche is not None:
+            code = self._codes["niche"].get(niche)
+            if code is None:
+                return []
+            rows = np.flatnonzero(self.columns["niche"] == code)
+            audio, likes, comments = audio[rows], likes[rows], comments[rows]
+        n_audio = len(self.audio)
+        counts = np.bincount(audio, minlength=n_audio)
+        engagement = np.bincount(audio, weights=likes, minlength=n_audio) + np.bincount(
+            audio, weights=comments, minlength=n_audio
+        )
+        empty = self._codes["audio"].get("")
+        if empty is not None:
+            counts[empty] = 0
+        if limit < n_audio:
+            top = np.argpartition(-counts, limit - 1)[:limit]
+        else:
+            top = np.arange(n_audio)
+        top = top[np.argsort(-counts[top], kind="stable")]
+        results: List[TrendingAudio] = []
+        for code in top.tolist():
+            count = int(counts[code])
+            if not count:
+                break
+            aid, url, audio_hash, first_niche = self.audio[code]
+            results.append(
+                TrendingAudio(
+                    audio_id=aid,
+                    audio_hash=audio_hash,
+                    count=count,
+                    avg_engagement=float(engagement[code]) / count,
+                    url=url,
+                    niche=niche if niche is not None else first_niche,
+                )
+            )
+        return results
+
+
+@lru_cache()
+def _snapshot(path: str) -> VideoSnapshot:
+    return VideoSnapshot(path)
+
+
+async def get_video_snapshot(min_id: Optional[int] = None) -> Optional[VideoSnapshot]:
+    """Return the snapshot, or ``None`` when ``VIDEO_SNAPSHOT_DIR`` is unset.
+
+    It is refreshed when stale or when it does not yet cover ``min_id``.
+    """
+    path = os.environ.get("VIDEO_SNAPSHOT_DIR")
+    if not path:
+        return None
+    snapshot = _snapshot(path)
+    if snapshot.stale or (min_id is not None and min_id > snapshot.watermark):
+        await snapshot.refresh()
+    return snapshot
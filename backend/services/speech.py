@@ -0,0 +1,105 @@
+"""Word-level speech timing and the pacing features derived from it.
+
+Whisper's ``verbose_json`` response lists every word with its start and end
+time. :class:`WordTimings` keeps only those times, as two ``float32`` arrays,
+and stores them as base64 of little-endian ``uint32`` millisecond pairs
+(8 bytes per word) in ``videos.word_timings``. The word strings themselves are
+not kept; the transcript already has them.
+
+:func:`speech_features` computes, with array operations over the words:
+
+* ``time_to_hook`` – seconds until the last word of the hook (the first
+  sentence of the transcript) has been spoken;
+* ``speech_rate`` – words per second between the first and last word;
+* ``pause_density`` – gaps between words of at least
+  ``SPEECH_PAUSE_SECONDS`` per second of speech.
+
+They are computed from the transcription that ingestion already requests,
+so they need no additional pass over the audio.
+"""
+
+from __future__ import annotations
+
+import base64
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+@dataclass
+class WordTimings:
+    """Start and end time in seconds of each spoken word."""
+
+    starts: np.ndarray
+    ends: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def from_response(cls, response: Dict[str, Any]) -> "WordTimings":
+        """Read ``words`` from a verbose transcription, falling back to segments.
+
+        Without word granularity each segment's words are spread evenly over
+        the segment.
+        """
+        words = response.get("words") or []
+        if words:
+            starts = np.fromiter((w.get("start", 0.0) for w in words), np.float32, len(words))
+            ends = np.fromiter((w.get("end", 0.0) for w in words), np.float32, len(words))
+            return cls(starts, ends)
+        segments = response.get("segments") or []
+        counts = np.array([len((s.get("text") or "").split()) for s in segments], dtype=np.int64)
+        seg_starts = np.array([s.get("start", 0.0) for s in segments], dtype=np.float64)
+        seg_ends = np.array([s.get("end", 0.0) for s in segments], dtype=np.float64)
+        # position of every word within its segment, as a fraction of the segment
+        owner = np.repeat(np.arange(len(segments)), counts)
+        index = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        width = (seg_ends - seg_starts)[owner] / counts[owner].clip(min=1)
+        starts = seg_starts[owner] + index * width
+        return cls(starts.astype(np.float32), (starts + width).astype(np.float32))
+
+    def encode(self) -> str:
+        """Base64 of interleaved ``uint32`` millisecond start/end pairs."""
+        packed = np.empty(2 * len(self), dtype="<u4")
+        packed[0::2] = np.round(self.starts * 1000).clip(min=0)
+        packed[1::2] = np.round(self.ends * 1000).clip(min=0)
+        return base64.b64encode(packed.tobytes()).decode()
+
+    @classmethod
+    def decode(cls, data: Optional[str]) -> "WordTimings":
+        packed = np.frombuffer(base64.b64decode(data or ""), dtype="<u4")
+        seconds = packed.astype(np.float32) / 1000
+        return cls(seconds[0::2].copy(), seconds[1::2].copy())
+
+
+def hook_word_count(transcript: str) -> int:
+    """Number of words in the transcript's first sentence (the hook)."""
+    for sentence in (transcript or "").replace("\n", " ").split("."):
+        if sentence.strip():
+            return len(sentence.split())
+    return 0
+
+
+def speech_features(
+    timings: WordTimings, hook_words: int, pause_seconds: Optional[float] = None
+) -> Dict[str, Optional[float]]:
+    """``time_to_hook``, ``speech_rate`` and ``pause_density`` of one video."""
+    if not len(timings):
+        return {"time_to_hook": None, "speech_rate": None, "pause_density": None}
+    pause_seconds = (
+        pause_seconds
+        if pause_seconds is not None
+        else float(os.environ.get("SPEECH_PAUSE_SECONDS", 0.3))
+    )
+    starts, ends = timings.starts, timings.ends
+    span = float(ends[-1] - starts[0])
+    gaps = starts[1:] - ends[:-1]
+    hook_end = ends[min(max(hook_words, 1), len(ends)) - 1]
+    return {
+        "time_to_hook": float(hook_end),
+        "speech_rate": len(timings) / span if span > 0 else None,
+        "pause_density": float(np.count_nonzero(gaps >= pause_seconds)) / span if span > 0 else None,
+    }
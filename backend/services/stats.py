@@ -0,0 +1,205 @@
+"""Streaming engagement statistics used to normalize and score patterns.
+
+Raw likes + comments are heavy-tailed: a handful of mega-viral videos
+dominate any mean. This module provides
+
+* :class:`TDigest` – a merging t-digest (vectorized with NumPy) that keeps a
+  bounded set of centroids and answers quantile/CDF queries, so a video's
+  engagement can be mapped to its percentile within its niche;
+* :class:`EngagementStats` – one digest per niche, fed incrementally as videos
+  are ingested and seeded from the ``videos`` table at startup;
+* :func:`grouped_summary` – per-group count, mean, median, trimmed mean and a
+  normal-approximation confidence interval for the mean, computed for all
+  groups at once from a single sort.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class TDigest:
+    """Merging t-digest over a stream of floats."""
+
+    def __init__(self, compression: float = 200.0, buffer_size: int = 4096) -> None:
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._buffered = 0
+
+    @classmethod
+    def of(cls, values: Iterable[float], compression: float = 200.0) -> "TDigest":
+        digest = cls(compression)
+        digest.update(values)
+        return digest
+
+    def update(self, values: Iterable[float], weights: Optional[np.ndarray] = None) -> None:
+        """Add ``values`` (optionally weighted) to the digest."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not len(values):
+            return
+        weights = (
+            np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)
+        )
+        self._buffer.append((values, weights))
+        self._buffered += len(values)
+        self.count += float(weights.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        if self._buffered >= self.buffer_size:
+            self.compress()
+
+    def merge(self, other: "TDigest") -> None:
+        """Fold another digest's centroids into this one."""
+        other.compress()
+        if other.count:
+            self.update(other.means, other.weights)
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+
+    def compress(self) -> None:
+        """Merge buffered values into centroids sized by the k1 scale function."""
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means, *(v for v, _ in self._buffer)])
+        weights = np.concatenate([self.weights, *(w for _, w in self._buffer)])
+        self._buffer, self._buffered = [], 0
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        # k1-style scale δ/π · asin(2q − 1) (about δ centroids): clusters are
+        # small near the tails where percentile resolution matters most.
+        k = self.compression / math.pi * np.arcsin(np.clip(2 * q - 1, -1, 1))
+        bins = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def _curve(self) -> Tuple[np.ndarray, np.ndarray]:
+        self.compress()
+        cumulative = np.cumsum(self.weights)
+        mid = (cumulative - self.weights / 2) / self.count
+        return np.r_[self.min, self.means, self.max], np.r_[0.0, mid, 1.0]
+
+    def cdf(self, values: Iterable[float]) -> np.ndarray:
+        """Fraction of observations at or below each of ``values``."""
+        values = np.asarray(values, dtype=np.float64)
+        if not self.count:
+            return np.zeros_like(values)
+        xs, ys = self._curve()
+        return np.interp(values, xs, ys)
+
+    def quantile(self, q: Iterable[float]) -> np.ndarray:
+        """Approximate value at each quantile in ``q`` (0–1)."""
+        q = np.asarray(q, dtype=np.float64)
+        if not self.count:
+            return np.zeros_like(q)
+        xs, ys = self._curve()
+        return np.interp(q, ys, xs)
+
+
+def grouped_summary(
+    groups: np.ndarray, values: np.ndarray, trim: float = 0.1, z: float = 1.96
+) -> Dict[str, np.ndarray]:
+    """Robust statistics of ``values`` for each group label ``0..n-1``.
+
+    Every label in ``range(groups.max() + 1)`` must occur at least once.
+    Returns arrays indexed by group: ``count``, ``mean``, ``median``,
+    ``trimmed_mean`` (dropping ``trim`` of each tail, but always keeping the
+    middle value or two, so ``trim >= 0.5`` gives the median) and
+    ``ci_low``/``ci_high`` bounding the mean at ``z`` standard errors.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    counts = np.bincount(groups, minlength=n_groups)
+    mean = np.bincount(groups, weights=values, minlength=n_groups) / counts
+
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    median = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+    cut = np.floor(counts * max(trim, 0.0)).astype(np.int64)
+    cut = np.minimum(cut, (counts - 1) // 2)
+    cumulative = np.r_[0.0, np.cumsum(ordered)]
+    trimmed_mean = (cumulative[starts + counts - cut] - cumulative[starts + cut]) / (counts - 2 * cut)
+
+    squares = np.bincount(groups, weights=(values - mean[groups]) ** 2, minlength=n_groups)
+    variance = np.divide(squares, counts - 1, out=np.zeros(n_groups), where=counts > 1)
+    half_width = z * np.sqrt(variance / counts)
+    return {
+        "count": counts,
+        "mean": mean,
+        "median": median,
+        "trimmed_mean": trimmed_mean,
+        "ci_low": mean - half_width,
+        "ci_high": mean + half_width,
+    }
+
+
+class EngagementStats:
+    """Per-niche engagement distributions maintained as t-digests."""
+
+    def __init__(self, compression: Optional[float] = None, min_samples: Optional[int] = None) -> None:
+        self.compression = compression or float(os.environ.get("ENGAGEMENT_DIGEST_COMPRESSION", 200))
+        self.min_samples = (
+            min_samples
+            if min_samples is not None
+            else int(os.environ.get("ENGAGEMENT_MIN_SAMPLES", 50))
+        )
+        self.digests: Dict[str, TDigest] = {}
+        self.seeded = False
+
+    def update(self, niche: Optional[str], values: Iterable[float]) -> None:
+        """Add engagement values observed for ``niche``."""
+        digest = self.digests.get(niche or "")
+        if digest is None:
+            digest = self.digests[niche or ""] = TDigest(self.compression)
+        digest.update(values)
+
+    def digest(self, niche: Optional[str]) -> Optional[TDigest]:
+        """The niche's digest once it holds at least ``min_samples`` values."""
+        digest = self.digests.get(niche or "")
+        return digest if digest is not None and digest.count >= self.min_samples else None
+
+    async def seed(self, limit: Optional[int] = None) -> bool:
+        """Load recent engagement for every niche from the ``videos`` table."""
+        from .database import VideoRepository
+        from .supabase import get_supabase_client
+
+        repo = VideoRepository(get_supabase_client())
+        if not repo.configured:
+            return False
+        rows = await repo.select(
+            "niche,likes,comments",
+            order="id",
+            desc=True,
+            limit=limit or int(os.environ.get("ENGAGEMENT_SEED_LIMIT", 50000)),
+        )
+        by_niche: Dict[str, List[float]] = {}
+        for r in rows:
+            by_niche.setdefault(r.get("niche") or "", []).append(
+                float((r.get("likes") or 0) + (r.get("comments") or 0))
+            )
+        for niche, values in by_niche.items():
+            self.update(niche, values)
+        self.seeded = True
+        return True
+
+
+@lru_cache()
+def get_engagement_stats() -> EngagementStats:
+    """Return the process-wide engagement statistics."""
+    return EngagementStats()
@@ -0,0 +1,278 @@
+"""Storyboard frame generation with rate limiting and local caching.
+
+A script is split into shots sized by the pacing hint (one frame per
+``pacing`` seconds of narration, capped at ``STORYBOARD_MAX_FRAMES``) and each
+shot becomes an image prompt. Frames are rendered concurrently through the
+configured image backend under a process-wide rate limiter, deduplicated by a
+content hash of the backend, model and prompt, and written to
+``STORYBOARD_DIR`` as WebP together with a thumbnail. Decoding and re-encoding
+run in a small thread pool so they never block the event loop. Stored frames
+are served under ``/media/storyboards`` by every process role.
+
+Backends are selected with ``STORYBOARD_IMAGE_BACKEND``:
+
+* ``openai`` (default) – ``images.generate`` through the shared client;
+* ``stub`` – deterministic local images for tests and benchmarks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import io
+import math
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .llm import get_openai_client
+from .metrics import record_cache, record_error, timed
+from .resilience import RateLimiter, get_dependency
+
+WORDS_PER_SECOND = 2.5
+PLACEHOLDER = "https://via.placeholder.com/512x512.png?text=Storyboard+Frame+{}"
+
+
+def shot_prompts(
+    script: str,
+    prompt: str,
+    pacing_hint: Optional[float] = None,
+    style_hint: Optional[str] = None,
+    max_frames: Optional[int] = None,
+) -> List[str]:
+    """Split ``script`` into shots and return one image prompt per shot.
+
+    The number of shots is the narration length (at ~2.5 words per second)
+    divided by ``pacing_hint`` seconds per shot, bounded by ``max_frames``.
+    """
+    max_frames = max_frames or int(os.environ.get("STORYBOARD_MAX_FRAMES", 6))
+    shot_seconds = pacing_hint or float(os.environ.get("STORYBOARD_SHOT_SECONDS", 3.0))
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", script or "") if s.strip()]
+    if not sentences:
+        sentences = [prompt]
+    words = sum(len(s.split()) for s in sentences)
+    frames = max(1, min(max_frames, len(sentences), math.ceil(words / WORDS_PER_SECOND / shot_seconds)))
+
+    # distribute sentences over frames as evenly as possible, in order
+    shots: List[str] = []
+    per_frame = len(sentences) / frames
+    for i in range(frames):
+        chunk = sentences[round(i * per_frame) : round((i + 1) * per_frame)]
+        shots.append(" ".join(chunk))
+    style = f" Visual style: {style_hint}." if style_hint else ""
+    return [f"Vertical video storyboard frame for '{prompt}'. Scene: {shot}{style}" for shot in shots]
+
+
+class ImageBackend(ABC):
+    """Interface implemented by storyboard image generators."""
+
+    name = "base"
+    model = ""
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> bytes:
+        """Return encoded image bytes (PNG, JPEG or WebP) for ``prompt``."""
+
+
+@lru_cache()
+def _http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(timeout=None)
+
+
+async def _download(url: str) -> bytes:
+    resp = await _http_client().get(url)
+    resp.raise_for_status()
+    return resp.content
+
+
+class OpenAIImageBackend(ImageBackend):
+    """``images.generate`` returning base64 data, or a URL that is downloaded."""
+
+    name = "openai"
+
+    def __init__(self, model: Optional[str] = None, size: Optional[str] = None) -> None:
+        self.model = model or os.environ.get("STORYBOARD_IMAGE_MODEL", "dall-e-3")
+        self.size = size or os.environ.get("STORYBOARD_IMAGE_SIZE", "1024x1792")
+
+    async def generate(self, prompt: str) -> bytes:
+        with timed("openai.images.storyboard"):
+            resp = await get_dependency("openai_images").call(
+                lambda: get_openai_client().images.generate(
+                    model=self.model, prompt=prompt, size=self.size, response_format="b64_json"
+                )
+            )
+        image = resp.data[0]
+        if getattr(image, "b64_json", None):
+            return base64.b64decode(image.b64_json)
+        with timed("storyboard.download"):
+            return await get_dependency("image_download").call(lambda: _download(image.url))
+
+
+class StubImageBackend(ImageBackend):
+    """Deterministic solid-colour frames; records every prompt it renders."""
+
+    name = "stub"
+    model = "stub"
+
+    def __init__(self) -> None:
+        self.calls: List[str] = []
+
+    async def generate(self, prompt: str) -> bytes:
+        from PIL import Image
+
+        self.calls.append(prompt)
+        colour = tuple(hashlib.sha256(prompt.encode()).digest()[:3])
+        buf = io.BytesIO()
+        Image.new("RGB", (288, 512), colour).save(buf, format="PNG")
+        return buf.getvalue()
+
+
+def create_image_backend(name: Optional[str] = None) -> ImageBackend:
+    """Instantiate the backend named by ``name`` or ``STORYBOARD_IMAGE_BACKEND``."""
+    name = (name or os.environ.get("STORYBOARD_IMAGE_BACKEND", "openai")).lower()
+    if name == "stub":
+        return StubImageBackend()
+    if name == "openai":
+        return OpenAIImageBackend()
+    raise ValueError(f"Unknown STORYBOARD_IMAGE_BACKEND {name!r}")
+
+
+def _encode(data: bytes, frame_path: str, thumb_path: str, thumb_width: int, quality: int) -> None:
+    """Re-encode ``data`` as WebP plus a thumbnail (runs in the encoder pool)."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        image.save(f"{frame_path}.tmp", format="WEBP", quality=quality)
+        ratio = thumb_width / image.width
+        image.thumbnail((thumb_width, max(1, round(image.height * ratio))))
+        image.save(f"{thumb_path}.tmp", format="WEBP", quality=quality)
+    os.replace(f"{thumb_path}.tmp", thumb_path)
+    os.replace(f"{frame_path}.tmp", frame_path)
+
+
+@dataclass
+class Frame:
+    """One stored storyboard frame."""
+
+    prompt: str
+    url: str
+    thumbnail_url: str
+    cached: bool = False
+
+
+class Storyboarder:
+    """Renders, caches and stores storyboard frames."""
+
+    def __init__(
+        self,
+        backend: Optional[ImageBackend] = None,
+        directory: Optional[str] = None,
+        public_url: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        images_per_minute: Optional[float] = None,
+    ) -> None:
+        self.backend = backend or create_image_backend()
+        self.directory = directory or os.environ.get("STORYBOARD_DIR", "media/storyboards")
+        self.public_url = (
+            public_url
+            or os.environ.get("STORYBOARD_PUBLIC_URL", "http://localhost:8000/media/storyboards")
+        ).rstrip("/")
+        self.thumb_width = int(os.environ.get("STORYBOARD_THUMBNAIL_WIDTH", 256))
+        self.quality = int(os.environ.get("STORYBOARD_WEBP_QUALITY", 80))
+        self._semaphore = asyncio.Semaphore(
+            concurrency or int(os.environ.get("STORYBOARD_CONCURRENCY", 4))
+        )
+        self._limiter = RateLimiter(
+            images_per_minute or float(os.environ.get("STORYBOARD_IMAGES_PER_MINUTE", 50))
+        )
+        self._encoder = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("STORYBOARD_ENCODE_WORKERS", 2)),
+            thread_name_prefix="storyboard",
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def key(self, prompt: str) -> str:
+        """Content hash identifying a frame for ``prompt`` on this backend/model."""
+        material = "\x00".join((self.backend.name, self.backend.model, prompt))
+        return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.directory, f"{key}.webp"),
+            os.path.join(self.directory, f"{key}_thumb.webp"),
+        )
+
+    def _frame(self, prompt: str, key: str, cached: bool) -> Frame:
+        return Frame(
+            prompt=prompt,
+            url=f"{self.public_url}/{key}.webp",
+            thumbnail_url=f"{self.public_url}/{key}_thumb.webp",
+            cached=cached,
+        )
+
+    async def render(self, prompt: str) -> Frame:
+        """Return the stored frame for ``prompt``, generating it at most once."""
+        key = self.key(prompt)
+        frame_path, _ = self._paths(key)
+        if os.path.exists(frame_path):
+            record_cache("storyboard", True)
+            return self._frame(prompt, key, cached=True)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            record_cache("storyboard", True)
+            await asyncio.shield(pending)
+            return self._frame(prompt, key, cached=True)
+        record_cache("storyboard", False)
+        pending = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            async with self._semaphore:
+                await self._limiter.acquire()
+                data = await self.backend.generate(prompt)
+            os.makedirs(self.directory, exist_ok=True)
+            with timed("storyboard.encode"):
+                await asyncio.get_running_loop().run_in_executor(
+                    self._encoder, _encode, data, frame_path, self._paths(key)[1],
+                    self.thumb_width, self.quality,
+                )
+            pending.set_result(None)
+        except Exception as exc:
+            pending.set_exception(exc)
+            pending.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._inflight[key]
+        return self._frame(prompt, key, cached=False)
+
+    async def build(
+        self,
+        script: str,
+        prompt: str,
+        pacing_hint: Optional[float] = None,
+        style_hint: Optional[str] = None,
+    ) -> List[Optional[Frame]]:
+        """Render every shot of ``script``; failed shots come back as ``None``."""
+        prompts = shot_prompts(script, prompt, pacing_hint, style_hint)
+        results = await asyncio.gather(*(self.render(p) for p in prompts), return_exceptions=True)
+        frames: List[Optional[Frame]] = []
+        for result in results:
+            if isinstance(result, BaseException):
+                record_error("storyboard.frame")
+                frames.append(None)
+            else:
+                frames.append(result)
+        return frames
+
+
+@lru_cache()
+def get_storyboarder() -> Storyboarder:
+    """Return the process-wide storyboarder."""
+    return Storyboarder()
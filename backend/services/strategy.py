@@ -1,58 +1,85 @@
 """Service functions for analyzing content patterns from Supabase."""
 
+import json
 import os
-from typing import List, Optional
+from typing import Any, List, Optional, Sequence
 
 from ..models import Pattern, StrategyRequest, StrategyResponse
+from .cache import get_cache
+from .database import PatternRepository, VideoRepository
+from .metrics import record_error, timed
 from .supabase import get_supabase_client
-from .pattern_miner import mine_patterns_from_records
+from .pattern_miner import (
+    PATTERN_COLUMNS,
+    mine_patterns_from_records,
+    mine_patterns_from_snapshot,
+    store_patterns,
+)
+from .pattern_index import invalidate_patterns
+from .snapshot import get_video_snapshot
+from .stats import get_engagement_stats
 
 
-async def derive_patterns(request: StrategyRequest) -> StrategyResponse:
-    """Fetch video descriptors from Supabase and mine recurring patterns."""
+async def derive_patterns(request: StrategyRequest, merge: bool = False) -> StrategyResponse:
+    """Fetch video descriptors from Supabase and mine recurring patterns.
+
+    Mined patterns are upserted by content key. ``merge`` folds their
+    statistics into the stored patterns and must only be set when
+    ``request.video_ids`` are newly ingested videos (as ``/api/ingest`` does);
+    otherwise only unseen patterns are added.
+    """
     supabase = get_supabase_client()
-    videos = []
-    if supabase:
+    niche = request.niches[0] if request.niches else "general"
+    limit = int(os.environ.get("PATTERN_ANALYSIS_LIMIT", 50))
+    stats = get_engagement_stats()
+
+    try:
+        snapshot = await get_video_snapshot(
+            min_id=max(request.video_ids) if request.video_ids else None
+        )
+    except Exception:
+        snapshot = None
+
+    if snapshot is not None and snapshot.rows:
+        rows = (
+            snapshot.select(ids=request.video_ids)
+            if request.video_ids
+            else snapshot.select(niches=request.niches, limit=limit)
+        )
+        with timed("strategy.mine"):
+            patterns: List[Pattern] = mine_patterns_from_snapshot(
+                snapshot, rows, niche, top_percentile=request.top_percentile, stats=stats
+            )
+    else:
         try:
-            if request.video_ids:
-                query = supabase.table("videos").select(
-                    "id, transcript, pacing, visual_style, onscreen_text, trending_audio, niche, likes, comments"
-                ).in_("id", request.video_ids)
-            else:
-                query = supabase.table("videos").select(
-                    "id, transcript, pacing, visual_style, onscreen_text, trending_audio, niche, likes, comments"
-                ).in_("niche", request.niches)
-            limit = int(os.environ.get("PATTERN_ANALYSIS_LIMIT", 50))
-            videos = query.limit(limit).execute().data or []
+            videos = await VideoRepository(supabase).select(
+                "id, transcript, pacing, visual_style, onscreen_text, trending_audio, niche, likes, comments",
+                in_={"id": request.video_ids} if request.video_ids else {"niche": request.niches},
+                limit=limit,
+            )
         except Exception:
             videos = []
-
-    niche = request.niches[0] if request.niches else "general"
-    patterns: List[Pattern] = mine_patterns_from_records(videos, niche)
+        with timed("strategy.mine"):
+            patterns = mine_patterns_from_records(
+                videos, niche, top_percentile=request.top_percentile, stats=stats
+            )
 
     pattern_ids: List[int] = []
-    if supabase and patterns:
-        rows = [
-            {
-                "niche": p.niche,
-                "hook": p.hook,
-                "core_value_loop": p.core_value_loop,
-                "narrative_arc": p.narrative_arc,
-                "visual_formula": p.visual_formula,
-                "cta": p.cta,
-                "prevalence": p.prevalence,
-                "engagement_score": p.engagement_score,
-            }
-            for p in patterns
-        ]
+    if patterns:
+        merge = merge and bool(request.video_ids)
         try:
-            resp = supabase.table("patterns").insert(rows).execute()
-            if resp.data:
-                for pat, row in zip(patterns, resp.data):
-                    pat.id = row.get("id")
-                pattern_ids = [r.get("id") for r in resp.data]
+            ids = await store_patterns(
+                patterns,
+                merge=merge,
+                last_video_id=max(request.video_ids) if merge else None,
+                repo=PatternRepository(supabase),
+            )
+            for pat in patterns:
+                pat.id = ids.get(pat.content_key)
+            pattern_ids = [pat.id for pat in patterns if pat.id is not None]
         except Exception:
-            pass
+            record_error("patterns.store")
+        await invalidate_patterns(niche)
 
     from .ingestion import get_trending_audio
 
@@ -62,19 +89,42 @@ async def derive_patterns(request: StrategyRequest) -> StrategyResponse:
     )
 
 
-async def fetch_patterns(niche: Optional[str] = None, limit: int = 10) -> List[Pattern]:
-    """Retrieve stored patterns from Supabase ordered by prevalence."""
+async def fetch_patterns(
+    niche: Optional[str] = None,
+    limit: int = 10,
+    after: Optional[Sequence[Any]] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Pattern]:
+    """Retrieve stored patterns from Supabase ordered by prevalence, then id.
 
-    supabase = get_supabase_client()
-    if not supabase:
-        return []
-    try:
-        query = supabase.table("patterns").select(
-            "id,niche,hook,core_value_loop,narrative_arc,visual_formula,cta,prevalence,engagement_score"
-        )
-        if niche:
-            query = query.eq("niche", niche)
-        resp = query.order("prevalence", desc=True).limit(limit).execute()
-        return [Pattern(**r) for r in (resp.data or [])]
-    except Exception:
-        return []
+    ``after`` is the ``(prevalence, id)`` of the previous page's last pattern
+    and starts the page right after it. ``fields`` restricts the selected
+    columns (``id`` and ``prevalence`` are always read for the cursor); such
+    patterns are built without validation and only carry those fields.
+    Results are shared through the ``patterns:<niche>`` cache namespace for
+    ``PATTERN_CACHE_TTL`` seconds.
+    """
+    columns = ",".join(dict.fromkeys(["id", "prevalence", *fields])) if fields else PATTERN_COLUMNS
+
+    async def query() -> List[dict]:
+        try:
+            return await PatternRepository(get_supabase_client()).select(
+                columns,
+                eq={"niche": niche} if niche else None,
+                order="prevalence,id",
+                desc=True,
+                limit=limit,
+                after=after,
+            )
+        except Exception:
+            return []
+
+    rows = await get_cache().get_or_set(
+        f"patterns:{niche or '*'}",
+        json.dumps([limit, after, columns]),
+        query,
+        ttl=float(os.environ.get("PATTERN_CACHE_TTL", 60)),
+    )
+    if fields:
+        return [Pattern.model_construct(**r) for r in rows]
+    return [Pattern(**r) for r in rows]
@@ -1,7 +1,10 @@
 """Utility module for creating a Supabase client used across services."""
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from typing import Any
 from supabase import create_client, Client
 
 
@@ -13,3 +16,16 @@ def get_supabase_client() -> Client | None:
     if not url or not key:
         return None
     return create_client(url, key)
+
+
+@lru_cache()
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the thread pool used to run blocking Supabase requests."""
+    workers = int(os.environ.get("SUPABASE_THREAD_POOL_SIZE", 16))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="supabase")
+
+
+async def execute_async(query: Any) -> Any:
+    """Run a Supabase query builder's blocking ``execute`` off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), query.execute)
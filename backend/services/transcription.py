@@ -1,11 +1,17 @@
 import asyncio
 import os
+import tempfile
 from typing import Dict, Any
 
 import httpx
 
+from .metrics import instrument
+from .resilience import get_dependency, spend_budget
+
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
 
+@instrument("ffmpeg.extract_audio")
 async def extract_audio_from_video(video_url: str, output_path: str) -> str:
     """Download a video's audio track using ffmpeg.
 
@@ -14,7 +20,8 @@ async def extract_audio_from_video(video_url: str, output_path: str) -> str:
     """
     # Use ffmpeg to download audio from the video URL.
     process = await asyncio.create_subprocess_exec(
-        "ffmpeg", "-i", video_url, "-vn", "-acodec", "mp3", output_path,
+        # ``-y``: the output is a temporary file that already exists
+        "ffmpeg", "-y", "-i", video_url, "-vn", "-acodec", "mp3", output_path,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
@@ -24,36 +31,48 @@ async def extract_audio_from_video(video_url: str, output_path: str) -> str:
         raise RuntimeError(f"ffmpeg failed: {stderr.decode()}")
     return output_path
 
+@instrument("groq.transcribe")
 async def transcribe_audio(audio_path: str, use_turbo: bool = False) -> Dict[str, Any]:
     """Transcribe an audio file using Groq's Whisper API.
 
     If ``use_turbo`` is True, the ``whisper-turbo`` model is used; otherwise the
     ``whisper-large`` model is selected. Returns the JSON response from the Groq
-    API.
+    API in ``verbose_json`` form, with ``segments`` and ``words`` timestamps
+    next to ``text``.
     """
     model = "whisper-turbo" if use_turbo else "whisper-large"
-    url = "https://api.groq.com/openai/v1/audio/transcriptions"
+    url = f"{GROQ_BASE_URL}/audio/transcriptions"
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
     }
-    # Read the audio file and send it as multipart/form-data
-    with open(audio_path, "rb") as audio_file:
-        files = {"file": ("audio.mp3", audio_file, "audio/mpeg")}
-        data = {"model": model}
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(url, headers=headers, data=data, files=files, timeout=60)
-            resp.raise_for_status()
-            return resp.json()
+
+    async def post() -> Dict[str, Any]:
+        # Read the audio file and send it as multipart/form-data; reopened per attempt
+        with open(audio_path, "rb") as audio_file:
+            files = {"file": ("audio.mp3", audio_file, "audio/mpeg")}
+            data = {
+                "model": model,
+                "response_format": "verbose_json",
+                "timestamp_granularities[]": ["word", "segment"],
+            }
+            async with httpx.AsyncClient(timeout=None) as client:
+                resp = await client.post(url, headers=headers, data=data, files=files)
+                resp.raise_for_status()
+                return resp.json()
+
+    await spend_budget("groq")
+    return await get_dependency("groq").call(post)
 
 
 async def transcribe_video(video_url: str, use_turbo: bool = False) -> Dict[str, Any]:
     """Extract a video's audio with ffmpeg and transcribe it via Groq Whisper.
 
     This high-level helper downloads the audio track with ``extract_audio_from_video``
-    and then calls ``transcribe_audio``. Temporary audio files are cleaned up after
-    transcription.
+    and then calls ``transcribe_audio``. Each call extracts into its own temporary
+    file, so concurrent ingests never share one, and removes it afterwards.
     """
-    audio_path = "temp_audio.mp3"
+    fd, audio_path = tempfile.mkstemp(suffix=".mp3")
+    os.close(fd)
     try:
         await extract_audio_from_video(video_url, audio_path)
         return await transcribe_audio(audio_path, use_turbo=use_turbo)
@@ -0,0 +1,362 @@
+"""Time-aware trending audio engine backed by in-memory ring buffers.
+
+Every ``(niche, audio_id)`` pair owns one row in two NumPy matrices (usage
+counts and engagement) whose columns form a ring of fixed-width time buckets
+(``TRENDING_BUCKET_SECONDS`` wide, ``TRENDING_BUCKETS`` deep; hourly buckets
+over seven days by default). Top-K queries over any window up to the ring
+length are answered with vectorized column sums, without rescanning the
+``videos`` table:
+
+* ``score`` – usage weighted by exponential decay with a half-life of
+  ``TRENDING_HALF_LIFE_HOURS``;
+* ``velocity`` – uses per hour over the newest third of the window;
+* ``acceleration`` – change in that hourly rate relative to the previous third.
+
+The tracker is seeded from the ``videos`` rows inside the ring horizon on
+startup and updated as this process stores videos. Rows other workers store
+are paged in by ``id`` above a watermark when the ``trending`` cache
+namespace is invalidated remotely and every ``TRENDING_RESYNC_SECONDS``.
+Rows committed with a lower ``id`` after a higher one was read are missed
+until the process restarts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..models import TrendingAudio
+from .database import VideoRepository
+from .metrics import timed
+from .supabase import get_supabase_client
+
+TRACKER_COLUMNS = "id,audio_id,audio_url,audio_hash,niche,likes,comments,created_at"
+_WINDOW = re.compile(r"^(\d+)([mhd])$")
+# window naming the all-time usage ranking rather than a recent span
+ALL_TIME = "all"
+_UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_window(window: str) -> int:
+    """Convert ``"1h"``, ``"24h"``, ``"7d"`` style windows to seconds."""
+    match = _WINDOW.match(window.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid window {window!r}; expected e.g. 1h, 24h or 7d")
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+def _timestamp(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class TrendingTracker:
+    """Ring-buffered per-audio usage counters with decay and velocity scores."""
+
+    def __init__(
+        self,
+        bucket_seconds: Optional[int] = None,
+        buckets: Optional[int] = None,
+        half_life_hours: Optional[float] = None,
+        resync_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.bucket_seconds = bucket_seconds or int(os.environ.get("TRENDING_BUCKET_SECONDS", 3600))
+        self.buckets = buckets or int(os.environ.get("TRENDING_BUCKETS", 168))
+        self.half_life_hours = half_life_hours or float(os.environ.get("TRENDING_HALF_LIFE_HOURS", 24))
+        self.resync_seconds = (
+            resync_seconds
+            if resync_seconds is not None
+            else float(os.environ.get("TRENDING_RESYNC_SECONDS", 900))
+        )
+        self.clock = clock
+        self.synced_at: Optional[float] = None
+        self._sync_lock: Optional[asyncio.Lock] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all counters."""
+        capacity = 1024
+        self.counts = np.zeros((capacity, self.buckets), dtype=np.float32)
+        self.engagement = np.zeros((capacity, self.buckets), dtype=np.float32)
+        self._row_niche = np.zeros(capacity, dtype=np.int32)
+        self._row_audio = np.zeros(capacity, dtype=np.int32)
+        self._rows: Dict[Tuple[int, int], int] = {}
+        self._niches: Dict[str, int] = {}
+        self._audio: Dict[str, int] = {}
+        self._audio_ids: List[str] = []
+        self._audio_meta: List[Tuple[Optional[str], str, Optional[str]]] = []
+        self._epoch: Optional[int] = None
+        # highest ``videos.id`` read from the table; ``None`` until seeded
+        self.watermark: Optional[int] = None
+        # ids above the watermark this process already recorded when storing them
+        self._ahead: Set[int] = set()
+
+    def expire(self, *_: object) -> None:
+        """Read newer ``videos`` rows on the next query (e.g. after another worker ingested)."""
+        self.synced_at = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the tracker was seeded from the database recently enough."""
+        return self.synced_at is not None and time.monotonic() - self.synced_at < self.resync_seconds
+
+    @property
+    def horizon_seconds(self) -> int:
+        return self.bucket_seconds * self.buckets
+
+    # -- updates -----------------------------------------------------------
+
+    def _advance(self, epoch: int) -> None:
+        if self._epoch is None:
+            self._epoch = epoch
+            return
+        if epoch <= self._epoch:
+            return
+        steps = min(epoch - self._epoch, self.buckets)
+        cols = [(self._epoch + i) % self.buckets for i in range(1, steps + 1)]
+        self.counts[:, cols] = 0
+        self.engagement[:, cols] = 0
+        self._epoch = epoch
+
+    def _code(self, mapping: Dict[str, int], key: str) -> int:
+        code = mapping.get(key)
+        if code is None:
+            code = mapping[key] = len(mapping)
+        return code
+
+    def _row(self, niche: str, audio_id: str) -> int:
+        key = (self._code(self._niches, niche), self._code(self._audio, audio_id))
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        if len(self._rows) == len(self.counts):
+            self._compact()
+        if len(self._rows) == len(self.counts):
+            self._grow()
+        row = self._rows[key] = len(self._rows)
+        self._row_niche[row], self._row_audio[row] = key
+        self.counts[row] = 0
+        self.engagement[row] = 0
+        return row
+
+    def _grow(self) -> None:
+        capacity = len(self.counts) * 2
+        for name in ("counts", "engagement"):
+            old = getattr(self, name)
+            new = np.zeros((capacity, self.buckets), dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+        for name in ("_row_niche", "_row_audio"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _compact(self) -> None:
+        """Recycle rows whose counters have all aged out of the ring."""
+        n = len(self._rows)
+        keep = np.flatnonzero(self.counts[:n].sum(axis=1) > 0)
+        if len(keep) == n:
+            return
+        for name in ("counts", "engagement", "_row_niche", "_row_audio"):
+            arr = getattr(self, name)
+            arr[: len(keep)] = arr[keep]
+        self._rows = {
+            (int(self._row_niche[i]), int(self._row_audio[i])): i for i in range(len(keep))
+        }
+
+    def record(
+        self,
+        niche: Optional[str],
+        audio_id: str,
+        engagement: float = 0.0,
+        timestamp: Optional[float] = None,
+        url: Optional[str] = None,
+        audio_hash: Optional[str] = None,
+        video_id: Optional[int] = None,
+    ) -> None:
+        """Count one use of ``audio_id`` in ``niche`` at ``timestamp``.
+
+        ``video_id`` is the stored row's id, so a later sync does not count it again.
+        """
+        if not audio_id or video_id in self._ahead:
+            return
+        if video_id is not None and self.watermark is not None and video_id > self.watermark:
+            self._ahead.add(video_id)
+        now_epoch = int(self.clock() // self.bucket_seconds)
+        self._advance(now_epoch)
+        epoch = int((timestamp if timestamp is not None else self.clock()) // self.bucket_seconds)
+        if epoch > self._epoch:
+            self._advance(epoch)
+        if epoch <= self._epoch - self.buckets:
+            return
+        row = self._row(niche or "", audio_id)
+        col = epoch % self.buckets
+        self.counts[row, col] += 1
+        self.engagement[row, col] += engagement
+        code = self._audio[audio_id]
+        if code == len(self._audio_ids):
+            self._audio_ids.append(audio_id)
+            self._audio_meta.append((url, audio_hash or "", niche))
+
+    # -- queries -----------------------------------------------------------
+
+    def _window(self, window_seconds: int) -> np.ndarray:
+        """Ring columns covering ``window_seconds``, oldest first."""
+        n = max(1, min(self.buckets, math.ceil(window_seconds / self.bucket_seconds)))
+        return np.arange(self._epoch - n + 1, self._epoch + 1) % self.buckets
+
+    def window_count(self, niche: Optional[str], audio_id: str, window: str = "24h") -> int:
+        """Number of uses of ``audio_id`` in ``niche`` within ``window``."""
+        if self._epoch is None:
+            return 0
+        self._advance(int(self.clock() // self.bucket_seconds))
+        key = (self._niches.get(niche or ""), self._audio.get(audio_id))
+        row = self._rows.get(key)
+        if row is None:
+            return 0
+        return int(self.counts[row, self._window(parse_window(window))].sum())
+
+    def top(
+        self, niche: Optional[str] = None, limit: int = 10, window: str = "7d"
+    ) -> List[TrendingAudio]:
+        """Return the ``limit`` audios with the highest decayed score in ``window``."""
+        if self._epoch is None or not self._rows:
+            return []
+        self._advance(int(self.clock() // self.bucket_seconds))
+        n_rows = len(self._rows)
+        cols = self._window(parse_window(window))
+
+        # One weight column per statistic, laid out in ring order so a single
+        # matrix product covers the window without copying bucket columns.
+        width_hours = self.bucket_seconds / 3600.0
+        part = math.ceil(len(cols) / 3)
+        weights = np.zeros((self.buckets, 4), dtype=np.float32)
+        ages = (len(cols) - 1 - np.arange(len(cols))) * width_hours
+        weights[cols, 0] = 1.0
+        weights[cols, 1] = 0.5 ** (ages / self.half_life_hours)
+        weights[cols[-part:], 2] = 1.0
+        if len(cols) > part:
+            weights[cols[-2 * part : -part], 3] = 1.0
+        stats = self.counts[:n_rows] @ weights
+        total, score, recent, previous = stats.T
+        engagement = self.engagement[:n_rows] @ weights[:, 0]
+        part_hours = part * width_hours
+        velocity = recent / part_hours
+        acceleration = (recent - previous) / part_hours / part_hours
+
+        if niche is not None:
+            code = self._niches.get(niche)
+            if code is None:
+                return []
+            rows = np.flatnonzero((self._row_niche[:n_rows] == code) & (total > 0))
+            audio = self._row_audio[rows]
+            metrics = [m[rows] for m in (total, engagement, score, velocity, acceleration)]
+        else:
+            # sum each metric across niches per audio track
+            n_audio = len(self._audio_ids)
+            audio_of = self._row_audio[:n_rows]
+            metrics = [
+                np.bincount(audio_of, weights=m, minlength=n_audio)
+                for m in (total, engagement, score, velocity, acceleration)
+            ]
+            audio = np.flatnonzero(metrics[0] > 0)
+            metrics = [m[audio] for m in metrics]
+
+        total, engagement, score, velocity, acceleration = metrics
+        if limit < len(score):
+            top = np.argpartition(-score, limit - 1)[:limit]
+        else:
+            top = np.arange(len(score))
+        top = top[np.argsort(-score[top], kind="stable")]
+
+        results: List[TrendingAudio] = []
+        for i in top:
+            aid = self._audio_ids[int(audio[i])]
+            url, audio_hash, first_niche = self._audio_meta[int(audio[i])]
+            count = int(total[i])
+            results.append(
+                TrendingAudio(
+                    audio_id=aid,
+                    audio_hash=audio_hash,
+                    count=count,
+                    avg_engagement=float(engagement[i]) / count if count else 0.0,
+                    url=url,
+                    niche=niche if niche is not None else first_niche,
+                    score=float(score[i]),
+                    velocity=float(velocity[i]),
+                    acceleration=float(acceleration[i]),
+                )
+            )
+        return results
+
+    # -- persistence -------------------------------------------------------
+
+    async def sync(self) -> bool:
+        """Seed counters from ``videos`` in the ring horizon, then read rows above the watermark."""
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+        async with self._sync_lock:
+            if self.ready:
+                return True
+            repo = VideoRepository(get_supabase_client())
+            if not repo.configured:
+                return False
+            with timed("trending.sync"):
+                if self.watermark is None:
+                    since = datetime.now(timezone.utc) - timedelta(seconds=self.horizon_seconds)
+                    rows = await repo.select(TRACKER_COLUMNS, gte={"created_at": since})
+                    self.reset()
+                    watermark = 0
+                else:
+                    rows = await repo.select(
+                        TRACKER_COLUMNS, gte={"id": self.watermark + 1}, order="id"
+                    )
+                    watermark = self.watermark
+                for r in rows:
+                    vid = int(r.get("id") or 0)
+                    watermark = max(watermark, vid)
+                    if vid in self._ahead:
+                        continue
+                    self.record(
+                        r.get("niche"),
+                        r.get("audio_id") or "",
+                        engagement=(r.get("likes") or 0) + (r.get("comments") or 0),
+                        timestamp=_timestamp(r.get("created_at")),
+                        url=r.get("audio_url"),
+                        audio_hash=r.get("audio_hash"),
+                    )
+                self.watermark = watermark
+                self._ahead = {vid for vid in self._ahead if vid > watermark}
+            self.synced_at = time.monotonic()
+            return True
+
+
+@lru_cache()
+def get_trending_tracker() -> TrendingTracker:
+    """Return the process-wide trending tracker.
+
+    Ingestion in another process invalidates the ``trending`` cache namespace,
+    which expires this tracker so its next query reads the rows stored since
+    its watermark.
+    """
+    from .cache import get_cache
+
+    tracker = TrendingTracker()
+    get_cache().on_invalidate("trending", tracker.expire, remote_only=True)
+    return tracker
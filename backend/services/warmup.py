@@ -0,0 +1,134 @@
+"""Process roles and the startup warmup hook.
+
+``VIRALSYNTH_ROLE`` selects what a process serves:
+
+* ``api`` – generation, strategy, patterns and trending audio endpoints;
+* ``worker`` – ingestion (scraping and video analysis) plus strategy;
+* ``all`` (default) – everything, as in local development.
+
+:func:`warm_up` primes the caches and client pools the role needs so the
+first request does not pay for them. Set ``VIRALSYNTH_WARMUP=0`` to skip it.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import record_error, timed
+
+ROLES = ("api", "worker", "all")
+
+
+def get_role() -> str:
+    """Return the configured process role."""
+    role = os.environ.get("VIRALSYNTH_ROLE", "all").strip().lower()
+    if role not in ROLES:
+        raise ValueError(f"VIRALSYNTH_ROLE must be one of {', '.join(ROLES)}; got {role!r}")
+    return role
+
+
+async def _supabase() -> None:
+    from .supabase import get_supabase_client, _get_executor
+
+    get_supabase_client()
+    _get_executor()
+
+
+async def _database() -> None:
+    from .database import get_pool
+
+    if os.environ.get("DATABASE_URL"):
+        await get_pool()
+
+
+async def _llm() -> None:
+    from .llm import get_llm, get_openai_client
+
+    get_openai_client()
+    get_llm()
+
+
+async def _storyboard() -> None:
+    from .storyboard import get_storyboarder
+
+    get_storyboarder()
+
+
+async def _pattern_index() -> None:
+    from .pattern_index import get_pattern_index
+
+    await get_pattern_index().warm()
+
+
+async def _trending() -> None:
+    from .sketch import get_audio_sketch
+    from .trending import get_trending_tracker
+
+    get_audio_sketch()
+    await get_trending_tracker().sync()
+
+
+async def _engagement_stats() -> None:
+    from .stats import get_engagement_stats
+
+    stats = get_engagement_stats()
+    if not stats.seeded:
+        await stats.seed()
+
+
+async def _video_snapshot() -> None:
+    from .snapshot import get_video_snapshot
+
+    await get_video_snapshot()
+
+
+async def _analysis() -> None:
+    from .ingestion import preload_analysis_stack
+
+    preload_analysis_stack()
+
+
+Step = Tuple[str, Callable[[], Awaitable[None]]]
+
+STEPS: Dict[str, List[Step]] = {
+    "api": [
+        ("supabase", _supabase),
+        ("database", _database),
+        ("llm", _llm),
+        ("storyboard", _storyboard),
+        ("pattern_index", _pattern_index),
+        ("trending", _trending),
+        ("engagement_stats", _engagement_stats),
+        ("video_snapshot", _video_snapshot),
+    ],
+    "worker": [
+        ("supabase", _supabase),
+        ("database", _database),
+        ("trending", _trending),
+        ("engagement_stats", _engagement_stats),
+        ("video_snapshot", _video_snapshot),
+        ("analysis", _analysis),
+    ],
+}
+STEPS["all"] = STEPS["api"] + [STEPS["worker"][-1]]
+
+
+async def warm_up(role: Optional[str] = None) -> Dict[str, float]:
+    """Run the warmup steps for ``role`` and return each step's duration.
+
+    Failures are recorded as errors and never abort startup.
+    """
+    if os.environ.get("VIRALSYNTH_WARMUP", "1") == "0":
+        return {}
+    durations: Dict[str, float] = {}
+    for name, step in STEPS[role or get_role()]:
+        start = time.perf_counter()
+        try:
+            with timed(f"warmup.{name}"):
+                await step()
+        except Exception:
+            record_error(f"startup.{name}")
+        durations[name] = time.perf_counter() - start
+    return durations
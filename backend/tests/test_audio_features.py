@@ -0,0 +1,144 @@
+import asyncio
+import shutil
+import wave
+
+import numpy as np
+
+from backend.services import audio_features
+from backend.services.audio_features import analyse_audio, analyse_signal, beat_aligned
+
+SR = 22050
+
+
+def _click_track(seconds=12.0, bpm=120.0, drop_at=6.0):
+    t = np.arange(int(SR * seconds)) / SR
+    y = np.random.default_rng(0).normal(0, 0.002, len(t))
+    click = int(0.03 * SR)
+    envelope = np.sin(2 * np.pi * 1000 * t[:click]) * np.exp(-np.arange(click) / (0.005 * SR))
+    for beat in np.arange(0, seconds, 60 / bpm):
+        start = int(beat * SR)
+        y[start : start + click] += (0.1 if beat < drop_at else 0.6) * envelope[: len(y) - start]
+    y[int(drop_at * SR) :] += 0.2 * np.sin(2 * np.pi * 80 * t[int(drop_at * SR) :])
+    return y.astype(np.float32)
+
+
+def test_tempo_onsets_and_drop_of_a_click_track():
+    features = analyse_signal(_click_track(), SR)
+    assert abs(features["tempo"] - 120) < 2
+    assert 1.5 < features["onset_density"] < 2.5
+    assert len(features["drops"]) == 1 and abs(features["drops"][0] - 6.0) < 0.5
+    assert len(features["loudness_envelope"]) == 23  # 2 values per second
+    assert features["loudness_envelope"][-1] > features["loudness_envelope"][0] + 6
+
+
+def test_beat_alignment_snaps_to_whole_beats():
+    assert beat_aligned(2.3, 120) == 2.5
+    assert beat_aligned(0.1, 120) == 0.5
+    assert beat_aligned(2.3, None) == 2.3
+
+
+class FakeRepo:
+    def __init__(self):
+        self.rows = {}
+
+    async def select(self, columns, in_=None, **kwargs):
+        return [dict(self.rows[h]) for h in in_["audio_hash"] if h in self.rows]
+
+    async def upsert(self, rows, on_conflict):
+        for row in rows:
+            self.rows[row[on_conflict]] = row
+        return rows
+
+
+def test_each_audio_is_decoded_once_in_the_pool(tmp_path):
+    path = tmp_path / "track.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SR)
+        wav.writeframes((_click_track(seconds=6.0, drop_at=3.0) * 32767).astype("<i2").tobytes())
+    repo = FakeRepo()
+    calls = []
+
+    async def fetch(url, dest):
+        calls.append(url)
+        shutil.copyfile(url, dest)
+
+    first = asyncio.run(analyse_audio({"hash-pool-test": str(path)}, repo=repo, fetch=fetch))
+    again = asyncio.run(analyse_audio({"hash-pool-test": str(path)}, repo=repo, fetch=fetch))
+    assert calls == [str(path)]
+    assert abs(first["hash-pool-test"]["tempo"] - 120) < 2
+    assert again == first
+    assert repo.rows["hash-pool-test"]["tempo"] == first["hash-pool-test"]["tempo"]
+
+
+def test_analysis_runs_in_the_background_and_always_fetches(monkeypatch, tmp_path):
+    started, release, fetched = asyncio.Event(), asyncio.Event(), []
+
+    async def slow_analysis(urls):
+        started.set()
+        await release.wait()
+        return await analyse_audio(urls, repo=FakeRepo())
+
+    async def download(url, dest):
+        fetched.append(url)
+        raise OSError("offline")
+
+    monkeypatch.setattr(audio_features, "analyse_audio", slow_analysis)
+    monkeypatch.setattr(audio_features, "_download", download)
+    local = tmp_path / "track.wav"
+    local.write_bytes(b"RIFF")
+
+    async def run():
+        task = audio_features.analyse_audio_later({"hash-local": str(local)})
+        await started.wait()
+        assert not task.done()
+        release.set()
+        await task
+        return task.result()
+
+    assert asyncio.run(run()) is None
+    # a URL naming a local file is still handed to the downloader
+    assert fetched == [str(local)]
+
+
+def test_downloads_are_bounded_streamed_and_cancelled_on_shutdown(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from backend.loadtest.fakes import FakeApify
+
+    monkeypatch.setenv("AUDIO_DOWNLOAD_CONCURRENCY", "2")
+    pool, threads = audio_features._pool, ThreadPoolExecutor(2)
+    monkeypatch.setattr(audio_features, "_pool", lambda: threads)
+    monkeypatch.setattr(audio_features, "analyse_file", lambda path: {"tempo": 120.0})
+    active, peak = [0], [0]
+
+    async def fetch(url, dest):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+
+    urls = {f"hash-{i}": f"https://audio/{i}" for i in range(8)}
+    analysed = asyncio.run(analyse_audio(urls, repo=FakeRepo(), fetch=fetch))
+    assert len(analysed) == 8 and peak[0] == 2
+    threads.shutdown()
+    monkeypatch.setattr(audio_features, "_pool", pool)
+
+    with FakeApify(items=1) as fake:
+        dest = tmp_path / "streamed.wav"
+        asyncio.run(audio_features._download(f"{fake.url}/media/audio-0.wav", str(dest)))
+    assert dest.read_bytes()[:4] == b"RIFF"
+
+    async def stuck(urls):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(audio_features, "analyse_audio", stuck)
+
+    async def shutdown():
+        task = audio_features.analyse_audio_later({"hash-stuck": "https://audio/stuck"})
+        await asyncio.sleep(0)
+        await audio_features.shutdown_audio_analysis()
+        return task
+
+    assert asyncio.run(shutdown()).cancelled() and not audio_features._background
@@ -0,0 +1,144 @@
+import asyncio
+
+from backend.benchmarks.fixtures import FakeRedisServer
+from backend.services.cache import Cache, MemoryBackend, RedisBackend, SQLiteBackend
+
+
+def test_memory_backend_evicts_lru_and_expires():
+    async def run():
+        backend = MemoryBackend(max_entries=2)
+        await backend.set("a", b"1")
+        await backend.set("b", b"2")
+        await backend.get("a")  # "b" is now least recently used
+        await backend.set("c", b"3")
+        await backend.set("short", b"x", ttl=0.01)
+        await asyncio.sleep(0.02)
+        assert await backend.get_many(["a", "b", "c", "short"]) == [None, None, b"3", None]
+        await backend.set("d", b"4")
+        await backend.set("e", b"5")
+        assert await backend.incr("version") == 1
+        await backend.set("f", b"6")
+        # counters survive eviction pressure
+        assert await backend.incr("version") == 2
+
+    asyncio.run(run())
+
+
+def test_sqlite_cache_is_shared_and_invalidated_across_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def run():
+        worker_a = Cache(SQLiteBackend(path), version_ttl=0)
+        worker_b = Cache(SQLiteBackend(path), version_ttl=0)
+        seen = []
+        worker_b.on_invalidate("patterns:fitness", seen.append, remote_only=True)
+        assert await worker_b.poll() == []
+
+        await worker_a.set("patterns:fitness", "10", [{"hook": "h"}], ttl=60)
+        assert await worker_b.get("patterns:fitness", "10") == [{"hook": "h"}]
+
+        await worker_a.invalidate("patterns:fitness")
+        assert await worker_b.get("patterns:fitness", "10") is None
+        assert await worker_b.poll() == ["patterns:fitness"]
+        assert seen == ["patterns:fitness"]
+
+        # local invalidations do not call remote-only listeners
+        await worker_b.invalidate("patterns:fitness")
+        assert seen == ["patterns:fitness"]
+        assert await worker_b.poll() == []
+        await worker_a.close()
+        await worker_b.close()
+
+    asyncio.run(run())
+
+
+def test_redis_backend_against_local_stand_in():
+    with FakeRedisServer() as server:
+
+        async def run():
+            cache = Cache(RedisBackend(server.url), version_ttl=0)
+            await cache.set("trending", "k", [1, 2], ttl=60)
+            assert await cache.get("trending", "k") == [1, 2]
+            await cache.invalidate("trending")
+            assert await cache.get("trending", "k") is None
+            await cache.set("trending", "short", [3], ttl=0.01)
+            await asyncio.sleep(0.02)
+            assert await cache.get("trending", "short") is None
+            await cache.close()
+
+        asyncio.run(run())
+        assert server.commands > 0
+
+
+def test_cache_failures_are_misses():
+    async def run():
+        cache = Cache(RedisBackend("redis://127.0.0.1:1/0"))
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            return {"ok": True}
+
+        assert await cache.get_or_set("trending", "k", factory) == {"ok": True}
+        assert calls == [1]
+
+    asyncio.run(run())
+
+
+def test_get_or_set_computes_once_for_concurrent_callers():
+    async def run():
+        cache = Cache(MemoryBackend())
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [len(calls)]
+
+        results = await asyncio.gather(*(cache.get_or_set("generate:x", "k", factory) for _ in range(5)))
+        assert results == [[1]] * 5
+        assert await cache.get_or_set("generate:x", "k", factory) == [1]
+        assert len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_waiting_caller_takes_over_when_the_computing_one_is_cancelled():
+    async def run():
+        cache = Cache(MemoryBackend())
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return [len(calls)]
+
+        leader = asyncio.ensure_future(cache.get_or_set("generate:x", "k", factory))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(cache.get_or_set("generate:x", "k", factory))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await asyncio.wait_for(follower, 1) == [2]
+        assert leader.cancelled() and len(calls) == 2
+
+    asyncio.run(run())
+
+
+def test_leases_and_expiring_counters_on_every_backend(tmp_path):
+    async def check(backend):
+        assert await backend.acquire("lease", "a", ttl=0.2)
+        assert await backend.acquire("lease", "a", ttl=0.2)
+        assert not await backend.acquire("lease", "b", ttl=0.2)
+        await asyncio.sleep(0.3)
+        assert await backend.acquire("lease", "b", ttl=0.2)
+        assert not await backend.acquire("lease", "a", ttl=0.2)
+
+        assert [await backend.incr("window", ttl=0.2) for _ in range(3)] == [1, 2, 3]
+        await asyncio.sleep(0.3)
+        assert await backend.incr("window", ttl=0.2) == 1
+        await backend.close()
+
+    asyncio.run(check(MemoryBackend()))
+    asyncio.run(check(SQLiteBackend(str(tmp_path / "cache.sqlite3"))))
+    with FakeRedisServer() as server:
+        asyncio.run(check(RedisBackend(server.url)))
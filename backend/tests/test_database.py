@@ -0,0 +1,138 @@
+import asyncio
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+sys.modules.setdefault(
+    "supabase", types.SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+)
+
+from backend.services import database
+from backend.services.database import (
+    PatternRepository,
+    Repository,
+    build_call,
+    build_delete,
+    build_rest_keyset,
+    build_select,
+    build_upsert,
+)
+
+
+def test_build_select_parameterizes_filters():
+    sql, args = build_select(
+        "patterns",
+        "id, hook",
+        eq={"niche": "tech"},
+        in_={"id": [1, 2]},
+        order="engagement_score",
+        desc=True,
+        limit=5,
+    )
+    assert sql == (
+        "SELECT id, hook FROM patterns WHERE niche = $1 AND id = ANY($2) "
+        "ORDER BY engagement_score DESC LIMIT $3"
+    )
+    assert args == ["tech", [1, 2], 5]
+
+    with pytest.raises(ValueError):
+        build_select("patterns", "id; drop table patterns")
+
+
+def test_keyset_pages_compare_rows_after_the_cursor():
+    sql, args = build_select(
+        "patterns", "id", eq={"niche": "tech"}, order="prevalence,id", desc=True, limit=2, after=[0.5, 7]
+    )
+    assert sql == (
+        "SELECT id FROM patterns WHERE niche = $1 AND (prevalence, id) < ($2, $3) "
+        "ORDER BY prevalence DESC, id DESC LIMIT $4"
+    )
+    assert args == ["tech", 0.5, 7, 2]
+    assert build_rest_keyset("prevalence,id", [0.5, 7], desc=True) == (
+        "prevalence.lt.0.5,and(prevalence.eq.0.5,id.lt.7)"
+    )
+    assert build_rest_keyset("score,audio_id", [1, "a,b"]) == 'score.gt.1,and(score.eq.1,audio_id.gt."a,b")'
+
+
+def test_build_upsert_updates_everything_but_the_conflict_target():
+    sql, args = build_upsert(
+        "patterns", [{"content_key": "a", "hook": "x"}, {"content_key": "b", "hook": "y"}], "content_key"
+    )
+    assert sql == (
+        "INSERT INTO patterns (content_key, hook) VALUES ($1, $2), ($3, $4) "
+        "ON CONFLICT (content_key) DO UPDATE SET hook = EXCLUDED.hook RETURNING *"
+    )
+    assert args == ["a", "x", "b", "y"]
+    assert build_delete("patterns", {"id": [1, 2]}) == ("DELETE FROM patterns WHERE id = ANY($1)", [[1, 2]])
+    with pytest.raises(ValueError):
+        build_delete("patterns", {})
+    assert build_call("merge_patterns", {"batch": [{"hook": "x"}]}) == (
+        "SELECT * FROM merge_patterns(batch => $1)", [[{"hook": "x"}]]
+    )
+
+
+def test_rest_fallback_runs_off_event_loop(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    calls = []
+
+    class Query:
+        def __getattr__(self, name):
+            def chain(*args, **kwargs):
+                calls.append(name)
+                return self
+
+            return chain
+
+        def execute(self):
+            calls.append(threading.current_thread().name)
+            return types.SimpleNamespace(data=[{"id": 1}])
+
+    client = types.SimpleNamespace(table=lambda name: Query())
+
+    rows = asyncio.run(
+        PatternRepository(client).select("id", eq={"niche": "tech"}, limit=1)
+    )
+    assert rows == [{"id": 1}]
+    assert calls[:3] == ["select", "eq", "limit"]
+    assert calls[-1].startswith("supabase")
+    assert asyncio.run(PatternRepository(None).select("id")) == []
+
+
+@pytest.mark.skipif(
+    not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set"
+)
+def test_asyncpg_roundtrip(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", os.environ["TEST_DATABASE_URL"])
+
+    class ScratchRepository(Repository):
+        table = "viralsynth_test_scratch"
+
+    async def run_test():
+        pool = await database.get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS viralsynth_test_scratch "
+                "(id serial primary key, niche text, score double precision, meta jsonb)"
+            )
+        try:
+            repo = ScratchRepository()
+            stored = await repo.insert(
+                [
+                    {"niche": "tech", "score": 1.0, "meta": {"a": 1}},
+                    {"niche": "tech", "score": 2.0, "meta": None},
+                ]
+            )
+            assert [r["niche"] for r in stored] == ["tech", "tech"]
+            rows = await repo.select(
+                "id, score, meta", eq={"niche": "tech"}, order="score", desc=True, limit=1
+            )
+            assert rows[0]["score"] == 2.0
+        finally:
+            async with pool.acquire() as conn:
+                await conn.execute("DROP TABLE viralsynth_test_scratch")
+            await database.close_pool()
+
+    asyncio.run(run_test())
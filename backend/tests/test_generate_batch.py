@@ -0,0 +1,81 @@
+import json
+import sys
+import types
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.modules.setdefault(
+    "supabase", types.SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+)
+
+from backend.models import Pattern, PlatformVariation, GenerateResponse
+
+
+def test_batch_endpoint_resolves_assets_once_per_niche_and_bulk_inserts(monkeypatch):
+    from backend.routers import generate as generate_router
+    from backend.services import generation
+
+    resolved = []
+    inserts = []
+
+    async def fake_resolve(niche=None, pattern_ids=None):
+        resolved.append(niche)
+        return generation.GenerationAssets(
+            audio=None,
+            patterns=[
+                Pattern(
+                    id=7,
+                    hook="h",
+                    core_value_loop="c",
+                    narrative_arc="a",
+                    visual_formula="v",
+                    cta="t",
+                )
+            ],
+        )
+
+    async def fake_build(request, assets):
+        response = GenerateResponse(
+            script=f"script for {request.prompt}",
+            storyboard=[],
+            notes=[],
+            variations={"tiktok": PlatformVariation(hook="h", cta="c")},
+            pattern_ids=[7],
+            patterns=assets.patterns,
+        )
+        return response, {"prompt": request.prompt}
+
+    class FakeRepo:
+        def __init__(self, client):
+            pass
+
+        async def insert(self, rows):
+            inserts.append(list(rows))
+            return [{"id": 100 + i} for i, _ in enumerate(rows)]
+
+    monkeypatch.setattr(generation, "resolve_assets", fake_resolve)
+    monkeypatch.setattr(generation, "build_package", fake_build)
+    monkeypatch.setattr(generation, "PackageRepository", FakeRepo)
+
+    app = FastAPI()
+    app.include_router(generate_router.router)
+    payload = {
+        "requests": [
+            {"prompt": f"idea {i}", "niche": "tech" if i % 2 else "fitness"}
+            for i in range(5)
+        ],
+        "concurrency": 2,
+    }
+    resp = TestClient(app).post("/api/generate/batch", json=payload)
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+
+    packages = {line["index"]: line["package"] for line in lines if "package" in line}
+    assert sorted(packages) == [0, 1, 2, 3, 4]
+    assert packages[3]["script"] == "script for idea 3"
+    assert sorted(resolved) == ["fitness", "tech"]
+    assert len(inserts) == 1 and len(inserts[0]) == 5
+    assert lines[-1]["done"] is True
+    assert len(lines[-1]["package_ids"]) == 5
+    assert set(lines[-1]["package_ids"]) == {100, 101, 102, 103, 104}
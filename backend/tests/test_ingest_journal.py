@@ -0,0 +1,148 @@
+import asyncio
+
+from backend.services import ingestion
+from backend.services.ingest_journal import ANALYSED, PENDING, STORED, IngestJournal, ingest_key
+
+
+def test_journal_checkpoints_survive_reopening(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+
+    async def run():
+        journal = IngestJournal(path)
+        assert await journal.items("r1", "fitness") is None
+        await journal.start("r1", "fitness", [{"url": "a"}, {"url": "b"}], "apify", 5)
+        await journal.analysed("r1", "fitness", 0, {"url": "a", "likes": 3})
+        await journal.stored("r1", "fitness", 0, 11)
+        await journal.analysed("r1", "fitness", 1, {"url": "b"})
+        await journal.close()
+
+        reopened = IngestJournal(path)
+        items = await reopened.items("r1", "fitness")
+        assert [(i.status, i.video_id) for i in items] == [(STORED, 11), (ANALYSED, None)]
+        assert items[0].row == {"url": "a", "likes": 3} and items[1].item == {"url": "b"}
+        [progress] = await reopened.runs(unfinished=True)
+        assert (progress["items"], progress["analysed"], progress["stored"]) == (2, 1, 1)
+        await reopened.finish("r1", "fitness")
+        assert await reopened.runs(unfinished=True) == []
+        await reopened.close()
+
+        expired = IngestJournal(path, retention_days=-1)
+        assert await expired.runs() == []
+        await expired.close()
+
+    asyncio.run(run())
+
+
+def test_resumed_ingest_only_redoes_unfinished_items(tmp_path, monkeypatch):
+    journal = IngestJournal(str(tmp_path / "journal.sqlite3"))
+    scraped, analysed = [], []
+    crash = {"c"}
+
+    class FakeRepo:
+        rows = {}
+        failing = {"b"}
+        configured = True
+
+        def __init__(self, client):
+            pass
+
+        async def upsert(self, rows, on_conflict):
+            assert on_conflict == "ingest_key"
+            row = rows[0]
+            if row["url"] in self.failing:
+                raise ConnectionError("supabase unavailable")
+            stored = self.rows.setdefault(row["ingest_key"], {**row, "id": len(self.rows) + 1})
+            return [stored]
+
+    async def fake_scrape(niche, percentile, provider_name):
+        scraped.append(niche)
+        return [{"url": u, "likes": i} for i, u in enumerate("abc")]
+
+    async def fake_analyse(niche, provider_name, item):
+        if item["url"] in crash:
+            raise RuntimeError("worker restarted")
+        analysed.append(item["url"])
+        return {"niche": niche, "url": item["url"], "likes": item["likes"]}
+
+    monkeypatch.setenv("AUDIO_ANALYSIS_WORKERS", "0")
+    monkeypatch.setattr(ingestion, "get_ingest_journal", lambda: journal)
+    monkeypatch.setattr(ingestion, "get_supabase_client", lambda: object())
+    monkeypatch.setattr(ingestion, "VideoRepository", FakeRepo)
+    monkeypatch.setattr(ingestion, "_scrape", fake_scrape)
+    monkeypatch.setattr(ingestion, "_analyse_item", fake_analyse)
+
+    async def run():
+        try:
+            await ingestion.ingest_niche("fitness", 5, run_id="run-1")
+        except RuntimeError:
+            pass
+        statuses = [i.status for i in await journal.items("run-1", "fitness")]
+        assert statuses == [STORED, ANALYSED, PENDING]
+
+        crash.clear()
+        FakeRepo.failing = set()
+        records = await ingestion.ingest_niche("fitness", 5, run_id="run-1")
+        assert [(r.url, r.id) for r in records] == [("a", 1), ("b", 2), ("c", 3)]
+        assert scraped == ["fitness"]
+        assert analysed == ["a", "b", "c"]
+        assert len(FakeRepo.rows) == 3
+
+        # a completed run is served from the journal
+        again = await ingestion.ingest_niche("fitness", 5, run_id="run-1")
+        assert [r.id for r in again] == [1, 2, 3] and analysed == ["a", "b", "c"]
+        [progress] = await journal.runs("run-1")
+        assert progress["status"] == "completed" and progress["stored"] == 3
+        await journal.close()
+
+    asyncio.run(run())
+
+
+def test_ingest_keys_follow_the_video_not_its_position(tmp_path, monkeypatch):
+    tiktok = "https://www.tiktok.com/@a/video/1?is_from_webapp=1&utm_source=x"
+    assert ingest_key("r", "n", {"url": tiktok}) == ingest_key("r", "n", {"url": "https://tiktok.com/@a/video/1/"})
+    assert ingest_key("r", "n", {"url": "https://youtube.com/watch?v=a"}) != ingest_key(
+        "r", "n", {"url": "https://youtube.com/watch?v=b"}
+    )
+    assert ingest_key("r", "n", {"id": 7, "url": "x"}) == ingest_key("r", "n", {"id": 7, "url": "y"})
+
+    class BrokenJournal:
+        async def items(self, run_id, niche):
+            raise OSError("journal unavailable")
+
+    class FakeRepo:
+        rows = {}
+        configured = True
+
+        def __init__(self, client):
+            pass
+
+        async def upsert(self, rows, on_conflict):
+            row = rows[0]
+            self.rows[row["ingest_key"]] = row
+            return [{**row, "id": list(self.rows).index(row["ingest_key"]) + 1}]
+
+    order = [["a", "b", "c"], ["c", "a", "b"]]
+
+    async def fake_scrape(niche, percentile, provider_name):
+        return [{"url": f"https://v/{u}", "likes": ord(u)} for u in order.pop(0)]
+
+    async def fake_analyse(niche, provider_name, item):
+        return {"niche": niche, "url": item["url"], "likes": item["likes"]}
+
+    monkeypatch.setenv("AUDIO_ANALYSIS_WORKERS", "0")
+    monkeypatch.setattr(ingestion, "get_ingest_journal", lambda: BrokenJournal())
+    monkeypatch.setattr(ingestion, "get_supabase_client", lambda: object())
+    monkeypatch.setattr(ingestion, "VideoRepository", FakeRepo)
+    monkeypatch.setattr(ingestion, "_scrape", fake_scrape)
+    monkeypatch.setattr(ingestion, "_analyse_item", fake_analyse)
+
+    async def run():
+        first = await ingestion.ingest_niche("fitness", 5, run_id="run-2")
+        # re-scraped in another order without the journal: each video keeps its row
+        second = await ingestion.ingest_niche("fitness", 5, run_id="run-2")
+        assert {r.url: r.id for r in first} == {r.url: r.id for r in second}
+        assert sorted((r["url"], r["likes"]) for r in FakeRepo.rows.values()) == [
+            ("https://v/a", 97), ("https://v/b", 98), ("https://v/c", 99)
+        ]
+
+    asyncio.run(run())
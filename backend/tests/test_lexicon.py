@@ -0,0 +1,46 @@
+import json
+import os
+
+from backend.services.lexicon import Automaton, Lexicon, get_lexicon
+
+
+def test_automaton_reports_overlapping_phrases_via_failure_links():
+    automaton = Automaton({"a b c": "x", "b c d": "y", "c": "z", "b": "w"})
+    found = [(i, category) for i, category, _, _ in automaton.scan("a b c d".split())]
+    assert found == [(1, "w"), (2, "x"), (2, "z"), (3, "y")]
+    assert automaton.counts("a b c d".split()) == {"w": 1, "x": 1, "z": 1, "y": 1}
+
+
+def test_classify_reports_categories_with_positions():
+    lexicon = Lexicon(
+        {
+            "arc": {"story": ["once"], "tutorial": ["step", "how to"]},
+            "hook": {"question": ["why"], "secret": ["secret"]},
+            "cta": {"follow": ["follow"], "link": ["link in bio"]},
+        }
+    )
+    text = "Why is this a SECRET? Once I learned how to cook. Step two. Link in bio, follow."
+    result = lexicon.classify(text)
+    # ties go to the category listed first
+    assert (result.arc, result.hook_type, result.cta_type) == ("tutorial", "question", "follow")
+    spans = {(m.kind, m.phrase): text[m.start:m.end] for m in result.matches}
+    assert spans[("hook", "secret")] == "SECRET"
+    assert spans[("arc", "how to")] == "how to"
+    assert spans[("cta", "link in bio")] == "Link in bio"
+    # phrases match whole words only
+    assert lexicon.arc("A concept of history") == "informational"
+
+
+def test_lexicon_file_extends_builtins_per_niche(tmp_path, monkeypatch):
+    path = tmp_path / "lexicon.json"
+    path.write_text(json.dumps({"niches": {"fitness": {"arc": {"transformation": ["before and after"]}}}}))
+    monkeypatch.setenv("PATTERN_LEXICON_PATH", str(path))
+    assert get_lexicon("fitness").arc("My before and after") == "transformation"
+    assert get_lexicon("tech").arc("My before and after") == "informational"
+    assert get_lexicon("fitness").arc("Once upon a time") == "story"
+    assert get_lexicon("fitness") is get_lexicon("fitness")
+
+    path.write_text(json.dumps({"arc": {"story": ["legend"]}}))
+    os.utime(path, ns=(1, 1))
+    assert get_lexicon("fitness").arc("A legend, once") == "story"
+    assert get_lexicon("fitness").arc("My before and after") == "informational"
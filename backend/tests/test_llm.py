@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from backend.services.llm import MicroBatcher, StubBackend, create_backend
+
+
+def test_micro_batcher_merges_concurrent_prompts():
+    backend = StubBackend()
+    batcher = MicroBatcher(backend, max_batch_size=4, max_wait_ms=5)
+
+    async def run_test():
+        return await asyncio.gather(*(batcher.complete(f"prompt {i}") for i in range(6)))
+
+    results = asyncio.run(run_test())
+    assert [len(call) for call in backend.calls] == [4, 2]
+    assert results == [StubBackend._respond(f"prompt {i}") for i in range(6)]
+
+
+def test_stub_backend_is_deterministic_and_returns_variation_json(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    backend = create_backend()
+    assert isinstance(backend, StubBackend)
+
+    async def run_test():
+        first = await backend.complete("Script: x\\nReturn JSON object mapping platform")
+        second = await backend.complete("Script: x\\nReturn JSON object mapping platform")
+        return first, second
+
+    first, second = asyncio.run(run_test())
+    assert first == second
+    assert set(json.loads(first)) == {"tiktok", "instagram", "youtube"}
+
+
+def test_batch_failure_propagates_to_every_caller():
+    class FailingBackend(StubBackend):
+        async def complete_batch(self, prompts):
+            raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(FailingBackend(), max_batch_size=2, max_wait_ms=1)
+
+    async def run_test():
+        return await asyncio.gather(
+            batcher.complete("a"), batcher.complete("b"), return_exceptions=True
+        )
+
+    results = asyncio.run(run_test())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_openai_backend_streams_and_records_time_to_first_token():
+    from backend.benchmarks.fixtures import StubOpenAIServer
+    from backend.services.llm import TIME_TO_FIRST_TOKEN, OpenAIBackend, get_openai_client
+
+    before = TIME_TO_FIRST_TOKEN.count("openai")
+    with StubOpenAIServer():
+        get_openai_client.cache_clear()
+        try:
+            text = asyncio.run(OpenAIBackend().complete("Provide platform-specific hooks"))
+        finally:
+            get_openai_client.cache_clear()
+    assert json.loads(text)["tiktok"] == {"hook": "tiktok hook", "cta": "tiktok cta"}
+    assert TIME_TO_FIRST_TOKEN.count("openai") == before + 1
@@ -0,0 +1,93 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+from postgrest import SyncPostgrestClient
+
+from backend.loadtest.fakes import FakeApify, FakeGroq, FakePostgREST, Latency
+from backend.loadtest.run import saturation_point
+from backend.services.database import VideoRepository
+
+
+def test_postgrest_fake_serves_the_supabase_repository():
+    with FakePostgREST() as fake:
+        # the PostgREST client the supabase package wraps (other tests stub ``supabase``)
+        repo = VideoRepository(SyncPostgrestClient(f"{fake.url}/rest/v1"))
+
+        async def run():
+            stored = await repo.insert(
+                [{"niche": "tech", "url": f"v{i}", "likes": i % 3} for i in range(6)]
+                + [{"niche": "food", "url": "v6", "likes": 9}]
+            )
+            assert [r["id"] for r in stored] == [1, 2, 3, 4, 5, 6, 7]
+            page = await repo.select(
+                "id,likes", eq={"niche": "tech"}, order="likes,id", desc=True, limit=2, after=[2, 6]
+            )
+            assert page == [{"id": 3, "likes": 2}, {"id": 5, "likes": 1}]
+            assert await repo.select("url", in_={"url": ["v1", "v6", "nope"]}, gte={"likes": 5}) == [
+                {"url": "v6"}
+            ]
+            await repo.upsert([{"url": "v0", "niche": "tech", "likes": 50}], on_conflict="url")
+            await repo.delete(in_={"url": ["v1", "v2"]})
+            return await repo.select("url,likes", eq={"niche": "tech"}, order="likes", desc=True)
+
+        rows = asyncio.run(run())
+    assert rows[0] == {"url": "v0", "likes": 50}
+    assert sorted(r["url"] for r in rows) == ["v0", "v3", "v4", "v5"]
+
+
+def test_latency_specs_and_injected_errors():
+    rng = random.Random(1)
+    assert Latency("fixed:0.25").sample(rng) == 0.25
+    assert all(0.1 <= Latency("uniform:0.1,0.2").sample(rng) <= 0.2 for _ in range(50))
+    samples = sorted(Latency("lognormal:0.2,0.5").sample(rng) for _ in range(501))
+    assert samples[250] == pytest.approx(0.2, rel=0.2)
+    with pytest.raises(ValueError):
+        Latency("normal:1")
+
+    with FakeGroq(error_rate=0.5, error_status=429) as fake:
+        statuses = [
+            httpx.post(f"{fake.url}/openai/v1/audio/transcriptions", files={"file": b"x"}).status_code
+            for _ in range(40)
+        ]
+        assert httpx.get(f"{fake.url}/health").status_code == 200
+    assert set(statuses) == {200, 429}
+    assert fake.requests == 40 and fake.errors == statuses.count(429)
+
+
+def test_apify_fake_returns_videos_with_seekable_media():
+    with FakeApify(items=4) as fake:
+        items = httpx.post(
+            f"{fake.url}/v2/acts/fake~trending/run-sync-get-dataset-items", json={"niche": "tech"}
+        ).json()
+        assert len(items) == 4 and all(i["url"].startswith(f"{fake.url}/media/tech-") for i in items)
+        audio = httpx.get(items[0]["audio_url"])
+        tail = httpx.get(items[0]["audio_url"], headers={"Range": "bytes=-10"})
+    assert audio.content[:4] == b"RIFF"
+    assert tail.status_code == 206 and tail.content == audio.content[-10:]
+
+
+def test_saturation_is_the_first_step_that_stops_scaling():
+    def step(concurrency, throughput, p99=100.0, errors=0.0):
+        return {"concurrency": concurrency, "throughput_per_s": throughput, "p99_ms": p99, "error_rate": errors}
+
+    steps = [step(4, 100), step(8, 190), step(16, 200), step(32, 150)]
+    assert saturation_point(steps, slo_p99_ms=500)["concurrency"] == 16
+    assert saturation_point(steps[:2] + [step(16, 300, p99=900)], slo_p99_ms=500)["concurrency"] == 16
+    assert saturation_point([step(4, 100), step(8, 200, errors=0.05)], slo_p99_ms=500)["concurrency"] == 8
+    assert saturation_point(steps[:2], slo_p99_ms=500) is None
+
+
+def test_apify_scrapes_through_the_actor_api_and_failures_scrape_nothing(monkeypatch):
+    from backend.services import ingestion
+
+    monkeypatch.setattr(ingestion, "APIFY_TOKEN", "fake-token")
+    with FakeApify(items=3) as fake:
+        monkeypatch.setattr(ingestion, "APIFY_BASE_URL", fake.url)
+        items = asyncio.run(ingestion._ingest_niche_apify("tech", 5))
+    assert [i["likes"] >= 0 for i in items] == [True] * 3
+
+    with FakeApify(error_rate=1.0, error_status=400) as fake:
+        monkeypatch.setattr(ingestion, "APIFY_BASE_URL", fake.url)
+        assert asyncio.run(ingestion._ingest_niche_apify("tech", 5)) == []
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import metrics as metrics_router
+from backend.services.metrics import (
+    OPERATION_ERRORS,
+    OPERATION_LATENCY,
+    instrument,
+    record_cache,
+    timed,
+)
+
+
+def test_timed_records_latency_and_errors():
+    with timed("test.ok"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timed("test.fail"):
+            raise RuntimeError("boom")
+
+    assert OPERATION_LATENCY.count("test.ok") == 1
+    assert OPERATION_LATENCY.count("test.fail") == 1
+    assert OPERATION_ERRORS.value("test.fail") == 1
+    assert OPERATION_ERRORS.value("test.ok") == 0
+
+
+def test_instrument_wraps_async_functions():
+    @instrument("test.async")
+    async def work(x):
+        return x * 2
+
+    assert asyncio.run(work(2)) == 4
+    assert OPERATION_LATENCY.count("test.async") == 1
+
+
+def test_metrics_endpoint_renders_prometheus_text():
+    record_cache("test_cache", hit=True)
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+    resp = TestClient(app).get("/metrics")
+    assert resp.status_code == 200
+    body = resp.text
+    assert "# TYPE viralsynth_operation_duration_seconds histogram" in body
+    assert 'viralsynth_cache_requests_total{cache="test_cache",result="hit"} 1.0' in body
+    assert 'le="+Inf"' in body
@@ -0,0 +1,63 @@
+import asyncio
+import sys
+import types
+
+sys.modules.setdefault(
+    "supabase", types.SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+)
+
+from backend.models import Pattern
+from backend.services import pattern_index
+from backend.services.pattern_index import NicheIndex, PatternIndex
+
+
+def _pattern(pid, hook, core, score):
+    return Pattern(
+        id=pid,
+        niche="fitness",
+        hook=hook,
+        core_value_loop=core,
+        narrative_arc="informational",
+        visual_formula="lo-fi",
+        cta="Follow for more",
+        engagement_score=score,
+    )
+
+
+PATTERNS = [
+    _pattern(1, "Stop skipping leg day", "Three squat variations for strength", 900.0),
+    _pattern(2, "Meal prep in ten minutes", "High protein breakfast ideas", 500.0),
+    _pattern(3, "Morning stretch routine", "Mobility drills for desk workers", 50.0),
+]
+
+
+def test_search_prefers_prompt_relevance_weighted_by_engagement():
+    index = NicheIndex(PATTERNS, dim=256)
+    assert [p.id for p in index.search("quick protein breakfast meal prep", 2)][0] == 2
+    assert index.search("mobility stretch for desk workers", 1)[0].id == 3
+    # Unknown vocabulary degrades to pure engagement ordering
+    assert [p.id for p in index.search("zzz", 3)] == [1, 2, 3]
+
+
+def test_index_loads_once_and_reloads_after_invalidation(monkeypatch):
+    loads = []
+
+    class FakeRepo:
+        def __init__(self, client):
+            pass
+
+        async def select(self, columns, **kwargs):
+            loads.append(kwargs.get("eq"))
+            return [p.model_dump() for p in PATTERNS]
+
+    monkeypatch.setattr(pattern_index, "PatternRepository", FakeRepo)
+    index = PatternIndex(ttl=60, dim=256)
+
+    async def run_test():
+        await asyncio.gather(*(index.search("fitness", "squat strength", 1) for _ in range(5)))
+        index.invalidate("fitness")
+        return await index.search("fitness", "squat strength", 1)
+
+    top = asyncio.run(run_test())
+    assert top[0].id == 1
+    assert loads == [{"niche": "fitness"}, {"niche": "fitness"}]
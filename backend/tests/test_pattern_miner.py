@@ -1,3 +1,4 @@
+import asyncio
 import math
 
 from backend.services.pattern_miner import mine_patterns_from_records
@@ -34,9 +35,152 @@ def test_mine_patterns_from_records_groups_and_stats():
     assert math.isclose(p1.engagement_score, 22.5, rel_tol=1e-5)
     assert p1.narrative_arc == "informational"
     assert p1.visual_formula == "lofi"
+    assert (p1.hook_type, p1.cta_type) == ("secret", "follow")
 
     # Second pattern stats
     p2 = next(p for p in patterns if p.hook == "Here is my story")
     assert math.isclose(p2.prevalence, 1 / 3, rel_tol=1e-5)
     assert math.isclose(p2.engagement_score, 5.0, rel_tol=1e-5)
     assert p2.narrative_arc == "story"
+    assert (p2.hook_type, p2.cta_type) == (None, "follow")
+
+
+from backend.models import Pattern  # noqa: E402
+from backend.services.pattern_miner import (  # noqa: E402
+    compact_patterns,
+    content_key,
+    merge_pattern_stats,
+    store_patterns,
+)
+
+
+class FakePatternRepo:
+    """In-memory ``patterns`` table supporting the repository calls used here."""
+
+    def __init__(self, rows=()):
+        self.rows = {r["id"]: dict(r) for r in rows}
+        self.next_id = max(self.rows, default=0) + 1
+
+    async def select(self, columns, eq=None, in_=None, gte=None, order=None, desc=False, limit=None):
+        await asyncio.sleep(0)  # let concurrent callers interleave, as over a network
+        rows = [dict(r) for r in self.rows.values()]
+        for col, value in (eq or {}).items():
+            rows = [r for r in rows if r.get(col) == value]
+        for col, values in (in_ or {}).items():
+            rows = [r for r in rows if r.get(col) in set(values)]
+        for col, value in (gte or {}).items():
+            rows = [r for r in rows if r.get(col) is not None and r[col] >= value]
+        if order:
+            rows.sort(key=lambda r: r[order], reverse=desc)
+        return rows[:limit] if limit is not None else rows
+
+    async def upsert(self, rows, on_conflict):
+        stored = []
+        for row in rows:
+            match = next(
+                (r for r in self.rows.values() if r.get(on_conflict) == row.get(on_conflict)), None
+            )
+            if match is None:
+                match = self.rows[self.next_id] = {"id": self.next_id}
+                self.next_id += 1
+            match.update(row)
+            stored.append(dict(match))
+        return stored
+
+    async def rpc(self, function, params):
+        # merge_patterns: one atomic statement per call, like the database function
+        assert function == "merge_patterns"
+        await asyncio.sleep(0)
+        stored = []
+        for row in params["batch"]:
+            match = next((r for r in self.rows.values() if r["content_key"] == row["content_key"]), None)
+            if match is None:
+                stored += await self.upsert([row], "content_key")
+                continue
+            merged = merge_pattern_stats(Pattern(**match), Pattern(**row))
+            match.update(merged.model_dump(exclude={"id"}))
+            stored.append(dict(match))
+        return stored
+
+    async def delete(self, in_):
+        for col, values in in_.items():
+            for row_id in [i for i, r in self.rows.items() if r.get(col) in set(values)]:
+                del self.rows[row_id]
+
+
+def _records(likes):
+    return [
+        {"transcript": "Try this hack. Post daily. Follow for more.", "visual_style": "lofi",
+         "likes": like, "comments": 0}
+        for like in likes
+    ] + [{"transcript": "Other hook. Other loop. Other cta.", "visual_style": "lofi",
+          "likes": 1, "comments": 0}]
+
+
+def test_content_key_ignores_case_whitespace_and_trailing_punctuation():
+    a = Pattern(niche="tech", hook="Try this hack!", core_value_loop="Post  daily",
+                narrative_arc="informational", visual_formula="lofi", cta="Follow")
+    b = a.model_copy(update={"hook": "  try this HACK", "core_value_loop": "post daily."})
+    c = a.model_copy(update={"niche": "fitness"})
+    assert content_key(a) == content_key(b) != content_key(c)
+
+
+def test_merging_disjoint_batches_matches_mining_them_together():
+    first, second = [10, 20, 30], [40, 100]
+    key = "Try this hack"
+    a = next(p for p in mine_patterns_from_records(_records(first), "tech") if p.hook == key)
+    b = next(p for p in mine_patterns_from_records(_records(second), "tech") if p.hook == key)
+    both = next(
+        p for p in mine_patterns_from_records(_records(first) + _records(second), "tech")
+        if p.hook == key
+    )
+    merged = merge_pattern_stats(a, b)
+    assert merged.video_count == both.video_count == 5
+    assert math.isclose(merged.prevalence, both.prevalence)
+    assert math.isclose(merged.engagement_score, both.engagement_score)
+    assert math.isclose(merged.engagement_ci_low, both.engagement_ci_low)
+    assert math.isclose(merged.engagement_ci_high, both.engagement_ci_high)
+
+
+def test_store_patterns_upserts_by_content_key():
+    repo = FakePatternRepo()
+    first = mine_patterns_from_records(_records([10, 20]), "tech")
+    ids = asyncio.run(store_patterns(first, last_video_id=3, repo=repo))
+    assert len(repo.rows) == 2
+
+    again = mine_patterns_from_records(_records([30]), "tech")
+    assert asyncio.run(store_patterns(again, last_video_id=5, repo=repo)) == ids
+    assert len(repo.rows) == 2
+    stored = repo.rows[ids[content_key(first[0])]]
+    assert stored["video_count"] == 3
+    assert stored["last_video_id"] == 5
+
+    # concurrent merges of the same patterns keep every count
+    async def concurrently():
+        await asyncio.gather(*(store_patterns(list(again), last_video_id=9, repo=repo) for _ in range(4)))
+
+    asyncio.run(concurrently())
+    assert repo.rows[stored["id"]]["video_count"] == 7
+
+    # without merge existing statistics are left alone
+    asyncio.run(store_patterns(again, merge=False, repo=repo))
+    assert repo.rows[stored["id"]]["video_count"] == 7
+
+
+def test_compaction_collapses_legacy_duplicates():
+    base = dict(niche="tech", hook="Hook", core_value_loop="Loop", narrative_arc="story",
+                visual_formula="lofi", cta="Follow", prevalence=0.5)
+    repo = FakePatternRepo([
+        {"id": 1, **base, "engagement_score": 10.0},
+        {"id": 2, **base, "hook": "hook.", "engagement_score": 30.0},
+        {"id": 3, **base, "cta": "Subscribe", "engagement_score": 5.0},
+        {"id": 4, **base, "engagement_score": 50.0},
+    ])
+    removed = asyncio.run(compact_patterns(page_size=2, repo=repo))
+    assert removed == 2
+    assert sorted(repo.rows) == [1, 3]
+    assert math.isclose(repo.rows[1]["engagement_score"], 30.0)
+    assert repo.rows[1]["video_count"] is None
+    assert repo.rows[1]["content_key"] == content_key(Pattern(**base))
+    assert repo.rows[3]["content_key"] is not None
+    assert asyncio.run(compact_patterns(repo=repo)) == 0
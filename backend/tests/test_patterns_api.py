@@ -16,7 +16,7 @@ def test_list_patterns_endpoint(monkeypatch):
 
     app = FastAPI()
     app.include_router(patterns_router.router)
-    async def fake_fetch_patterns(niche=None, limit=10):
+    async def fake_fetch_patterns(niche=None, limit=10, **kwargs):
         return [
             Pattern(
                 id=1,
@@ -41,3 +41,49 @@ def test_list_patterns_endpoint(monkeypatch):
     assert data[0]["hook"] == "Bold claim"
     assert data[0]["prevalence"] == 0.5
     assert data[0]["engagement_score"] == 100.0
+
+
+def test_patterns_pages_by_cursor_with_projection_and_etag(monkeypatch):
+    sys.modules.setdefault(
+        "supabase", SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+    )
+    from backend.routers import patterns as patterns_router
+    from backend.services import strategy
+
+    rows = [
+        {"id": i, "niche": "tech", "hook": f"hook {i}", "core_value_loop": "", "narrative_arc": "",
+         "visual_formula": "", "cta": "", "prevalence": p}
+        for i, p in [(1, 0.9), (2, 0.5), (3, 0.5), (4, 0.1)]
+    ]
+    selects = []
+
+    class FakeRepo:
+        def __init__(self, client):
+            pass
+
+        async def select(self, columns, eq=None, order=None, desc=False, limit=None, after=None):
+            selects.append((columns, order, after))
+            ranked = sorted(rows, key=lambda r: (r["prevalence"], r["id"]), reverse=True)
+            if after is not None:
+                ranked = [r for r in ranked if (r["prevalence"], r["id"]) < tuple(after)]
+            return [{c: r.get(c) for c in columns.split(",")} for r in ranked[:limit]]
+
+    monkeypatch.setattr(strategy, "PatternRepository", FakeRepo)
+    monkeypatch.setattr(strategy, "get_supabase_client", lambda: None)
+    app = FastAPI()
+    app.include_router(patterns_router.router)
+    client = TestClient(app)
+
+    first = client.get("/api/patterns/?niche=paging&limit=2&fields=hook")
+    assert first.json() == [{"hook": "hook 1"}, {"hook": "hook 3"}]
+    assert selects[-1] == ("id,prevalence,hook", "prevalence,id", None)
+    second = client.get(f"/api/patterns/?niche=paging&limit=2&fields=hook&cursor={first.headers['x-next-cursor']}")
+    assert second.json() == [{"hook": "hook 2"}, {"hook": "hook 4"}]
+    assert selects[-1][2] == [0.5, 3]
+
+    unchanged = client.get(
+        "/api/patterns/?niche=paging&limit=2&fields=hook", headers={"If-None-Match": first.headers["etag"]}
+    )
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert client.get("/api/patterns/?fields=nope").status_code == 400
+    assert client.get("/api/patterns/?cursor=bogus").status_code == 400
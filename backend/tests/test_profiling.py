@@ -0,0 +1,95 @@
+import asyncio
+import json
+import pstats
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import metrics as metrics_router
+from backend.services import profiling
+from backend.services.metrics import timed, trace
+
+
+def test_timed_operations_nest_into_a_span_tree():
+    async def query(name):
+        with timed(name):
+            await asyncio.sleep(0.01)
+
+    async def run():
+        with trace("POST /api/generate") as root:
+            with timed("chooser.assets"):
+                await asyncio.gather(query("supabase.patterns.select"), query("trending.top"))
+            with timed("llm.script"):
+                pass
+        return root
+
+    tree = asyncio.run(run()).to_dict()
+    assert [c["name"] for c in tree["children"]] == ["chooser.assets", "llm.script"]
+    children = tree["children"][0]["children"]
+    assert sorted(c["name"] for c in children) == ["supabase.patterns.select", "trending.top"]
+    assert all(c["duration_ms"] >= 10 for c in children)
+    assert tree["duration_ms"] >= tree["children"][0]["duration_ms"]
+    # outside a trace nothing is collected
+    with timed("chooser.assets"):
+        pass
+
+
+def _app(slow_seconds=0.0):
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware, slow_seconds=slow_seconds)
+    app.include_router(metrics_router.router)
+
+    @app.get("/slow")
+    async def slow():
+        with timed("supabase.videos.select"):
+            await asyncio.sleep(0.05)
+        deadline = time.perf_counter() + 0.03
+        while time.perf_counter() < deadline:
+            pass
+        return {"ok": True}
+
+    @app.get("/fast")
+    async def fast():
+        return {"ok": True}
+
+    return app
+
+
+def test_slow_requests_are_logged_with_their_spans(tmp_path, monkeypatch):
+    log = tmp_path / "slow.jsonl"
+    monkeypatch.setenv("SLOW_REQUEST_LOG", str(log))
+    monkeypatch.setenv("PROFILE_TOKEN", "secret")
+    profiling._SLOW.clear()
+    client = TestClient(_app(slow_seconds=0.04))
+    assert client.get("/fast").status_code == 200
+    assert client.get("/slow").status_code == 200
+
+    [record] = [json.loads(line) for line in log.read_text().splitlines()]
+    assert (record["route"], record["status"]) == ("/slow", 200)
+    assert record["spans"]["children"][0]["name"] == "supabase.videos.select"
+    assert client.get("/api/profiles/slow").status_code == 404
+    listed = client.get("/api/profiles/slow", headers={"X-Profile-Token": "secret"}).json()
+    assert [r["path"] for r in listed] == ["/slow"]
+
+
+def test_profiles_require_the_token_and_are_downloadable(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_TOKEN", "secret")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_INTERVAL", "0.001")
+    client = TestClient(_app())
+
+    assert "x-profile-id" not in client.get("/slow", headers={"X-Profile-Token": "wrong"}).headers
+
+    resp = client.get("/slow", headers={"X-Profile-Token": "secret", "X-Profile": "cprofile"})
+    name = resp.headers["x-profile-id"]
+    assert name.endswith(".prof")
+    stats = pstats.Stats(str(tmp_path / name))
+    assert any(func[2] == "slow" for func in stats.stats)
+
+    resp = client.get("/slow?profile_token=secret")
+    name = resp.headers["x-profile-id"]
+    folded = client.get(f"/api/profiles/{name}", headers={"X-Profile-Token": "secret"}).text
+    assert any(line.rsplit(";", 1)[-1].startswith("slow (test_profiling.py:") for line in folded.splitlines())
+    assert client.get(f"/api/profiles/{name}").status_code == 404
+    assert client.get("/api/profiles/..%2Fsecrets", headers={"X-Profile-Token": "secret"}).status_code == 404
@@ -0,0 +1,79 @@
+import pytest
+
+from backend.models import Pattern
+from backend.services.prompts import (
+    PROMPT_TOKENS,
+    PromptBuilder,
+    count_tokens,
+    pattern_lines,
+    truncate_tokens,
+)
+
+
+def _pattern(hook, value, score, cta="Follow for more"):
+    return Pattern(
+        hook=hook,
+        core_value_loop=value,
+        narrative_arc="Problem-solution reveal",
+        visual_formula="Lo-fi selfie clips",
+        cta=cta,
+        engagement_score=score,
+    )
+
+
+def test_token_counting_and_truncation():
+    assert count_tokens("") == 0
+    assert count_tokens("Three tips, 2024!") == 6
+    # long words split like BPE sub-words
+    assert count_tokens("internationalisation") == 3
+    text = "one two three four five six"
+    assert truncate_tokens(text, 6) == text
+    cut = truncate_tokens(text, 4)
+    assert cut == "one two three…" and count_tokens(cut) == 4
+
+
+def test_pattern_lines_rank_dedupe_and_fit_the_budget():
+    transcript = " ".join(f"word{i}" for i in range(500))
+    patterns = [
+        _pattern("Ask a bold question", "Three rapid tips", 10.0),
+        _pattern("Start with the result", transcript, 900.0),
+        _pattern("ask a  BOLD question", "Three rapid tips", 50.0, cta="Save this"),
+    ]
+    lines = pattern_lines(patterns, budget=1000, field_tokens=20)
+    assert lines[0].startswith("- Hook: Start with the result; Value: word0")
+    assert count_tokens(lines[0].split("; ")[1]) <= 22
+    # the weakest pattern restates the stronger ones and is left out entirely
+    assert lines[1] == "- Hook: ask a  BOLD question; Value: Three rapid tips; CTA: Save this"
+    assert len(lines) == 2
+
+    assert pattern_lines(patterns, budget=30, field_tokens=20) == []
+    assert len(pattern_lines(patterns, budget=count_tokens(lines[0]) + 1, field_tokens=20)) == 1
+
+
+def test_prompts_share_a_prefix_and_stay_within_budget():
+    patterns = [
+        _pattern(f"Hook {i}", " ".join(f"step{j}" for j in range(300)), float(i)) for i in range(5)
+    ]
+    before = PROMPT_TOKENS.count("variations")
+    prompts = PromptBuilder(budget=400, field_tokens=40).build(
+        patterns, "Trending audio: a1. Pacing target: 1.5 sec per shot.", "3 productivity tips"
+    )
+    script_prompt = prompts.script()
+    variations_prompt = prompts.variations("Open strong. " * 400)
+    assert script_prompt.startswith(prompts.prefix) and variations_prompt.startswith(prompts.prefix)
+    assert "Hook 4" in prompts.prefix and "Trending audio: a1." in prompts.prefix
+    assert count_tokens(prompts.prefix) <= 200
+    assert count_tokens(script_prompt) <= 400 and count_tokens(variations_prompt) <= 400
+    assert script_prompt.endswith("Generate a viral video script for: 3 productivity tips")
+    assert "Return JSON" in variations_prompt and "Open strong." in variations_prompt
+    assert PROMPT_TOKENS.count("variations") == before + 1
+
+
+def test_long_context_never_crowds_out_the_script():
+    prompts = PromptBuilder(budget=200, field_tokens=40).build([], "Style note. " * 300, "tips")
+    assert count_tokens(prompts.prefix) <= 100
+    assert "Script: Open strong." in prompts.variations("Open strong. " * 50)
+
+    tiny = PromptBuilder(budget=20, field_tokens=40).build([], "", "tips")
+    with pytest.raises(ValueError):
+        tiny.variations("Open strong.")
@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.benchmarks.fixtures import FaultInjectingServer
+from backend.services.resilience import (
+    BREAKER_STATE,
+    DEPENDENCY_HEDGES,
+    CircuitBreaker,
+    CircuitOpenError,
+    Dependency,
+    Policy,
+    get_rate_budget,
+    load_policy,
+    spend_budget,
+)
+
+
+def _get(url):
+    async def call():
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(url)
+            resp.raise_for_status()
+            return resp.json()
+
+    return call
+
+
+def test_transient_failures_are_retried_with_backoff():
+    dep = Dependency("test_retry", Policy(timeout=2, retries=2, backoff_base=0.01))
+    with FaultInjectingServer(schedule=["fail", "fail"]) as server:
+        result = asyncio.run(dep.call(_get(server.url)))
+    assert result["action"] == "ok"
+    assert server.requests == 3
+
+
+def test_client_errors_and_inserts_are_not_retried():
+    dep = Dependency("test_no_retry", Policy(timeout=2, retries=3, backoff_base=0.01))
+    with FaultInjectingServer(schedule=["fail"], status=400) as server:
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(dep.call(_get(server.url)))
+        assert server.requests == 1
+    with FaultInjectingServer(schedule=["fail"]) as server:
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(dep.call(_get(server.url), idempotent=False))
+        assert server.requests == 1
+    assert dep.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    policy = Policy(timeout=2, retries=0, failure_threshold=2, reset_seconds=0.1)
+    dep = Dependency("test_breaker", policy)
+    with FaultInjectingServer(schedule=["fail", "fail"]) as server:
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                asyncio.run(dep.call(_get(server.url)))
+        assert BREAKER_STATE.value("test_breaker") == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(dep.call(_get(server.url)))
+        assert server.requests == 2
+
+        asyncio.run(asyncio.sleep(0.12))
+        assert asyncio.run(dep.call(_get(server.url)))["ok"]
+    assert BREAKER_STATE.value("test_breaker") == CircuitBreaker.CLOSED
+
+
+def test_cancelled_probe_does_not_wedge_the_breaker():
+    dep = Dependency("test_cancel_probe", Policy(timeout=2, retries=0, failure_threshold=1, reset_seconds=0))
+    dep.breaker.failure()
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def ok():
+        return "ok"
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(dep.call(hang), 0.05)
+        return await dep.call(ok)
+
+    assert asyncio.run(run()) == "ok"
+    assert dep.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_attempts_time_out():
+    dep = Dependency("test_timeout", Policy(timeout=0.2, retries=0))
+    with FaultInjectingServer(schedule=["slow"], delay=1.0) as server:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(dep.call(_get(server.url)))
+    assert dep.breaker.failures == 1
+
+
+def test_hedged_request_returns_the_faster_attempt():
+    dep = Dependency("test_hedge", Policy(timeout=2, retries=0, hedge_ms=30))
+
+    async def timed_call():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await dep.call(_get(server.url))
+        return result, loop.time() - start
+
+    with FaultInjectingServer(schedule=["slow"], delay=1.5) as server:
+        result, elapsed = asyncio.run(timed_call())
+    assert result["action"] == "ok"
+    assert elapsed < 1.0
+    assert DEPENDENCY_HEDGES.value("test_hedge") == 1
+
+
+def test_policy_env_overrides(monkeypatch):
+    monkeypatch.setenv("RESILIENCE_GROQ_TIMEOUT", "5")
+    monkeypatch.setenv("RESILIENCE_GROQ_RETRIES", "4")
+    policy = load_policy("groq")
+    assert policy.timeout == 5.0
+    assert policy.retries == 4 and isinstance(policy.retries, int)
+
+
+def test_rate_budgets_are_shared_per_provider(monkeypatch):
+    monkeypatch.setenv("RATE_BUDGET_TESTSCRAPER_PER_MINUTE", "600")
+    budget = get_rate_budget("testscraper")
+    assert budget is get_rate_budget("testscraper")
+    assert get_rate_budget("testunlimited") is None
+
+    async def run():
+        began = time.monotonic()
+        await asyncio.gather(*(spend_budget("testscraper") for _ in range(601)))
+        await spend_budget("testunlimited")
+        return time.monotonic() - began
+
+    # the burst covers 600 requests; the 601st waits about 0.1s for a token
+    assert asyncio.run(run()) >= 0.08
+
+
+def test_rate_budgets_are_counted_in_a_shared_cache(tmp_path, monkeypatch):
+    from backend.services.cache import SQLiteBackend
+    from backend.services.resilience import SharedRateBudget
+
+    path = str(tmp_path / "cache.sqlite3")
+    workers = [SharedRateBudget("scraper", 3, SQLiteBackend(path), "test") for _ in range(2)]
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        raise asyncio.CancelledError
+
+    # mid-minute, so the test never straddles a window boundary
+    monkeypatch.setattr(time, "time", lambda: 6_000_030.0)
+
+    async def run():
+        for budget in workers + workers[:1]:
+            await budget.acquire()
+        # a fourth request this minute from either process waits for the next one
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+        with pytest.raises(asyncio.CancelledError):
+            await workers[1].acquire()
+        monkeypatch.setattr(asyncio, "sleep", real_sleep)
+        for budget in workers:
+            await budget.backend.close()
+
+    asyncio.run(run())
+    assert len(sleeps) == 1 and 30 <= sleeps[0] <= 30.5
@@ -0,0 +1,154 @@
+import asyncio
+
+from backend.services.scheduler import IngestScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_intervals_adapt_to_churn_and_velocity():
+    scheduler = IngestScheduler(["fitness", "tech"], path="", clock=Clock())
+    urls = [f"https://v/{i}" for i in range(10)]
+
+    assert scheduler.observe("fitness", urls, 0.0).interval == 3600  # nothing to compare yet
+    quiet = scheduler.observe("fitness", urls, 0.0)
+    assert quiet.churn == 0.0 and quiet.interval == 7200
+    moving = scheduler.observe("fitness", [f"https://v/new{i}" for i in range(10)], 0.0)
+    assert moving.churn == 1.0 and moving.interval == 3600
+    steady = scheduler.observe("fitness", [f"https://v/new{i}" for i in range(7)] + urls[:3], 0.0)
+    assert abs(steady.churn - 0.3) < 1e-9 and steady.interval == 3600
+
+    # trending audio velocity alone shortens the interval, down to the minimum
+    for _ in range(5):
+        fast = scheduler.observe("tech", [], 40.0)
+    assert fast.activity == 1.0 and fast.interval == 900
+    assert fast.next_run == 1000.0 + 900
+
+
+def test_runs_are_bounded_prioritised_and_resumed(tmp_path):
+    clock = Clock()
+    release = asyncio.Event()
+    calls = []
+    fail = {"food"}
+
+    async def ingest(niche, percentile, run_id):
+        calls.append((niche, run_id))
+        if niche in fail:
+            raise RuntimeError("scrape failed")
+        await release.wait()
+        return [f"https://{niche}/1"]
+
+    async def velocity(niche):
+        return 0.0
+
+    path = str(tmp_path / "schedule.json")
+
+    async def run():
+        scheduler = IngestScheduler(
+            ["fitness", "tech", "food"], ingest=ingest, velocity=velocity, path=path, concurrency=2, clock=clock
+        )
+        scheduler.states["food"].activity = 0.9
+        scheduler.states["tech"].activity = 0.5
+        assert scheduler.tick() == ["food", "tech"]
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        # food failed and freed its slot; it is retried after the minimum interval
+        assert scheduler.running == ["tech"]
+        assert scheduler.tick() == ["fitness"]
+        assert scheduler.tick() == []
+        release.set()
+        await asyncio.sleep(0.01)
+        assert scheduler.running == []
+        assert scheduler.states["tech"].next_run == clock.now + 3600
+
+        clock.now += 900
+        assert scheduler.tick() == ["food"]
+        fail.clear()
+        await asyncio.sleep(0.01)
+        food_runs = [run_id for niche, run_id in calls if niche == "food"]
+        assert len(food_runs) == 2 and food_runs[0] == food_runs[1]
+        assert scheduler.states["food"].run_id is None and scheduler.states["food"].failures == 1
+
+        reloaded = IngestScheduler(["fitness", "tech", "food"], path=path, clock=clock)
+        assert reloaded.states["tech"].urls == scheduler.states["tech"].urls
+        assert reloaded.states["food"].runs == 1
+
+    asyncio.run(run())
+
+
+def test_only_the_lease_holder_schedules(tmp_path, monkeypatch):
+    from backend.services import cache as cache_module
+    from backend.services.cache import Cache, SQLiteBackend
+
+    shared = str(tmp_path / "cache.sqlite3")
+    caches = [Cache(SQLiteBackend(shared)), Cache(SQLiteBackend(shared))]
+    path = str(tmp_path / "schedule.json")
+
+    async def run():
+        schedulers = []
+        for cache in caches:
+            monkeypatch.setattr(cache_module, "get_cache", lambda cache=cache: cache)
+            schedulers.append(IngestScheduler(["fitness"], path=path, clock=Clock()))
+        first, second = schedulers
+
+        monkeypatch.setattr(cache_module, "get_cache", lambda: caches[0])
+        assert await first.elect() and await first.elect()
+        monkeypatch.setattr(cache_module, "get_cache", lambda: caches[1])
+        assert not await second.elect()
+
+        # stopping hands the lease over without waiting for it to expire
+        monkeypatch.setattr(cache_module, "get_cache", lambda: caches[0])
+        await first.stop()
+        monkeypatch.setattr(cache_module, "get_cache", lambda: caches[1])
+        assert await second.elect()
+        monkeypatch.setattr(cache_module, "get_cache", lambda: caches[0])
+        assert not await first.elect()
+        for cache in caches:
+            await cache.close()
+
+    asyncio.run(run())
+
+
+def test_losing_the_lease_cancels_runs_and_reelection_keeps_state_objects(tmp_path, monkeypatch):
+    import types
+
+    from backend.services import cache as cache_module
+
+    lease = {"held": True}
+
+    class Backend:
+        async def acquire(self, key, owner, ttl):
+            return lease["held"]
+
+    monkeypatch.setattr(cache_module, "get_cache", lambda: types.SimpleNamespace(prefix="t", backend=Backend()))
+    cancelled = []
+
+    async def ingest(niche, percentile, run_id):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(niche)
+            raise
+        return []
+
+    async def run():
+        scheduler = IngestScheduler(["fitness"], ingest=ingest, path=str(tmp_path / "s.json"), clock=Clock())
+        state = scheduler.states["fitness"]
+        assert await scheduler.elect() and scheduler.tick() == ["fitness"]
+        await asyncio.sleep(0)
+
+        lease["held"] = False
+        assert not await scheduler.elect()
+        assert cancelled == ["fitness"] and scheduler.running == []
+
+        scheduler.save()
+        lease["held"] = True
+        assert await scheduler.elect()
+        assert scheduler.states["fitness"] is state
+
+    asyncio.run(run())
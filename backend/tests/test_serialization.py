@@ -0,0 +1,93 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend.models import Pattern
+from backend.services.paging import page_response
+from backend.services.serialization import CompressionMiddleware, ORJSONResponse, dumps
+
+
+def _app():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500, encodings=["gzip"])
+
+    @app.get("/big")
+    async def big():
+        return {"rows": [{"id": i, "text": "x" * 20} for i in range(100)]}
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/page")
+    async def page(request: Request):
+        response = page_response(request, [{"id": i, "text": "x" * 20} for i in range(100)])
+        response.headers["Vary"] = "Origin"
+        return response
+
+    return app
+
+
+def test_dumps_matches_stdlib_for_models_and_numpy():
+    pattern = Pattern(niche="tech", hook="Bold", core_value_loop="Tips", narrative_arc="arc",
+                      visual_formula="lofi", cta="Follow", prevalence=0.5)
+    assert json.loads(dumps(pattern)) == pattern.model_dump(mode="json")
+    assert json.loads(dumps({"p": [pattern], "n": np.float32(0.5), "a": np.arange(3)})) == {
+        "p": [pattern.model_dump(mode="json")], "n": 0.5, "a": [0, 1, 2]
+    }
+
+
+def test_compression_negotiates_and_skips_small_bodies():
+    client = TestClient(_app())
+    resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip" and resp.headers["vary"] == "Accept-Encoding"
+    assert len(resp.json()["rows"]) == 100
+
+    raw = client.get("/big", headers={"Accept-Encoding": "identity, gzip;q=0"})
+    assert "content-encoding" not in raw.headers and len(raw.json()["rows"]) == 100
+
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.json() == {"ok": True}
+
+
+def test_streamed_lines_are_flushed_individually():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for i in range(3):
+            await send({"type": "http.response.body", "body": dumps({"i": i}) + b"\n", "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=500, encodings=["gzip"])(scope, None, send))
+    assert (b"content-encoding", b"gzip") in sent[0]["headers"]
+    chunks = [m["body"] for m in sent[1:]]
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # each line is decodable as soon as its chunk arrives
+    assert [decoder.decompress(c) for c in chunks[:3]] == [b'{"i":0}\n', b'{"i":1}\n', b'{"i":2}\n']
+    assert gzip.decompress(b"".join(chunks)).count(b"\n") == 3
+
+
+def test_compressed_pages_carry_a_weak_etag_and_one_vary_header():
+    client = TestClient(_app())
+    raw = client.get("/page", headers={"Accept-Encoding": "identity"})
+    strong = raw.headers["etag"]
+    assert not strong.startswith("W/") and "content-encoding" not in raw.headers
+
+    resp = client.get("/page", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip" and resp.headers["etag"] == f"W/{strong}"
+    assert resp.headers.get_list("vary") == ["Origin, Accept-Encoding"]
+
+    cached = client.get("/page", headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["etag"]})
+    assert cached.status_code == 304 and cached.headers["etag"] == f"W/{strong}"
+    fresh = client.get("/page", headers={"Accept-Encoding": "gzip", "If-None-Match": strong})
+    assert fresh.status_code == 304 and fresh.headers["etag"] == strong
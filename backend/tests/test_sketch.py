@@ -0,0 +1,118 @@
+import asyncio
+import random
+import sys
+import types
+from collections import Counter
+
+sys.modules.setdefault(
+    "supabase", types.SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+)
+
+from backend.services.sketch import AudioSketch, CountMinSketch
+
+
+def test_count_min_overestimates_within_bound():
+    rng = random.Random(3)
+    sketch = CountMinSketch.from_error(epsilon=0.01, delta=0.01)
+    truth = Counter(f"a{rng.randint(0, 2000)}" for _ in range(20000))
+    for key, count in truth.items():
+        sketch.add(key, count)
+    errors = [sketch.estimate(k)[0] - c for k, c in truth.items()]
+    assert min(errors) >= 0
+    assert max(errors) <= 0.01 * sketch.total
+
+
+def test_heavy_hitters_match_exact_top_and_snapshot_roundtrip(tmp_path):
+    rng = random.Random(7)
+    ids = rng.choices(range(5000), weights=[1 / (r + 1) for r in range(5000)], k=30000)
+    sketch = AudioSketch(epsilon=0.001, delta=0.01, top_k=50, path=str(tmp_path / "sketch.npz"))
+    for i in ids:
+        sketch.record("tech" if i % 2 else "fitness", f"audio-{i}", engagement=10, url=f"u{i}")
+
+    exact = [f"audio-{i}" for i, _ in Counter(ids).most_common(5)]
+    top = sketch.top(limit=5)
+    assert [a.audio_id for a in top] == exact
+    assert top[0].avg_engagement <= 10.0 + 1e-9 and top[0].url == "u0"
+    assert all(a.niche == "fitness" for a in sketch.top("fitness", limit=3))
+
+    # only snapshots that can be continued from ``videos`` are written
+    assert not sketch.snapshot()
+    sketch.watermark = len(ids)
+    assert sketch.snapshot()
+    restored = AudioSketch(epsilon=0.001, delta=0.01, top_k=50, path=sketch.path)
+    assert restored.load()
+    assert restored.total == len(ids) and restored.watermark == len(ids)
+    assert [a.model_dump() for a in restored.top(limit=5)] == [a.model_dump() for a in top]
+
+
+class FakeVideos:
+    configured = True
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    async def select(self, columns, *, gte=None, order=None, limit=None, **_):
+        self.calls += 1
+        return [r for r in self.rows if r["id"] >= gte["id"]][:limit]
+
+
+def _videos(n, start=1):
+    return [
+        {"id": start + i, "niche": "tech", "audio_id": f"audio-{i % 3}", "likes": 5, "comments": 0}
+        for i in range(n)
+    ]
+
+
+def test_sketch_pages_in_videos_above_its_watermark(tmp_path):
+    repo = FakeVideos(_videos(25))
+    sketch = AudioSketch(epsilon=0.01, delta=0.01, top_k=10, path=str(tmp_path / "sketch.npz"))
+    assert asyncio.run(sketch.sync(repo, page_size=10)) and repo.calls == 3
+    assert sketch.total == 25 and sketch.watermark == 25
+
+    # an ingest elsewhere expires it; only the new rows are read
+    repo.rows += _videos(5, start=26)
+    assert asyncio.run(sketch.sync(repo)) and repo.calls == 3
+    sketch.expire("trending")
+    assert asyncio.run(sketch.sync(repo, page_size=10)) and repo.calls == 4
+    assert sketch.total == 30
+
+    # a worker behind the stored snapshot does not overwrite it
+    behind = AudioSketch(epsilon=0.01, delta=0.01, top_k=10, path=sketch.path)
+    asyncio.run(behind.sync(FakeVideos(_videos(10))))
+    assert behind.watermark == 10 and not behind.snapshot()
+    restarted = AudioSketch(epsilon=0.01, delta=0.01, top_k=10, path=sketch.path)
+    assert restarted.load() and restarted.watermark == 30 and restarted.total == 30
+
+
+def test_all_time_trending_uses_the_sketch_and_falls_back_for_unseen_niches(monkeypatch):
+    from backend.services import ingestion
+
+    sketch = AudioSketch(epsilon=0.01, delta=0.01, top_k=10, path="")
+    asyncio.run(sketch.sync(FakeVideos(_videos(20))))
+
+    class Videos:
+        def __init__(self, client):
+            pass
+
+        async def select(self, columns, eq=None, **_):
+            return [{"audio_id": "db-audio", "audio_hash": "", "niche": eq["niche"], "likes": 4}]
+
+    async def no_snapshot(min_id=None):
+        return None
+
+    monkeypatch.setattr(ingestion, "get_audio_sketch", lambda: sketch)
+    monkeypatch.setattr(ingestion, "get_video_snapshot", no_snapshot)
+    monkeypatch.setattr(ingestion, "VideoRepository", Videos)
+    monkeypatch.setattr(ingestion, "get_supabase_client", lambda: None)
+
+    top = asyncio.run(ingestion._rank_trending_audio("tech", 2, "all"))
+    assert [a.audio_id for a in top] == [a.audio_id for a in sketch.top("tech", 2)]
+    unseen = asyncio.run(ingestion._rank_trending_audio("food", 2, "all"))
+    assert [(a.audio_id, a.niche, a.count) for a in unseen] == [("db-audio", "food", 1)]
+
+    # a sketch that has not caught up with ``videos`` is not consulted
+    sketch.expire("trending")
+    monkeypatch.setattr(sketch, "sync", lambda: asyncio.sleep(0, result=False))
+    fallback = asyncio.run(ingestion._rank_trending_audio("tech", 2, "all"))
+    assert [a.audio_id for a in fallback] == ["db-audio"]
@@ -0,0 +1,119 @@
+import asyncio
+import sys
+import types
+from collections import Counter
+
+import numpy as np
+
+sys.modules.setdefault(
+    "supabase", types.SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+)
+
+from backend.models import TrendingAudio
+from backend.services.pattern_miner import mine_patterns_from_records, mine_patterns_from_snapshot
+from backend.services.snapshot import VideoSnapshot
+
+
+def make_rows(n, start=1):
+    return [
+        {
+            "id": start + i,
+            "niche": "tech" if i % 3 else "fitness",
+            "audio_id": f"a{i % 7}",
+            "audio_url": f"https://audio/{i % 7}",
+            "audio_hash": f"h{i % 7}",
+            "likes": i * 10,
+            "comments": i,
+            "visual_style": "lo-fi" if i % 2 else "cinematic",
+            "transcript": f"Hook {i % 4}. Core loop. Follow for more {'é' * (i % 2)}.",
+            "created_at": "2024-01-01T00:00:00Z",
+        }
+        for i in range(n)
+    ]
+
+
+class FakeVideos:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    async def select(self, columns, *, gte=None, order=None, limit=None, **_):
+        self.calls += 1
+        rows = [r for r in self.rows if r["id"] >= gte["id"]]
+        return sorted(rows, key=lambda r: r[order])[:limit]
+
+
+def test_incremental_refresh_and_reload(tmp_path):
+    rows = make_rows(50)
+    repo = FakeVideos(rows[:30])
+    snapshot = VideoSnapshot(str(tmp_path))
+    assert asyncio.run(snapshot.refresh(repo, page_size=8)) == 30
+    assert repo.calls == 4 and snapshot.watermark == 30
+
+    repo.rows = rows
+    assert asyncio.run(snapshot.refresh(repo, page_size=100)) == 20
+
+    reopened = VideoSnapshot(str(tmp_path))
+    assert reopened.rows == 50 and isinstance(reopened.columns["likes"], np.memmap)
+    assert list(reopened.transcripts([0, 1, 49])) == [r["transcript"] for r in (rows[0], rows[1], rows[49])]
+    assert reopened.columns["id"][reopened.select(ids=[5, 42, 999])].tolist() == [5, 42]
+
+    exact = Counter(r["audio_id"] for r in rows if r["niche"] == "tech")
+    top = reopened.top_audio("tech", limit=3)
+    assert all(exact[a.audio_id] == a.count for a in top)
+    assert [a.count for a in top] == [c for _, c in exact.most_common(3)]
+    assert reopened.top_audio(limit=1)[0].niche == "fitness"
+
+
+def test_snapshot_mining_matches_records(tmp_path):
+    rows = make_rows(40)
+    snapshot = VideoSnapshot(str(tmp_path))
+    snapshot.append(rows)
+    tech = [r for r in rows if r["niche"] == "tech"]
+    expected = mine_patterns_from_records(tech, "tech", top_percentile=0.5)
+    mined = mine_patterns_from_snapshot(snapshot, snapshot.select(niches=["tech"]), "tech", top_percentile=0.5)
+    assert [p.model_dump() for p in mined] == [p.model_dump() for p in expected]
+
+
+def test_workers_sharing_a_directory_keep_each_others_rows(tmp_path):
+    rows = make_rows(30)
+    first, second = VideoSnapshot(str(tmp_path)), VideoSnapshot(str(tmp_path))
+    assert first.append(rows[:10]) == 10
+    # ``second`` still believes the snapshot is empty
+    assert second.append(rows[:20]) == 10
+    assert first.append(rows) == 10
+
+    # a crashed append left bytes past the committed length; they are overwritten, never truncated
+    with open(tmp_path / "id.bin", "ab") as fh:
+        fh.write(b"\xff" * 800)
+    size = (tmp_path / "id.bin").stat().st_size
+    mapped = VideoSnapshot(str(tmp_path))
+    assert asyncio.run(second.refresh(FakeVideos(make_rows(40)), page_size=100)) == 10
+    assert (tmp_path / "id.bin").stat().st_size == size and mapped.columns["id"][-1] == 30
+
+    reopened = VideoSnapshot(str(tmp_path))
+    assert reopened.rows == 40 and reopened.columns["id"].tolist() == list(range(1, 41))
+    assert list(reopened.transcripts([9, 10, 29])) == [rows[i]["transcript"] for i in (9, 10, 29)]
+    assert sum(a.count for a in reopened.top_audio(limit=10)) == 40
+
+
+def test_all_time_trending_is_served_from_the_snapshot(tmp_path, monkeypatch):
+    from backend.services import ingestion
+
+    snapshot = VideoSnapshot(str(tmp_path))
+    snapshot.append(make_rows(30))
+
+    async def fake_snapshot(min_id=None):
+        return snapshot
+
+    class Tracker:
+        ready = True
+
+        def top(self, niche=None, limit=10, window=None):
+            return [TrendingAudio(audio_id="windowed", audio_hash="", count=1)]
+
+    monkeypatch.setattr(ingestion, "get_video_snapshot", fake_snapshot)
+    monkeypatch.setattr(ingestion, "get_trending_tracker", Tracker)
+    top = asyncio.run(ingestion._rank_trending_audio("tech", 3, "all"))
+    assert [a.model_dump() for a in top] == [a.model_dump() for a in snapshot.top_audio("tech", 3)]
+    assert asyncio.run(ingestion._rank_trending_audio("tech", 3, None))[0].audio_id == "windowed"
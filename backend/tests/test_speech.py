@@ -0,0 +1,45 @@
+import math
+
+import numpy as np
+
+from backend.services.speech import WordTimings, hook_word_count, speech_features
+
+RESPONSE = {
+    "text": "Stop scrolling now. Here are three tips.",
+    "words": [
+        {"word": "Stop", "start": 0.2, "end": 0.5},
+        {"word": "scrolling", "start": 0.5, "end": 0.9},
+        {"word": "now", "start": 0.9, "end": 1.2},
+        {"word": "Here", "start": 1.8, "end": 2.0},
+        {"word": "are", "start": 2.0, "end": 2.1},
+        {"word": "three", "start": 2.1, "end": 2.4},
+        {"word": "tips", "start": 2.9, "end": 3.2},
+    ],
+}
+
+
+def test_features_from_word_timestamps():
+    timings = WordTimings.from_response(RESPONSE)
+    features = speech_features(timings, hook_word_count(RESPONSE["text"]), pause_seconds=0.3)
+    assert math.isclose(features["time_to_hook"], 1.2, rel_tol=1e-6)
+    assert math.isclose(features["speech_rate"], 7 / 3.0, rel_tol=1e-6)
+    # gaps of 0.6s (after the hook) and 0.5s (before "tips")
+    assert math.isclose(features["pause_density"], 2 / 3.0, rel_tol=1e-6)
+
+
+def test_compact_encoding_round_trips_to_the_millisecond():
+    timings = WordTimings.from_response(RESPONSE)
+    encoded = timings.encode()
+    assert len(encoded) == math.ceil(len(timings) * 8 / 3) * 4
+    decoded = WordTimings.decode(encoded)
+    assert np.allclose(decoded.starts, timings.starts, atol=1e-3)
+    assert np.allclose(decoded.ends, timings.ends, atol=1e-3)
+
+
+def test_segments_without_words_are_spread_evenly():
+    timings = WordTimings.from_response(
+        {"segments": [{"start": 0.0, "end": 2.0, "text": "one two"}, {"start": 3.0, "end": 4.0, "text": "three"}]}
+    )
+    assert timings.starts.tolist() == [0.0, 1.0, 3.0]
+    assert timings.ends.tolist() == [1.0, 2.0, 4.0]
+    assert speech_features(WordTimings.decode(None), 3)["speech_rate"] is None
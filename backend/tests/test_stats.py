@@ -0,0 +1,60 @@
+import math
+
+import numpy as np
+import pytest
+
+from backend.services.pattern_miner import mine_patterns_from_records
+from backend.services.stats import EngagementStats, TDigest, grouped_summary
+
+
+def test_tdigest_quantiles_track_exact_values():
+    rng = np.random.default_rng(5)
+    values = rng.lognormal(mean=8, sigma=1.5, size=50_000)
+    digest = TDigest(compression=200)
+    for chunk in np.array_split(values, 20):
+        digest.update(chunk)
+    assert len(digest.means) <= 200
+    for q in (0.5, 0.9, 0.99):
+        exact = np.quantile(values, q)
+        assert math.isclose(digest.quantile(q), exact, rel_tol=0.05)
+    assert abs(digest.cdf(np.quantile(values, 0.95)) - 0.95) < 0.01
+
+
+def test_grouped_summary_matches_numpy():
+    groups = np.array([0, 1, 0, 0, 1, 0, 0])
+    values = np.array([1.0, 7.0, 3.0, 100.0, 9.0, 2.0, 4.0])
+    summary = grouped_summary(groups, values, trim=0.2)
+    assert list(summary["count"]) == [5, 2]
+    assert summary["median"][0] == 3.0 and summary["median"][1] == 8.0
+    assert summary["trimmed_mean"][0] == 3.0
+    assert math.isclose(summary["mean"][0], 22.0)
+    assert summary["ci_low"][0] < 22.0 < summary["ci_high"][0]
+
+    # trimming half or more of each tail degrades to the median
+    assert list(grouped_summary(groups, values, trim=0.5)["trimmed_mean"]) == [3.0, 8.0]
+    assert list(grouped_summary(groups, values, trim=0.9)["trimmed_mean"]) == [3.0, 8.0]
+
+
+def test_mining_filters_to_top_percentile_of_niche():
+    stats = EngagementStats(min_samples=10)
+    stats.update("fitness", range(0, 1000, 10))
+    records = [
+        {"transcript": "Hook one. Core. Follow.", "likes": 990, "comments": 0},
+        {"transcript": "Hook one. Core. Follow.", "likes": 950, "comments": 5},
+        {"transcript": "Hook two. Core. Follow.", "likes": 10, "comments": 0},
+    ]
+    patterns = mine_patterns_from_records(records, "fitness", top_percentile=0.1, stats=stats)
+    assert [p.hook for p in patterns] == ["Hook one"]
+    assert patterns[0].prevalence == 1.0
+    assert patterns[0].engagement_percentile > 0.9
+
+
+def test_ingest_top_percentile_is_bounded_like_strategy_requests():
+    from pydantic import ValidationError
+
+    from backend.models import IngestRequest
+
+    assert IngestRequest(niches=["tech"], top_percentile=1).top_percentile == 1
+    for bad in (0, -0.1, 5):
+        with pytest.raises(ValidationError):
+            IngestRequest(niches=["tech"], top_percentile=bad)
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import sys
+import time
+import types
+
+sys.modules.setdefault(
+    "supabase", types.SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+)
+
+from PIL import Image
+
+from backend.services.storyboard import RateLimiter, Storyboarder, StubImageBackend, shot_prompts
+
+SCRIPT = (
+    "Stop scrolling. Here are three desk hacks. First, raise your monitor. "
+    "Second, add a lamp. Third, hide the cables. Follow for more."
+)
+
+
+def test_shot_count_follows_pacing():
+    assert len(shot_prompts(SCRIPT, "desk hacks", pacing_hint=1.0)) == 6
+    assert len(shot_prompts(SCRIPT, "desk hacks", pacing_hint=4.0)) == 3
+    slow = shot_prompts(SCRIPT, "desk hacks", pacing_hint=30.0, style_hint="lo-fi")
+    assert len(slow) == 1 and "Follow for more." in slow[0] and "lo-fi" in slow[0]
+
+
+def test_frames_are_deduped_cached_and_thumbnailed(tmp_path):
+    backend = StubImageBackend()
+    board = Storyboarder(backend, directory=str(tmp_path), public_url="/media")
+
+    async def run():
+        first = await asyncio.gather(board.render("same shot"), board.render("same shot"))
+        frames = await board.build(SCRIPT, "desk hacks", pacing_hint=2.0)
+        again = await board.build(SCRIPT, "desk hacks", pacing_hint=2.0)
+        return first, frames, again
+
+    first, frames, again = asyncio.run(run())
+    assert backend.calls.count("same shot") == 1
+    assert first[0].url == first[1].url == f"/media/{board.key('same shot')}.webp"
+    assert all(f and not f.cached for f in frames) and all(f.cached for f in again)
+    assert len(backend.calls) == 1 + len(frames)
+
+    key = board.key("same shot")
+    with Image.open(os.path.join(tmp_path, f"{key}_thumb.webp")) as thumb:
+        assert thumb.format == "WEBP" and thumb.width == board.thumb_width
+
+
+def test_rate_limiter_spaces_out_bursts():
+    limiter = RateLimiter(rate=20, period=1.0, burst=1)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.09
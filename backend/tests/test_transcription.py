@@ -0,0 +1,28 @@
+import asyncio
+import os
+
+from backend.services import transcription
+
+
+def test_concurrent_transcriptions_use_their_own_audio_files(monkeypatch):
+    paths = []
+
+    async def extract(video_url, output_path):
+        paths.append(output_path)
+        with open(output_path, "w") as fh:
+            fh.write(video_url)
+        await asyncio.sleep(0.01)
+        return output_path
+
+    async def transcribe(audio_path, use_turbo=False):
+        with open(audio_path) as fh:
+            return {"text": fh.read()}
+
+    monkeypatch.setattr(transcription, "extract_audio_from_video", extract)
+    monkeypatch.setattr(transcription, "transcribe_audio", transcribe)
+
+    async def run():
+        return await asyncio.gather(*(transcription.transcribe_video(f"video-{i}") for i in range(3)))
+
+    assert [r["text"] for r in asyncio.run(run())] == ["video-0", "video-1", "video-2"]
+    assert len(set(paths)) == 3 and not any(os.path.exists(p) for p in paths)
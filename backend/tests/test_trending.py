@@ -0,0 +1,151 @@
+import math
+import sys
+import types
+
+sys.modules.setdefault(
+    "supabase", types.SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+)
+
+from backend.services.trending import TrendingTracker, parse_window
+
+HOUR = 3600
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_windows_decay_and_velocity():
+    clock = Clock(1000 * HOUR)
+    tracker = TrendingTracker(bucket_seconds=HOUR, buckets=168, half_life_hours=24, clock=clock)
+
+    # "old" was popular five days ago; "new" is ramping up in the last hours
+    for _ in range(10):
+        tracker.record("tech", "old", engagement=10, timestamp=clock.now - 120 * HOUR)
+    for hours_ago, uses in ((3, 1), (2, 2), (1, 3), (0, 4)):
+        for _ in range(uses):
+            tracker.record("tech", "new", engagement=20, timestamp=clock.now - hours_ago * HOUR)
+
+    week = tracker.top("tech", limit=2, window="7d")
+    assert [a.audio_id for a in week] == ["new", "old"]
+    assert week[1].count == 10 and week[0].count == 10
+    assert math.isclose(week[0].avg_engagement, 20.0)
+
+    day = tracker.top("tech", limit=5, window="24h")
+    assert [a.audio_id for a in day] == ["new"]
+    assert day[0].velocity > 0 and day[0].acceleration > 0
+
+    assert [a.audio_id for a in tracker.top("tech", window="1h")] == ["new"]
+    assert tracker.window_count("tech", "new", "1h") == 4
+    assert tracker.top("fitness") == []
+
+
+def test_buckets_expire_as_time_advances_and_niches_aggregate():
+    clock = Clock(500 * HOUR)
+    tracker = TrendingTracker(bucket_seconds=HOUR, buckets=24, clock=clock)
+    tracker.record("tech", "a", timestamp=clock.now)
+    tracker.record("fitness", "a", timestamp=clock.now)
+    tracker.record("fitness", "b", timestamp=clock.now)
+
+    overall = tracker.top(limit=5, window="24h")
+    assert overall[0].audio_id == "a" and overall[0].count == 2
+
+    clock.now += 30 * HOUR
+    assert tracker.top(limit=5, window="24h") == []
+    assert tracker.window_count("tech", "a") == 0
+
+
+def test_parse_window():
+    assert parse_window("1h") == HOUR
+    assert parse_window("7d") == 7 * 24 * HOUR
+
+
+def test_trending_pages_are_keyset_ordered_and_limit_is_honoured(monkeypatch):
+    import asyncio
+
+    from backend.models import TrendingAudio
+    from backend.services import ingestion
+
+    scores = {"a": 5.0, "b": 3.0, "c": 3.0, "d": 2.0, "e": 1.0}
+    depths = []
+
+    async def fake_rank(niche, limit, window):
+        depths.append(limit)
+        ranked = sorted(scores.items(), key=lambda kv: -kv[1])[:limit]
+        return [TrendingAudio(audio_id=a, audio_hash=a, count=1, score=s, niche=niche) for a, s in ranked]
+
+    async def no_features(audios):
+        return audios
+
+    monkeypatch.setenv("TRENDING_AUDIO_LIMIT", "50")
+    monkeypatch.setattr(ingestion, "_rank_trending_audio", fake_rank)
+    monkeypatch.setattr(ingestion, "attach_audio_features", no_features)
+
+    async def run():
+        first, cursor = await ingestion.page_trending_audio("paging", limit=2)
+        assert [a.audio_id for a in first] == ["a", "b"] and cursor == [3.0, "b", 1]
+        second, cursor = await ingestion.page_trending_audio("paging", limit=2, after=cursor)
+        assert [a.audio_id for a in second] == ["c", "d"] and cursor == [2.0, "d", 3]
+        third, cursor = await ingestion.page_trending_audio("paging", limit=2, after=cursor)
+        assert [a.audio_id for a in third] == ["e"] and cursor is None
+        # the caller's limit is no longer replaced by TRENDING_AUDIO_LIMIT
+        assert len(await ingestion.get_trending_audio("paging-all", limit=4)) == 4
+
+    asyncio.run(run())
+    assert depths == [2, 6, 8, 4]
+
+
+def test_sync_seeds_the_horizon_once_then_reads_rows_above_the_watermark(monkeypatch):
+    import asyncio
+
+    from backend.services import trending
+
+    now = 1_700_000_000.0
+    stamp = "2023-11-14T22:00:00+00:00"  # shortly before ``now``
+
+    class Videos:
+        configured = True
+        rows = [{"id": i, "niche": "tech", "audio_id": "a", "created_at": stamp} for i in (1, 2)]
+        calls = []
+
+        def __init__(self, client):
+            pass
+
+        async def select(self, columns, gte=None, **_):
+            self.calls.append(gte)
+            if "id" in gte:
+                return [r for r in self.rows if r["id"] >= gte["id"]]
+            return list(self.rows)
+
+    monkeypatch.setattr(trending, "VideoRepository", Videos)
+    monkeypatch.setattr(trending, "get_supabase_client", lambda: None)
+    tracker = TrendingTracker(clock=Clock(now))
+    assert asyncio.run(tracker.sync()) and tracker.watermark == 2
+    assert tracker.window_count("tech", "a", "24h") == 2
+
+    # this process stored video 3; another worker stored video 4
+    tracker.record("tech", "a", timestamp=now, video_id=3)
+    Videos.rows += [{"id": vid, "niche": "tech", "audio_id": "a", "created_at": stamp} for vid in (3, 4)]
+    tracker.expire("trending")
+    assert asyncio.run(tracker.sync())
+    assert list(Videos.calls[-1]) == ["id"] and Videos.calls[-1]["id"] == 3
+    assert tracker.window_count("tech", "a", "24h") == 4 and tracker.watermark == 4
+
+
+def test_trending_audio_endpoint_rejects_oversized_limits(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from backend.services import ingestion
+
+    # other tests may leave a stub in sys.modules
+    monkeypatch.setitem(sys.modules, "backend.services.ingestion", ingestion)
+    from backend.routers import audio as audio_router
+
+    app = FastAPI()
+    app.include_router(audio_router.router)
+    assert TestClient(app).get("/api/audio/trending?limit=101").status_code == 422
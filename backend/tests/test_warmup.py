@@ -0,0 +1,51 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+sys.modules.setdefault(
+    "supabase", types.SimpleNamespace(create_client=lambda *a, **k: None, Client=object)
+)
+
+from backend.services import warmup
+
+
+def test_role_validation(monkeypatch):
+    monkeypatch.setenv("VIRALSYNTH_ROLE", "Worker")
+    assert warmup.get_role() == "worker"
+    monkeypatch.setenv("VIRALSYNTH_ROLE", "batch")
+    with pytest.raises(ValueError):
+        warmup.get_role()
+
+
+def test_warm_up_runs_role_steps_and_survives_failures(monkeypatch):
+    ran = []
+
+    async def ok():
+        ran.append("ok")
+
+    async def boom():
+        raise RuntimeError("no database")
+
+    monkeypatch.setitem(warmup.STEPS, "api", [("ok", ok), ("boom", boom)])
+    durations = asyncio.run(warmup.warm_up("api"))
+    assert ran == ["ok"] and set(durations) == {"ok", "boom"}
+
+    monkeypatch.setenv("VIRALSYNTH_WARMUP", "0")
+    assert asyncio.run(warmup.warm_up("api")) == {}
+
+
+@pytest.mark.parametrize("role", ["api", "worker"])
+def test_every_role_serves_the_storyboard_frames_it_generates(role):
+    # main mounts per role at import time, so each role needs a fresh interpreter
+    import os
+    import subprocess
+
+    code = (
+        "from backend.main import app;"
+        "print(any(getattr(r, 'path', '') == '/media/storyboards' for r in app.routes))"
+    )
+    env = {**os.environ, "VIRALSYNTH_ROLE": role}
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=120)
+    assert out.stdout.strip() == "True", out.stderr